@@ -0,0 +1,73 @@
+from fastapi import APIRouter, Depends, Query, HTTPException
+from typing import Dict, Literal, Optional
+import logging
+from app.models.responses import KeyListResponse
+from app.services.auth_service import get_current_user
+from app.services.datamart import DatamartService
+from app.dependencies import get_current_datamart
+
+
+router = APIRouter(prefix = "/api/v1/keys", tags=["keys"])
+
+@router.get(
+    "/{dimension}",
+    response_model=KeyListResponse,
+    summary="Listado y autocompletado de claves",
+    tags=["keys"],
+    description="""
+    Lista las claves válidas de una dimensión en orden lexicográfico, con el
+    número de registros de cada una. Con `prefix` retorna solo las claves que
+    empiezan con ese texto (autocompletado).
+
+     **Requiere autenticación JWT**
+
+    Las claves salen de los valores únicos ordenados que se construyen al cargar
+    el datamart: el rango del prefijo se ubica con búsqueda binaria y no se
+    recorren transacciones.
+
+    Parámetros:
+    - `dimension`: `key_employee`, `key_product`, `key_store`, `key_customer` o `key_division`
+    - `prefix`: (Opcional) Prefijo de las claves (ej. `1|34`)
+    - `offset`: Posición de la primera clave retornada (paginación)
+    - `limit`: Máximo de claves retornadas (1 a 1000)
+
+    Ejemplo de uso:
+```
+    GET /api/v1/keys/key_employee?prefix=1|34&limit=20
+```
+    """,
+    response_description="Claves de la página, con sus registros, y total que coincide"
+)
+async def list_keys(
+        dimension: Literal["key_employee", "key_product", "key_store", "key_customer", "key_division"],
+        prefix: Optional[str] = Query(None, description="(Opcional) Prefijo de las claves", example="1|34"),
+        offset: int = Query(0, ge=0, description="Posición de la primera clave retornada"),
+        limit: int = Query(100, ge=1, le=1000, description="Máximo de claves retornadas"),
+        datamart_service: DatamartService = Depends(get_current_datamart),
+        current_user: Dict = Depends(get_current_user)
+) -> KeyListResponse:
+    """
+    Endpoint para listar y autocompletar las claves de una dimensión.
+    """
+    try:
+        return datamart_service.list_keys(
+            dimension=dimension,
+            prefix=prefix,
+            offset=offset,
+            limit=limit
+        )
+
+    except HTTPException:
+        raise
+    except ValueError as e:
+        logging.error(f"Error de validación: {str(e)}")
+        raise HTTPException(
+            status_code=422,
+            detail=f"Error de validación: {str(e)}"
+        )
+    except Exception as e:
+        logging.error(f"Error inesperado: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail="Error al listar las claves"
+        )
@@ -0,0 +1,104 @@
+from fastapi import APIRouter, Depends, Query, HTTPException
+from datetime import date
+from typing import Dict, List, Literal, Optional
+import logging
+from app.models.responses import PivotResponse
+from app.services.auth_service import get_current_user
+from app.services.datamart import DatamartService
+from app.dependencies import get_current_datamart
+from app.utils.exceptions import PivotNotFoundError
+
+
+router = APIRouter(prefix = "/api/v1/pivots", tags=["pivots"])
+
+@router.get(
+    "/{name}",
+    response_model=PivotResponse,
+    summary="Pivote entre dos dimensiones",
+    tags=["pivots"],
+    description="""
+    Retorna un sub-pivote denso (filas × columnas) de monto, cantidad y registros
+    desde una matriz dispersa precalculada por mes, sin agrupar transacciones.
+
+     **Requiere autenticación JWT**
+
+    Pivotes disponibles:
+    - `store-product`: filas `key_store`, columnas `key_product`
+    - `employee-store`: filas `key_employee`, columnas `key_store`
+
+    Parámetros:
+    - `name`: Nombre del pivote
+    - `rows`: (Opcional, repetible) Claves de las filas; sin ellas se eligen las
+      `row_limit` filas con mayor `order_by` en el periodo
+    - `columns`: (Opcional, repetible) Claves de las columnas; sin ellas se eligen
+      las `column_limit` columnas con mayor `order_by` dentro de las filas
+    - `date_start` / `date_end`: (Opcional) Periodo (formato: YYYY-MM-DD)
+    - `order_by`: `amount`, `quantity` o `records`
+
+    Las claves pedidas que no existen se retornan con ceros.
+
+    Ejemplo de uso:
+```
+    GET /api/v1/pivots/store-product?rows=1|023&rows=1|045&date_start=2023-11-01&date_end=2023-11-30
+```
+    """,
+    response_description="Monto, cantidad y registros por fila y columna"
+)
+async def get_pivot(
+        name: str,
+        rows: Optional[List[str]] = Query(None, description="(Opcional) Claves de las filas", example=["1|023"]),
+        columns: Optional[List[str]] = Query(None, description="(Opcional) Claves de las columnas",
+                                             example=["1|44733"]),
+        date_start: Optional[date] = Query(None, description="(Opcional) Fecha de inicio", example="2023-11-01"),
+        date_end: Optional[date] = Query(None, description="(Opcional) Fecha de fin", example="2023-11-30"),
+        order_by: Literal["amount", "quantity", "records"] = Query(
+            "amount", description="Medida para elegir filas y columnas: 'amount', 'quantity' o 'records'"
+        ),
+        row_limit: int = Query(50, ge=1, le=500, description="Máximo de filas elegidas (sin rows)"),
+        column_limit: int = Query(50, ge=1, le=500, description="Máximo de columnas elegidas (sin columns)"),
+        datamart_service: DatamartService = Depends(get_current_datamart),
+        current_user: Dict = Depends(get_current_user)
+) -> PivotResponse:
+    """
+    Endpoint para consultar un pivote entre dos dimensiones.
+    """
+    try:
+        # Validar rango de fechas
+        if date_start and date_end and date_end < date_start:
+            raise HTTPException(
+                status_code=422,
+                detail=f"date_end ({date_end}) debe ser mayor o igual a date_start ({date_start})"
+            )
+        if (rows and len(rows) > 500) or (columns and len(columns) > 500):
+            raise HTTPException(
+                status_code=422,
+                detail="Se admiten como máximo 500 filas y 500 columnas"
+            )
+
+        return datamart_service.get_pivot(
+            name=name,
+            rows=rows,
+            columns=columns,
+            date_start=date_start,
+            date_end=date_end,
+            order_by=order_by,
+            row_limit=row_limit,
+            column_limit=column_limit
+        )
+
+    except HTTPException:
+        raise
+    except PivotNotFoundError as e:
+        raise HTTPException(status_code=404, detail=e.message)
+    except ValueError as e:
+        logging.error(f"Error de validación: {str(e)}")
+        raise HTTPException(
+            status_code=422,
+            detail=f"Error de validación: {str(e)}"
+        )
+    except Exception as e:
+        logging.error(f"Error inesperado: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail="Error al consultar el pivote"
+        )
@@ -0,0 +1,67 @@
+from fastapi import APIRouter, Depends, HTTPException
+from typing import Dict
+import logging
+from app.models.schemas import AggregationQuery
+from app.models.responses import AggregationQueryResponse
+from app.services.auth_service import get_current_user
+from app.services.datamart import DatamartService
+from app.dependencies import get_current_datamart
+
+
+router = APIRouter(prefix = "/api/v1/query", tags=["sales-query"])
+
+@router.post(
+    "",
+    response_model=AggregationQueryResponse,
+    summary="Consulta de agregación (filtros, agrupación y métricas)",
+    tags=["sales-query"],
+    description="""
+    Ejecuta una consulta de agregación descrita en JSON, sin necesidad de un endpoint por pregunta.
+
+     **Requiere autenticación JWT**
+
+    Cuerpo:
+    - `filters`: Filtros por dimensión (`key_employee`, `key_product`, `key_store`,
+      `key_customer`, `key_division`); cada uno acepta una clave o una lista de claves
+    - `date_start` / `date_end`: (Opcional) Rango de fechas (formato: YYYY-MM-DD)
+    - `group_by`: Dimensiones de agrupación (mismos nombres que los filtros)
+    - `time_bucket`: (Opcional) Agrupación temporal: `day`, `week`, `month` o `year`
+    - `metrics`: Lista de métricas `{"op": "sum|count|avg|min|max", "field": "amount|quantity"}`
+    - `order_by`: (Opcional) Métrica (ej. `sum_amount`) o dimensión por la cual ordenar
+    - `descending`: Orden descendente (por defecto true)
+    - `limit`: Máximo de grupos retornados (1 a 10000)
+    - `explain`: Incluir el plan de ejecución (índices usados y filas recorridas)
+
+    Ejemplo de uso:
+```
+    POST /api/v1/query
+    {"filters": {"key_store": "1|023"}, "group_by": ["key_employee"], "time_bucket": "month",
+     "metrics": [{"op": "sum", "field": "amount"}, {"op": "count"}],
+     "order_by": "sum_amount", "limit": 20, "explain": true}
+```
+    """,
+    response_description="Grupos resultantes de la consulta",
+)
+async def run_query(
+    query: AggregationQuery,
+    datamart_service: DatamartService = Depends(get_current_datamart),
+    current_user: Dict = Depends(get_current_user)
+) -> AggregationQueryResponse:
+    """
+    Endpoint para ejecutar consultas de agregación.
+    """
+    try:
+        return datamart_service.run_query(query)
+
+    except ValueError as e:
+        logging.error(f"Error de validación: {str(e)}")
+        raise HTTPException(
+            status_code=422,
+            detail=f"Error de validación: {str(e)}"
+        )
+    except Exception as e:
+        logging.error(f"Error inesperado: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail="Error al ejecutar la consulta"
+        )
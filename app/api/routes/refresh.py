@@ -0,0 +1,66 @@
+from fastapi import APIRouter, Depends, HTTPException
+from starlette.concurrency import run_in_threadpool
+from typing import Dict
+import logging
+from app.models.responses import RefreshResponse
+from app.services.auth_service import get_current_user
+from app.services.datamart import DatamartService, refresh_datamart_service
+from app.dependencies import get_current_datamart
+
+
+router = APIRouter(prefix = "/api/v1/datamart", tags=["datamart"])
+
+@router.post(
+    "/refresh",
+    response_model=RefreshResponse,
+    summary="Recarga de archivos nuevos del datamart",
+    tags=["datamart"],
+    description="""
+    Revisa los archivos parquet de `DATAMART_PATH` y carga los cambios.
+
+     **Requiere autenticación JWT**
+
+    - Si solo hay archivos nuevos (el datamart es de solo anexado) se leen solo
+      esos y sus agregados, índices y sketches se mezclan con los existentes
+      (`mode: incremental`), en tiempo proporcional a las filas nuevas.
+    - Si un archivo ya cargado cambió o se borró, o los archivos nuevos no se
+      pueden anexar (columnas distintas, tickets repartidos entre archivos), se
+      hace una carga completa (`mode: full`).
+    - Sin cambios responde `mode: unchanged`.
+
+    Con `DATAMART_REFRESH_INTERVAL_SECONDS` la misma revisión corre periódicamente
+    en segundo plano. No está disponible con `SHARED_DATAMART_PATH` (422).
+
+    Ejemplo de uso:
+```
+    POST /api/v1/datamart/refresh
+```
+    """,
+    response_description="Modo de la recarga y registros anexados"
+)
+async def refresh_datamart(
+        datamart_service: DatamartService = Depends(get_current_datamart),
+        current_user: Dict = Depends(get_current_user)
+) -> RefreshResponse:
+    """
+    Endpoint para recargar los archivos nuevos del datamart.
+    """
+    try:
+        # La dependencia asegura que el datamart ya cargó (503 si no); la recarga
+        # lee archivos y construye estructuras: fuera del event loop
+        return await run_in_threadpool(refresh_datamart_service)
+
+    except HTTPException:
+        raise
+    except ValueError as e:
+        logging.error(f"Error de validación: {str(e)}")
+        raise HTTPException(
+            status_code=422,
+            detail=f"Error de validación: {str(e)}"
+        )
+    except Exception as e:
+        logging.error(f"Error inesperado: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail="Error al recargar el datamart"
+        )
@@ -2,10 +2,12 @@ from fastapi import APIRouter, Depends, Query, HTTPException
 from datetime import date
 from typing import Dict, Optional
 import logging
-from app.models.responses import EmployeeSalesResponse, ProductSalesResponse, StoreSalesResponse
-from app.services.datamart import get_datamart_service, DatamartService
+from app.models.responses import (EmployeeSalesResponse, ProductSalesResponse, StoreSalesResponse, SalesQueryResponse,
+                                  TicketResponse, CustomerSalesResponse)
+from app.services.datamart import DatamartService
 from app.dependencies import get_current_datamart
 from app.services.auth_service import get_current_user
+from app.utils.exceptions import TicketNotFoundError, MixedCurrencyError, KeyNotFoundError
 
 router = APIRouter(prefix = "/api/v1/sales", tags=["sales-by-period"])
 
@@ -22,6 +24,7 @@ router = APIRouter(prefix = "/api/v1/sales", tags=["sales-by-period"])
     - `key_employee`: ID del empleado en formato "1|343" (KeyEmployee del datamart)
     - `date_start`: Fecha de inicio del periodo (formato: YYYY-MM-DD)
     - `date_end`: Fecha de fin del periodo (formato: YYYY-MM-DD)
+    - `division`: (Opcional) División (KeyDivision); solo se leen sus segmentos
     
     Retorna:
     - Listado detallado de todas las ventas del empleado
@@ -55,6 +58,11 @@ async def get_sales_by_employee(
         description="Fecha de fin del periodo",
         example="2023-11-30"
     ),
+    division: Optional[str] = Query(
+        None,
+        description="(Opcional) División (KeyDivision) a la que se limita la consulta",
+        example="1"
+    ),
     datamart_service: DatamartService = Depends(get_current_datamart),
     current_user: Dict = Depends(get_current_user)
 ) -> EmployeeSalesResponse:
@@ -70,11 +78,17 @@ async def get_sales_by_employee(
         result = datamart_service.get_sales_by_employee(
             key_employee=key_employee,
             date_start=date_start,
-            date_end=date_end
+            date_end=date_end,
+            division=division
         )
 
         return result
 
+    except MixedCurrencyError as e:
+        logging.error(e.message)
+        raise HTTPException(status_code=422, detail=e.message)
+    except KeyNotFoundError as e:
+        raise HTTPException(status_code=404, detail=e.message)
     except ValueError as e:
         logging.error(str(e))
         raise HTTPException(status_code=422, detail=f"Error al obtener datos del empleado: {str(e)}")
@@ -99,6 +113,7 @@ async def get_sales_by_employee(
     - `key_product`: ID del producto en formato "1|44733" (KeyProduct del datamart)
     - `date_start`: Fecha de inicio del periodo (formato: YYYY-MM-DD)
     - `date_end`: Fecha de fin del periodo (formato: YYYY-MM-DD)
+    - `division`: (Opcional) División (KeyDivision); solo se leen sus segmentos
 
     Retorna:
     - Listado detallado de todas las ventas del producto
@@ -140,6 +155,11 @@ async def get_sales_by_product(
             description="Fecha de fin del periodo",
             example="2023-11-30"
         ),
+        division: Optional[str] = Query(
+            None,
+            description="(Opcional) División (KeyDivision) a la que se limita la consulta",
+            example="1"
+        ),
         datamart_service: DatamartService = Depends(get_current_datamart),
         current_user: Dict = Depends(get_current_user)
 ) -> ProductSalesResponse:
@@ -158,11 +178,17 @@ async def get_sales_by_product(
         result = datamart_service.get_sales_by_product(
             key_product=key_product,
             date_start=date_start,
-            date_end=date_end
+            date_end=date_end,
+            division=division
         )
 
         return result
 
+    except MixedCurrencyError as e:
+        logging.error(e.message)
+        raise HTTPException(status_code=422, detail=e.message)
+    except KeyNotFoundError as e:
+        raise HTTPException(status_code=404, detail=e.message)
     except ValueError as e:
         logging.error(f"Error de validación: {str(e)}")
         raise HTTPException(
@@ -190,6 +216,7 @@ async def get_sales_by_product(
     - `key_store`: ID de la tienda en formato "1|023" (KeyStore del datamart)
     - `date_start`: Fecha de inicio del periodo (formato: YYYY-MM-DD)
     - `date_end`: Fecha de fin del periodo (formato: YYYY-MM-DD)
+    - `division`: (Opcional) División (KeyDivision); solo se leen sus segmentos
     
     Retorna:
     - Listado detallado de todas las ventas de la tienda
@@ -229,6 +256,11 @@ async def get_sales_by_store(
         description="Fecha de fin del periodo",
         example="2023-11-30"
     ),
+    division: Optional[str] = Query(
+        None,
+        description="(Opcional) División (KeyDivision) a la que se limita la consulta",
+        example="1"
+    ),
     datamart_service: DatamartService = Depends(get_current_datamart),
     current_user: Dict = Depends(get_current_user)
 ) -> StoreSalesResponse:
@@ -247,10 +279,16 @@ async def get_sales_by_store(
         result = datamart_service.get_sales_by_store(
             key_store=key_store,
             date_start=date_start,
-            date_end=date_end
+            date_end=date_end,
+            division=division
         )
         return result
 
+    except MixedCurrencyError as e:
+        logging.error(e.message)
+        raise HTTPException(status_code=422, detail=e.message)
+    except KeyNotFoundError as e:
+        raise HTTPException(status_code=404, detail=e.message)
     except ValueError as e:
         logging.error(f"Error de validación: {str(e)}")
         raise HTTPException(
@@ -264,4 +302,247 @@ async def get_sales_by_store(
             detail="Error al consultar ventas por tienda"
         )
 
+@router.get(
+    "/by-customer",
+    response_model=CustomerSalesResponse,
+    summary="Ventas por cliente en periodo",
+    tags=["sales-by-period"],
+    description="""
+    Consulta las ventas de un cliente (o de todos los clientes anónimos de caja)
+    en un rango de fechas.
+
+     **Requiere autenticación JWT**
+
+    Parámetros:
+    - `key_customer`: ID del cliente en formato "1|88120" (KeyCustomer del datamart)
+    - `anonymous`: `true` para consultar juntos los clientes anónimos de caja
+      (ej. "1|POS|") en lugar de `key_customer`
+    - `date_start`: Fecha de inicio del periodo (formato: YYYY-MM-DD)
+    - `date_end`: Fecha de fin del periodo (formato: YYYY-MM-DD)
+    - `division`: (Opcional) División (KeyDivision); solo se leen sus segmentos
+    - `limit`: Máximo de ventas en el detalle (los totales consideran todas)
+
+    Retorna:
+    - Listado detallado de las ventas del cliente (hasta `limit`)
+    - Total de ventas, cantidad y número de transacciones en el periodo
+
+    Validaciones:
+    - La fecha de fin debe ser mayor o igual a la fecha de inicio
+    - Se indica `key_customer` o `anonymous=true`, no ambos
+
+    Ejemplo de uso:
+```
+    GET /api/v1/sales/by-customer?key_customer=1|88120&date_start=2023-11-01&date_end=2023-11-30
+```
+    """,
+    response_description="Ventas del cliente en el periodo especificado",
+)
+async def get_sales_by_customer(
+        key_customer: Optional[str] = Query(
+            None,
+            description="ID del cliente (formato: '1|88120')",
+            example="1|88120"
+        ),
+        date_start: date = Query(
+            ...,
+            description="Fecha de inicio del periodo",
+            example="2023-11-01"
+        ),
+        date_end: date = Query(
+            ...,
+            description="Fecha de fin del periodo",
+            example="2023-11-30"
+        ),
+        anonymous: bool = Query(False, description="Consultar el grupo de clientes anónimos de caja"),
+        limit: int = Query(1000, ge=0, le=100000, description="Máximo de ventas en el detalle"),
+        division: Optional[str] = Query(
+            None,
+            description="(Opcional) División (KeyDivision) a la que se limita la consulta",
+            example="1"
+        ),
+        datamart_service: DatamartService = Depends(get_current_datamart),
+        current_user: Dict = Depends(get_current_user)
+) -> CustomerSalesResponse:
+    """
+    Endpoint para obtener ventas de un cliente en un periodo.
+    """
+    try:
+        # Validar rango de fechas
+        if date_end < date_start:
+            raise HTTPException(
+                status_code=422,
+                detail=f"date_end ({date_end}) debe ser mayor o igual a date_start ({date_start})"
+            )
+
+        return datamart_service.get_sales_by_customer(
+            key_customer=key_customer,
+            date_start=date_start,
+            date_end=date_end,
+            anonymous=anonymous,
+            limit=limit,
+            division=division
+        )
+
+    except HTTPException:
+        raise
+    except MixedCurrencyError as e:
+        logging.error(e.message)
+        raise HTTPException(status_code=422, detail=e.message)
+    except KeyNotFoundError as e:
+        raise HTTPException(status_code=404, detail=e.message)
+    except ValueError as e:
+        logging.error(f"Error de validación: {str(e)}")
+        raise HTTPException(
+            status_code=422,
+            detail=f"Error de validación: {str(e)}"
+        )
+    except Exception as e:
+        logging.error(f"Error inesperado: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail="Error al consultar ventas por cliente"
+        )
+
+@router.get(
+    "/query",
+    response_model=SalesQueryResponse,
+    summary="Ventas con filtros combinados",
+    tags=["sales-by-period"],
+    description="""
+    Consulta las ventas que cumplen cualquier combinación de filtros de clave
+    (empleado, producto, tienda, cliente, división) y, opcionalmente, un rango de fechas.
+
+     **Requiere autenticación JWT**
+
+    Parámetros (todos opcionales, se combinan con AND):
+    - `key_employee`: ID del empleado (ej. "1|343")
+    - `key_product`: ID del producto (ej. "1|44733")
+    - `key_store`: ID de la tienda (ej. "1|023")
+    - `key_customer`: ID del cliente
+    - `key_division`: ID de la división
+    - `date_start` / `date_end`: Rango de fechas (formato: YYYY-MM-DD)
+    - `limit`: Máximo de ventas en el detalle (los totales consideran todas)
 
+    Los filtros se resuelven con índices de bitmaps por valor de clave: se parte
+    de la clave más selectiva y se intersecta con las demás.
+
+    Ejemplo de uso:
+```
+    GET /api/v1/sales/query?key_product=1|44733&key_store=1|023&key_employee=1|343&date_start=2023-10-01&date_end=2023-12-31
+```
+    """,
+    response_description="Ventas que cumplen los filtros",
+)
+async def query_sales(
+    key_employee: Optional[str] = Query(None, description="ID del empleado (formato: '1|343')"),
+    key_product: Optional[str] = Query(None, description="ID del producto (formato: '1|44733')"),
+    key_store: Optional[str] = Query(None, description="ID de la tienda (formato: '1|023')"),
+    key_customer: Optional[str] = Query(None, description="ID del cliente"),
+    key_division: Optional[str] = Query(None, description="ID de la división"),
+    date_start: Optional[date] = Query(None, description="Fecha de inicio del periodo", example="2023-10-01"),
+    date_end: Optional[date] = Query(None, description="Fecha de fin del periodo", example="2023-12-31"),
+    limit: int = Query(1000, ge=0, le=100000, description="Máximo de ventas en el detalle"),
+    datamart_service: DatamartService = Depends(get_current_datamart),
+    current_user: Dict = Depends(get_current_user)
+) -> SalesQueryResponse:
+    """
+    Endpoint para obtener ventas con filtros combinados.
+    """
+    try:
+        # Validar rango de fechas
+        if date_start is not None and date_end is not None and date_end < date_start:
+            raise HTTPException(
+                status_code=422,
+                detail=f"date_end ({date_end}) debe ser mayor o igual a date_start ({date_start})"
+            )
+
+        return datamart_service.query_sales(
+            filters={
+                "key_employee": key_employee,
+                "key_product": key_product,
+                "key_store": key_store,
+                "key_customer": key_customer,
+                "key_division": key_division,
+            },
+            date_start=date_start,
+            date_end=date_end,
+            limit=limit
+        )
+
+    except HTTPException:
+        raise
+    except MixedCurrencyError as e:
+        logging.error(e.message)
+        raise HTTPException(status_code=422, detail=e.message)
+    except KeyNotFoundError as e:
+        raise HTTPException(status_code=404, detail=e.message)
+    except ValueError as e:
+        logging.error(f"Error de validación: {str(e)}")
+        raise HTTPException(
+            status_code=422,
+            detail=f"Error de validación: {str(e)}"
+        )
+    except Exception as e:
+        logging.error(f"Error inesperado: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail="Error al consultar ventas"
+        )
+
+@router.get(
+    "/ticket",
+    response_model=TicketResponse,
+    summary="Detalle de un ticket",
+    tags=["sales-by-period"],
+    description="""
+    Consulta las líneas y los totales de un ticket.
+
+     **Requiere autenticación JWT**
+
+    La búsqueda usa el índice de tickets (tabla hash sobre `TicketId`), así que
+    es O(1) y no recorre el datamart; los totales son agregados precalculados.
+
+    Parámetros:
+    - `ticket_id`: ID del ticket (TicketId del datamart)
+
+    Retorna:
+    - Líneas del ticket, tienda, empleado y cliente
+    - Monto total, unidades y número de líneas
+
+    Errores:
+    - 404 si el ticket no existe
+
+    Ejemplo de uso:
+```
+    GET /api/v1/sales/ticket?ticket_id=N01-00000385
+```
+    """,
+    response_description="Detalle del ticket",
+)
+async def get_ticket(
+    ticket_id: str = Query(..., min_length=1, description="ID del ticket", example="N01-00000385"),
+    datamart_service: DatamartService = Depends(get_current_datamart),
+    current_user: Dict = Depends(get_current_user)
+) -> TicketResponse:
+    """
+    Endpoint para obtener el detalle de un ticket.
+    """
+    try:
+        return datamart_service.get_ticket(ticket_id=ticket_id)
+
+    except HTTPException:
+        raise
+    except TicketNotFoundError as e:
+        raise HTTPException(status_code=404, detail=e.message)
+    except ValueError as e:
+        logging.error(f"Error de validación: {str(e)}")
+        raise HTTPException(
+            status_code=422,
+            detail=f"Error de validación: {str(e)}"
+        )
+    except Exception as e:
+        logging.error(f"Error inesperado: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail="Error al consultar el ticket"
+        )
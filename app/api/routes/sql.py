@@ -0,0 +1,95 @@
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from typing import Dict
+import json
+import logging
+from app.config import settings
+from app.models.schemas import SqlQueryRequest
+from app.services.auth_service import get_current_user
+from app.services.datamart import DatamartService
+from app.dependencies import get_current_datamart
+from app.utils.exceptions import InvalidSqlQueryError, SqlQueryTimeoutError
+
+
+router = APIRouter(prefix = "/api/v1/sql", tags=["sales-query"])
+
+@router.post(
+    "",
+    summary="Consulta SQL de solo lectura sobre el datamart",
+    tags=["sales-query"],
+    description="""
+    Ejecuta una consulta SQL de solo lectura sobre el datamart cargado en memoria,
+    expuesto como la tabla `sales` (mismas columnas del datamart, con `KeyDate`
+    como fecha y `Amount` en unidades de la moneda).
+
+     **Requiere autenticación JWT**
+
+    Cuerpo:
+    - `query`: Una sola sentencia SELECT (o EXPLAIN)
+    - `max_rows`: (Opcional) Máximo de filas, acotado por `SQL_MAX_ROWS`
+
+    Restricciones:
+    - Sin escritura, sin acceso a archivos ni extensiones
+    - Tiempo máximo `SQL_TIMEOUT_SECONDS` y límite de memoria `SQL_MEMORY_LIMIT`
+
+    Respuesta en streaming (`application/x-ndjson`): una fila JSON por línea. Si el
+    resultado se recorta, la última línea es `{"_truncated": true, "max_rows": N}`;
+    si la consulta se interrumpe durante el envío, la última línea es `{"_error": "..."}`.
+
+    Ejemplo de uso:
+```
+    POST /api/v1/sql
+    {"query": "SELECT KeyStore, SUM(Amount) AS total FROM sales GROUP BY KeyStore ORDER BY total DESC"}
+```
+    """,
+    response_description="Filas del resultado en formato NDJSON",
+)
+async def run_sql_query(
+    request: SqlQueryRequest,
+    datamart_service: DatamartService = Depends(get_current_datamart),
+    current_user: Dict = Depends(get_current_user)
+) -> StreamingResponse:
+    """
+    Endpoint para ejecutar consultas SQL de solo lectura.
+    """
+    max_rows = min(request.max_rows or settings.SQL_MAX_ROWS, settings.SQL_MAX_ROWS)
+    logging.info(f"Consulta SQL de {current_user.get('email', current_user.get('user_id'))}: {request.query}")
+
+    try:
+        # La preparación puede ejecutar parte de la consulta: fuera del event loop
+        result = await run_in_threadpool(
+            datamart_service.get_sql_engine().execute,
+            request.query,
+            max_rows=max_rows,
+            timeout_seconds=settings.SQL_TIMEOUT_SECONDS
+        )
+
+    except InvalidSqlQueryError as e:
+        logging.error(f"Consulta SQL rechazada: {e.message}")
+        raise HTTPException(status_code=403 if e.forbidden else 422, detail=e.message)
+    except SqlQueryTimeoutError as e:
+        logging.error(e.message)
+        raise HTTPException(status_code=408, detail=e.message)
+    except Exception as e:
+        logging.error(f"Error inesperado: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail="Error al ejecutar la consulta SQL"
+        )
+
+    def stream_rows():
+        try:
+            for rows in result.batches():
+                yield "".join(json.dumps(row, default=str) + "\n" for row in rows)
+            if result.truncated:
+                yield json.dumps({"_truncated": True, "max_rows": max_rows}) + "\n"
+        except (InvalidSqlQueryError, SqlQueryTimeoutError) as e:
+            logging.error(e.message)
+            yield json.dumps({"_error": e.message}) + "\n"
+
+    return StreamingResponse(
+        stream_rows(),
+        media_type="application/x-ndjson",
+        headers={"X-Columns": ",".join(result.columns)}
+    )
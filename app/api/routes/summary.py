@@ -1,11 +1,15 @@
 from fastapi import APIRouter, Depends, Query, HTTPException
 from datetime import date
-from typing import Dict, Optional
+from typing import Dict, Literal, Optional
 import logging
-from app.models.responses import EmployeeSummaryResponse, ProductSummaryResponse, StoreSummaryResponse
+from app.models.responses import (EmployeeSummaryResponse, ProductSummaryResponse, StoreSummaryResponse,
+                                  AmountDistributionResponse, CoPurchaseResponse, CustomerSummaryResponse,
+                                  PeriodComparisonResponse, SalesSeriesResponse)
 from app.services.auth_service import get_current_user
-from app.services.datamart import get_datamart_service, DatamartService
+from app.services.datamart import DatamartService
 from app.dependencies import get_current_datamart
+from app.config import settings
+from app.utils.exceptions import CooccurrenceNotReadyError, MixedCurrencyError, KeyNotFoundError
 
 
 router = APIRouter(prefix = "/api/v1/sales", tags=["sales-aggregations"])
@@ -24,12 +28,24 @@ router = APIRouter(prefix = "/api/v1/sales", tags=["sales-aggregations"])
     - `key_employee`: (Opcional) ID del empleado en formato "1|343"
       - Si se proporciona: Resumen de ese empleado específico
       - Si NO se proporciona: Resumen de TODOS los empleados
+    - `date_start` / `date_end`: (Opcional) Periodo del resumen; sin fechas se
+      resume todo el datamart
+    - `division`: (Opcional) División (KeyDivision); solo se leen sus segmentos
+    - `split_returns`: (Opcional) Agrega `returns` con ventas brutas, devoluciones,
+      neto y tasas de devolución (precalculados en los cubos diarios)
+    - `approx`: (Opcional) Estima `total_amount`, `total_quantity`, `records_count`
+      y `average_amount` desde la muestra estratificada (tienda, mes) y agrega
+      `confidence_intervals` (95%); los recortes chicos se calculan exactos.
+      `returns` también se estima desde la muestra y, como la muestra es de filas
+      y no de tickets, `tickets_count` y los promedios por ticket quedan en null
 
     Retorna:
     - Total de ventas (suma de todos los montos)
     - Promedio de ventas por transacción
     - Cantidad total vendida
     - Número total de registros
+    - Tickets, clientes y productos distintos (exactos con pocos registros, estimados
+      con HyperLogLog en resultados grandes; ver `distinct_approximate`)
 
     Casos de uso:
     - Evaluación de desempeño individual
@@ -45,6 +61,9 @@ router = APIRouter(prefix = "/api/v1/sales", tags=["sales-aggregations"])
 
     # Resumen de todos los empleados (sin parámetro)
     GET /api/v1/sales/employee-summary
+
+    # Resumen de un periodo
+    GET /api/v1/sales/employee-summary?date_start=2023-11-01&date_end=2023-11-30
 ```
     """,
     response_description="Resumen de ventas del empleado o todos los empleados"
@@ -55,7 +74,30 @@ async def get_employee_summary(
             description="ID del empleado (formato: '1|343'). Dejar vacío para resumen de todos",
             example="1|343"
         ),
-        datamart_service: DatamartService = Depends(get_datamart_service),
+        date_start: Optional[date] = Query(
+            None,
+            description="(Opcional) Fecha de inicio del periodo",
+            example="2023-11-01"
+        ),
+        date_end: Optional[date] = Query(
+            None,
+            description="(Opcional) Fecha de fin del periodo",
+            example="2023-11-30"
+        ),
+        division: Optional[str] = Query(
+            None,
+            description="(Opcional) División (KeyDivision) a la que se limita la consulta",
+            example="1"
+        ),
+        split_returns: bool = Query(
+            False,
+            description="Separar ventas brutas, devoluciones (montos negativos) y neto, con tasas de devolución"
+        ),
+        approx: bool = Query(
+            False,
+            description="Estimar totales desde la muestra estratificada (tienda, mes), con intervalos de confianza"
+        ),
+        datamart_service: DatamartService = Depends(get_current_datamart),
         current_user: Dict = Depends(get_current_user)
 ) -> EmployeeSummaryResponse:
     """
@@ -65,13 +107,35 @@ async def get_employee_summary(
     Si key_employee tiene valor, retorna solo el resumen de ese empleado.
     """
     try:
+        # Validar rango de fechas
+        if date_start and date_end and date_end < date_start:
+            raise HTTPException(
+                status_code=422,
+                detail=f"date_end ({date_end}) debe ser mayor o igual a date_start ({date_start})"
+            )
+
         # Consultar resumen
         result = datamart_service.get_employee_summary(
-            key_employee=key_employee
+            key_employee=key_employee,
+            date_start=date_start,
+            date_end=date_end,
+            division=division,
+            split_returns=split_returns,
+            approx=approx
         )
 
         return result
 
+    except HTTPException:
+        raise
+    except MixedCurrencyError as e:
+        logging.error(e.message)
+        raise HTTPException(status_code=422, detail=e.message)
+    except KeyNotFoundError as e:
+        raise HTTPException(status_code=404, detail=e.message)
+    except ValueError as e:
+        logging.error(str(e))
+        raise HTTPException(status_code=422, detail=str(e))
     except Exception as e:
         logging.error(f"Error inesperado: {str(e)}")
         raise HTTPException(
@@ -94,12 +158,23 @@ async def get_employee_summary(
     - `key_product`: (Opcional) ID del producto en formato "1|44733"
       - Si se proporciona: Resumen de ese producto específico
       - Si NO se proporciona: Resumen de TODOS los productos
+    - `date_start` / `date_end`: (Opcional) Periodo del resumen; sin fechas se
+      resume todo el datamart
+    - `division`: (Opcional) División (KeyDivision); solo se leen sus segmentos
+    - `split_returns`: (Opcional) Agrega `returns` con ventas brutas, devoluciones,
+      neto y tasas de devolución (precalculados en los cubos diarios)
+    - `approx`: (Opcional) Estima `total_amount`, `total_quantity`, `records_count`
+      y `average_amount` desde la muestra estratificada (tienda, mes) y agrega
+      `confidence_intervals` (95%); los recortes chicos se calculan exactos.
+      `returns` también se estima desde la muestra
 
     Retorna:
     - Total de ventas (suma de todos los montos)
     - Promedio de ventas por transacción
     - Cantidad total vendida
     - Número total de registros
+    - Tickets y clientes distintos (exactos con pocos registros, estimados
+      con HyperLogLog en resultados grandes; ver `distinct_approximate`)
 
     Casos de uso:
     - Identificar productos más vendidos
@@ -116,6 +191,9 @@ async def get_employee_summary(
 
     # Resumen de todos los productos (sin parámetro)
     GET /api/v1/sales/product-summary
+
+    # Resumen de un periodo
+    GET /api/v1/sales/product-summary?date_start=2023-11-01&date_end=2023-11-30
 ```
     """,
     response_description="Resumen de ventas del producto o todos los productos"
@@ -126,7 +204,30 @@ async def get_product_summary(
             description="ID del producto (formato: '1|44733'). Dejar vacío para resumen de todos",
             example="1|44733"
         ),
-        datamart_service: DatamartService = Depends(get_datamart_service),
+        date_start: Optional[date] = Query(
+            None,
+            description="(Opcional) Fecha de inicio del periodo",
+            example="2023-11-01"
+        ),
+        date_end: Optional[date] = Query(
+            None,
+            description="(Opcional) Fecha de fin del periodo",
+            example="2023-11-30"
+        ),
+        division: Optional[str] = Query(
+            None,
+            description="(Opcional) División (KeyDivision) a la que se limita la consulta",
+            example="1"
+        ),
+        split_returns: bool = Query(
+            False,
+            description="Separar ventas brutas, devoluciones (montos negativos) y neto, con tasas de devolución"
+        ),
+        approx: bool = Query(
+            False,
+            description="Estimar totales desde la muestra estratificada (tienda, mes), con intervalos de confianza"
+        ),
+        datamart_service: DatamartService = Depends(get_current_datamart),
         current_user: Dict = Depends(get_current_user)
 ) -> ProductSummaryResponse:
     """
@@ -136,13 +237,35 @@ async def get_product_summary(
     Si key_product tiene valor, retorna solo el resumen de ese producto.
     """
     try:
+        # Validar rango de fechas
+        if date_start and date_end and date_end < date_start:
+            raise HTTPException(
+                status_code=422,
+                detail=f"date_end ({date_end}) debe ser mayor o igual a date_start ({date_start})"
+            )
+
         # Consultar resumen
         result = datamart_service.get_product_summary(
-            key_product=key_product
+            key_product=key_product,
+            date_start=date_start,
+            date_end=date_end,
+            division=division,
+            split_returns=split_returns,
+            approx=approx
         )
 
         return result
 
+    except HTTPException:
+        raise
+    except MixedCurrencyError as e:
+        logging.error(e.message)
+        raise HTTPException(status_code=422, detail=e.message)
+    except KeyNotFoundError as e:
+        raise HTTPException(status_code=404, detail=e.message)
+    except ValueError as e:
+        logging.error(str(e))
+        raise HTTPException(status_code=422, detail=str(e))
     except Exception as e:
         logging.error(f"Error inesperado: {str(e)}")
         raise HTTPException(
@@ -165,12 +288,24 @@ async def get_product_summary(
     - `key_store`: (Opcional) ID de la tienda en formato "1|023"
       - Si se proporciona: Resumen de esa tienda específica
       - Si NO se proporciona: Resumen de TODAS las tiendas
+    - `date_start` / `date_end`: (Opcional) Periodo del resumen; sin fechas se
+      resume todo el datamart
+    - `division`: (Opcional) División (KeyDivision); solo se leen sus segmentos
+    - `split_returns`: (Opcional) Agrega `returns` con ventas brutas, devoluciones,
+      neto y tasas de devolución (precalculados en los cubos diarios)
+    - `approx`: (Opcional) Estima `total_amount`, `total_quantity`, `records_count`
+      y `average_amount` desde la muestra estratificada (tienda, mes) y agrega
+      `confidence_intervals` (95%); los recortes chicos se calculan exactos.
+      `returns` también se estima desde la muestra y, como la muestra es de filas
+      y no de tickets, `tickets_count` y los promedios por ticket quedan en null
 
     **Retorna:**
     - Total de ventas (suma de todos los montos)
     - Promedio de ventas por transacción
     - Cantidad total vendida
     - Número total de registros
+    - Tickets, clientes y productos distintos (exactos con pocos registros, estimados
+      con HyperLogLog en resultados grandes; ver `distinct_approximate`)
 
     **Casos de uso:**
     - Comparación entre sucursales
@@ -187,6 +322,9 @@ async def get_product_summary(
 
     # Resumen de todas las tiendas (sin parámetro)
     GET /api/v1/sales/store-summary
+
+    # Resumen de un periodo
+    GET /api/v1/sales/store-summary?date_start=2023-11-01&date_end=2023-11-30
 ```
     """,
     response_description="Resumen de ventas de la tienda o todas las tiendas"
@@ -197,7 +335,30 @@ async def get_store_summary(
             description="ID de la tienda (formato: '1|023'). Dejar vacío para resumen de todas",
             example="1|023"
         ),
-        datamart_service: DatamartService = Depends(get_datamart_service),
+        date_start: Optional[date] = Query(
+            None,
+            description="(Opcional) Fecha de inicio del periodo",
+            example="2023-11-01"
+        ),
+        date_end: Optional[date] = Query(
+            None,
+            description="(Opcional) Fecha de fin del periodo",
+            example="2023-11-30"
+        ),
+        division: Optional[str] = Query(
+            None,
+            description="(Opcional) División (KeyDivision) a la que se limita la consulta",
+            example="1"
+        ),
+        split_returns: bool = Query(
+            False,
+            description="Separar ventas brutas, devoluciones (montos negativos) y neto, con tasas de devolución"
+        ),
+        approx: bool = Query(
+            False,
+            description="Estimar totales desde la muestra estratificada (tienda, mes), con intervalos de confianza"
+        ),
+        datamart_service: DatamartService = Depends(get_current_datamart),
         current_user: Dict = Depends(get_current_user)
 ) -> StoreSummaryResponse:
     """
@@ -207,16 +368,499 @@ async def get_store_summary(
     Si key_store tiene valor, retorna solo el resumen de esa tienda.
     """
     try:
+        # Validar rango de fechas
+        if date_start and date_end and date_end < date_start:
+            raise HTTPException(
+                status_code=422,
+                detail=f"date_end ({date_end}) debe ser mayor o igual a date_start ({date_start})"
+            )
+
         # Consultar resumen
         result = datamart_service.get_store_summary(
-            key_store=key_store
+            key_store=key_store,
+            date_start=date_start,
+            date_end=date_end,
+            division=division,
+            split_returns=split_returns,
+            approx=approx
         )
 
         return result
 
+    except HTTPException:
+        raise
+    except MixedCurrencyError as e:
+        logging.error(e.message)
+        raise HTTPException(status_code=422, detail=e.message)
+    except KeyNotFoundError as e:
+        raise HTTPException(status_code=404, detail=e.message)
+    except ValueError as e:
+        logging.error(str(e))
+        raise HTTPException(status_code=422, detail=str(e))
     except Exception as e:
         logging.error(f"Error inesperado: {str(e)}")
         raise HTTPException(
             status_code=500,
             detail="Error al calcular resumen de ventas"
-        )
\ No newline at end of file
+        )
+
+
+@router.get(
+    "/customer-summary",
+    response_model=CustomerSummaryResponse,
+    summary="Resumen de ventas por cliente (Total, Promedio y Canasta)",
+    tags=["sales-aggregations"],
+    description="""
+    Calcula el total, promedio y métricas de canasta de ventas por cliente.
+
+     **Requiere autenticación JWT**
+
+    **Parámetros:**
+    - `key_customer`: (Opcional) ID del cliente en formato "1|88120"
+      - Si se proporciona: Resumen de ese cliente
+      - Si NO se proporciona: Resumen de TODOS los clientes
+    - `anonymous`: (Opcional) `true` para resumir juntos todos los clientes
+      anónimos de caja (ej. "1|POS|"); no se combina con `key_customer`
+    - `date_start` / `date_end`: (Opcional) Periodo del resumen
+    - `division`: (Opcional) División (KeyDivision); solo se leen sus segmentos
+    - `split_returns`: (Opcional) Agrega `returns` con ventas brutas, devoluciones,
+      neto y tasas de devolución (precalculados en los cubos diarios)
+
+    **Retorna:**
+    - Total de ventas, promedio por transacción, cantidad y registros
+    - Tickets, valor promedio por ticket y unidades promedio por ticket
+    - Productos distintos (exacto; `null` si el resultado tiene demasiados registros)
+    - `customers_count`: claves de cliente incluidas
+
+    **Ejemplos de uso:**
+```
+    # Resumen de un cliente
+    GET /api/v1/sales/customer-summary?key_customer=1|88120
+
+    # Clientes anónimos de caja en noviembre
+    GET /api/v1/sales/customer-summary?anonymous=true&date_start=2023-11-01&date_end=2023-11-30
+```
+    """,
+    response_description="Resumen de ventas del cliente, de los anónimos o de todos los clientes"
+)
+async def get_customer_summary(
+        key_customer: Optional[str] = Query(
+            None,
+            description="ID del cliente (formato: '1|88120'). Dejar vacío para resumen de todos",
+            example="1|88120"
+        ),
+        anonymous: bool = Query(False, description="Resumir el grupo de clientes anónimos de caja"),
+        date_start: Optional[date] = Query(
+            None,
+            description="(Opcional) Fecha de inicio del periodo",
+            example="2023-11-01"
+        ),
+        date_end: Optional[date] = Query(
+            None,
+            description="(Opcional) Fecha de fin del periodo",
+            example="2023-11-30"
+        ),
+        division: Optional[str] = Query(
+            None,
+            description="(Opcional) División (KeyDivision) a la que se limita la consulta",
+            example="1"
+        ),
+        split_returns: bool = Query(
+            False,
+            description="Separar ventas brutas, devoluciones (montos negativos) y neto, con tasas de devolución"
+        ),
+        datamart_service: DatamartService = Depends(get_current_datamart),
+        current_user: Dict = Depends(get_current_user)
+) -> CustomerSummaryResponse:
+    """
+    Endpoint para obtener resumen de ventas por cliente.
+
+    Si key_customer es None, retorna el resumen de todos los clientes (o de los
+    anónimos con anonymous=true).
+    """
+    try:
+        # Validar rango de fechas
+        if date_start and date_end and date_end < date_start:
+            raise HTTPException(
+                status_code=422,
+                detail=f"date_end ({date_end}) debe ser mayor o igual a date_start ({date_start})"
+            )
+
+        return datamart_service.get_customer_summary(
+            key_customer=key_customer,
+            date_start=date_start,
+            date_end=date_end,
+            anonymous=anonymous,
+            division=division,
+            split_returns=split_returns
+        )
+
+    except HTTPException:
+        raise
+    except MixedCurrencyError as e:
+        logging.error(e.message)
+        raise HTTPException(status_code=422, detail=e.message)
+    except KeyNotFoundError as e:
+        raise HTTPException(status_code=404, detail=e.message)
+    except ValueError as e:
+        logging.error(str(e))
+        raise HTTPException(status_code=422, detail=str(e))
+    except Exception as e:
+        logging.error(f"Error inesperado: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail="Error al calcular resumen de ventas"
+        )
+
+
+@router.get(
+    "/distribution",
+    response_model=AmountDistributionResponse,
+    summary="Distribución de montos (percentiles e histograma)",
+    tags=["sales-aggregations"],
+    description="""
+    Calcula p50, p90, p99 e histograma del monto por registro o del valor del
+    ticket, para una entidad (o todo el datamart) en un periodo.
+
+     **Requiere autenticación JWT**
+
+    Se responde desde sketches de cuantiles por (entidad, mes) construidos al
+    cargar, sin ordenar las transacciones: cada percentil tiene un error
+    relativo máximo de 1% (`relative_accuracy`).
+
+    Parámetros:
+    - `measure`: `amount` (Amount de cada registro) o `ticket` (suma de Amount de cada ticket)
+    - `key_employee` / `key_product` / `key_store`: (Opcional) Una sola entidad;
+      sin entidad se usa todo el datamart
+    - `date_start` / `date_end`: (Opcional) Periodo
+    - `division`: (Opcional) División (KeyDivision); los sketches no están
+      segmentados, así que con división se cuenta desde las filas del recorte
+    - `bins`: Intervalos del histograma (entre p1 y p99; las colas se reportan
+      en `below_range` y `above_range`)
+
+    Validaciones:
+    - Solo se puede indicar una entidad
+    - `ticket` no está disponible por producto
+    - Si el recorte tiene montos en varias monedas responde 422 (limítelo con `division`)
+
+    Ejemplos de uso:
+```
+    # Valor del ticket de una tienda en noviembre
+    GET /api/v1/sales/distribution?measure=ticket&key_store=1|023&date_start=2023-11-01&date_end=2023-11-30
+
+    # Montos por registro de todo el datamart
+    GET /api/v1/sales/distribution
+```
+    """,
+    response_description="Percentiles e histograma de montos"
+)
+async def get_amount_distribution(
+        measure: Literal["amount", "ticket"] = Query(
+            "amount",
+            description="Medida: 'amount' (por registro) o 'ticket' (valor del ticket)"
+        ),
+        key_employee: Optional[str] = Query(None, description="(Opcional) ID del empleado", example="1|343"),
+        key_product: Optional[str] = Query(None, description="(Opcional) ID del producto", example="1|44733"),
+        key_store: Optional[str] = Query(None, description="(Opcional) ID de la tienda", example="1|023"),
+        date_start: Optional[date] = Query(None, description="(Opcional) Fecha de inicio del periodo"),
+        date_end: Optional[date] = Query(None, description="(Opcional) Fecha de fin del periodo"),
+        division: Optional[str] = Query(
+            None,
+            description="(Opcional) División (KeyDivision) a la que se limita la consulta",
+            example="1"
+        ),
+        bins: int = Query(20, ge=1, le=200, description="Intervalos del histograma"),
+        datamart_service: DatamartService = Depends(get_current_datamart),
+        current_user: Dict = Depends(get_current_user)
+) -> AmountDistributionResponse:
+    """
+    Endpoint para obtener percentiles e histograma de montos desde los sketches de cuantiles.
+    """
+    try:
+        # Validar rango de fechas
+        if date_start and date_end and date_end < date_start:
+            raise HTTPException(
+                status_code=422,
+                detail=f"date_end ({date_end}) debe ser mayor o igual a date_start ({date_start})"
+            )
+
+        return datamart_service.get_amount_distribution(
+            measure=measure,
+            key_employee=key_employee,
+            key_product=key_product,
+            key_store=key_store,
+            date_start=date_start,
+            date_end=date_end,
+            division=division,
+            bins=bins
+        )
+
+    except HTTPException:
+        raise
+    except MixedCurrencyError as e:
+        logging.error(e.message)
+        raise HTTPException(status_code=422, detail=e.message)
+    except KeyNotFoundError as e:
+        raise HTTPException(status_code=404, detail=e.message)
+    except ValueError as e:
+        logging.error(str(e))
+        raise HTTPException(status_code=422, detail=str(e))
+    except Exception as e:
+        logging.error(f"Error inesperado: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail="Error al calcular la distribución de montos"
+        )
+
+
+@router.get(
+    "/comparison",
+    response_model=PeriodComparisonResponse,
+    summary="Comparación de periodos (anterior y año anterior)",
+    tags=["sales-aggregations"],
+    description="""
+    Compara los totales de un periodo con el periodo anterior de la misma
+    cantidad de días y con el mismo periodo del año anterior, para una entidad
+    (o todo el datamart).
+
+     **Requiere autenticación JWT**
+
+    Los tres periodos se calculan en una sola pasada por el cubo diario de la
+    entidad (sumas acumuladas sobre sus días), en lugar de seis consultas.
+
+    Parámetros:
+    - `date_start` / `date_end`: Periodo actual (formato: YYYY-MM-DD)
+    - `key_employee` / `key_product` / `key_store`: (Opcional) Una sola entidad;
+      sin entidad se usa todo el datamart
+    - `division`: (Opcional) División (KeyDivision); solo se leen sus segmentos
+    - `split_returns`: (Opcional) Agrega `returns` con ventas brutas, devoluciones,
+      neto y tasas de devolución (precalculados en los cubos diarios)
+
+    Retorna:
+    - `current`, `previous` y `year_ago`: fechas, monto, cantidad y registros
+    - `change_vs_previous` y `change_vs_year_ago`: diferencias absolutas y
+      porcentuales (None si el periodo comparado no tiene ventas)
+
+    Ejemplo de uso:
+```
+    GET /api/v1/sales/comparison?key_store=1|023&date_start=2023-11-01&date_end=2023-11-30
+```
+    """,
+    response_description="Totales del periodo, del periodo anterior y del año anterior"
+)
+async def get_period_comparison(
+        date_start: date = Query(..., description="Fecha de inicio del periodo actual", example="2023-11-01"),
+        date_end: date = Query(..., description="Fecha de fin del periodo actual", example="2023-11-30"),
+        key_employee: Optional[str] = Query(None, description="(Opcional) ID del empleado", example="1|343"),
+        key_product: Optional[str] = Query(None, description="(Opcional) ID del producto", example="1|44733"),
+        key_store: Optional[str] = Query(None, description="(Opcional) ID de la tienda", example="1|023"),
+        division: Optional[str] = Query(
+            None,
+            description="(Opcional) División (KeyDivision) a la que se limita la consulta",
+            example="1"
+        ),
+        split_returns: bool = Query(
+            False,
+            description="Separar ventas brutas, devoluciones (montos negativos) y neto, con tasas de devolución"
+        ),
+        datamart_service: DatamartService = Depends(get_current_datamart),
+        current_user: Dict = Depends(get_current_user)
+) -> PeriodComparisonResponse:
+    """
+    Endpoint para comparar un periodo con el anterior y con el mismo periodo del año anterior.
+    """
+    try:
+        # Validar rango de fechas
+        if date_end < date_start:
+            raise HTTPException(
+                status_code=422,
+                detail=f"date_end ({date_end}) debe ser mayor o igual a date_start ({date_start})"
+            )
+
+        return datamart_service.get_period_comparison(
+            date_start=date_start,
+            date_end=date_end,
+            key_employee=key_employee,
+            key_product=key_product,
+            key_store=key_store,
+            division=division,
+            split_returns=split_returns
+        )
+
+    except HTTPException:
+        raise
+    except MixedCurrencyError as e:
+        logging.error(e.message)
+        raise HTTPException(status_code=422, detail=e.message)
+    except KeyNotFoundError as e:
+        raise HTTPException(status_code=404, detail=e.message)
+    except ValueError as e:
+        logging.error(str(e))
+        raise HTTPException(status_code=422, detail=str(e))
+    except Exception as e:
+        logging.error(f"Error inesperado: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail="Error al comparar periodos"
+        )
+
+
+@router.get(
+    "/series",
+    response_model=SalesSeriesResponse,
+    summary="Serie diaria con promedios móviles y acumulado del año",
+    tags=["sales-aggregations"],
+    description="""
+    Retorna la serie diaria de ventas de una entidad (o todo el datamart) con
+    sumas y promedios móviles de 7, 30 y 90 días y el acumulado del año (YTD).
+
+     **Requiere autenticación JWT**
+
+    La serie se calcula con sumas acumuladas sobre el cubo diario de la
+    entidad, así que rangos de varios años no requieren descargar el detalle.
+    Las ventanas y el YTD del primer día incluyen los días anteriores al rango.
+
+    Parámetros:
+    - `date_start` / `date_end`: Rango de la serie (formato: YYYY-MM-DD)
+    - `key_employee` / `key_product` / `key_store`: (Opcional) Una sola entidad;
+      sin entidad se usa todo el datamart
+    - `division`: (Opcional) División (KeyDivision); solo se leen sus segmentos
+    - `approx`: (Opcional) Estima la serie desde la muestra estratificada (tienda,
+      mes) y agrega `total_amount_ci` (95%) a cada día; los recortes chicos se
+      calculan exactos
+
+    Retorna, por día (incluidos los días sin ventas): monto, cantidad y
+    registros del día, `amount_7d`/`amount_30d`/`amount_90d`, sus promedios
+    diarios `avg_amount_*` y `ytd_amount`/`ytd_quantity`.
+
+    Ejemplo de uso:
+```
+    GET /api/v1/sales/series?key_store=1|023&date_start=2023-01-01&date_end=2023-12-31
+```
+    """,
+    response_description="Serie diaria con ventanas móviles y acumulado del año"
+)
+async def get_sales_series(
+        date_start: date = Query(..., description="Fecha de inicio de la serie", example="2023-01-01"),
+        date_end: date = Query(..., description="Fecha de fin de la serie", example="2023-12-31"),
+        key_employee: Optional[str] = Query(None, description="(Opcional) ID del empleado", example="1|343"),
+        key_product: Optional[str] = Query(None, description="(Opcional) ID del producto", example="1|44733"),
+        key_store: Optional[str] = Query(None, description="(Opcional) ID de la tienda", example="1|023"),
+        division: Optional[str] = Query(
+            None,
+            description="(Opcional) División (KeyDivision) a la que se limita la consulta",
+            example="1"
+        ),
+        approx: bool = Query(
+            False,
+            description="Estimar la serie desde la muestra estratificada (tienda, mes), con el intervalo de cada día"
+        ),
+        datamart_service: DatamartService = Depends(get_current_datamart),
+        current_user: Dict = Depends(get_current_user)
+) -> SalesSeriesResponse:
+    """
+    Endpoint para la serie diaria con ventanas móviles y acumulado del año.
+    """
+    try:
+        # Validar rango de fechas
+        if date_end < date_start:
+            raise HTTPException(
+                status_code=422,
+                detail=f"date_end ({date_end}) debe ser mayor o igual a date_start ({date_start})"
+            )
+
+        return datamart_service.get_sales_series(
+            date_start=date_start,
+            date_end=date_end,
+            key_employee=key_employee,
+            key_product=key_product,
+            key_store=key_store,
+            division=division,
+            approx=approx
+        )
+
+    except HTTPException:
+        raise
+    except MixedCurrencyError as e:
+        logging.error(e.message)
+        raise HTTPException(status_code=422, detail=e.message)
+    except KeyNotFoundError as e:
+        raise HTTPException(status_code=404, detail=e.message)
+    except ValueError as e:
+        logging.error(str(e))
+        raise HTTPException(status_code=422, detail=str(e))
+    except Exception as e:
+        logging.error(f"Error inesperado: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail="Error al calcular la serie de ventas"
+        )
+
+
+@router.get(
+    "/co-purchased",
+    response_model=CoPurchaseResponse,
+    summary="Productos comprados juntos",
+    tags=["sales-aggregations"],
+    description="""
+    Retorna los productos que más se compran junto con un producto (en el mismo ticket).
+
+     **Requiere autenticación JWT**
+
+    Se responde desde una matriz dispersa de co-ocurrencia producto × producto
+    construida en segundo plano al terminar la carga (sin self-join por
+    petición). Mientras se construye, el endpoint responde 503 con Retry-After.
+
+    Parámetros:
+    - `key_product`: ID del producto en formato "1|44733"
+    - `limit`: Máximo de productos retornados
+    - `order_by`: `count` (tickets juntos) o `lift` (asociación sobre lo esperado al azar)
+    - `min_count`: Mínimo de tickets juntos (el lift de pares raros es ruidoso)
+
+    Retorna, por producto: `tickets`, `support`, `confidence` y `lift`.
+
+    Ejemplo de uso:
+```
+    GET /api/v1/sales/co-purchased?key_product=1|44733&limit=10&order_by=lift&min_count=20
+```
+    """,
+    response_description="Productos comprados junto con el producto"
+)
+async def get_copurchased_products(
+        key_product: str = Query(..., description="ID del producto (formato: '1|44733')", example="1|44733"),
+        limit: int = Query(10, ge=1, le=500, description="Máximo de productos retornados"),
+        order_by: Literal["count", "lift"] = Query("count", description="Orden: 'count' o 'lift'"),
+        min_count: int = Query(1, ge=1, description="Mínimo de tickets juntos"),
+        datamart_service: DatamartService = Depends(get_current_datamart),
+        current_user: Dict = Depends(get_current_user)
+) -> CoPurchaseResponse:
+    """
+    Endpoint para obtener los productos comprados junto con un producto.
+    """
+    try:
+        return datamart_service.get_copurchased_products(
+            key_product=key_product,
+            limit=limit,
+            order_by=order_by,
+            min_count=min_count
+        )
+
+    except HTTPException:
+        raise
+    except CooccurrenceNotReadyError as e:
+        raise HTTPException(
+            status_code=503,
+            detail=e.message,
+            headers={"Retry-After": str(settings.DATAMART_RETRY_AFTER_SECONDS)}
+        )
+    except KeyNotFoundError as e:
+        raise HTTPException(status_code=404, detail=e.message)
+    except ValueError as e:
+        logging.error(str(e))
+        raise HTTPException(status_code=422, detail=str(e))
+    except Exception as e:
+        logging.error(f"Error inesperado: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail="Error al consultar productos comprados juntos"
+        )
@@ -0,0 +1,139 @@
+from fastapi import APIRouter, Depends, Query, HTTPException
+from datetime import date
+from typing import Dict, Optional
+import logging
+from app.models.responses import ViewRegistryResponse, ViewQueryResponse
+from app.services.auth_service import get_current_user
+from app.services.datamart import DatamartService
+from app.dependencies import get_current_datamart
+from app.utils.exceptions import ViewNotFoundError
+
+
+router = APIRouter(prefix = "/api/v1/views", tags=["materialized-views"])
+
+@router.get(
+    "",
+    response_model=ViewRegistryResponse,
+    summary="Registro de vistas materializadas",
+    tags=["materialized-views"],
+    description="""
+    Lista las vistas materializadas declaradas en `MATERIALIZED_VIEWS` con su
+    estado.
+
+     **Requiere autenticación JWT**
+
+    Retorna, por vista: dimensiones, grano temporal, métricas, filas, memoria
+    (`size_bytes`), tiempo de construcción (`build_seconds`), momento de la
+    última construcción (`refreshed_at`) y el error si la construcción falló.
+
+    Ejemplo de uso:
+```
+    GET /api/v1/views
+```
+    """,
+    response_description="Vistas declaradas con su tamaño y última construcción"
+)
+async def get_views(
+        datamart_service: DatamartService = Depends(get_current_datamart),
+        current_user: Dict = Depends(get_current_user)
+) -> ViewRegistryResponse:
+    """
+    Endpoint para listar las vistas materializadas.
+    """
+    try:
+        return datamart_service.get_views()
+
+    except Exception as e:
+        logging.error(f"Error inesperado: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail="Error al listar las vistas materializadas"
+        )
+
+
+@router.get(
+    "/{name}",
+    response_model=ViewQueryResponse,
+    summary="Consulta de una vista materializada",
+    tags=["materialized-views"],
+    description="""
+    Retorna las filas precalculadas de una vista materializada, filtradas por
+    sus dimensiones y periodo, sin recorrer las transacciones.
+
+     **Requiere autenticación JWT**
+
+    Parámetros:
+    - `name`: Nombre de la vista (ver `GET /api/v1/views`)
+    - `key_employee` / `key_product` / `key_store` / `key_customer` / `key_division`:
+      (Opcional) Filtros; solo se admiten las dimensiones de la vista
+    - `date_start` / `date_end`: (Opcional) Periodo (formato: YYYY-MM-DD); solo en
+      vistas con grano temporal, se incluyen los periodos que contienen date_start
+    - `offset` / `limit`: Paginación
+
+    Retorna las filas en el orden de la vista (dimensiones y periodo) y
+    `total_rows`, el número de filas que cumplen los filtros.
+
+    Ejemplo de uso:
+```
+    GET /api/v1/views/store_month?key_store=1|023&date_start=2023-01-01&date_end=2023-12-31
+```
+    """,
+    response_description="Filas de la vista"
+)
+async def query_view(
+        name: str,
+        key_employee: Optional[str] = Query(None, description="(Opcional) ID del empleado", example="1|343"),
+        key_product: Optional[str] = Query(None, description="(Opcional) ID del producto", example="1|44733"),
+        key_store: Optional[str] = Query(None, description="(Opcional) ID de la tienda", example="1|023"),
+        key_customer: Optional[str] = Query(None, description="(Opcional) ID del cliente", example="1|88120"),
+        key_division: Optional[str] = Query(None, description="(Opcional) División (KeyDivision)", example="1"),
+        date_start: Optional[date] = Query(None, description="(Opcional) Fecha de inicio", example="2023-01-01"),
+        date_end: Optional[date] = Query(None, description="(Opcional) Fecha de fin", example="2023-12-31"),
+        offset: int = Query(0, ge=0, description="Filas que se saltan"),
+        limit: int = Query(100, ge=1, le=10000, description="Máximo de filas retornadas"),
+        datamart_service: DatamartService = Depends(get_current_datamart),
+        current_user: Dict = Depends(get_current_user)
+) -> ViewQueryResponse:
+    """
+    Endpoint para consultar una vista materializada.
+    """
+    try:
+        # Validar rango de fechas
+        if date_start and date_end and date_end < date_start:
+            raise HTTPException(
+                status_code=422,
+                detail=f"date_end ({date_end}) debe ser mayor o igual a date_start ({date_start})"
+            )
+
+        filters = {
+            'key_employee': key_employee,
+            'key_product': key_product,
+            'key_store': key_store,
+            'key_customer': key_customer,
+            'key_division': key_division,
+        }
+        return datamart_service.query_view(
+            name=name,
+            filters={dimension: key for dimension, key in filters.items() if key},
+            date_start=date_start,
+            date_end=date_end,
+            offset=offset,
+            limit=limit
+        )
+
+    except HTTPException:
+        raise
+    except ViewNotFoundError as e:
+        raise HTTPException(status_code=404, detail=e.message)
+    except ValueError as e:
+        logging.error(f"Error de validación: {str(e)}")
+        raise HTTPException(
+            status_code=422,
+            detail=f"Error de validación: {str(e)}"
+        )
+    except Exception as e:
+        logging.error(f"Error inesperado: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail="Error al consultar la vista materializada"
+        )
@@ -1,3 +1,4 @@
+import json
 import os
 from pathlib import Path
 from dotenv import load_dotenv
@@ -15,6 +16,59 @@ class Settings(BaseSettings):
     BASE_DIR: Path = Path(__file__).resolve().parent.parent
     DATAMART_PATH: str = os.getenv("DATAMART_PATH", str(BASE_DIR / "datamart"))
 
+    # Datamart compartido entre workers (archivo Arrow creado por app.launcher)
+    SHARED_DATAMART_PATH: str = os.getenv("SHARED_DATAMART_PATH", "")
+    WORKERS: int = int(os.getenv("WORKERS", 1))
+
+    # Segundos sugeridos en Retry-After mientras el datamart carga
+    DATAMART_RETRY_AFTER_SECONDS: int = int(os.getenv("DATAMART_RETRY_AFTER_SECONDS", 5))
+
+    # Segundos entre revisiones de archivos nuevos en DATAMART_PATH (0 = solo con POST /api/v1/datamart/refresh)
+    DATAMART_REFRESH_INTERVAL_SECONDS: int = int(os.getenv("DATAMART_REFRESH_INTERVAL_SECONDS", 0))
+
+    # Amount en punto fijo: se guarda como int64 en unidades menores (centavos)
+    AMOUNT_FIXED_POINT: bool = os.getenv("AMOUNT_FIXED_POINT", "False").lower() == "true"
+    AMOUNT_DECIMALS: int = int(os.getenv("AMOUNT_DECIMALS", 2))
+
+    # Endpoint SQL de solo lectura (DuckDB sobre el datamart en memoria)
+    SQL_MAX_ROWS: int = int(os.getenv("SQL_MAX_ROWS", 10000))
+    SQL_TIMEOUT_SECONDS: float = float(os.getenv("SQL_TIMEOUT_SECONDS", 30))
+    SQL_MEMORY_LIMIT: str = os.getenv("SQL_MEMORY_LIMIT", "1GB")
+    SQL_THREADS: int = int(os.getenv("SQL_THREADS", 2))
+
+    # Conteos distintos (tickets, clientes, productos) en los resúmenes: hasta
+    # este número de registros se cuentan exactos; por encima se usan los
+    # sketches HyperLogLog (0 = siempre aproximado)
+    DISTINCT_EXACT_MAX_ROWS: int = int(os.getenv("DISTINCT_EXACT_MAX_ROWS", 50000))
+
+    # Claves de cliente anónimas (ventas de caja sin cliente identificado, ej.
+    # "1|POS|"): se agrupan como una sola entidad con su propio cubo diario
+    ANONYMOUS_CUSTOMER_PATTERN: str = os.getenv("ANONYMOUS_CUSTOMER_PATTERN", r"\|POS\|")
+
+    # Respuesta a una clave que no existe en el datamart: "empty" (resultado
+    # vacío) o "404"; en ambos casos se responde sin recorrer índices ni cubos
+    UNKNOWN_KEY_MODE: str = os.getenv("UNKNOWN_KEY_MODE", "empty").lower()
+
+    # Muestra estratificada por (tienda, mes) para resúmenes y series con
+    # approx=true: fracción de filas por estrato (0 = sin muestra), filas mínimas
+    # por estrato y registros estimados hasta los que se calcula exacto
+    APPROX_SAMPLE_FRACTION: float = float(os.getenv("APPROX_SAMPLE_FRACTION", 0.01))
+    APPROX_MIN_STRATUM_ROWS: int = int(os.getenv("APPROX_MIN_STRATUM_ROWS", 10))
+    APPROX_EXACT_MAX_ROWS: int = int(os.getenv("APPROX_EXACT_MAX_ROWS", 100000))
+
+    # Matriz de co-ocurrencia de productos (se construye en segundo plano al
+    # terminar la carga); los tickets con más productos distintos se omiten
+    COOCCURRENCE_ENABLED: bool = os.getenv("COOCCURRENCE_ENABLED", "True").lower() == "true"
+    COOCCURRENCE_MAX_BASKET: int = int(os.getenv("COOCCURRENCE_MAX_BASKET", 50))
+
+    # Vistas materializadas: lista JSON de {name, dimensions, grain, metrics}, o
+    # ruta a un archivo .json con esa lista; se construyen al terminar la carga
+    MATERIALIZED_VIEWS: str = os.getenv(
+        "MATERIALIZED_VIEWS",
+        '[{"name": "store_month", "dimensions": ["key_store"], "grain": "month", '
+        '"metrics": ["amount", "quantity", "records", "tickets"]}]'
+    )
+
     LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO")
 
     # Firebase Config
@@ -43,6 +97,23 @@ class Settings(BaseSettings):
 
         return parquet_files
 
+    def get_view_definitions(self) -> list:
+        """Retorna las declaraciones de vistas materializadas (JSON en línea o archivo .json)"""
+        value = self.MATERIALIZED_VIEWS.strip()
+        if not value:
+            return []
+
+        if not value.startswith("["):
+            path = Path(value)
+            if not path.exists():
+                raise FileNotFoundError(f"Archivo de vistas materializadas no encontrado: {path}")
+            value = path.read_text(encoding="utf-8")
+
+        definitions = json.loads(value)
+        if not isinstance(definitions, list):
+            raise ValueError("MATERIALIZED_VIEWS debe ser una lista de vistas")
+        return definitions
+
 
 # Instancia global de configuración
 settings = Settings()
\ No newline at end of file
@@ -1,11 +1,20 @@
-from app.services.datamart import get_datamart_service, DatamartService
+from fastapi import HTTPException, status
+
+from app.config import settings
+from app.services.datamart import get_ready_datamart_service, DatamartService
+from app.utils.exceptions import DatamartNotReadyError
 
 def get_current_datamart() -> DatamartService:
     """
     Dependency para obtener el servicio de datamart.
-    Se asegura de que esté inicializado.
+    Se asegura de que esté inicializado; mientras carga responde 503 con
+    Retry-After para que el cliente (o el balanceador) reintente.
     """
-    service = get_datamart_service()
-    if service.data is None:
-        raise RuntimeError("Datamart no está cargado")
-    return service
\ No newline at end of file
+    try:
+        return get_ready_datamart_service()
+    except DatamartNotReadyError as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=e.message,
+            headers={"Retry-After": str(settings.DATAMART_RETRY_AFTER_SECONDS)}
+        )
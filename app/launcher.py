@@ -0,0 +1,74 @@
+"""
+Launcher multi-worker del Sales Datamart API.
+
+Carga el datamart una sola vez, lo exporta a memoria compartida y arranca
+uvicorn con N workers. Cada worker mapea el mismo archivo en lugar de leer los
+parquet por su cuenta, así que la memoria por worker adicional es solo la del
+proceso Python, no la de una copia completa del datamart.
+
+Las estructuras derivadas (claves, índice de tickets, cubos globales y por
+segmento, sketches, pivotes y muestra) también se construyen una sola vez aquí
+y se guardan como archivos .npy que los workers mapean en lugar de
+reconstruirlas.
+
+Uso:
+    python -m app.launcher --workers 8 --host 0.0.0.0 --port 8000
+"""
+import argparse
+import gc
+import logging
+import os
+import shutil
+from pathlib import Path
+
+import uvicorn
+
+from app.config import settings
+from app.services.datamart import read_datamart_frame
+from app.services.shared_datamart import (default_shared_path, export_shared_datamart, save_shared_structures,
+                                          store_dir_for)
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sales Datamart API con datamart compartido entre workers")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=settings.WORKERS)
+    parser.add_argument(
+        "--shared-path",
+        default=settings.SHARED_DATAMART_PATH or str(default_shared_path()),
+        help="Archivo Arrow compartido (por defecto en /dev/shm)"
+    )
+    args = parser.parse_args(argv)
+
+    shared_path = Path(args.shared_path)
+
+    logger.info("Cargando datamart una sola vez para todos los workers...")
+    data = read_datamart_frame()
+    export_shared_datamart(data, shared_path)
+    save_shared_structures(data, store_dir_for(shared_path))
+
+    # El launcher no atiende peticiones: libera su copia antes de crear workers
+    del data
+    gc.collect()
+
+    # Los workers heredan el entorno y leen SHARED_DATAMART_PATH en app.config
+    os.environ["SHARED_DATAMART_PATH"] = str(shared_path)
+
+    try:
+        logger.info(f"Iniciando {args.workers} workers con datamart compartido en {shared_path}")
+        uvicorn.run("app.main:app", host=args.host, port=args.port, workers=args.workers)
+    finally:
+        shared_path.unlink(missing_ok=True)
+        shutil.rmtree(store_dir_for(shared_path), ignore_errors=True)
+        logger.info("Datamart compartido eliminado")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,8 +4,9 @@ from fastapi.responses import JSONResponse
 import logging
 from contextlib import asynccontextmanager
 
-from app.api.routes import sales, auth, summary
-from app.services.datamart import get_datamart_service
+from app.api.routes import sales, auth, summary, query, sql, views, pivots, refresh, keys
+from app.config import settings
+from app.services.datamart import start_background_load, start_refresh_job, get_load_progress
 
 logging.basicConfig(
     level=logging.INFO,
@@ -24,13 +25,12 @@ async def lifespan(app: FastAPI):
     logger.info("Iniciando Sales Datamart API...")
     logger.info("Documentación disponible en: http://localhost:8000/docs")
 
-    try:
-        logger.info("Cargando datamart...")
-        datamart_service = get_datamart_service()
-        logger.info("Datamart cargado exitosamente al inicio")
-    except Exception as e:
-        logger.error(f"Error al cargar datamart: {e}")
-        raise
+    # La carga corre en segundo plano: /health responde de inmediato y las
+    # rutas de consulta devuelven 503 hasta que /ready indique "ready"
+    logger.info("Cargando datamart en segundo plano...")
+    start_background_load()
+    # Revisión periódica de archivos nuevos (carga incremental), si está configurada
+    start_refresh_job()
 
     yield
 
@@ -49,11 +49,29 @@ Esta API proporciona acceso seguro a datos analíticos de ventas con las siguien
 * **Ventas por Empleado** - Consultar ventas de un empleado en un rango de fechas
 * **Ventas por Producto** - Analizar ventas de productos específicos
 * **Ventas por Tienda** - Revisar desempeño de tiendas
+* **Ventas por Cliente** - Historial de un cliente o de los clientes anónimos de caja
+* **Detalle de Ticket** - Líneas y totales de un ticket (búsqueda O(1) por TicketId)
 
 #### Agregaciones y Estadísticas
 * **Resumen por Tienda** - Totales y promedios de ventas
 * **Resumen por Producto** - Análisis de rendimiento de productos
 * **Resumen por Empleado** - Métricas de desempeño individual
+* **Resumen por Cliente** - Totales y canasta por cliente o del grupo de anónimos
+* **Distribución de Montos** - Percentiles (p50/p90/p99) e histograma de montos y valor del ticket
+* **Comparación de Periodos** - Totales del periodo, del periodo anterior y del año anterior con variaciones
+* **Devoluciones** - Ventas brutas, devoluciones, neto y tasas de devolución en resúmenes y periodos (`split_returns`)
+* **Series Móviles** - Serie diaria con promedios móviles de 7/30/90 días y acumulado del año
+* **Modo Aproximado** - `approx=true` en resúmenes y series: estimaciones desde una muestra estratificada (tienda × mes) con intervalos de confianza
+* **Productos Comprados Juntos** - Top de productos por tickets compartidos, support, confidence y lift
+
+#### Consultas Generales
+* **Filtros Combinados** - Ventas por cualquier combinación de empleado, producto, tienda, cliente y división
+* **Consulta de Agregación** - Filtros, agrupación, periodo y métricas en un cuerpo JSON (con explain)
+* **SQL de Solo Lectura** - Consultas ad-hoc sobre la tabla `sales` (DuckDB, con límites y streaming)
+* **Vistas Materializadas** - Agregados declarados en configuración, precalculados al cargar y consultados por nombre
+* **Pivotes** - Matrices dispersas tienda × producto y empleado × tienda por mes, recortadas en sub-pivotes densos
+* **Listado de Claves** - Claves válidas por dimensión con autocompletado por prefijo, paginación y registros por clave
+* **Recarga Incremental** - Solo los archivos nuevos del datamart se procesan y se mezclan con los agregados existentes
 
 ###  Seguridad
 - Autenticación mediante **JWT (JSON Web Tokens)**
@@ -65,7 +83,7 @@ Esta API proporciona acceso seguro a datos analíticos de ventas con las siguien
 - Manejo robusto de errores con mensajes descriptivos
 - Logging detallado de operaciones
 - Respuestas consistentes en formato JSON
-- Filtrado por rangos de fechas
+- Filtrado por rangos de fechas y por división (sin mezclar monedas)
 - Cálculos agregados (totales y promedios)
 
 ###  Tecnologías
@@ -134,6 +152,12 @@ app.add_middleware(
 app.include_router(sales.router)
 app.include_router(auth.router)
 app.include_router(summary.router)
+app.include_router(query.router)
+app.include_router(sql.router)
+app.include_router(views.router)
+app.include_router(pivots.router)
+app.include_router(refresh.router)
+app.include_router(keys.router)
 
 @app.get("/", tags=["health"])
 async def root():
@@ -147,12 +171,27 @@ async def root():
             "auth": "/api/v1/auth/login",
             "self": "/api/v1/auth/self",
             "verify": "/api/v1/auth/verify",
+            "ready": "/ready",
             "sales_by_employee": "/api/v1/sales/by-employee",
             "employee_summary": "/api/v1/sales/employee-summary",
             "sales_by_product": "/api/v1/sales/by-product",
             "products_summary": "/api/v1/sales/products-summary",
             "sales_by_store": "/api/v1/sales/by-store",
             "store_summary": "/api/v1/sales/store-summary",
+            "sales_by_customer": "/api/v1/sales/by-customer",
+            "customer_summary": "/api/v1/sales/customer-summary",
+            "ticket": "/api/v1/sales/ticket",
+            "amount_distribution": "/api/v1/sales/distribution",
+            "period_comparison": "/api/v1/sales/comparison",
+            "sales_series": "/api/v1/sales/series",
+            "co_purchased": "/api/v1/sales/co-purchased",
+            "sales_query": "/api/v1/sales/query",
+            "aggregation_query": "/api/v1/query",
+            "sql": "/api/v1/sql",
+            "views": "/api/v1/views",
+            "pivots": "/api/v1/pivots/{name}",
+            "datamart_refresh": "/api/v1/datamart/refresh",
+            "keys": "/api/v1/keys/{dimension}",
         }
     }
 
@@ -164,3 +203,22 @@ async def health_check():
         "service": "Sales Datamart API",
         "version": "1.0.0"
     }
+
+@app.get("/ready", tags=["health"])
+async def readiness_check():
+    """Readiness check - indica si el datamart terminó de cargar y su progreso"""
+    progress = get_load_progress()
+    content = {
+        "ready": progress.is_ready,
+        "service": "Sales Datamart API",
+        "datamart": progress.as_dict()
+    }
+
+    if progress.is_ready:
+        return content
+
+    return JSONResponse(
+        status_code=503,
+        content=content,
+        headers={"Retry-After": str(settings.DATAMART_RETRY_AFTER_SECONDS)}
+    )
@@ -1,6 +1,6 @@
 from pydantic import BaseModel, Field
-from datetime import date
-from typing import List, Optional
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional
 from app.models.schemas import SaleRecord
 
 class EmployeeSalesResponse(BaseModel):
@@ -11,6 +11,8 @@ class EmployeeSalesResponse(BaseModel):
     total_amount: float = Field(..., description="Monto total de ventas")
     total_quantity: int = Field(..., description="Cantidad total vendida")
     records_count: int = Field(..., description="Número total de registros")
+    division: Optional[str] = Field(None, description="División consultada (None: todas)")
+    currency: Optional[str] = Field(None, description="Moneda de los montos (None si no hay KeyCurrency o registros)")
     sales: List[SaleRecord] = Field(..., description="Lista de ventas detalladas")
 
     class Config:
@@ -27,6 +29,8 @@ class ProductSalesResponse(BaseModel):
     total_amount: float = Field(..., description="Monto total de ventas")
     total_quantity: int = Field(..., description="Cantidad total vendida")
     records_count: int = Field(..., description="Número total de registros")
+    division: Optional[str] = Field(None, description="División consultada (None: todas)")
+    currency: Optional[str] = Field(None, description="Moneda de los montos (None si no hay KeyCurrency o registros)")
     sales: List[SaleRecord] = Field(..., description="Lista de ventas detalladas")
 
     class Config:
@@ -39,6 +43,8 @@ class ProductSalesResponse(BaseModel):
                 "total_amount": 24873.95,
                 "total_quantity": 150,
                 "records_count": 25,
+                "division": None,
+                "currency": "CLP",
                 "sales": [
                     {
                         "date": "2023-11-02",
@@ -61,6 +67,8 @@ class StoreSalesResponse(BaseModel):
     total_amount: float = Field(..., description="Monto total de ventas")
     total_quantity: int = Field(..., description="Cantidad total vendida")
     records_count: int = Field(..., description="Número total de registros")
+    division: Optional[str] = Field(None, description="División consultada (None: todas)")
+    currency: Optional[str] = Field(None, description="Moneda de los montos (None si no hay KeyCurrency o registros)")
     sales: List[SaleRecord] = Field(..., description="Lista de ventas detalladas")
 
     class Config:
@@ -72,6 +80,8 @@ class StoreSalesResponse(BaseModel):
                 "total_amount": 24873.95,
                 "total_quantity": 150,
                 "records_count": 25,
+                "division": None,
+                "currency": "CLP",
                 "sales": [
                     {
                         "date": "2023-11-02",
@@ -85,6 +95,72 @@ class StoreSalesResponse(BaseModel):
             }
         }
 
+class CustomerSalesResponse(BaseModel):
+    """Modelo para la respuesta de ventas por cliente"""
+    success: bool = Field(default=True, description="Indica si la operación fue exitosa")
+    key_customer: Optional[str] = Field(None, description="ID del cliente (None para el grupo de anónimos)")
+    anonymous: bool = Field(False, description="Indica si es el grupo de clientes anónimos de caja")
+    date_start: date = Field(..., description="Fecha de inicio del periodo")
+    date_end: date = Field(..., description="Fecha de fin del periodo")
+    total_amount: float = Field(..., description="Monto total de ventas")
+    total_quantity: int = Field(..., description="Cantidad total vendida")
+    records_count: int = Field(..., description="Número total de registros")
+    division: Optional[str] = Field(None, description="División consultada (None: todas)")
+    currency: Optional[str] = Field(None, description="Moneda de los montos (None si no hay KeyCurrency o registros)")
+    truncated: bool = Field(default=False, description="Indica si el detalle se recortó al límite")
+    sales: List[SaleRecord] = Field(..., description="Lista de ventas detalladas (hasta el límite)")
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "success": True,
+                "key_customer": "1|88120",
+                "anonymous": False,
+                "date_start": "2023-11-01",
+                "date_end": "2023-11-30",
+                "total_amount": 3120.5,
+                "total_quantity": 14,
+                "records_count": 6,
+                "division": None,
+                "currency": "CLP",
+                "truncated": False,
+                "sales": [
+                    {
+                        "date": "2023-11-02",
+                        "amount": 1500.50,
+                        "quantity": 10,
+                        "ticket_id": "N01-00000385",
+                        "product": "1|44733",
+                        "store": "1|023"
+                    }
+                ]
+            }
+        }
+
+class ReturnsBreakdown(BaseModel):
+    """Ventas brutas, devoluciones (filas con monto negativo) y neto"""
+    gross_amount: float = Field(..., description="Monto de las ventas (filas con monto no negativo)")
+    returns_amount: float = Field(..., description="Monto devuelto, en positivo")
+    net_amount: float = Field(..., description="Ventas menos devoluciones (igual a total_amount)")
+    gross_quantity: int = Field(..., description="Unidades vendidas")
+    returns_quantity: int = Field(..., description="Unidades devueltas, en positivo")
+    net_quantity: int = Field(..., description="Unidades vendidas menos devueltas")
+    sales_count: int = Field(..., description="Registros de venta")
+    returns_count: int = Field(..., description="Registros de devolución")
+    return_rate: Optional[float] = Field(None, description="Monto devuelto sobre monto vendido (%); None sin ventas")
+    quantity_return_rate: Optional[float] = Field(
+        None,
+        description="Unidades devueltas sobre unidades vendidas (%); None sin ventas"
+    )
+
+
+class ConfidenceInterval(BaseModel):
+    """Intervalo de confianza de una estimación"""
+    lower: float = Field(..., description="Límite inferior")
+    upper: float = Field(..., description="Límite superior")
+    level: float = Field(..., description="Nivel de confianza (ej. 0.95)")
+
+
 class EmployeeSummaryResponse(BaseModel):
     """Modelo para la respuesta de resumen de ventas por empleado"""
     success: bool = Field(default=True, description="Indica si la operación fue exitosa")
@@ -93,6 +169,36 @@ class EmployeeSummaryResponse(BaseModel):
     average_amount: float = Field(..., description="Promedio de ventas por transacción")
     total_quantity: int = Field(..., description="Cantidad total vendida")
     records_count: int = Field(..., description="Número total de registros")
+    division: Optional[str] = Field(None, description="División consultada (None: todas)")
+    currency: Optional[str] = Field(None, description="Moneda de los montos (None si no hay KeyCurrency o registros)")
+    date_start: Optional[date] = Field(None, description="Fecha de inicio del periodo (None: desde el inicio)")
+    date_end: Optional[date] = Field(None, description="Fecha de fin del periodo (None: hasta el final)")
+    unique_tickets: Optional[int] = Field(None, description="Tickets distintos")
+    unique_customers: Optional[int] = Field(None, description="Clientes distintos")
+    unique_products: Optional[int] = Field(None, description="Productos distintos")
+    distinct_approximate: bool = Field(
+        False,
+        description="Indica si los conteos distintos son estimaciones HyperLogLog (error estándar ~1.6%)"
+    )
+    tickets_count: Optional[int] = Field(
+        None,
+        description="Tickets del periodo (por el día de su primera línea); None si approximate"
+    )
+    average_ticket_value: Optional[float] = Field(None, description="Monto promedio por ticket")
+    average_items_per_ticket: Optional[float] = Field(None, description="Unidades promedio por ticket")
+    returns: Optional[ReturnsBreakdown] = Field(
+        None,
+        description="Ventas brutas, devoluciones y neto (solo con split_returns=true)"
+    )
+    approximate: bool = Field(
+        False,
+        description="Indica si los totales, el promedio, los registros y returns son estimaciones desde la "
+                    "muestra estratificada (approx=true)"
+    )
+    confidence_intervals: Optional[Dict[str, ConfidenceInterval]] = Field(
+        None,
+        description="Intervalos de total_amount, total_quantity y records_count (solo si approximate)"
+    )
 
     class Config:
         json_schema_extra = {
@@ -102,7 +208,18 @@ class EmployeeSummaryResponse(BaseModel):
                 "total_amount": 150000.50,
                 "average_amount": 6000.02,
                 "total_quantity": 1000,
-                "records_count": 25
+                "records_count": 25,
+                "division": None,
+                "currency": "CLP",
+                "date_start": None,
+                "date_end": None,
+                "unique_tickets": 18,
+                "unique_customers": 15,
+                "unique_products": 21,
+                "distinct_approximate": False,
+                "tickets_count": 18,
+                "average_ticket_value": 8333.36,
+                "average_items_per_ticket": 55.56
             }
         }
 
@@ -115,6 +232,29 @@ class ProductSummaryResponse(BaseModel):
     average_amount: float = Field(..., description="Promedio de ventas por transacción")
     total_quantity: int = Field(..., description="Cantidad total vendida")
     records_count: int = Field(..., description="Número total de registros")
+    division: Optional[str] = Field(None, description="División consultada (None: todas)")
+    currency: Optional[str] = Field(None, description="Moneda de los montos (None si no hay KeyCurrency o registros)")
+    date_start: Optional[date] = Field(None, description="Fecha de inicio del periodo (None: desde el inicio)")
+    date_end: Optional[date] = Field(None, description="Fecha de fin del periodo (None: hasta el final)")
+    unique_tickets: Optional[int] = Field(None, description="Tickets distintos")
+    unique_customers: Optional[int] = Field(None, description="Clientes distintos")
+    distinct_approximate: bool = Field(
+        False,
+        description="Indica si los conteos distintos son estimaciones HyperLogLog (error estándar ~1.6%)"
+    )
+    returns: Optional[ReturnsBreakdown] = Field(
+        None,
+        description="Ventas brutas, devoluciones y neto (solo con split_returns=true)"
+    )
+    approximate: bool = Field(
+        False,
+        description="Indica si los totales, el promedio, los registros y returns son estimaciones desde la "
+                    "muestra estratificada (approx=true)"
+    )
+    confidence_intervals: Optional[Dict[str, ConfidenceInterval]] = Field(
+        None,
+        description="Intervalos de total_amount, total_quantity y records_count (solo si approximate)"
+    )
 
     class Config:
         json_schema_extra = {
@@ -124,7 +264,14 @@ class ProductSummaryResponse(BaseModel):
                 "total_amount": 250000.75,
                 "average_amount": 5000.02,
                 "total_quantity": 2500,
-                "records_count": 50
+                "records_count": 50,
+                "division": None,
+                "currency": "CLP",
+                "date_start": None,
+                "date_end": None,
+                "unique_tickets": 47,
+                "unique_customers": 45,
+                "distinct_approximate": False
             }
         }
 
@@ -136,6 +283,36 @@ class StoreSummaryResponse(BaseModel):
     average_amount: float = Field(..., description="Promedio de ventas por transacción")
     total_quantity: int = Field(..., description="Cantidad total vendida")
     records_count: int = Field(..., description="Número total de registros")
+    division: Optional[str] = Field(None, description="División consultada (None: todas)")
+    currency: Optional[str] = Field(None, description="Moneda de los montos (None si no hay KeyCurrency o registros)")
+    date_start: Optional[date] = Field(None, description="Fecha de inicio del periodo (None: desde el inicio)")
+    date_end: Optional[date] = Field(None, description="Fecha de fin del periodo (None: hasta el final)")
+    unique_tickets: Optional[int] = Field(None, description="Tickets distintos")
+    unique_customers: Optional[int] = Field(None, description="Clientes distintos")
+    unique_products: Optional[int] = Field(None, description="Productos distintos")
+    distinct_approximate: bool = Field(
+        False,
+        description="Indica si los conteos distintos son estimaciones HyperLogLog (error estándar ~1.6%)"
+    )
+    tickets_count: Optional[int] = Field(
+        None,
+        description="Tickets del periodo (por el día de su primera línea); None si approximate"
+    )
+    average_ticket_value: Optional[float] = Field(None, description="Monto promedio por ticket")
+    average_items_per_ticket: Optional[float] = Field(None, description="Unidades promedio por ticket")
+    returns: Optional[ReturnsBreakdown] = Field(
+        None,
+        description="Ventas brutas, devoluciones y neto (solo con split_returns=true)"
+    )
+    approximate: bool = Field(
+        False,
+        description="Indica si los totales, el promedio, los registros y returns son estimaciones desde la "
+                    "muestra estratificada (approx=true)"
+    )
+    confidence_intervals: Optional[Dict[str, ConfidenceInterval]] = Field(
+        None,
+        description="Intervalos de total_amount, total_quantity y records_count (solo si approximate)"
+    )
 
     class Config:
         json_schema_extra = {
@@ -145,7 +322,512 @@ class StoreSummaryResponse(BaseModel):
                 "total_amount": 500000.25,
                 "average_amount": 10000.50,
                 "total_quantity": 5000,
-                "records_count": 50
+                "records_count": 50,
+                "division": None,
+                "currency": "CLP",
+                "date_start": None,
+                "date_end": None,
+                "unique_tickets": 41,
+                "unique_customers": 38,
+                "unique_products": 44,
+                "distinct_approximate": False,
+                "tickets_count": 41,
+                "average_ticket_value": 12195.13,
+                "average_items_per_ticket": 121.95
+            }
+        }
+
+class CustomerSummaryResponse(BaseModel):
+    """Modelo para la respuesta de resumen de ventas por cliente"""
+    success: bool = Field(default=True, description="Indica si la operación fue exitosa")
+    key_customer: Optional[str] = Field(None, description="ID del cliente o None para todos / anónimos")
+    anonymous: bool = Field(False, description="Indica si es el grupo de clientes anónimos de caja")
+    customers_count: int = Field(..., description="Claves de cliente incluidas en el resumen")
+    total_amount: float = Field(..., description="Monto total de ventas")
+    average_amount: float = Field(..., description="Promedio de ventas por transacción")
+    total_quantity: int = Field(..., description="Cantidad total vendida")
+    records_count: int = Field(..., description="Número total de registros")
+    division: Optional[str] = Field(None, description="División consultada (None: todas)")
+    currency: Optional[str] = Field(None, description="Moneda de los montos (None si no hay KeyCurrency o registros)")
+    date_start: Optional[date] = Field(None, description="Fecha de inicio del periodo (None: desde el inicio)")
+    date_end: Optional[date] = Field(None, description="Fecha de fin del periodo (None: hasta el final)")
+    unique_products: Optional[int] = Field(None, description="Productos distintos (exacto; None si hay demasiados registros)")
+    tickets_count: Optional[int] = Field(None, description="Tickets del periodo")
+    average_ticket_value: Optional[float] = Field(None, description="Monto promedio por ticket")
+    average_items_per_ticket: Optional[float] = Field(None, description="Unidades promedio por ticket")
+    returns: Optional[ReturnsBreakdown] = Field(
+        None,
+        description="Ventas brutas, devoluciones y neto (solo con split_returns=true)"
+    )
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "success": True,
+                "key_customer": "1|88120",
+                "anonymous": False,
+                "customers_count": 1,
+                "total_amount": 3120.5,
+                "average_amount": 520.08,
+                "total_quantity": 14,
+                "records_count": 6,
+                "division": None,
+                "currency": "CLP",
+                "date_start": None,
+                "date_end": None,
+                "unique_products": 5,
+                "tickets_count": 2,
+                "average_ticket_value": 1560.25,
+                "average_items_per_ticket": 7.0
+            }
+        }
+
+class HistogramBin(BaseModel):
+    """Intervalo de un histograma"""
+    lower: float = Field(..., description="Límite inferior del intervalo")
+    upper: float = Field(..., description="Límite superior del intervalo")
+    count: int = Field(..., description="Valores en el intervalo")
+
+
+class AmountDistributionResponse(BaseModel):
+    """Modelo para la respuesta de distribución (percentiles e histograma) de montos"""
+    success: bool = Field(default=True, description="Indica si la operación fue exitosa")
+    dimension: Optional[str] = Field(None, description="Dimensión de la entidad o None para todo el datamart")
+    key: Optional[str] = Field(None, description="ID de la entidad o None para todo el datamart")
+    measure: str = Field(..., description="Medida: 'amount' (por registro) o 'ticket' (valor del ticket)")
+    division: Optional[str] = Field(None, description="División consultada (None: todas)")
+    currency: Optional[str] = Field(None, description="Moneda de los montos (None si no hay KeyCurrency o registros)")
+    date_start: Optional[date] = Field(None, description="Fecha de inicio del periodo")
+    date_end: Optional[date] = Field(None, description="Fecha de fin del periodo")
+    count: int = Field(..., description="Número de valores (registros o tickets)")
+    p50: Optional[float] = Field(None, description="Percentil 50 (mediana)")
+    p90: Optional[float] = Field(None, description="Percentil 90")
+    p99: Optional[float] = Field(None, description="Percentil 99")
+    histogram: List[HistogramBin] = Field(default_factory=list, description="Histograma de igual ancho")
+    below_range: int = Field(0, description="Valores por debajo del primer intervalo")
+    above_range: int = Field(0, description="Valores por encima del último intervalo")
+    relative_accuracy: float = Field(..., description="Error relativo máximo de los percentiles")
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "success": True,
+                "dimension": "KeyStore",
+                "key": "1|023",
+                "measure": "ticket",
+                "division": None,
+                "currency": "CLP",
+                "date_start": "2023-11-01",
+                "date_end": "2023-11-30",
+                "count": 1250,
+                "p50": 18250.4,
+                "p90": 64310.77,
+                "p99": 189004.12,
+                "histogram": [
+                    {"lower": 1200.0, "upper": 19980.0, "count": 640},
+                    {"lower": 19980.0, "upper": 38760.0, "count": 310}
+                ],
+                "below_range": 12,
+                "above_range": 13,
+                "relative_accuracy": 0.01
+            }
+        }
+
+
+class PeriodTotals(BaseModel):
+    """Totales de un periodo"""
+    date_start: date = Field(..., description="Fecha de inicio del periodo")
+    date_end: date = Field(..., description="Fecha de fin del periodo")
+    total_amount: float = Field(..., description="Monto total de ventas")
+    total_quantity: int = Field(..., description="Cantidad total vendida")
+    records_count: int = Field(..., description="Número total de registros")
+    returns: Optional[ReturnsBreakdown] = Field(
+        None,
+        description="Ventas brutas, devoluciones y neto (solo con split_returns=true)"
+    )
+
+
+class PeriodChange(BaseModel):
+    """Variación del periodo actual respecto de otro periodo"""
+    amount: float = Field(..., description="Diferencia de monto (actual - comparado)")
+    amount_pct: Optional[float] = Field(None, description="Variación porcentual del monto (None si el comparado es 0)")
+    quantity: int = Field(..., description="Diferencia de cantidad")
+    quantity_pct: Optional[float] = Field(None, description="Variación porcentual de la cantidad")
+    records: int = Field(..., description="Diferencia de registros")
+    records_pct: Optional[float] = Field(None, description="Variación porcentual de los registros")
+
+
+class PeriodComparisonResponse(BaseModel):
+    """Modelo para la respuesta de comparación de periodos"""
+    success: bool = Field(default=True, description="Indica si la operación fue exitosa")
+    dimension: Optional[str] = Field(None, description="Dimensión de la entidad o None para todo el datamart")
+    key: Optional[str] = Field(None, description="ID de la entidad o None para todo el datamart")
+    division: Optional[str] = Field(None, description="División consultada (None: todas)")
+    currency: Optional[str] = Field(None, description="Moneda de los montos (None si no hay KeyCurrency o registros)")
+    current: PeriodTotals = Field(..., description="Periodo consultado")
+    previous: PeriodTotals = Field(..., description="Periodo anterior de la misma cantidad de días")
+    year_ago: PeriodTotals = Field(..., description="Mismo periodo del año anterior")
+    change_vs_previous: PeriodChange = Field(..., description="Variación respecto del periodo anterior")
+    change_vs_year_ago: PeriodChange = Field(..., description="Variación respecto del año anterior")
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "success": True,
+                "dimension": "KeyStore",
+                "key": "1|023",
+                "division": None,
+                "currency": "CLP",
+                "current": {"date_start": "2023-11-01", "date_end": "2023-11-30", "total_amount": 500000.25,
+                            "total_quantity": 5000, "records_count": 50},
+                "previous": {"date_start": "2023-10-02", "date_end": "2023-10-31", "total_amount": 400000.2,
+                             "total_quantity": 4200, "records_count": 44},
+                "year_ago": {"date_start": "2022-11-01", "date_end": "2022-11-30", "total_amount": 450000.0,
+                             "total_quantity": 4800, "records_count": 47},
+                "change_vs_previous": {"amount": 100000.05, "amount_pct": 25.0, "quantity": 800,
+                                       "quantity_pct": 19.05, "records": 6, "records_pct": 13.64},
+                "change_vs_year_ago": {"amount": 50000.25, "amount_pct": 11.11, "quantity": 200,
+                                       "quantity_pct": 4.17, "records": 3, "records_pct": 6.38}
+            }
+        }
+
+
+class SeriesPoint(BaseModel):
+    """Modelo para un día de la serie con ventanas móviles y acumulado del año"""
+    date: date
+    total_amount: float = Field(..., description="Monto del día")
+    total_quantity: int = Field(..., description="Cantidad vendida en el día")
+    records_count: int = Field(..., description="Registros del día")
+    amount_7d: float = Field(..., description="Monto de los últimos 7 días (incluido el día)")
+    amount_30d: float = Field(..., description="Monto de los últimos 30 días")
+    amount_90d: float = Field(..., description="Monto de los últimos 90 días")
+    avg_amount_7d: float = Field(..., description="Promedio diario de los últimos 7 días")
+    avg_amount_30d: float = Field(..., description="Promedio diario de los últimos 30 días")
+    avg_amount_90d: float = Field(..., description="Promedio diario de los últimos 90 días")
+    ytd_amount: float = Field(..., description="Monto acumulado desde el 1 de enero")
+    ytd_quantity: int = Field(..., description="Cantidad acumulada desde el 1 de enero")
+    total_amount_ci: Optional[ConfidenceInterval] = Field(
+        None,
+        description="Intervalo de confianza del monto del día (solo en series aproximadas)"
+    )
+
+
+class SalesSeriesResponse(BaseModel):
+    """Modelo para la respuesta de la serie diaria con ventanas móviles"""
+    success: bool = Field(default=True, description="Indica si la operación fue exitosa")
+    dimension: Optional[str] = Field(None, description="Dimensión de la entidad o None para todo el datamart")
+    key: Optional[str] = Field(None, description="ID de la entidad o None para todo el datamart")
+    division: Optional[str] = Field(None, description="División consultada (None: todas)")
+    currency: Optional[str] = Field(None, description="Moneda de los montos (None si no hay KeyCurrency o registros)")
+    date_start: date = Field(..., description="Fecha de inicio de la serie")
+    date_end: date = Field(..., description="Fecha de fin de la serie")
+    points: List[SeriesPoint] = Field(..., description="Un punto por día del rango, incluidos los días sin ventas")
+    approximate: bool = Field(
+        False,
+        description="Indica si los puntos son estimaciones desde la muestra estratificada (approx=true)"
+    )
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "success": True,
+                "dimension": "KeyStore",
+                "key": "1|023",
+                "division": None,
+                "currency": "CLP",
+                "date_start": "2023-11-01",
+                "date_end": "2023-11-30",
+                "points": [
+                    {"date": "2023-11-01", "total_amount": 15000.5, "total_quantity": 120, "records_count": 14,
+                     "amount_7d": 98000.0, "amount_30d": 410000.25, "amount_90d": 1250000.75,
+                     "avg_amount_7d": 14000.0, "avg_amount_30d": 13666.68, "avg_amount_90d": 13888.9,
+                     "ytd_amount": 4800000.5, "ytd_quantity": 41000}
+                ]
+            }
+        }
+
+
+class SalesQueryResponse(BaseModel):
+    """Modelo para la respuesta de consulta de ventas con filtros combinados"""
+    success: bool = Field(default=True, description="Indica si la operación fue exitosa")
+    filters: Dict[str, str] = Field(..., description="Filtros de clave aplicados")
+    date_start: Optional[date] = Field(None, description="Fecha de inicio del periodo")
+    date_end: Optional[date] = Field(None, description="Fecha de fin del periodo")
+    total_amount: float = Field(..., description="Monto total de ventas")
+    total_quantity: int = Field(..., description="Cantidad total vendida")
+    records_count: int = Field(..., description="Número total de registros")
+    currency: Optional[str] = Field(None, description="Moneda de los montos (None si no hay KeyCurrency o registros)")
+    truncated: bool = Field(default=False, description="Indica si el detalle se recortó al límite")
+    sales: List[SaleRecord] = Field(..., description="Lista de ventas detalladas (hasta el límite)")
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "success": True,
+                "filters": {"key_product": "1|44733", "key_store": "1|023", "key_employee": "1|343"},
+                "date_start": "2023-10-01",
+                "date_end": "2023-12-31",
+                "total_amount": 4500.75,
+                "total_quantity": 12,
+                "records_count": 3,
+                "currency": "CLP",
+                "truncated": False,
+                "sales": [
+                    {
+                        "date": "2023-11-02",
+                        "amount": 1500.50,
+                        "quantity": 4,
+                        "ticket_id": "N01-00000385",
+                        "product": "1|44733",
+                        "store": "1|023"
+                    }
+                ]
+            }
+        }
+
+class TicketResponse(BaseModel):
+    """Modelo para la respuesta de detalle de un ticket"""
+    success: bool = Field(default=True, description="Indica si la operación fue exitosa")
+    ticket_id: str = Field(..., description="ID del ticket")
+    ticket_date: Optional[date] = Field(None, description="Fecha del ticket (día de su primera línea)")
+    key_store: Optional[str] = Field(None, description="Tienda del ticket")
+    key_employee: Optional[str] = Field(None, description="Empleado del ticket")
+    key_customer: Optional[str] = Field(None, description="Cliente del ticket")
+    total_amount: float = Field(..., description="Monto total del ticket")
+    total_quantity: int = Field(..., description="Unidades del ticket")
+    lines_count: int = Field(..., description="Número de líneas del ticket")
+    sales: List[SaleRecord] = Field(..., description="Líneas del ticket")
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "success": True,
+                "ticket_id": "N01-00000385",
+                "ticket_date": "2023-11-02",
+                "key_store": "1|023",
+                "key_employee": "1|343",
+                "key_customer": "1|88120",
+                "total_amount": 1800.5,
+                "total_quantity": 12,
+                "lines_count": 2,
+                "sales": [
+                    {
+                        "date": "2023-11-02",
+                        "amount": 1500.50,
+                        "quantity": 10,
+                        "ticket_id": "N01-00000385",
+                        "product": "1|44733",
+                        "store": "1|023"
+                    }
+                ]
+            }
+        }
+
+class CoPurchasedProduct(BaseModel):
+    """Producto comprado junto con otro en los mismos tickets"""
+    key_product: str = Field(..., description="ID del producto")
+    tickets: int = Field(..., description="Tickets con ambos productos")
+    support: float = Field(..., description="Fracción de todos los tickets con ambos productos")
+    confidence: float = Field(..., description="Fracción de los tickets del producto consultado que incluyen este")
+    lift: float = Field(..., description="Confidence dividida por la frecuencia de este producto (>1: se compran juntos más que al azar)")
+
+
+class CoPurchaseResponse(BaseModel):
+    """Modelo para la respuesta de productos comprados juntos"""
+    success: bool = Field(default=True, description="Indica si la operación fue exitosa")
+    key_product: str = Field(..., description="ID del producto consultado")
+    product_tickets: int = Field(..., description="Tickets que incluyen el producto consultado")
+    total_tickets: int = Field(..., description="Tickets considerados en la matriz")
+    order_by: str = Field(..., description="Orden de los productos: 'count' o 'lift'")
+    products: List[CoPurchasedProduct] = Field(..., description="Productos comprados juntos")
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "success": True,
+                "key_product": "1|44733",
+                "product_tickets": 1520,
+                "total_tickets": 845000,
+                "order_by": "count",
+                "products": [
+                    {
+                        "key_product": "1|1021",
+                        "tickets": 310,
+                        "support": 0.000367,
+                        "confidence": 0.2039,
+                        "lift": 4.8123
+                    }
+                ]
+            }
+        }
+
+class AggregationQueryResponse(BaseModel):
+    """Modelo para la respuesta de una consulta de agregación"""
+    success: bool = Field(default=True, description="Indica si la operación fue exitosa")
+    columns: List[str] = Field(..., description="Columnas de cada fila (dimensiones y métricas)")
+    rows: List[Dict[str, Any]] = Field(..., description="Grupos resultantes")
+    groups_count: int = Field(..., description="Número total de grupos antes del límite")
+    truncated: bool = Field(default=False, description="Indica si los grupos se recortaron al límite")
+    explain: Optional[Dict[str, Any]] = Field(None, description="Plan de ejecución (si se pidió explain)")
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "success": True,
+                "columns": ["key_employee", "period", "sum_amount", "count"],
+                "rows": [
+                    {"key_employee": "1|343", "period": "2023-11-01", "sum_amount": 24873.95, "count": 12}
+                ],
+                "groups_count": 1,
+                "truncated": False,
+                "explain": None
+            }
+        }
+
+class ViewInfo(BaseModel):
+    """Estado de una vista materializada"""
+    name: str = Field(..., description="Nombre de la vista")
+    dimensions: List[str] = Field(..., description="Dimensiones de agrupación")
+    grain: Optional[str] = Field(None, description="Grano temporal (None: sin desglose por fecha)")
+    metrics: List[str] = Field(..., description="Métricas precalculadas")
+    available: bool = Field(..., description="Indica si la vista se construyó")
+    rows: Optional[int] = Field(None, description="Filas (grupos) de la vista")
+    size_bytes: Optional[int] = Field(None, description="Memoria de sus arreglos")
+    build_seconds: Optional[float] = Field(None, description="Tiempo de la última construcción")
+    refreshed_at: Optional[datetime] = Field(None, description="Momento de la última construcción (UTC)")
+    error: Optional[str] = Field(None, description="Error de la última construcción, si falló")
+
+
+class ViewRegistryResponse(BaseModel):
+    """Modelo para la respuesta del registro de vistas materializadas"""
+    success: bool = Field(default=True, description="Indica si la operación fue exitosa")
+    views: List[ViewInfo] = Field(..., description="Vistas declaradas")
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "success": True,
+                "views": [
+                    {"name": "store_month", "dimensions": ["key_store"], "grain": "month",
+                     "metrics": ["amount", "quantity", "records", "tickets"], "available": True,
+                     "rows": 1440, "size_bytes": 46080, "build_seconds": 0.84,
+                     "refreshed_at": "2024-01-15T10:30:00Z", "error": None}
+                ]
+            }
+        }
+
+
+class ViewQueryResponse(BaseModel):
+    """Modelo para la respuesta de una consulta a una vista materializada"""
+    success: bool = Field(default=True, description="Indica si la operación fue exitosa")
+    view: str = Field(..., description="Nombre de la vista")
+    columns: List[str] = Field(..., description="Columnas de cada fila (dimensiones, period y métricas)")
+    rows: List[Dict[str, Any]] = Field(..., description="Filas de la vista (página solicitada)")
+    total_rows: int = Field(..., description="Filas que cumplen los filtros")
+    offset: int = Field(..., description="Filas saltadas")
+    limit: int = Field(..., description="Máximo de filas retornadas")
+    refreshed_at: datetime = Field(..., description="Momento de la última construcción de la vista (UTC)")
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "success": True,
+                "view": "store_month",
+                "columns": ["key_store", "period", "amount", "quantity", "records", "tickets"],
+                "rows": [
+                    {"key_store": "1|023", "period": "2023-11-01", "amount": 500000.25, "quantity": 5000,
+                     "records": 50, "tickets": 21}
+                ],
+                "total_rows": 12,
+                "offset": 0,
+                "limit": 100,
+                "refreshed_at": "2024-01-15T10:30:00Z"
+            }
+        }
+
+class PivotResponse(BaseModel):
+    """Modelo para la respuesta de un sub-pivote entre dos dimensiones"""
+    success: bool = Field(default=True, description="Indica si la operación fue exitosa")
+    pivot: str = Field(..., description="Nombre del pivote")
+    row_dimension: str = Field(..., description="Dimensión de las filas")
+    column_dimension: str = Field(..., description="Dimensión de las columnas")
+    date_start: Optional[date] = Field(None, description="Fecha de inicio del periodo")
+    date_end: Optional[date] = Field(None, description="Fecha de fin del periodo")
+    rows: List[str] = Field(..., description="Claves de las filas")
+    columns: List[str] = Field(..., description="Claves de las columnas")
+    amount: List[List[float]] = Field(..., description="Monto por fila y columna")
+    quantity: List[List[int]] = Field(..., description="Cantidad por fila y columna")
+    records: List[List[int]] = Field(..., description="Registros por fila y columna")
+    total_rows: int = Field(..., description="Filas con ventas en el periodo (o filas pedidas)")
+    total_columns: int = Field(..., description="Columnas con ventas en las filas retornadas (o columnas pedidas)")
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "success": True,
+                "pivot": "store-product",
+                "row_dimension": "key_store",
+                "column_dimension": "key_product",
+                "date_start": "2023-11-01",
+                "date_end": "2023-11-30",
+                "rows": ["1|023", "1|045"],
+                "columns": ["1|44733", "1|44734"],
+                "amount": [[150000.5, 0.0], [98000.0, 12000.25]],
+                "quantity": [[30, 0], [21, 4]],
+                "records": [[12, 0], [9, 2]],
+                "total_rows": 24,
+                "total_columns": 1530
+            }
+        }
+
+class KeyEntry(BaseModel):
+    """Clave de una dimensión con su número de registros"""
+    key: str = Field(..., description="Clave")
+    records: int = Field(..., description="Registros de la clave en el datamart")
+
+
+class KeyListResponse(BaseModel):
+    """Modelo para la respuesta del listado de claves de una dimensión"""
+    success: bool = Field(default=True, description="Indica si la operación fue exitosa")
+    dimension: str = Field(..., description="Dimensión consultada")
+    prefix: Optional[str] = Field(None, description="Prefijo buscado")
+    total: int = Field(..., description="Claves que coinciden con el prefijo")
+    offset: int = Field(..., description="Posición de la primera clave retornada")
+    limit: int = Field(..., description="Máximo de claves por página")
+    keys: List[KeyEntry] = Field(..., description="Claves en orden lexicográfico")
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "success": True,
+                "dimension": "key_employee",
+                "prefix": "1|34",
+                "total": 12,
+                "offset": 0,
+                "limit": 2,
+                "keys": [
+                    {"key": "1|34", "records": 1520},
+                    {"key": "1|340", "records": 873}
+                ]
+            }
+        }
+
+class RefreshResponse(BaseModel):
+    """Modelo para respuesta de recarga del datamart"""
+    mode: str = Field(..., description="incremental (solo archivos nuevos), full (carga completa) o unchanged")
+    files_added: int = Field(..., description="Archivos leídos en la recarga")
+    rows_added: int = Field(..., description="Registros anexados (solo en modo incremental)")
+    total_rows: int = Field(..., description="Registros del datamart después de la recarga")
+    seconds: float = Field(..., description="Duración de la recarga en segundos")
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "mode": "incremental",
+                "files_added": 1,
+                "rows_added": 48210,
+                "total_rows": 5231877,
+                "seconds": 1.84
             }
         }
 
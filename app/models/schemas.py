@@ -1,6 +1,6 @@
-from pydantic import BaseModel, Field, EmailStr
+from pydantic import BaseModel, Field, EmailStr, model_validator
 from datetime import date
-from typing import List, Optional
+from typing import Dict, List, Literal, Optional, Union
 
 class SaleRecord(BaseModel):
     """Modelo para representar un registro individual de venta"""
@@ -27,4 +27,123 @@ class RegisterRequest(BaseModel):
     """Modelo para registro de usuario (opcional)"""
     email: EmailStr
     password: str
-    confirm_password: str
\ No newline at end of file
+    confirm_password: str
+
+
+# Dimensiones de la consulta de agregación (filtros y agrupación)
+QueryDimension = Literal["key_employee", "key_product", "key_store", "key_customer", "key_division"]
+
+
+class QueryMetric(BaseModel):
+    """Métrica de una consulta de agregación (ej. sum de amount)"""
+    op: Literal["sum", "count", "avg", "min", "max"] = Field(..., description="Operación de agregación")
+    field: Optional[Literal["amount", "quantity"]] = Field(None, description="Campo agregado (no aplica a count)")
+
+    @model_validator(mode="after")
+    def check_field(self):
+        if self.op == "count":
+            self.field = None
+        elif self.field is None:
+            raise ValueError(f"La métrica '{self.op}' requiere el campo 'field' (amount o quantity)")
+        return self
+
+    @property
+    def name(self) -> str:
+        return self.op if self.op == "count" else f"{self.op}_{self.field}"
+
+
+class AggregationQuery(BaseModel):
+    """Modelo para consultas de agregación (DSL de filtros, agrupación y métricas)"""
+    filters: Dict[QueryDimension, Union[str, List[str]]] = Field(
+        default_factory=dict, description="Filtros por dimensión: una clave o lista de claves"
+    )
+    date_start: Optional[date] = Field(None, description="Fecha de inicio del periodo")
+    date_end: Optional[date] = Field(None, description="Fecha de fin del periodo")
+    group_by: List[QueryDimension] = Field(default_factory=list, description="Dimensiones de agrupación")
+    time_bucket: Optional[Literal["day", "week", "month", "year"]] = Field(
+        None, description="Agrupación temporal adicional"
+    )
+    metrics: List[QueryMetric] = Field(
+        default_factory=lambda: [QueryMetric(op="count")], min_length=1, description="Métricas a calcular"
+    )
+    order_by: Optional[str] = Field(None, description="Métrica o dimensión por la cual ordenar")
+    descending: bool = Field(True, description="Orden descendente")
+    limit: int = Field(100, ge=1, le=10000, description="Máximo de grupos retornados")
+    explain: bool = Field(False, description="Incluir el plan de ejecución en la respuesta")
+
+    @model_validator(mode="after")
+    def check_query(self):
+        if self.date_start and self.date_end and self.date_end < self.date_start:
+            raise ValueError(f"date_end ({self.date_end}) debe ser mayor o igual a date_start ({self.date_start})")
+        if len(set(self.group_by)) != len(self.group_by):
+            raise ValueError("group_by no puede repetir dimensiones")
+
+        columns = list(self.group_by) + (["period"] if self.time_bucket else []) + [m.name for m in self.metrics]
+        if self.order_by is not None and self.order_by not in columns:
+            raise ValueError(f"order_by debe ser una de: {', '.join(columns)}")
+        return self
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "filters": {"key_store": "1|023"},
+                "date_start": "2023-01-01",
+                "date_end": "2023-12-31",
+                "group_by": ["key_employee"],
+                "time_bucket": "month",
+                "metrics": [{"op": "sum", "field": "amount"}, {"op": "count"}],
+                "order_by": "sum_amount",
+                "descending": True,
+                "limit": 20,
+                "explain": True
+            }
+        }
+
+
+# Métricas de una vista materializada
+ViewMetric = Literal["amount", "quantity", "records", "tickets", "returns_amount", "returns_quantity", "returns_records"]
+
+
+class ViewDefinition(BaseModel):
+    """Declaración de una vista materializada (dimensiones, grano temporal y métricas)"""
+    name: str = Field(..., pattern=r"^[a-z0-9_]+$", description="Nombre de la vista (minúsculas, dígitos y _)")
+    dimensions: List[QueryDimension] = Field(default_factory=list, description="Dimensiones de agrupación")
+    grain: Optional[Literal["day", "week", "month", "year"]] = Field(
+        None, description="Grano temporal (None: sin desglose por fecha)"
+    )
+    metrics: List[ViewMetric] = Field(
+        default_factory=lambda: ["amount", "quantity", "records"], min_length=1, description="Métricas precalculadas"
+    )
+
+    @model_validator(mode="after")
+    def check_definition(self):
+        if len(set(self.dimensions)) != len(self.dimensions):
+            raise ValueError(f"La vista {self.name} repite dimensiones")
+        if len(set(self.metrics)) != len(self.metrics):
+            raise ValueError(f"La vista {self.name} repite métricas")
+        return self
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "name": "store_month",
+                "dimensions": ["key_store"],
+                "grain": "month",
+                "metrics": ["amount", "quantity", "records", "tickets"]
+            }
+        }
+
+
+class SqlQueryRequest(BaseModel):
+    """Modelo para consultas SQL de solo lectura sobre la tabla sales"""
+    query: str = Field(..., min_length=1, description="Sentencia SELECT sobre la tabla sales")
+    max_rows: Optional[int] = Field(None, ge=1, description="Máximo de filas (acotado por SQL_MAX_ROWS)")
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "query": "SELECT KeyStore, SUM(Amount) AS total FROM sales "
+                         "WHERE KeyDate >= DATE '2023-11-01' GROUP BY KeyStore ORDER BY total DESC",
+                "max_rows": 100
+            }
+        }
@@ -0,0 +1,559 @@
+"""
+Agregados diarios precalculados por entidad.
+
+Para cada dimensión indexada (empleado, producto, tienda) se construye un cubo
+disperso (entidad × día) con suma de Amount, suma de Qty y conteo de registros.
+Solo se guardan las celdas con ventas, agrupadas por entidad y ordenadas por día
+(formato CSR), así que los totales de una entidad en un periodo son un slice y
+dos búsquedas binarias sobre días, no una pasada por las transacciones.
+
+El cubo se construye reutilizando el índice de filas ordenado por (clave, día)
+del almacén columnar, por lo que la agregación es un ``np.add.reduceat`` sin
+ordenamientos adicionales. Las sumas conservan el tipo de Amount: en punto fijo
+(int64) siguen siendo exactas.
+
+Los cubos de empleado y tienda pueden llevar además una parte ``tickets``: los
+tickets atribuidos a cada celda por su fila cabeza (ver ``app.services.tickets``),
+para métricas de canasta por periodo sin pasar por las transacciones.
+
+Las devoluciones (filas con Amount negativo) se acumulan aparte en el mismo
+``reduceat`` (partes ``return_amount``, ``return_qty`` y ``return_count``), así
+que ventas brutas, devoluciones y neto de un periodo salen del cubo sin una
+segunda pasada. Las sumas de devoluciones son negativas, como en los datos.
+"""
+import logging
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from app.services.columnar import ColumnarStore, KeyColumn, read_only
+from app.services.incremental import CodeMap, day_slots, merge_cells, slot_days
+from app.services.tickets import TICKET_DIMENSIONS, TicketIndex
+
+logger = logging.getLogger(__name__)
+
+CUBE_PARTS = ("offsets", "days", "amount", "qty", "count", "grand")
+
+# Partes que solo existen en algunos cubos
+OPTIONAL_CUBE_PARTS = ("tickets", "return_amount", "return_qty", "return_count")
+
+# Partes con las devoluciones de cada celda
+RETURN_PARTS = ("return_amount", "return_qty", "return_count")
+
+# Dimensiones con cubo diario (las que tienen endpoints de ventas y resumen)
+CUBE_DIMENSIONS = ('KeyEmployee', 'KeyProduct', 'KeyStore')
+
+
+class DailyCube:
+    """Cubo disperso (entidad × día) de suma Amount, suma Qty y conteo"""
+
+    def __init__(
+            self,
+            name: str,
+            offsets: np.ndarray,
+            days: np.ndarray,
+            amount: np.ndarray,
+            qty: np.ndarray,
+            count: np.ndarray,
+            grand: np.ndarray,
+            tickets: Optional[np.ndarray] = None,
+            return_amount: Optional[np.ndarray] = None,
+            return_qty: Optional[np.ndarray] = None,
+            return_count: Optional[np.ndarray] = None
+    ):
+        self.name = name
+        self.offsets = read_only(offsets)
+        self.days = read_only(days)
+        self.amount = read_only(amount)
+        self.qty = read_only(qty)
+        self.count = read_only(count)
+        # Totales de todo el datamart: [Amount, Qty, conteo]
+        self.grand = read_only(grand)
+        # Tickets cuya fila cabeza cae en la celda (None si el cubo no los cuenta)
+        self.tickets = read_only(tickets) if tickets is not None else None
+        # Suma Amount, suma Qty y conteo de las devoluciones de la celda (None en cubos guardados sin ellas)
+        self.return_amount = read_only(return_amount) if return_amount is not None else None
+        self.return_qty = read_only(return_qty) if return_qty is not None else None
+        self.return_count = read_only(return_count) if return_count is not None else None
+
+    @classmethod
+    def from_key_column(
+            cls,
+            column: KeyColumn,
+            store: ColumnarStore,
+            ticket_heads: Optional[np.ndarray] = None
+    ) -> "DailyCube":
+        """
+        Construye el cubo de una columna indexada del almacén.
+
+        Args:
+            column: Columna de clave con índice de filas ordenado por (clave, día)
+            store: Almacén con las columnas Amount y Qty
+            ticket_heads: (Opcional) Máscara por fila de las filas cabeza de ticket
+
+        Returns:
+            DailyCube de la dimensión
+        """
+        if not column.indexed:
+            raise ValueError(f"La columna {column.name} no tiene índice por clave")
+
+        return cls.from_sorted_rows(column.name, column.order, column.order_days, column.offsets,
+                                     store, ticket_heads)
+
+    @classmethod
+    def from_rows(
+            cls,
+            name: str,
+            rows: np.ndarray,
+            store: ColumnarStore,
+            ticket_heads: Optional[np.ndarray] = None
+    ) -> "DailyCube":
+        """
+        Construye el cubo de una sola entidad (código 0) a partir de un grupo de filas.
+
+        Sirve para grupos de claves que se consultan juntos (por ejemplo, los
+        clientes anónimos de caja) sin indexar cada combinación.
+
+        Args:
+            name: Nombre del cubo
+            rows: Posiciones de fila del grupo (en cualquier orden)
+            store: Almacén con las columnas Amount y Qty
+            ticket_heads: (Opcional) Máscara por fila de las filas cabeza de ticket
+
+        Returns:
+            DailyCube con una entidad
+        """
+        rows = np.asarray(rows)
+        order = rows[np.argsort(store.days[rows], kind='stable')]
+        offsets = np.array([0, len(order)], dtype=np.int64)
+        return cls.from_sorted_rows(name, order, store.days[order], offsets, store, ticket_heads)
+
+    @classmethod
+    def from_sorted_rows(
+            cls,
+            name: str,
+            order: np.ndarray,
+            order_days: np.ndarray,
+            entity_offsets: np.ndarray,
+            store: ColumnarStore,
+            ticket_heads: Optional[np.ndarray] = None,
+            grand: Optional[np.ndarray] = None
+    ) -> "DailyCube":
+        """
+        Construye el cubo a partir de filas agrupadas por entidad y ordenadas por día.
+
+        Args:
+            name: Nombre del cubo
+            order: Posiciones de fila agrupadas por entidad y ordenadas por día en cada una
+            order_days: Día de cada posición de order
+            entity_offsets: Inicio de cada entidad en order (longitud n_entidades + 1)
+            store: Almacén con las columnas Amount y Qty
+            ticket_heads: (Opcional) Máscara por fila de las filas cabeza de ticket
+            grand: (Opcional) Totales [Amount, Qty, conteo] del cubo; por defecto los del almacén
+
+        Returns:
+            DailyCube
+        """
+        n_rows = len(order)
+
+        amount = store.amount[order]
+        if np.issubdtype(amount.dtype, np.floating):
+            amount = np.nan_to_num(amount)
+        qty = store.qty[order]
+
+        # Una celda empieza donde cambia el día o la entidad
+        is_start = np.zeros(n_rows, dtype=bool)
+        if n_rows > 0:
+            is_start[0] = True
+            is_start[1:] = order_days[1:] != order_days[:-1]
+            entity_starts = entity_offsets[:-1][np.diff(entity_offsets) > 0]
+            is_start[entity_starts] = True
+        starts = np.flatnonzero(is_start)
+
+        # Devoluciones: filas con Amount negativo, sumadas en las mismas celdas
+        is_return = amount < 0
+        return_amount = np.where(is_return, amount, 0).astype(amount.dtype, copy=False)
+        return_qty = np.where(is_return, qty, 0).astype(qty.dtype, copy=False)
+
+        if len(starts) > 0:
+            cell_amount = np.add.reduceat(amount, starts)
+            cell_qty = np.add.reduceat(qty, starts)
+            cell_return_amount = np.add.reduceat(return_amount, starts)
+            cell_return_qty = np.add.reduceat(return_qty, starts)
+            cell_return_count = np.add.reduceat(is_return, starts, dtype=np.int64)
+        else:
+            cell_amount = np.zeros(0, dtype=amount.dtype)
+            cell_qty = np.zeros(0, dtype=qty.dtype)
+            cell_return_amount = np.zeros(0, dtype=amount.dtype)
+            cell_return_qty = np.zeros(0, dtype=qty.dtype)
+            cell_return_count = np.zeros(0, dtype=np.int64)
+        cell_count = np.diff(np.append(starts, n_rows)).astype(np.int64)
+
+        cell_tickets = None
+        if ticket_heads is not None:
+            cell_tickets = (np.add.reduceat(ticket_heads[order], starts, dtype=np.int64) if len(starts) > 0
+                            else np.zeros(0, dtype=np.int64))
+
+        # Índice de celda donde empieza cada entidad
+        cells_before = np.concatenate(([0], np.cumsum(is_start)))
+        offsets = cells_before[entity_offsets].astype(np.int64)
+
+        if grand is None:
+            grand = store.totals()
+        grand = np.array(list(grand), dtype=np.result_type(cell_amount.dtype, np.int64))
+
+        return cls(name, offsets, order_days[starts], cell_amount, cell_qty, cell_count, grand, cell_tickets,
+                   cell_return_amount, cell_return_qty, cell_return_count)
+
+    def merge(
+            self,
+            delta: "DailyCube",
+            code_map: CodeMap,
+            grand: Optional[np.ndarray] = None
+    ) -> "DailyCube":
+        """
+        Suma el cubo de las filas nuevas (construido aparte) a este cubo.
+
+        Las celdas (entidad, día) comunes se suman y las nuevas se insertan en
+        su lugar, sin volver a pasar por las filas existentes. Las partes
+        opcionales solo se conservan si las tienen los dos cubos.
+
+        Args:
+            delta: Cubo de las filas nuevas, con los códigos del delta
+            code_map: Códigos de las entidades de cada cubo en la unión
+            grand: (Opcional) Totales [Amount, Qty, conteo]; por defecto la suma de los dos
+
+        Returns:
+            DailyCube con las celdas de los dos
+        """
+        cells = merge_cells(self.offsets, day_slots(self.days), delta.offsets, day_slots(delta.days), code_map)
+
+        def merged(part: str) -> Optional[np.ndarray]:
+            old, new = getattr(self, part), getattr(delta, part)
+            if old is None or new is None:
+                return None
+            return cells.combine(old, new)
+
+        if grand is None:
+            grand = self.grand + delta.grand
+        return DailyCube(
+            self.name, cells.offsets, slot_days(cells.slots), merged("amount"), merged("qty"), merged("count"),
+            np.asarray(grand), merged("tickets"), merged("return_amount"), merged("return_qty"),
+            merged("return_count")
+        )
+
+    @property
+    def n_cells(self) -> int:
+        return len(self.days)
+
+    @property
+    def parts(self) -> Tuple[str, ...]:
+        return CUBE_PARTS + tuple(part for part in OPTIONAL_CUBE_PARTS if getattr(self, part) is not None)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(getattr(self, part).nbytes for part in self.parts)
+
+    @property
+    def has_returns(self) -> bool:
+        """Si el cubo tiene las partes de devoluciones"""
+        return all(getattr(self, part) is not None for part in RETURN_PARTS)
+
+    def _cell_range(self, code: int, day_start: Optional[int], day_end: Optional[int]) -> Tuple[int, int]:
+        lo, hi = int(self.offsets[code]), int(self.offsets[code + 1])
+        days = self.days[lo:hi]
+        start = int(np.searchsorted(days, day_start, side='left')) if day_start is not None else 0
+        end = int(np.searchsorted(days, day_end, side='right')) if day_end is not None else hi - lo
+        return lo + start, lo + end
+
+    def totals(
+            self,
+            code: Optional[int] = None,
+            day_start: Optional[int] = None,
+            day_end: Optional[int] = None
+    ) -> Tuple[Union[int, float], int, int]:
+        """
+        Suma de Amount, suma de Qty y conteo de una entidad en un rango de días.
+
+        Args:
+            code: Código de la entidad, None para todo el datamart o -1 si no existe
+            day_start: Primer día incluido (número de día)
+            day_end: Último día incluido (número de día)
+
+        Returns:
+            (suma Amount sin convertir, suma Qty, número de registros)
+        """
+        if code is None and day_start is None and day_end is None:
+            amount, qty, count = self.grand.tolist()
+            return amount, int(qty), int(count)
+
+        if code is not None and code < 0:
+            return self.amount.dtype.type(0).item(), 0, 0
+
+        if code is None:
+            # Todo el datamart en un rango de días: se filtran las celdas por día
+            mask = np.ones(self.n_cells, dtype=bool)
+            if day_start is not None:
+                mask &= self.days >= day_start
+            if day_end is not None:
+                mask &= self.days <= day_end
+            return self.amount[mask].sum().item(), int(self.qty[mask].sum()), int(self.count[mask].sum())
+
+        lo, hi = self._cell_range(code, day_start, day_end)
+        return self.amount[lo:hi].sum().item(), int(self.qty[lo:hi].sum()), int(self.count[lo:hi].sum())
+
+    def range_totals(
+            self,
+            code: Optional[int],
+            ranges: Sequence[Tuple[int, int]]
+    ) -> List[Tuple[Union[int, float], int, int]]:
+        """
+        Totales de una entidad en varios rangos de días con una sola pasada por su slice.
+
+        Se calculan sumas acumuladas sobre las celdas de la entidad (ordenadas
+        por día) y cada rango es la diferencia de dos posiciones halladas con
+        búsqueda binaria, así que comparar periodos no recorre el slice una vez
+        por periodo.
+
+        Args:
+            code: Código de la entidad, None para todo el datamart o -1 si no existe
+            ranges: Rangos (primer día, último día) incluidos
+
+        Returns:
+            (suma Amount sin convertir, suma Qty, número de registros) por rango
+        """
+        return self._range_sums((self.amount, self.qty, self.count), code, ranges)
+
+    def returns(
+            self,
+            code: Optional[int] = None,
+            day_start: Optional[int] = None,
+            day_end: Optional[int] = None
+    ) -> Optional[Tuple[Union[int, float], int, int]]:
+        """
+        Suma de Amount, suma de Qty y conteo de las devoluciones de una entidad en un rango de días.
+
+        Returns:
+            (suma Amount sin convertir, suma Qty, número de devoluciones), sumas
+            negativas, o None si el cubo no tiene las partes de devoluciones
+        """
+        if not self.has_returns:
+            return None
+        return self._range_sums(self._return_parts(), code, [(day_start, day_end)])[0]
+
+    def range_returns(
+            self,
+            code: Optional[int],
+            ranges: Sequence[Tuple[int, int]]
+    ) -> Optional[List[Tuple[Union[int, float], int, int]]]:
+        """Devoluciones de una entidad en varios rangos de días (como range_totals), o None si no hay partes"""
+        if not self.has_returns:
+            return None
+        return self._range_sums(self._return_parts(), code, ranges)
+
+    def _return_parts(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        return self.return_amount, self.return_qty, self.return_count
+
+    def _range_sums(
+            self,
+            parts: Tuple[np.ndarray, np.ndarray, np.ndarray],
+            code: Optional[int],
+            ranges: Sequence[Tuple[Optional[int], Optional[int]]]
+    ) -> List[Tuple[Union[int, float], int, int]]:
+        amount, qty, count = parts
+        if code is not None and code < 0:
+            return [(amount.dtype.type(0).item(), 0, 0) for _ in ranges]
+
+        if code is None:
+            # Todo el datamart: las celdas no están ordenadas por día, se filtra cada rango
+            sums = []
+            for day_start, day_end in ranges:
+                mask = np.ones(self.n_cells, dtype=bool)
+                if day_start is not None:
+                    mask &= self.days >= day_start
+                if day_end is not None:
+                    mask &= self.days <= day_end
+                sums.append((amount[mask].sum().item(), int(qty[mask].sum()), int(count[mask].sum())))
+            return sums
+
+        lo, hi = int(self.offsets[code]), int(self.offsets[code + 1])
+        days = self.days[lo:hi]
+        cumulative = [np.concatenate(([0], np.cumsum(values[lo:hi]))) for values in parts]
+
+        starts = np.array([np.searchsorted(days, day_start, side='left') if day_start is not None else 0
+                           for day_start, _ in ranges], dtype=np.int64)
+        ends = np.array([np.searchsorted(days, day_end, side='right') if day_end is not None else hi - lo
+                         for _, day_end in ranges], dtype=np.int64)
+        amount_sums, qty_sums, count_sums = ((values[ends] - values[starts]) for values in cumulative)
+        return [(amount_sums[i].item(), int(qty_sums[i]), int(count_sums[i])) for i in range(len(ranges))]
+
+    def ticket_count(
+            self,
+            code: Optional[int] = None,
+            day_start: Optional[int] = None,
+            day_end: Optional[int] = None
+    ) -> Optional[int]:
+        """
+        Tickets de una entidad en un rango de días (por el día de su fila cabeza).
+
+        Returns:
+            Número de tickets, o None si el cubo no cuenta tickets
+        """
+        if self.tickets is None:
+            return None
+        if code is not None and code < 0:
+            return 0
+
+        if code is None:
+            mask = np.ones(self.n_cells, dtype=bool)
+            if day_start is not None:
+                mask &= self.days >= day_start
+            if day_end is not None:
+                mask &= self.days <= day_end
+            return int(self.tickets[mask].sum())
+
+        lo, hi = self._cell_range(code, day_start, day_end)
+        return int(self.tickets[lo:hi].sum())
+
+    def daily(
+            self,
+            code: int,
+            day_start: Optional[int] = None,
+            day_end: Optional[int] = None
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Celdas diarias de una entidad en un rango (solo días con ventas).
+
+        Returns:
+            (días, suma Amount, suma Qty, conteo), vistas de solo lectura
+        """
+        if code < 0:
+            empty = np.zeros(0, dtype=np.int64)
+            return self.days[:0], self.amount[:0], self.qty[:0], empty
+
+        lo, hi = self._cell_range(code, day_start, day_end)
+        return self.days[lo:hi], self.amount[lo:hi], self.qty[lo:hi], self.count[lo:hi]
+
+    def cells(
+            self,
+            code: Optional[int],
+            day_start: Optional[int] = None,
+            day_end: Optional[int] = None
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Celdas de una entidad (o de todo el datamart si code es None) en un rango.
+
+        Sin entidad puede haber varias celdas por día (una por entidad).
+
+        Returns:
+            (días, suma Amount, suma Qty, conteo)
+        """
+        if code is not None:
+            return self.daily(code, day_start, day_end)
+
+        mask = np.ones(self.n_cells, dtype=bool)
+        if day_start is not None:
+            mask &= self.days >= day_start
+        if day_end is not None:
+            mask &= self.days <= day_end
+        return self.days[mask], self.amount[mask], self.qty[mask], self.count[mask]
+
+    def save(self, directory: Union[str, Path]):
+        """Guarda el cubo como archivos .npy mapeables en la carpeta del almacén"""
+        directory = Path(directory)
+        for part in self.parts:
+            np.save(directory / f"{self.name}.cube.{part}.npy", getattr(self, part), allow_pickle=False)
+
+    @classmethod
+    def load(cls, directory: Union[str, Path], name: str) -> Optional["DailyCube"]:
+        """Mapea en memoria un cubo guardado con save, o None si no existe"""
+        directory = Path(directory)
+        paths = {part: directory / f"{name}.cube.{part}.npy" for part in CUBE_PARTS}
+        if not all(path.exists() for path in paths.values()):
+            return None
+        for part in OPTIONAL_CUBE_PARTS:
+            path = directory / f"{name}.cube.{part}.npy"
+            if path.exists():
+                paths[part] = path
+        return cls(name, **{part: np.load(path, mmap_mode='r') for part, path in paths.items()})
+
+
+def build_daily_cubes(
+        store: ColumnarStore,
+        dimensions=CUBE_DIMENSIONS,
+        tickets: Optional[TicketIndex] = None
+) -> Dict[str, DailyCube]:
+    """
+    Construye los cubos diarios de las dimensiones indexadas y registra tiempo y memoria.
+
+    Args:
+        store: Almacén columnar
+        dimensions: Columnas de clave para las que se construye cubo
+        tickets: (Opcional) Índice de tickets para contar tickets en TICKET_DIMENSIONS
+
+    Returns:
+        Diccionario {columna: DailyCube}
+    """
+    ticket_heads = tickets.head_mask(len(store)) if tickets is not None else None
+
+    cubes = {}
+    for name in dimensions:
+        if name not in store.keys or not store.key(name).indexed:
+            continue
+
+        start = time.perf_counter()
+        heads = ticket_heads if name in TICKET_DIMENSIONS else None
+        cube = DailyCube.from_key_column(store.key(name), store, heads)
+        cubes[name] = cube
+
+        logger.info(
+            f"Cubo diario {name}: {cube.n_cells:,} celdas, "
+            f"{cube.nbytes / 1024 ** 2:,.1f} MB, {time.perf_counter() - start:.2f}s"
+        )
+
+    return cubes
+
+
+def merge_daily_cubes(
+        cubes: Dict[str, DailyCube],
+        delta_cubes: Dict[str, DailyCube],
+        code_maps: Dict[str, CodeMap]
+) -> Dict[str, DailyCube]:
+    """
+    Suma los cubos de las filas nuevas a los cubos existentes y registra el tiempo.
+
+    Args:
+        cubes: Cubos existentes {columna: DailyCube}
+        delta_cubes: Cubos de las filas nuevas
+        code_maps: CodeMap de cada columna (ColumnarStore.append)
+
+    Returns:
+        Diccionario {columna: DailyCube}
+
+    Raises:
+        ValueError: si los dos lados no tienen cubo para las mismas dimensiones
+    """
+    if set(cubes) != set(delta_cubes):
+        raise ValueError("Las filas nuevas no tienen cubos para las mismas dimensiones")
+
+    merged = {}
+    for name, cube in cubes.items():
+        start = time.perf_counter()
+        merged[name] = cube.merge(delta_cubes[name], code_maps[name])
+        logger.info(
+            f"Cubo diario {name}: +{delta_cubes[name].n_cells:,} celdas nuevas, "
+            f"{merged[name].n_cells:,} celdas, {time.perf_counter() - start:.2f}s"
+        )
+    return merged
+
+
+def load_daily_cubes(directory: Union[str, Path], dimensions=CUBE_DIMENSIONS) -> Dict[str, DailyCube]:
+    """Mapea los cubos guardados en la carpeta del almacén compartido"""
+    cubes = {}
+    for name in dimensions:
+        cube = DailyCube.load(directory, name)
+        if cube is not None:
+            cubes[name] = cube
+    return cubes
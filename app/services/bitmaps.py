@@ -0,0 +1,466 @@
+"""
+Conjuntos de filas comprimidos estilo roaring para filtros multidimensionales.
+
+Un ``RowSet`` guarda las filas como arreglo ordenado de posiciones cuando es
+disperso, o como bitset de palabras uint64 cuando es denso (más de 1/16 de las
+filas, el mismo umbral que usa roaring para pasar de contenedor arreglo a
+bitmap). Las intersecciones eligen el algoritmo según los contenedores:
+arreglo ∩ arreglo por búsqueda binaria, arreglo ∩ bitset probando bits, y
+bitset ∩ bitset con AND por palabras.
+
+``BitmapIndex`` entrega el ``RowSet`` de cada valor de una dimensión: las claves
+"pesadas" se precalculan como bitset al cargar (a lo sumo 16 por dimensión por
+el umbral) y las dispersas se derivan del índice de filas del almacén.
+
+``select_rows`` combina filtros de varias dimensiones: parte de la clave más
+selectiva (ya recortada al rango de días con su índice) y la intersecta con las
+demás en orden de cardinalidad creciente, cortando en cuanto queda vacía. Si
+la consulta es poco selectiva recorre las columnas en su lugar (ver
+``app.services.statistics``).
+"""
+import logging
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Union
+
+import numpy as np
+
+from app.services.columnar import ColumnarStore, KeyColumn, INDEXED_KEYS
+from app.services.incremental import CodeMap
+from app.services.statistics import KeyStatistics, choose_access_path, estimate_rows
+
+logger = logging.getLogger(__name__)
+
+# Fracción de filas a partir de la cual un conjunto se guarda como bitset
+DENSE_RATIO = 1 / 16
+
+# Filtros combinables de las consultas -> columna del datamart
+FILTER_COLUMNS = {
+    'key_employee': 'KeyEmployee',
+    'key_product': 'KeyProduct',
+    'key_store': 'KeyStore',
+    'key_customer': 'KeyCustomer',
+    'key_division': 'KeyDivision',
+}
+
+
+def _popcount(words: np.ndarray) -> int:
+    return int(np.bitwise_count(words).sum())
+
+
+class RowSet:
+    """Conjunto de posiciones de fila: arreglo ordenado (disperso) o bitset (denso)"""
+
+    def __init__(self, n_rows: int, positions: Optional[np.ndarray] = None, words: Optional[np.ndarray] = None,
+                 count: Optional[int] = None):
+        self.n_rows = n_rows
+        self.positions = positions
+        self.words = words
+        # count evita recorrer un bitset ya contado (mapeado desde la carpeta del almacén)
+        if count is not None:
+            self._count = count
+        else:
+            self._count = len(positions) if positions is not None else _popcount(words)
+
+    @classmethod
+    def from_positions(cls, positions: np.ndarray, n_rows: int, assume_sorted: bool = False) -> "RowSet":
+        """Crea el conjunto eligiendo el contenedor según la densidad"""
+        positions = np.asarray(positions, dtype=np.int64)
+        if len(positions) >= n_rows * DENSE_RATIO:
+            mask = np.zeros(n_rows, dtype=bool)
+            mask[positions] = True
+            return cls.from_mask(mask)
+        if not assume_sorted:
+            positions = np.sort(positions)
+        return cls(n_rows, positions=positions)
+
+    @classmethod
+    def from_mask(cls, mask: np.ndarray) -> "RowSet":
+        """Crea el conjunto a partir de una máscara booleana"""
+        n_rows = len(mask)
+        if mask.sum() < n_rows * DENSE_RATIO:
+            return cls(n_rows, positions=np.flatnonzero(mask))
+
+        padded = np.zeros(((n_rows + 63) // 64) * 64, dtype=bool)
+        padded[:n_rows] = mask
+        words = np.packbits(padded, bitorder='little').view(np.uint64)
+        return cls(n_rows, words=words)
+
+    @classmethod
+    def full(cls, n_rows: int) -> "RowSet":
+        return cls.from_mask(np.ones(n_rows, dtype=bool))
+
+    @property
+    def is_dense(self) -> bool:
+        return self.words is not None
+
+    @property
+    def nbytes(self) -> int:
+        return self.words.nbytes if self.is_dense else self.positions.nbytes
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _contains(self, positions: np.ndarray) -> np.ndarray:
+        """Máscara de cuáles posiciones pertenecen al conjunto"""
+        if self.is_dense:
+            bits = self.words[positions >> 6] >> (positions & 63).astype(np.uint64)
+            return (bits & np.uint64(1)).astype(bool)
+
+        found = np.searchsorted(self.positions, positions)
+        found[found == len(self.positions)] = 0
+        return self.positions[found] == positions if len(self.positions) else np.zeros(len(positions), dtype=bool)
+
+    def __and__(self, other: "RowSet") -> "RowSet":
+        if self.is_dense and other.is_dense:
+            words = np.bitwise_and(self.words, other.words)
+            result = RowSet(self.n_rows, words=words)
+            if len(result) < self.n_rows * DENSE_RATIO:
+                return RowSet(self.n_rows, positions=result.to_positions())
+            return result
+
+        # Al menos uno es disperso: se recorre el más pequeño contra el otro
+        small, large = (self, other) if len(self) <= len(other) else (other, self)
+        if small.is_dense:
+            small, large = large, small
+        positions = small.positions[large._contains(small.positions)]
+        return RowSet(self.n_rows, positions=positions)
+
+    def __or__(self, other: "RowSet") -> "RowSet":
+        if self.is_dense and other.is_dense:
+            return RowSet(self.n_rows, words=np.bitwise_or(self.words, other.words))
+
+        if self.is_dense or other.is_dense:
+            dense, sparse = (self, other) if self.is_dense else (other, self)
+            mask = np.zeros(self.n_rows, dtype=bool)
+            mask[dense.to_positions()] = True
+            mask[sparse.positions] = True
+            return RowSet.from_mask(mask)
+
+        return RowSet.from_positions(np.union1d(self.positions, other.positions), self.n_rows, assume_sorted=True)
+
+    def extended(self, n_rows: int, positions: np.ndarray) -> "RowSet":
+        """
+        Conjunto sobre n_rows filas con las posiciones nuevas (todas >= self.n_rows, ordenadas) agregadas.
+
+        Un bitset solo se amplía y recibe los bits nuevos; un arreglo se concatena.
+        """
+        positions = np.asarray(positions, dtype=np.int64)
+        if not self.is_dense:
+            return RowSet.from_positions(np.concatenate((self.positions, positions)), n_rows, assume_sorted=True)
+
+        words = np.zeros((n_rows + 63) // 64, dtype=np.uint64)
+        words[:len(self.words)] = self.words
+        np.bitwise_or.at(words, positions >> 6, np.left_shift(np.uint64(1), (positions & 63).astype(np.uint64)))
+        result = RowSet(n_rows, words=words)
+        if len(result) < n_rows * DENSE_RATIO:
+            return RowSet(n_rows, positions=result.to_positions())
+        return result
+
+    def to_positions(self) -> np.ndarray:
+        """Posiciones de fila ordenadas"""
+        if not self.is_dense:
+            return self.positions
+        bits = np.unpackbits(self.words.view(np.uint8), bitorder='little')[:self.n_rows]
+        return np.flatnonzero(bits)
+
+
+class BitmapIndex:
+    """Índice de conjuntos de filas por valor de clave para una dimensión"""
+
+    def __init__(self, column: KeyColumn, n_rows: int, dense: Optional[Dict[int, RowSet]] = None):
+        self.column = column
+        self.n_rows = n_rows
+        self._dense: Dict[int, RowSet] = {}
+
+        if column.indexed:
+            counts = np.diff(column.offsets)
+            heavy = np.flatnonzero(counts >= n_rows * DENSE_RATIO)
+        else:
+            counts = np.bincount(column.codes[column.codes >= 0], minlength=column.n_keys)
+            heavy = np.flatnonzero(counts >= n_rows * DENSE_RATIO)
+
+        for code in heavy:
+            if dense is not None and int(code) in dense:
+                # Conjunto ya calculado (ampliado por append)
+                self._dense[int(code)] = dense[int(code)]
+            elif column.indexed:
+                self._dense[int(code)] = RowSet.from_positions(column.rows(int(code)), n_rows)
+            else:
+                self._dense[int(code)] = RowSet.from_mask(column.codes == code)
+
+        self._counts = counts
+
+    @property
+    def nbytes(self) -> int:
+        return sum(row_set.nbytes for row_set in self._dense.values())
+
+    def append(self, column: KeyColumn, delta: KeyColumn, code_map: CodeMap, n_rows: int) -> "BitmapIndex":
+        """
+        Índice de la columna con las filas nuevas anexadas (ColumnarStore.append).
+
+        Los bitsets de las claves pesadas se amplían con las filas nuevas de la
+        clave en lugar de recalcularse; solo una clave que pasa a ser pesada se
+        arma desde el índice.
+
+        Args:
+            column: Columna con todas las filas
+            delta: Columna de las filas nuevas (códigos y filas del delta)
+            code_map: CodeMap de la columna
+            n_rows: Filas totales
+        """
+        n_old = self.n_rows
+        dense = {}
+        for code, row_set in self._dense.items():
+            merged_code = int(code_map.old[code])
+            delta_code = int(np.searchsorted(code_map.delta, merged_code))
+            if delta_code < len(code_map.delta) and code_map.delta[delta_code] == merged_code:
+                rows = np.sort(delta.rows(delta_code)) + n_old
+            else:
+                rows = np.empty(0, dtype=np.int64)
+            dense[merged_code] = row_set.extended(n_rows, rows)
+        return BitmapIndex(column, n_rows, dense)
+
+    def save(self, directory: Union[str, Path]):
+        """
+        Guarda los bitsets de las claves pesadas como archivos .npy mapeables:
+        una matriz (clave pesada × palabra) con sus códigos y conteos.
+        """
+        directory = Path(directory)
+        dense = {code: row_set for code, row_set in self._dense.items() if row_set.is_dense}
+        codes = np.array(sorted(dense), dtype=np.int64)
+        words = (np.stack([dense[int(code)].words for code in codes]) if len(codes)
+                 else np.zeros((0, (self.n_rows + 63) // 64), dtype=np.uint64))
+        counts = np.array([len(dense[int(code)]) for code in codes], dtype=np.int64)
+        name = self.column.name
+        np.save(directory / f"{name}.bitmaps.codes.npy", codes, allow_pickle=False)
+        np.save(directory / f"{name}.bitmaps.words.npy", words, allow_pickle=False)
+        np.save(directory / f"{name}.bitmaps.counts.npy", counts, allow_pickle=False)
+
+    @classmethod
+    def load(cls, directory: Union[str, Path], column: KeyColumn, n_rows: int) -> Optional["BitmapIndex"]:
+        """Índice con los bitsets guardados con save mapeados en memoria, o None si no existen"""
+        directory = Path(directory)
+        paths = {part: directory / f"{column.name}.bitmaps.{part}.npy" for part in ("codes", "words", "counts")}
+        if not all(path.exists() for path in paths.values()):
+            return None
+        codes, counts = np.load(paths["codes"]), np.load(paths["counts"])
+        words = np.load(paths["words"], mmap_mode='r')
+        dense = {int(code): RowSet(n_rows, words=words[i], count=int(counts[i])) for i, code in enumerate(codes)}
+        return cls(column, n_rows, dense)
+
+    def cardinality(self, key: Union[str, Sequence[str]]) -> int:
+        """Número de filas de la clave o claves (0 si no existe)"""
+        if not isinstance(key, str):
+            return sum(self.cardinality(single) for single in key)
+        code = self.column.code_of(key)
+        return int(self._counts[code]) if code >= 0 else 0
+
+    def rows(self, key: Union[str, Sequence[str]]) -> RowSet:
+        """Conjunto de filas de una clave (o unión de varias claves)"""
+        if not isinstance(key, str):
+            result = RowSet(self.n_rows, positions=np.empty(0, dtype=np.int64))
+            for single in key:
+                result = result | self.rows(single)
+            return result
+
+        code = self.column.code_of(key)
+        if code < 0:
+            return RowSet(self.n_rows, positions=np.empty(0, dtype=np.int64))
+
+        if code in self._dense:
+            return self._dense[code]
+
+        if self.column.indexed:
+            # El índice está ordenado por día; se reordena por posición de fila
+            return RowSet.from_positions(self.column.rows(code), self.n_rows)
+
+        return RowSet(self.n_rows, positions=np.flatnonzero(self.column.codes == code))
+
+
+def build_bitmap_indexes(store: ColumnarStore, dimensions=INDEXED_KEYS) -> Dict[str, BitmapIndex]:
+    """
+    Construye los índices de bitmaps de las dimensiones filtrables.
+
+    Args:
+        store: Almacén columnar
+        dimensions: Columnas de clave a indexar
+
+    Returns:
+        Diccionario {columna: BitmapIndex}
+    """
+    start = time.perf_counter()
+    indexes = {
+        name: BitmapIndex(store.key(name), len(store))
+        for name in dimensions if name in store.keys
+    }
+    logger.info(
+        f"Índices de bitmaps ({', '.join(indexes)}): "
+        f"{sum(index.nbytes for index in indexes.values()) / 1024 ** 2:,.1f} MB, "
+        f"{time.perf_counter() - start:.2f}s"
+    )
+    return indexes
+
+
+def load_bitmap_indexes(directory: Union[str, Path], store: ColumnarStore,
+                        dimensions=INDEXED_KEYS) -> Dict[str, BitmapIndex]:
+    """Mapea los índices guardados (ver BitmapIndex.save); las dimensiones sin archivos se omiten"""
+    loaded = {
+        name: BitmapIndex.load(directory, store.key(name), len(store))
+        for name in dimensions if name in store.keys
+    }
+    return {name: index for name, index in loaded.items() if index is not None}
+
+
+def merge_bitmap_indexes(
+        indexes: Dict[str, BitmapIndex],
+        store: ColumnarStore,
+        delta: ColumnarStore,
+        code_maps: Dict[str, CodeMap]
+) -> Dict[str, BitmapIndex]:
+    """Índices de bitmaps con las filas nuevas anexadas (ver BitmapIndex.append)"""
+    start = time.perf_counter()
+    merged = {
+        name: index.append(store.key(name), delta.key(name), code_maps[name], len(store))
+        for name, index in indexes.items()
+    }
+    logger.info(
+        f"Índices de bitmaps ({', '.join(merged)}): "
+        f"{sum(index.nbytes for index in merged.values()) / 1024 ** 2:,.1f} MB, "
+        f"{time.perf_counter() - start:.2f}s"
+    )
+    return merged
+
+
+def _key_codes(column: KeyColumn, key: Union[str, Sequence[str]]) -> np.ndarray:
+    keys = [key] if isinstance(key, str) else key
+    codes = [column.code_of(single) for single in keys]
+    return np.array([code for code in codes if code >= 0], dtype=np.int32)
+
+
+def _by_day(store: ColumnarStore, rows: np.ndarray) -> np.ndarray:
+    return rows[np.argsort(store.days[rows], kind='stable')]
+
+
+def _scan_rows(
+        store: ColumnarStore,
+        filters: Dict[str, Union[str, Sequence[str]]],
+        day_start: Optional[int],
+        day_end: Optional[int]
+) -> np.ndarray:
+    """Filas que cumplen los filtros recorriendo las columnas secuencialmente"""
+    mask = np.ones(len(store), dtype=bool)
+    if day_start is not None:
+        mask &= store.days >= day_start
+    if day_end is not None:
+        mask &= store.days <= day_end
+    for name, key in filters.items():
+        codes = _key_codes(store.key(name), key)
+        column_codes = store.key(name).codes
+        mask &= column_codes == codes[0] if len(codes) == 1 else np.isin(column_codes, codes)
+    return np.flatnonzero(mask)
+
+
+def select_rows(
+        store: ColumnarStore,
+        indexes: Dict[str, BitmapIndex],
+        filters: Dict[str, Union[str, Sequence[str]]],
+        day_start: Optional[int] = None,
+        day_end: Optional[int] = None,
+        trace: Optional[List[Dict]] = None,
+        statistics: Optional[Dict[str, KeyStatistics]] = None,
+        ordered: bool = True
+) -> np.ndarray:
+    """
+    Filas que cumplen todos los filtros de clave y el rango de días.
+
+    Con estadísticas de cardinalidad se estima cuántas filas tiene cada filtro en
+    el rango y se elige entre el índice y un recorrido secuencial
+    (``choose_access_path``); sin ellas siempre se usa el índice.
+
+    Args:
+        store: Almacén columnar
+        indexes: Índices de bitmaps por columna
+        filters: {columna: clave o lista de claves} de los filtros a combinar (AND entre
+            columnas, OR entre las claves de una misma columna)
+        day_start: Primer día incluido (número de día)
+        day_end: Último día incluido (número de día)
+        trace: (Opcional) Lista donde se agregan los pasos ejecutados (para explain)
+        statistics: (Opcional) Estadísticas por (clave, mes) de cada columna
+        ordered: Si las filas deben quedar ordenadas por día; con False el orden no
+            está garantizado (para agregaciones)
+
+    Returns:
+        Posiciones de fila ordenadas por día (estable por posición dentro del día)
+    """
+    n_rows = len(store)
+
+    if not filters:
+        # Sin filtros de clave solo queda el rango de días
+        rows = _scan_rows(store, filters, day_start, day_end)
+        if trace is not None:
+            trace.append({"step": "scan_days", "rows_scanned": n_rows, "rows_out": len(rows)})
+        return _by_day(store, rows) if ordered else rows
+
+    # Filas estimadas por filtro en el rango (exactas sin rango si no hay estadísticas)
+    if statistics is not None and all(name in statistics for name in filters):
+        estimates = {
+            name: estimate_rows(statistics[name], store.key(name), key, day_start, day_end)
+            for name, key in filters.items()
+        }
+    else:
+        estimates = {name: float(indexes[name].cardinality(key)) for name, key in filters.items()}
+
+    # La clave más selectiva define el punto de partida
+    ordered_filters = sorted(filters.items(), key=lambda item: estimates[item[0]])
+    driver_name, driver_key = ordered_filters[0]
+
+    path = "index"
+    if statistics is not None:
+        path, index_cost, scan_cost = choose_access_path(
+            n_rows,
+            [estimates[name] for name, _ in ordered_filters],
+            day_start is not None or day_end is not None,
+            ordered
+        )
+        logger.info(
+            f"Ruta de acceso: {path} | filtros {', '.join(f'{n}={k}' for n, k in ordered_filters)} | "
+            f"estimado {estimates[driver_name]:,.0f} filas ({estimates[driver_name] / max(n_rows, 1):.2%}) | "
+            f"costo índice {index_cost:,.0f} vs recorrido {scan_cost:,.0f}"
+        )
+
+    if path == "scan":
+        rows = _scan_rows(store, filters, day_start, day_end)
+        if trace is not None:
+            trace.append({"step": "scan", "columns": [name for name, _ in ordered_filters],
+                          "estimated_rows": round(estimates[driver_name]),
+                          "rows_scanned": n_rows, "rows_out": len(rows)})
+        return _by_day(store, rows) if ordered else rows
+
+    driver_keys = [driver_key] if isinstance(driver_key, str) else list(driver_key)
+    rows = np.concatenate([
+        store.select(driver_name, key, day_start, day_end) for key in driver_keys
+    ]) if driver_keys else np.empty(0, dtype=np.int64)
+    if trace is not None:
+        trace.append({"step": "index_range", "index": driver_name,
+                      "estimated_rows": round(estimates[driver_name]),
+                      "rows_scanned": len(rows), "rows_out": len(rows)})
+
+    if len(ordered_filters) == 1 and len(driver_keys) == 1:
+        # Un solo filtro: el slice del índice ya está ordenado por día
+        return rows
+
+    result = RowSet.from_positions(rows, n_rows)
+    for name, key in ordered_filters[1:]:
+        if len(result) == 0:
+            break
+        key_rows = indexes[name].rows(key)
+        rows_in = len(result)
+        result = result & key_rows
+        if trace is not None:
+            trace.append({"step": "bitmap_and", "index": name,
+                          "container": "bitset" if key_rows.is_dense else "array",
+                          "rows_scanned": min(rows_in, len(key_rows)), "rows_out": len(result)})
+
+    rows = result.to_positions()
+    return _by_day(store, rows) if ordered else rows
@@ -0,0 +1,443 @@
+"""
+Almacén columnar (struct-of-arrays) para el camino caliente de las consultas.
+
+Cada columna es un arreglo numpy de solo lectura y las claves (empleado,
+producto, tienda, ...) se codifican como enteros int32 contra un arreglo
+ordenado de valores únicos. Para las claves indexadas se guarda además la lista
+de filas de cada clave ordenada por día (formato CSR: ``order`` + ``offsets``),
+de modo que "ventas de X entre A y B" es un slice + dos búsquedas binarias, sin
+máscaras sobre todo el datamart ni maquinaria de pandas.
+
+pandas solo se usa al cargar (``from_dataframe``) y para compatibilidad.
+"""
+import logging
+import os
+import shutil
+from pathlib import Path
+from typing import Dict, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from app.services.incremental import CodeMap
+
+logger = logging.getLogger(__name__)
+
+# Columnas de clave que se codifican como enteros
+KEY_COLUMNS = ('KeyEmployee', 'KeyProduct', 'KeyStore', 'KeyCustomer', 'KeyDivision', 'KeyCurrency')
+
+# Claves con índice de filas ordenado por día (también usadas como filtros combinables)
+INDEXED_KEYS = ('KeyEmployee', 'KeyProduct', 'KeyStore', 'KeyCustomer', 'KeyDivision')
+
+# Columnas de texto que solo se leen al armar el detalle
+TEXT_COLUMNS = ('TicketId',)
+
+
+def read_only(array) -> np.ndarray:
+    array = np.asarray(array)
+    if array.flags.writeable:
+        array.flags.writeable = False
+    return array
+
+
+def _row_dtype(n_rows: int):
+    return np.int32 if n_rows < np.iinfo(np.int32).max else np.int64
+
+
+def _entity_codes(offsets: np.ndarray) -> np.ndarray:
+    """Código de cada posición de un índice CSR"""
+    return np.repeat(np.arange(len(offsets) - 1, dtype=np.int64), np.diff(offsets))
+
+
+class KeyColumn:
+    """Columna de clave codificada como enteros, con índice opcional por clave"""
+
+    def __init__(
+            self,
+            name: str,
+            codes: np.ndarray,
+            values: np.ndarray,
+            order: Optional[np.ndarray] = None,
+            offsets: Optional[np.ndarray] = None,
+            order_days: Optional[np.ndarray] = None
+    ):
+        self.name = name
+        self.codes = read_only(codes)
+        self.values = read_only(values)
+        self.order = read_only(order) if order is not None else None
+        self.offsets = read_only(offsets) if offsets is not None else None
+        self.order_days = read_only(order_days) if order_days is not None else None
+
+    @classmethod
+    def build(cls, name: str, raw_values, days: np.ndarray, indexed: bool = False) -> "KeyColumn":
+        """
+        Codifica una columna de claves.
+
+        Args:
+            name: Nombre de la columna
+            raw_values: Valores originales (texto)
+            days: Números de día de cada fila (para ordenar el índice)
+            indexed: Si se construye el índice de filas por clave
+
+        Returns:
+            KeyColumn con códigos int32 (-1 para nulos) y valores únicos ordenados
+        """
+        codes, uniques = pd.factorize(pd.Series(raw_values), sort=True)
+        codes = codes.astype(np.int32)
+        values = np.asarray(uniques, dtype=str) if len(uniques) else np.array([], dtype='<U1')
+
+        if not indexed:
+            return cls(name, codes, values)
+
+        row_dtype = _row_dtype(len(codes))
+        valid = np.flatnonzero(codes >= 0)
+        order = valid[np.lexsort((days[valid], codes[valid]))].astype(row_dtype)
+        counts = np.bincount(codes[valid], minlength=len(values))
+        offsets = np.concatenate(([0], np.cumsum(counts))).astype(np.int64)
+
+        return cls(name, codes, values, order, offsets, days[order])
+
+    @property
+    def n_keys(self) -> int:
+        return len(self.values)
+
+    @property
+    def indexed(self) -> bool:
+        return self.order is not None
+
+    def code_of(self, key: str) -> int:
+        """Código de la clave, o -1 si no existe en el datamart"""
+        position = int(np.searchsorted(self.values, key))
+        if position < len(self.values) and self.values[position] == key:
+            return position
+        return -1
+
+    def prefix_range(self, prefix: str) -> Tuple[int, int]:
+        """
+        Rango de códigos [start, end) de las claves que empiezan con el prefijo.
+
+        Los valores están ordenados, así que las claves con el mismo prefijo son
+        contiguas: el inicio es la posición del prefijo y el fin la del prefijo con
+        su último carácter incrementado (dos búsquedas binarias).
+        """
+        if not prefix:
+            return 0, self.n_keys
+        start = int(np.searchsorted(self.values, prefix, side='left'))
+        upper = prefix[:-1] + chr(ord(prefix[-1]) + 1) if ord(prefix[-1]) < 0x10FFFF else None
+        end = int(np.searchsorted(self.values, upper, side='left')) if upper is not None else self.n_keys
+        return start, max(start, end)
+
+    def record_counts(self, start: int, end: int) -> np.ndarray:
+        """Número de filas de los códigos [start, end)"""
+        if self.indexed:
+            return np.diff(self.offsets[start:end + 1])
+        codes = self.codes[(self.codes >= start) & (self.codes < end)]
+        return np.bincount(codes - start, minlength=end - start).astype(np.int64)
+
+    def rows(self, code: int, day_start: Optional[int] = None, day_end: Optional[int] = None) -> np.ndarray:
+        """
+        Filas de una clave, ordenadas por día, opcionalmente en un rango de días.
+
+        El rango de días solo se aplica si la columna está indexada.
+
+        Args:
+            code: Código de la clave
+            day_start: Primer día incluido (número de día)
+            day_end: Último día incluido (número de día)
+
+        Returns:
+            Posiciones de fila (vista de solo lectura)
+        """
+        if code < 0:
+            return np.empty(0, dtype=np.int64)
+
+        if not self.indexed:
+            # Sin índice no hay orden por día: el filtro de fechas lo aplica el almacén
+            return np.flatnonzero(self.codes == code)
+
+        lo, hi = int(self.offsets[code]), int(self.offsets[code + 1])
+        days = self.order_days[lo:hi]
+        start = int(np.searchsorted(days, day_start, side='left')) if day_start is not None else 0
+        end = int(np.searchsorted(days, day_end, side='right')) if day_end is not None else hi - lo
+        return self.order[lo + start:lo + end]
+
+    def decode(self, codes: np.ndarray) -> np.ndarray:
+        """Valores originales de un arreglo de códigos (None para nulos)"""
+        if len(self.values) == 0:
+            return np.full(len(codes), None, dtype=object)
+        decoded = self.values[codes].astype(object)
+        decoded[codes < 0] = None
+        return decoded
+
+    def append(self, delta: "KeyColumn", n_rows: int) -> Tuple["KeyColumn", CodeMap]:
+        """
+        Anexa la columna de filas nuevas (codificada aparte) a esta columna.
+
+        Los valores se unen y los códigos existentes solo se reasignan si
+        aparecen claves nuevas. En el índice, las filas nuevas de cada clave se
+        insertan al final de su tramo; solo si el delta trae días anteriores al
+        último día ya cargado de la clave se busca su lugar en el tramo.
+
+        Args:
+            delta: Columna de las filas nuevas (filas 0..len(delta) - 1)
+            n_rows: Filas de esta columna (las nuevas empiezan en esta posición)
+
+        Returns:
+            (columna con todas las filas, CodeMap de los códigos de cada lado)
+        """
+        code_map, values = CodeMap.from_values(self.values, delta.values)
+        old_codes = self.codes if code_map.identity else code_map.remap(self.codes)
+        codes = np.concatenate((old_codes, code_map.remap(delta.codes, delta=True)))
+
+        if not (self.indexed and delta.indexed):
+            return KeyColumn(self.name, codes, values), code_map
+
+        delta_codes = _entity_codes(delta.offsets)
+        merged_codes = code_map.delta[delta_codes]
+        # Fin del tramo de la clave (o inicio del tramo siguiente si la clave es nueva)
+        next_old = np.searchsorted(code_map.old, merged_codes, side='right')
+        positions = self.offsets[next_old]
+
+        # Filas con días anteriores al último día ya cargado de su clave
+        exists = (next_old > 0) & (next_old <= len(code_map.old))
+        exists[exists] = code_map.old[next_old[exists] - 1] == merged_codes[exists]
+        old_code = next_old - 1
+        nonempty = exists.copy()
+        nonempty[exists] = self.offsets[old_code[exists] + 1] > self.offsets[old_code[exists]]
+        late = np.zeros(len(delta_codes), dtype=bool)
+        late[nonempty] = delta.order_days[nonempty] < self.order_days[positions[nonempty] - 1]
+        late_rows = np.flatnonzero(late)
+        late_codes = old_code[late_rows]
+        bounds = np.flatnonzero(np.r_[True, late_codes[1:] != late_codes[:-1], True]) if len(late_rows) else []
+        for a, b in zip(bounds[:-1], bounds[1:]):
+            lo, hi = int(self.offsets[late_codes[a]]), int(self.offsets[late_codes[a] + 1])
+            rows = late_rows[a:b]
+            positions[rows] = lo + np.searchsorted(self.order_days[lo:hi], delta.order_days[rows], side='right')
+
+        row_dtype = _row_dtype(n_rows + len(delta.codes))
+        order = np.insert(self.order.astype(row_dtype, copy=False), positions,
+                          delta.order.astype(row_dtype) + n_rows)
+        order_days = np.insert(self.order_days, positions, delta.order_days)
+
+        counts = np.zeros(code_map.n_keys, dtype=np.int64)
+        counts[code_map.old] = np.diff(self.offsets)
+        counts[code_map.delta] += np.diff(delta.offsets)
+        offsets = np.concatenate(([0], np.cumsum(counts))).astype(np.int64)
+
+        return KeyColumn(self.name, codes, values, order, offsets, order_days), code_map
+
+    def arrays(self) -> Dict[str, np.ndarray]:
+        arrays = {"codes": self.codes, "values": self.values}
+        if self.indexed:
+            arrays.update(order=self.order, offsets=self.offsets, order_days=self.order_days)
+        return arrays
+
+
+class ColumnarStore:
+    """Datamart en arreglos numpy inmutables con claves codificadas"""
+
+    def __init__(
+            self,
+            days: np.ndarray,
+            amount: np.ndarray,
+            qty: np.ndarray,
+            keys: Dict[str, KeyColumn],
+            texts: Dict[str, object]
+    ):
+        self.days = read_only(days)
+        self.amount = read_only(amount)
+        self.qty = read_only(qty)
+        self.keys = keys
+        self._texts = texts
+
+    @classmethod
+    def from_dataframe(cls, data: pd.DataFrame, indexed_keys=INDEXED_KEYS) -> "ColumnarStore":
+        """
+        Construye el almacén a partir del DataFrame ya procesado.
+
+        Las columnas numéricas se toman sin copiar (vistas sobre el DataFrame);
+        solo las claves se codifican.
+        """
+        days = data['KeyDate'].to_numpy()
+        keys = {
+            name: KeyColumn.build(name, data[name], days, indexed=name in indexed_keys)
+            for name in KEY_COLUMNS if name in data.columns
+        }
+        return cls(
+            days=days,
+            amount=data['Amount'].to_numpy(),
+            qty=data['Qty'].to_numpy(),
+            keys=keys,
+            texts=cls._text_columns(data)
+        )
+
+    def append(self, delta: "ColumnarStore", data: pd.DataFrame) -> Tuple["ColumnarStore", Dict[str, CodeMap]]:
+        """
+        Anexa un almacén de filas nuevas (construido aparte con from_dataframe).
+
+        Args:
+            delta: Almacén de las filas nuevas
+            data: DataFrame con todas las filas (las existentes y luego las nuevas)
+
+        Returns:
+            (almacén con todas las filas, {columna: CodeMap})
+
+        Raises:
+            ValueError: si los dos almacenes no tienen las mismas columnas de clave
+        """
+        if set(self.keys) != set(delta.keys) or set(self.text_names) != set(delta.text_names):
+            raise ValueError("Los archivos nuevos no tienen las mismas columnas que el datamart cargado")
+
+        keys, code_maps = {}, {}
+        for name, column in self.keys.items():
+            keys[name], code_maps[name] = column.append(delta.key(name), len(self))
+
+        store = ColumnarStore(
+            days=data['KeyDate'].to_numpy(),
+            amount=data['Amount'].to_numpy(),
+            qty=data['Qty'].to_numpy(),
+            keys=keys,
+            texts=self._text_columns(data)
+        )
+        return store, code_maps
+
+    @staticmethod
+    def _text_columns(data: pd.DataFrame) -> Dict[str, object]:
+        # .array evita materializar columnas Arrow (datamart compartido) como object
+        return {name: data[name].array for name in TEXT_COLUMNS if name in data.columns}
+
+    def __len__(self) -> int:
+        return len(self.days)
+
+    def key(self, name: str) -> KeyColumn:
+        return self.keys[name]
+
+    @property
+    def text_names(self) -> Tuple[str, ...]:
+        return tuple(self._texts)
+
+    def select(
+            self,
+            key_name: str,
+            key: str,
+            day_start: Optional[int] = None,
+            day_end: Optional[int] = None
+    ) -> np.ndarray:
+        """Filas de una clave en un rango de días (ordenadas por día)"""
+        column = self.keys[key_name]
+        rows = column.rows(column.code_of(key), day_start, day_end)
+
+        if not column.indexed and len(rows) > 0:
+            days = self.days[rows]
+            keep = np.ones(len(rows), dtype=bool)
+            if day_start is not None:
+                keep &= days >= day_start
+            if day_end is not None:
+                keep &= days <= day_end
+            rows = rows[keep]
+
+        return rows
+
+    def totals(self, rows: Optional[np.ndarray] = None) -> Tuple[Union[int, float], int, int]:
+        """
+        Suma de Amount, suma de Qty y conteo de filas.
+
+        Args:
+            rows: Posiciones de fila, o None para todo el datamart
+
+        Returns:
+            (suma Amount sin convertir, suma Qty, número de registros)
+        """
+        amount = self.amount if rows is None else self.amount[rows]
+        qty = self.qty if rows is None else self.qty[rows]
+
+        if np.issubdtype(amount.dtype, np.integer):
+            amount_sum = int(amount.sum())
+        else:
+            amount_sum = float(np.nansum(amount))
+
+        return amount_sum, int(qty.sum()), len(amount)
+
+    def return_totals(self, rows: Optional[np.ndarray] = None) -> Tuple[Union[int, float], int, int]:
+        """
+        Suma de Amount, suma de Qty y conteo de las devoluciones (filas con Amount negativo).
+
+        Args:
+            rows: Posiciones de fila, o None para todo el datamart
+
+        Returns:
+            (suma Amount sin convertir, suma Qty, número de devoluciones), sumas negativas
+        """
+        amount = self.amount if rows is None else self.amount[rows]
+        qty = self.qty if rows is None else self.qty[rows]
+        is_return = amount < 0
+
+        amount_sum = amount[is_return].sum()
+        amount_sum = int(amount_sum) if np.issubdtype(amount.dtype, np.integer) else float(amount_sum)
+        return amount_sum, int(qty[is_return].sum()), int(is_return.sum())
+
+    def text(self, name: str, rows: np.ndarray) -> np.ndarray:
+        """Valores de una columna de texto para las filas dadas"""
+        return np.asarray(self._texts[name].take(rows), dtype=object)
+
+    def text_codes(self, name: str) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Códigos por fila y valores únicos de una columna de texto.
+
+        No materializa un objeto por fila (en columnas Arrow se codifica en C).
+
+        Returns:
+            (códigos int64, -1 para nulos; valores únicos como object)
+        """
+        codes, uniques = pd.factorize(pd.Series(self._texts[name], copy=False))
+        return np.asarray(codes, dtype=np.int64), np.asarray(uniques, dtype=object)
+
+    def save(self, directory: Union[str, Path]) -> Path:
+        """
+        Guarda las claves codificadas como archivos .npy mapeables.
+
+        Las columnas numéricas y de texto no se guardan: en el datamart
+        compartido ya están en el archivo Arrow y se toman del DataFrame.
+        """
+        directory = Path(directory)
+        tmp_dir = directory.with_name(f".{directory.name}.{os.getpid()}.tmp")
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        tmp_dir.mkdir(parents=True)
+
+        for name, column in self.keys.items():
+            for part, array in column.arrays().items():
+                np.save(tmp_dir / f"{name}.{part}.npy", array, allow_pickle=False)
+
+        shutil.rmtree(directory, ignore_errors=True)
+        os.replace(tmp_dir, directory)
+        return directory
+
+    @classmethod
+    def load(cls, directory: Union[str, Path], data: pd.DataFrame) -> "ColumnarStore":
+        """
+        Mapea en memoria las claves guardadas con save (zero-copy).
+
+        Args:
+            directory: Carpeta creada por save
+            data: DataFrame con las columnas numéricas y de texto
+        """
+        directory = Path(directory)
+        keys = {}
+        for name in KEY_COLUMNS:
+            if not (directory / f"{name}.codes.npy").exists():
+                continue
+
+            def part(suffix):
+                path = directory / f"{name}.{suffix}.npy"
+                return np.load(path, mmap_mode='r') if path.exists() else None
+
+            keys[name] = KeyColumn(name, part("codes"), part("values"),
+                                   part("order"), part("offsets"), part("order_days"))
+
+        return cls(
+            days=data['KeyDate'].to_numpy(),
+            amount=data['Amount'].to_numpy(),
+            qty=data['Qty'].to_numpy(),
+            keys=keys,
+            texts=cls._text_columns(data)
+        )
@@ -0,0 +1,341 @@
+"""
+Matriz de co-ocurrencia de productos (canasta de mercado).
+
+"¿Qué se compra junto con el producto X?" es un self-join por ``TicketId``
+demasiado caro para hacerlo por petición. Aquí se construye una vez, en segundo
+plano, una matriz dispersa producto × producto con el número de tickets en que
+aparece cada par:
+
+1. Canastas: pares (ticket, producto) distintos a partir del índice de tickets
+   (las filas ya vienen agrupadas por ticket). Los tickets con más de
+   ``max_basket`` productos distintos se omiten: aportan pares cuadráticos y
+   casi nada de señal.
+2. Pares: dentro de cada ticket los productos quedan ordenados, así que el par
+   (i, i + d) cubre todos los pares a < b variando d. Se procesa por tramos de
+   tickets y cada tramo se reduce (ordenar + contar) antes de acumular, para no
+   materializar todos los pares a la vez.
+3. Servicio: la matriz se simetriza en formato CSR por producto con los socios
+   ordenados por conteo descendente, así que el top por conteo es un slice; el
+   top por lift se calcula sobre los socios de un solo producto.
+
+Métricas de un par (A, B) sobre N tickets:
+
+* support = tickets(A, B) / N
+* confidence = tickets(A, B) / tickets(A)
+* lift = tickets(A, B) · N / (tickets(A) · tickets(B))
+
+Los conteos son sumables: ``merge`` combina la matriz de un lote nuevo con la
+existente (por valor de producto, no por código) para actualizarla de forma
+incremental sin reconstruirla.
+"""
+import logging
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+
+import numpy as np
+
+from app.services.columnar import ColumnarStore, read_only
+from app.services.tickets import TicketIndex
+
+logger = logging.getLogger(__name__)
+
+# Pares que se generan por tramo antes de reducir
+_CHUNK_PAIRS = 20_000_000
+
+# Arreglos de la matriz que se guardan para los workers (ver CooccurrenceMatrix.save)
+COOCCURRENCE_PARTS = ("pair_keys", "pair_counts", "product_tickets", "partners", "partner_counts", "offsets")
+
+
+def basket_items(store: ColumnarStore, tickets: TicketIndex, max_basket: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Pares (ticket, producto) distintos, ordenados por ticket y producto.
+
+    Args:
+        store: Almacén con la columna KeyProduct
+        tickets: Índice de tickets del almacén
+        max_basket: Máximo de productos distintos de un ticket (los mayores se omiten)
+
+    Returns:
+        (código de ticket, código de producto) por par
+    """
+    products = store.key('KeyProduct')
+    lines = np.diff(tickets.offsets)
+    ticket_of = np.repeat(np.arange(tickets.n_tickets, dtype=np.int64), lines)
+    product_of = products.codes[tickets.order].astype(np.int64)
+
+    valid = product_of >= 0
+    keys = np.sort(ticket_of[valid] * products.n_keys + product_of[valid])
+    if len(keys) > 0:
+        keys = keys[np.r_[True, keys[1:] != keys[:-1]]]
+
+    ticket_of, product_of = keys // max(products.n_keys, 1), keys % max(products.n_keys, 1)
+
+    # Se omiten las canastas demasiado grandes
+    sizes = np.bincount(ticket_of, minlength=tickets.n_tickets)
+    keep = sizes[ticket_of] <= max_basket
+    return ticket_of[keep], product_of[keep]
+
+
+def _reduce_pairs(keys: np.ndarray, counts: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """Suma los conteos de claves de par repetidas (resultado ordenado por clave)"""
+    if len(keys) == 0:
+        return keys.astype(np.int64), np.zeros(0, dtype=np.int64)
+
+    order = np.argsort(keys, kind='stable')
+    keys = keys[order]
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    if counts is None:
+        reduced = np.diff(np.r_[starts, len(keys)]).astype(np.int64)
+    else:
+        reduced = np.add.reduceat(counts[order], starts)
+    return keys[starts], reduced
+
+
+def count_pairs(ticket_of: np.ndarray, product_of: np.ndarray, n_products: int,
+                chunk_pairs: int = _CHUNK_PAIRS) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Tickets en que aparece cada par de productos (a < b).
+
+    Args:
+        ticket_of: Código de ticket por par (ticket, producto), ordenado
+        product_of: Código de producto, ordenado dentro de cada ticket
+        n_products: Número de productos (para la clave a · n + b)
+        chunk_pairs: Pares generados por tramo antes de reducir
+
+    Returns:
+        (claves a · n + b ordenadas, conteos)
+    """
+    n_items = len(ticket_of)
+    if n_items == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+
+    starts = np.flatnonzero(np.r_[True, ticket_of[1:] != ticket_of[:-1]])
+    sizes = np.diff(np.r_[starts, n_items])
+    # Productos que quedan después de cada uno dentro de su ticket
+    remaining = np.repeat(starts + sizes, sizes) - np.arange(n_items) - 1
+
+    # Tramos de tickets completos con ~chunk_pairs pares cada uno
+    pairs_before = np.concatenate(([0], np.cumsum(remaining[starts] * (remaining[starts] + 1) // 2)))
+    boundaries = np.searchsorted(pairs_before, np.arange(0, pairs_before[-1] + chunk_pairs, chunk_pairs))
+    boundaries = np.unique(np.r_[boundaries.clip(0, len(starts)), len(starts)])
+
+    pair_keys = np.zeros(0, dtype=np.int64)
+    pair_counts = np.zeros(0, dtype=np.int64)
+    for first, last in zip(boundaries[:-1], boundaries[1:]):
+        lo = starts[first]
+        hi = starts[last] if last < len(starts) else n_items
+        items = np.arange(lo, hi)
+        # Ordenados por productos restantes: los que forman par a distancia d son un prefijo
+        items = items[np.argsort(-remaining[items], kind='stable')]
+        items_remaining = remaining[items]
+        if len(items) == 0 or items_remaining[0] == 0:
+            continue
+
+        chunk = []
+        for distance in range(1, int(items_remaining[0]) + 1):
+            paired = items[:int(np.searchsorted(-items_remaining, -distance, side='right'))]
+            chunk.append(product_of[paired] * n_products + product_of[paired + distance])
+
+        keys, counts = _reduce_pairs(np.concatenate(chunk))
+        pair_keys, pair_counts = _reduce_pairs(np.concatenate((pair_keys, keys)),
+                                               np.concatenate((pair_counts, counts)))
+
+    return pair_keys, pair_counts
+
+
+class CooccurrenceMatrix:
+    """Tickets por par de productos, con socios de cada producto ordenados por conteo"""
+
+    def __init__(
+            self,
+            products: np.ndarray,
+            pair_keys: np.ndarray,
+            pair_counts: np.ndarray,
+            product_tickets: np.ndarray,
+            n_tickets: int,
+            partners: Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]] = None
+    ):
+        # Valores de KeyProduct de los códigos usados en las claves de par
+        self.products = read_only(products)
+        self.pair_keys = read_only(pair_keys)
+        self.pair_counts = read_only(pair_counts)
+        self.product_tickets = read_only(product_tickets)
+        self.n_tickets = int(n_tickets)
+        if partners is not None:
+            # (socios, conteos, offsets) ya ordenados (mapeados desde la carpeta del almacén)
+            self.partners, self.partner_counts, self.offsets = (read_only(part) for part in partners)
+        else:
+            self._build_partners()
+
+    def _build_partners(self):
+        n_products = len(self.products)
+        first = self.pair_keys // max(n_products, 1)
+        second = self.pair_keys % max(n_products, 1)
+
+        # Simétrica: cada par aparece para sus dos productos
+        owner = np.concatenate((first, second))
+        partner = np.concatenate((second, first))
+        counts = np.concatenate((self.pair_counts, self.pair_counts))
+
+        order = np.lexsort((partner, -counts, owner))
+        self.partners = read_only(partner[order].astype(np.int32))
+        self.partner_counts = read_only(counts[order])
+        self.offsets = read_only(np.concatenate((
+            [0], np.cumsum(np.bincount(owner, minlength=n_products))
+        )).astype(np.int64))
+
+    @classmethod
+    def build(cls, store: ColumnarStore, tickets: TicketIndex, max_basket: int) -> "CooccurrenceMatrix":
+        """
+        Construye la matriz del almacén.
+
+        Args:
+            store: Almacén con la columna KeyProduct
+            tickets: Índice de tickets del almacén
+            max_basket: Máximo de productos distintos por ticket
+
+        Returns:
+            CooccurrenceMatrix
+        """
+        n_products = store.key('KeyProduct').n_keys
+        ticket_of, product_of = basket_items(store, tickets, max_basket)
+        pair_keys, pair_counts = count_pairs(ticket_of, product_of, n_products)
+        product_tickets = np.bincount(product_of, minlength=n_products).astype(np.int64)
+        n_tickets = len(np.flatnonzero(np.r_[True, ticket_of[1:] != ticket_of[:-1]])) if len(ticket_of) else 0
+        return cls(store.key('KeyProduct').values, pair_keys, pair_counts, product_tickets, n_tickets)
+
+    def save(self, directory: Union[str, Path]):
+        """
+        Guarda la matriz como archivos .npy mapeables en la carpeta del almacén.
+
+        Los productos no se guardan: son los valores de KeyProduct del almacén
+        guardado junto a la matriz.
+        """
+        directory = Path(directory)
+        for part in COOCCURRENCE_PARTS:
+            np.save(directory / f"KeyProduct.cooccurrence.{part}.npy", getattr(self, part), allow_pickle=False)
+        np.save(directory / "KeyProduct.cooccurrence.n_tickets.npy", np.array([self.n_tickets], dtype=np.int64),
+                allow_pickle=False)
+
+    @classmethod
+    def load(cls, directory: Union[str, Path], products: np.ndarray) -> Optional["CooccurrenceMatrix"]:
+        """
+        Mapea en memoria una matriz guardada con save, o None si no existe.
+
+        Args:
+            directory: Carpeta del almacén
+            products: Valores de KeyProduct del almacén mapeado
+        """
+        directory = Path(directory)
+        paths = {part: directory / f"KeyProduct.cooccurrence.{part}.npy"
+                 for part in COOCCURRENCE_PARTS + ("n_tickets",)}
+        if not all(path.exists() for path in paths.values()):
+            return None
+        arrays = {part: np.load(path, mmap_mode='r') for part, path in paths.items()}
+        return cls(products, arrays["pair_keys"], arrays["pair_counts"], arrays["product_tickets"],
+                   int(arrays["n_tickets"][0]),
+                   partners=(arrays["partners"], arrays["partner_counts"], arrays["offsets"]))
+
+    @property
+    def n_pairs(self) -> int:
+        return len(self.pair_keys)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(array.nbytes for array in (self.pair_keys, self.pair_counts, self.product_tickets,
+                                              self.partners, self.partner_counts, self.offsets))
+
+    def code_of(self, key: str) -> int:
+        """Código del producto en la matriz, o -1 si no existe"""
+        position = int(np.searchsorted(self.products, key))
+        if position < len(self.products) and self.products[position] == key:
+            return position
+        return -1
+
+    def merge(self, other: "CooccurrenceMatrix") -> "CooccurrenceMatrix":
+        """
+        Suma los conteos de otra matriz (por ejemplo, la de un lote de ventas nuevo).
+
+        Los códigos se reasignan sobre la unión de productos, así que las matrices
+        pueden venir de almacenes con productos distintos.
+        """
+        products = np.union1d(self.products, other.products)
+        n_products = len(products)
+
+        def remapped(matrix: "CooccurrenceMatrix"):
+            codes = np.searchsorted(products, matrix.products).astype(np.int64)
+            n_old = max(len(matrix.products), 1)
+            first = codes[matrix.pair_keys // n_old]
+            second = codes[matrix.pair_keys % n_old]
+            tickets = np.zeros(n_products, dtype=np.int64)
+            tickets[codes] = matrix.product_tickets
+            return first * n_products + second, tickets
+
+        keys, tickets = remapped(self)
+        other_keys, other_tickets = remapped(other)
+        pair_keys, pair_counts = _reduce_pairs(np.concatenate((keys, other_keys)),
+                                               np.concatenate((self.pair_counts, other.pair_counts)))
+        return CooccurrenceMatrix(products, pair_keys, pair_counts, tickets + other_tickets,
+                                  self.n_tickets + other.n_tickets)
+
+    def top(self, code: int, limit: int = 10, order_by: str = "count", min_count: int = 1) -> List[Dict]:
+        """
+        Productos comprados junto con un producto.
+
+        Args:
+            code: Código del producto en la matriz
+            limit: Máximo de productos retornados
+            order_by: "count" (tickets juntos) o "lift"
+            min_count: Mínimo de tickets juntos para considerar un par
+
+        Returns:
+            Lista de {product, tickets, support, confidence, lift}
+        """
+        if code < 0:
+            return []
+
+        lo, hi = int(self.offsets[code]), int(self.offsets[code + 1])
+        counts = self.partner_counts[lo:hi]
+        # Socios ordenados por conteo descendente: min_count recorta un sufijo
+        hi = lo + int(np.searchsorted(-counts, -min_count, side='right'))
+        partners = self.partners[lo:hi].astype(np.int64)
+        counts = self.partner_counts[lo:hi].astype(np.float64)
+
+        tickets_a = float(self.product_tickets[code])
+        lift = counts * self.n_tickets / (tickets_a * self.product_tickets[partners])
+        if order_by == "lift":
+            selected = np.lexsort((partners, -counts, -lift))[:limit]
+        else:
+            selected = np.arange(min(limit, len(partners)))
+
+        return [
+            {
+                "product": str(self.products[partners[i]]),
+                "tickets": int(counts[i]),
+                "support": float(counts[i] / self.n_tickets),
+                "confidence": float(counts[i] / tickets_a),
+                "lift": float(lift[i]),
+            }
+            for i in selected
+        ]
+
+
+def build_cooccurrence(store: ColumnarStore, tickets: Optional[TicketIndex],
+                       max_basket: int) -> Optional[CooccurrenceMatrix]:
+    """
+    Construye la matriz de co-ocurrencia y registra tiempo y memoria.
+
+    Returns:
+        CooccurrenceMatrix, o None si el datamart no tiene tickets o productos
+    """
+    if tickets is None or 'KeyProduct' not in store.keys:
+        return None
+
+    start = time.perf_counter()
+    matrix = CooccurrenceMatrix.build(store, tickets, max_basket)
+    logger.info(
+        f"Matriz de co-ocurrencia: {matrix.n_pairs:,} pares en {matrix.n_tickets:,} tickets, "
+        f"{matrix.nbytes / 1024 ** 2:,.1f} MB, {time.perf_counter() - start:.2f}s"
+    )
+    return matrix
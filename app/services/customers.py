@@ -0,0 +1,128 @@
+"""
+Dimensión de clientes.
+
+``KeyCustomer`` ya tiene en el almacén columnar su índice de filas ordenado por
+(cliente, día), así que el historial de un cliente es un slice y dos búsquedas
+binarias. No se construye un cubo diario por cliente: con millones de clientes
+casi cada (cliente, día) sería una celda y el cubo ocuparía casi lo mismo que
+el datamart. Los totales de un cliente se calculan desde sus filas, que son
+pocas.
+
+La excepción son los clientes anónimos de caja (ej. ``1|POS|``): pocas claves
+que concentran una fracción grande de las filas. Se agrupan por patrón
+(``ANONYMOUS_CUSTOMER_PATTERN``) y el grupo tiene su propio cubo diario de una
+sola entidad (una celda por día), así que se consulta como un cliente más sin
+índices adicionales.
+"""
+import logging
+import re
+import time
+from pathlib import Path
+from typing import Optional, Union
+
+import numpy as np
+
+from app.services.aggregates import DailyCube
+from app.services.columnar import ColumnarStore, KeyColumn, read_only
+from app.services.incremental import CodeMap
+from app.services.tickets import TicketIndex
+
+logger = logging.getLogger(__name__)
+
+CUSTOMER_COLUMN = 'KeyCustomer'
+
+# Nombre del cubo del grupo de anónimos (y prefijo de sus archivos en la carpeta del almacén)
+ANONYMOUS_GROUP_NAME = 'KeyCustomer.anonymous'
+
+
+def anonymous_codes(column: KeyColumn, pattern: str) -> np.ndarray:
+    """Códigos de las claves de cliente que cumplen el patrón de anónimos"""
+    regex = re.compile(pattern)
+    return np.array([code for code, value in enumerate(column.values) if regex.search(str(value))],
+                    dtype=np.int64)
+
+
+class CustomerGroup:
+    """Grupo de claves de cliente que se consulta como una sola entidad"""
+
+    def __init__(self, codes: np.ndarray, cube: DailyCube):
+        self.codes = read_only(codes)
+        # Cubo de una entidad: se consulta siempre con el código 0
+        self.cube = cube
+
+    @property
+    def n_customers(self) -> int:
+        return len(self.codes)
+
+    def merge(self, delta: "CustomerGroup", code_map: CodeMap) -> "CustomerGroup":
+        """
+        Suma el grupo de las filas nuevas (construido aparte) a este grupo.
+
+        Args:
+            delta: Grupo de las filas nuevas, con los códigos del delta
+            code_map: CodeMap de KeyCustomer (ColumnarStore.append)
+
+        Returns:
+            CustomerGroup con las claves y el cubo de los dos
+        """
+        codes = np.union1d(code_map.old[self.codes], code_map.delta[delta.codes]).astype(np.int64)
+        return CustomerGroup(codes, self.cube.merge(delta.cube, CodeMap.single()))
+
+    def save(self, directory: Union[str, Path]):
+        """Guarda las claves y el cubo del grupo como archivos .npy mapeables en la carpeta del almacén"""
+        directory = Path(directory)
+        np.save(directory / f"{ANONYMOUS_GROUP_NAME}.codes.npy", self.codes, allow_pickle=False)
+        self.cube.save(directory)
+
+    @classmethod
+    def load(cls, directory: Union[str, Path]) -> Optional["CustomerGroup"]:
+        """Mapea en memoria un grupo guardado con save, o None si no existe"""
+        path = Path(directory) / f"{ANONYMOUS_GROUP_NAME}.codes.npy"
+        cube = DailyCube.load(directory, ANONYMOUS_GROUP_NAME)
+        if not path.exists() or cube is None:
+            return None
+        return cls(np.load(path, mmap_mode='r'), cube)
+
+    def rows(self, store: ColumnarStore, day_start: Optional[int] = None,
+             day_end: Optional[int] = None) -> np.ndarray:
+        """Filas del grupo en un rango de días, ordenadas por día"""
+        column = store.key(CUSTOMER_COLUMN)
+        parts = [column.rows(int(code), day_start, day_end) for code in self.codes]
+        if not parts:
+            return np.empty(0, dtype=np.int64)
+
+        rows = np.concatenate(parts)
+        return rows[np.argsort(store.days[rows], kind='stable')]
+
+
+def build_anonymous_group(
+        store: ColumnarStore,
+        pattern: str,
+        tickets: Optional[TicketIndex] = None
+) -> Optional[CustomerGroup]:
+    """
+    Agrupa los clientes anónimos y construye su cubo diario.
+
+    Args:
+        store: Almacén con la columna KeyCustomer indexada
+        pattern: Expresión regular de las claves anónimas
+        tickets: (Opcional) Índice de tickets para contar tickets por día
+
+    Returns:
+        CustomerGroup, o None si el datamart no tiene KeyCustomer indexado
+    """
+    if CUSTOMER_COLUMN not in store.keys or not store.key(CUSTOMER_COLUMN).indexed:
+        return None
+
+    start = time.perf_counter()
+    column = store.key(CUSTOMER_COLUMN)
+    codes = anonymous_codes(column, pattern)
+    rows = np.concatenate([column.rows(int(code)) for code in codes]) if len(codes) else np.empty(0, dtype=np.int64)
+    ticket_heads = tickets.head_mask(len(store)) if tickets is not None else None
+
+    group = CustomerGroup(codes, DailyCube.from_rows(ANONYMOUS_GROUP_NAME, rows, store, ticket_heads))
+    logger.info(
+        f"Clientes anónimos: {group.n_customers} claves, {len(rows):,} registros, "
+        f"{group.cube.n_cells:,} celdas, {time.perf_counter() - start:.2f}s"
+    )
+    return group
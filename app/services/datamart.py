@@ -1,13 +1,54 @@
+import numpy as np
 import pandas as pd
-from datetime import date
-from typing import Dict, Optional
+import time
+from datetime import date, datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+import copy
 import logging
+import threading
 
 from app.config import settings
-from app.models.schemas import SaleRecord
+from app.models.schemas import SaleRecord, AggregationQuery
+from app.services.shared_datamart import attach_shared_datamart, store_dir_for
+from app.services.columnar import ColumnarStore
+from app.services.aggregates import DailyCube, build_daily_cubes, load_daily_cubes, merge_daily_cubes
+from app.services.bitmaps import (BitmapIndex, FILTER_COLUMNS, build_bitmap_indexes, load_bitmap_indexes,
+                                  merge_bitmap_indexes, select_rows)
+from app.services.incremental import new_files
+from app.services.query_plan import compile_query
+from app.services.statistics import KeyStatistics, build_key_statistics, load_key_statistics, merge_key_statistics
+from app.services.sketches import (DistinctSketch, build_distinct_sketches, count_distinct, count_exact,
+                                   load_distinct_sketches, merge_distinct_sketches, range_rows)
+from app.services.tickets import TicketIndex, build_ticket_index
+from app.services.cooccurrence import CooccurrenceMatrix, build_cooccurrence
+from app.services.customers import CustomerGroup, build_anonymous_group
+from app.services.segments import (CURRENCY_COLUMN, DIVISION_COLUMN, SegmentSet, build_segments, merge_segments,
+                                   sum_totals, sum_range_totals, sum_ticket_counts, sum_returns, sum_range_returns)
+from app.services.quantiles import (QUANTILE_RELATIVE_ACCURACY, QuantileSketch, build_quantile_sketches,
+                                    distribution_counts, histogram_from_counts, load_quantile_sketches,
+                                    merge_quantile_sketches, quantiles_from_counts, rows_counts)
+from app.services.series import SERIES_WINDOWS, dense_daily, rolling_sum, series_start, year_to_date
+from app.services.sql_engine import SqlEngine
+from app.services.views import ViewRegistry
+from app.services.pivots import (PivotMatrix, build_pivot_matrices, load_pivot_matrices, merge_pivot_matrices,
+                                 pivot_table)
+from app.services.sampling import (CONFIDENCE_LEVEL, STRATUM_DIMENSION, SampleEstimate, StratifiedSample,
+                                   build_sample)
 from app.models.responses import (EmployeeSalesResponse, ProductSalesResponse, StoreSalesResponse,
-                                  EmployeeSummaryResponse, ProductSummaryResponse, StoreSummaryResponse)
-from app.utils.exceptions import InvalidDateRangeError
+                                  EmployeeSummaryResponse, ProductSummaryResponse, StoreSummaryResponse,
+                                  SalesQueryResponse, AggregationQueryResponse, AmountDistributionResponse,
+                                  HistogramBin, TicketResponse, CoPurchaseResponse, CoPurchasedProduct,
+                                  CustomerSalesResponse, CustomerSummaryResponse, PeriodComparisonResponse,
+                                  PeriodTotals, PeriodChange, SalesSeriesResponse, SeriesPoint, ReturnsBreakdown,
+                                  ViewInfo, ViewRegistryResponse, ViewQueryResponse, PivotResponse,
+                                  RefreshResponse, KeyListResponse, KeyEntry, ConfidenceInterval)
+from app.utils.exceptions import (InvalidDateRangeError, DatamartNotReadyError, TicketNotFoundError,
+                                  CooccurrenceNotReadyError, MixedCurrencyError, PivotNotFoundError,
+                                  KeyNotFoundError)
+from app.utils.money import to_minor_units, from_minor_units
+from app.utils.dates import (to_day_number, from_day_number, day_numbers_from_dates, dates_from_day_numbers,
+                             previous_period, shift_years, MISSING_DAY)
 
 logging.basicConfig(
     level=logging.INFO,
@@ -16,83 +57,786 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
-def _create_detail_list(filtered) -> list:
+def _create_detail_list(store: ColumnarStore, rows: np.ndarray, amount_decimals: Optional[int] = None) -> list:
+    # Se extraen las columnas de las filas pedidas una sola vez (vectorizado)
+    days = store.days[rows]
+    amounts = store.amount[rows]
+    quantities = store.qty[rows]
+    tickets = store.text('TicketId', rows)
+    products = store.key('KeyProduct').decode(store.key('KeyProduct').codes[rows])
+    stores = store.key('KeyStore').decode(store.key('KeyStore').codes[rows])
+
     sales_list = []
-    for _, row in filtered.iterrows():
+    for day, amount, quantity, ticket_id, product, key_store in zip(days, amounts, quantities,
+                                                                     tickets, products, stores):
         sales_list.append(SaleRecord(
-            date=row['KeyDate'].date(),
-            amount=float(row['Amount']),
-            quantity=int(row['Qty']),
-            ticket_id=str(row['TicketId']),
-            product=str(row['KeyProduct']),
-            store=str(row['KeyStore'])
+            date=from_day_number(day),
+            amount=from_minor_units(amount, amount_decimals),
+            quantity=int(quantity),
+            ticket_id=str(ticket_id),
+            product=str(product),
+            store=str(key_store)
         ))
     return sales_list
 
-def _get_total_details(filtered) -> tuple:
-    total_amount = float(filtered['Amount'].sum())
-    total_quantity = int(filtered['Qty'].sum())
-    records_count = len(filtered)
+def _get_total_details(cube: DailyCube, code: Optional[int] = None, day_start: Optional[int] = None,
+                       day_end: Optional[int] = None, amount_decimals: Optional[int] = None) -> tuple:
+    # Totales desde el cubo diario; en punto fijo la suma es entera y se convierte al final
+    amount_sum, total_quantity, records_count = cube.totals(code, day_start, day_end)
+    total_amount = from_minor_units(amount_sum, amount_decimals)
+
+    return total_amount, total_quantity, records_count
+
+def _get_scoped_details(cubes: List[DailyCube], code: Optional[int] = None, day_start: Optional[int] = None,
+                        day_end: Optional[int] = None, amount_decimals: Optional[int] = None) -> tuple:
+    # Totales sumando los cubos de los segmentos del alcance (todos en la misma moneda)
+    amount_sum, total_quantity, records_count = sum_totals(cubes, code, day_start, day_end)
+    total_amount = from_minor_units(amount_sum, amount_decimals)
 
     return total_amount, total_quantity, records_count
 
+def _basket_metrics(cubes: List[DailyCube], code: Optional[int], day_start: Optional[int], day_end: Optional[int],
+                    total_amount: float, total_quantity: int) -> Dict[str, Optional[float]]:
+    # Tickets del periodo desde los cubos (por su fila cabeza); None si algún cubo no cuenta tickets
+    return _basket_values(sum_ticket_counts(cubes, code, day_start, day_end), total_amount, total_quantity)
+
+def _basket_values(tickets_count: Optional[int], total_amount: float, total_quantity: int) -> Dict[str, Optional[float]]:
+    if not tickets_count:
+        return {"tickets_count": tickets_count, "average_ticket_value": None, "average_items_per_ticket": None}
+
+    return {
+        "tickets_count": tickets_count,
+        "average_ticket_value": round(total_amount / tickets_count, 2),
+        "average_items_per_ticket": round(total_quantity / tickets_count, 2),
+    }
+
+def _returns_metrics(cubes: List[DailyCube], code: Optional[int], day_start: Optional[int], day_end: Optional[int],
+                     total_amount: float, total_quantity: int, records_count: int,
+                     amount_decimals: Optional[int] = None) -> Optional[ReturnsBreakdown]:
+    # Devoluciones del periodo desde las partes precalculadas de los cubos; None si algún cubo no las tiene
+    return _returns_values(sum_returns(cubes, code, day_start, day_end), total_amount, total_quantity,
+                           records_count, amount_decimals)
+
+def _returns_values(returns: Optional[tuple], total_amount: float, total_quantity: int, records_count: int,
+                    amount_decimals: Optional[int] = None) -> Optional[ReturnsBreakdown]:
+    if returns is None:
+        return None
+
+    return_amount, return_quantity, returns_count = returns
+    returns_amount = -from_minor_units(return_amount, amount_decimals)
+    gross_amount = total_amount + returns_amount
+    gross_quantity = total_quantity - return_quantity
+
+    return ReturnsBreakdown(
+        gross_amount=round(gross_amount, 2),
+        returns_amount=round(returns_amount, 2),
+        net_amount=round(total_amount, 2),
+        gross_quantity=gross_quantity,
+        returns_quantity=-return_quantity,
+        net_quantity=total_quantity,
+        sales_count=records_count - returns_count,
+        returns_count=returns_count,
+        return_rate=round(returns_amount / gross_amount * 100, 2) if gross_amount else None,
+        quantity_return_rate=round(-return_quantity / gross_quantity * 100, 2) if gross_quantity else None
+    )
+
+def _percent_change(current: float, other: float) -> Optional[float]:
+    return round((current - other) / abs(other) * 100, 2) if other else None
+
+def _period_change(current: PeriodTotals, other: PeriodTotals) -> PeriodChange:
+    return PeriodChange(
+        amount=round(current.total_amount - other.total_amount, 2),
+        amount_pct=_percent_change(current.total_amount, other.total_amount),
+        quantity=current.total_quantity - other.total_quantity,
+        quantity_pct=_percent_change(current.total_quantity, other.total_quantity),
+        records=current.records_count - other.records_count,
+        records_pct=_percent_change(current.records_count, other.records_count)
+    )
+
+class LoadProgress:
+    """Progreso de la carga del datamart (expuesto en /ready)"""
+
+    PENDING = "pending"
+    LOADING = "loading"
+    READY = "ready"
+    ERROR = "error"
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.status = self.PENDING
+        self.files_total = 0
+        self.files_loaded = 0
+        self.rows_loaded = 0
+        self.error: Optional[str] = None
+        self.started_at: Optional[datetime] = None
+        self.finished_at: Optional[datetime] = None
+
+    def start(self, files_total: int = 0):
+        with self._lock:
+            self.status = self.LOADING
+            self.files_total = files_total
+            self.files_loaded = 0
+            self.rows_loaded = 0
+            self.error = None
+            self.started_at = datetime.now(timezone.utc)
+            self.finished_at = None
+
+    def file_loaded(self, rows: int):
+        with self._lock:
+            self.files_loaded += 1
+            self.rows_loaded += rows
+
+    def finish(self, rows_total: int):
+        with self._lock:
+            self.status = self.READY
+            self.rows_loaded = rows_total
+            self.finished_at = datetime.now(timezone.utc)
+
+    def files_appended(self, files: int, rows: int):
+        """Registra archivos anexados por una carga incremental"""
+        with self._lock:
+            self.files_total += files
+            self.files_loaded += files
+            self.rows_loaded += rows
+            self.finished_at = datetime.now(timezone.utc)
+
+    def copy(self) -> "LoadProgress":
+        """Copia independiente del progreso (para el servicio que arma una recarga)"""
+        progress = LoadProgress()
+        with self._lock:
+            for name in ("status", "files_total", "files_loaded", "rows_loaded", "error", "started_at", "finished_at"):
+                setattr(progress, name, getattr(self, name))
+        return progress
+
+    def fail(self, error: Exception):
+        with self._lock:
+            self.status = self.ERROR
+            self.error = str(error)
+            self.finished_at = datetime.now(timezone.utc)
+
+    @property
+    def is_ready(self) -> bool:
+        return self.status == self.READY
+
+    def as_dict(self) -> Dict:
+        with self._lock:
+            return {
+                "status": self.status,
+                "files_total": self.files_total,
+                "files_loaded": self.files_loaded,
+                "rows_loaded": self.rows_loaded,
+                "error": self.error,
+                "started_at": self.started_at.isoformat() if self.started_at else None,
+                "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+            }
+
+def _file_mtimes(files: List[Path]) -> Dict[str, float]:
+    """Fecha de modificación de cada archivo {ruta: mtime}"""
+    return {str(file): Path(file).stat().st_mtime for file in files}
+
+def read_datamart_frame(progress: Optional[LoadProgress] = None, files: Optional[List[Path]] = None) -> pd.DataFrame:
+    """
+    Lee los archivos parquet del datamart y normaliza los tipos de columna.
+
+    Args:
+        progress: (Opcional) Objeto donde reportar archivos y registros leídos
+        files: (Opcional) Archivos a leer; por defecto todos los de DATAMART_PATH
+
+    Returns:
+        DataFrame con KeyDate como número de día (int32), Amount como float (o int64 en
+        unidades menores con AMOUNT_FIXED_POINT) y Qty como int
+    """
+    parquet_files = settings.get_parquet_files() if files is None else files
+    logger.info(f"Encontrados {len(parquet_files)} archivos parquet")
+
+    if progress is not None:
+        progress.start(files_total=len(parquet_files))
+
+    # Leer todos los archivos parquet
+    dataframes = []
+    for file in parquet_files:
+        logger.info(f"Leyendo: {file.name}")
+        df = pd.read_parquet(file)
+        dataframes.append(df)
+        logger.info(f"{len(df)} registros cargados")
+
+        if progress is not None:
+            progress.file_loaded(len(df))
+
+    # Concatenar todos los DataFrames
+    data = pd.concat(dataframes, ignore_index=True)
+
+    # Procesando columnas importantes
+    logger.info("Procesando datos...")
+
+    # Convertir fecha a número de día (int32 desde 1970-01-01)
+    data['KeyDate'] = day_numbers_from_dates(data['KeyDate'])
+
+    # Convertir Amount a float, o a int64 en unidades menores si se usa punto fijo
+    if settings.AMOUNT_FIXED_POINT:
+        data['Amount'] = to_minor_units(data['Amount'], settings.AMOUNT_DECIMALS)
+    else:
+        data['Amount'] = pd.to_numeric(data['Amount'], errors='coerce')
+
+    # Convertir Qty a int
+    data['Qty'] = pd.to_numeric(data['Qty'], errors='coerce').fillna(0).astype(int)
+
+    return data
+
 class DatamartService:
     """Servicio para operaciones sobre el datamart"""
 
-    def __init__(self):
+    def __init__(self, progress: Optional[LoadProgress] = None):
         self.data: Optional[pd.DataFrame] = None
+        # Almacén columnar usado por las consultas (el DataFrame queda por compatibilidad)
+        self.store: Optional[ColumnarStore] = None
+        # Cubos diarios (entidad × día) por dimensión para totales y resúmenes
+        self.cubes: Dict[str, DailyCube] = {}
+        # Segmentos (división, moneda) con sus propios cubos diarios
+        self.segments: Optional[SegmentSet] = None
+        # Filas y agregados por ticket con búsqueda O(1) por TicketId
+        self.tickets: Optional[TicketIndex] = None
+        # Índices de bitmaps por dimensión para combinar filtros
+        self.bitmaps: Dict[str, BitmapIndex] = {}
+        # Filas por (clave, mes) para elegir entre índice y recorrido secuencial
+        self.statistics: Dict[str, KeyStatistics] = {}
+        # HyperLogLog por (entidad, mes) para tickets, clientes y productos distintos
+        self.sketches: Dict[str, Dict[str, DistinctSketch]] = {}
+        # Sketches de cuantiles por (entidad, mes) de Amount y del valor del ticket
+        self.quantiles: Dict[str, Dict[str, QuantileSketch]] = {}
+        # Matrices dispersas (fila, mes, columna) para pivotes tienda × producto y empleado × tienda
+        self.pivots: Dict[str, PivotMatrix] = {}
+        # Muestra estratificada por (tienda, mes) para resúmenes y series aproximados
+        self.sample: Optional[StratifiedSample] = None
+        # Decimales de Amount si está en punto fijo (int64), None si es float
+        self.amount_decimals: Optional[int] = None
+        # Primer y último día del datamart (números de día) para indexar por día
+        self.first_day: Optional[int] = None
+        self.last_day: Optional[int] = None
+        self.progress = progress if progress is not None else LoadProgress()
+        # Clientes anónimos de caja agrupados como una sola entidad (con su cubo diario)
+        self.anonymous_customers: Optional[CustomerGroup] = None
+        # Co-ocurrencia de productos por ticket, construida en segundo plano tras la carga
+        self.cooccurrence: Optional[CooccurrenceMatrix] = None
+        self.cooccurrence_status = "pending"
+        self._cooccurrence_thread: Optional[threading.Thread] = None
+        # Vistas materializadas declaradas en MATERIALIZED_VIEWS (construidas al final de la carga)
+        self.views: Optional[ViewRegistry] = None
+        # Archivos parquet cargados {ruta: mtime}, para detectar archivos nuevos al recargar
+        self.loaded_files: Dict[str, float] = {}
+        # Motor SQL de solo lectura, creado en la primera consulta SQL
+        self._sql_engine: Optional[SqlEngine] = None
+        self._sql_lock = threading.Lock()
         self._load_data()
 
     def _load_data(self):
-        """Carga todos los archivos parquet de la carpeta"""
-        try:
-            parquet_files = settings.get_parquet_files()
-            logger.info(f"Encontrados {len(parquet_files)} archivos parquet")
-
-            # Leer todos los archivos parquet
-            dataframes = []
-            for file in parquet_files:
-                logger.info(f"Leyendo: {file.name}")
-                df = pd.read_parquet(file)
-                dataframes.append(df)
-                logger.info(f"{len(df)} registros cargados")
-
-            # Concatenar todos los DataFrames
-            self.data = pd.concat(dataframes, ignore_index=True)
-
-            # Procesando columnas importantes
-            logger.info("Procesando datos...")
+        """
+        Carga el datamart.
 
-            # Convertir fecha
-            self.data['KeyDate'] = pd.to_datetime(self.data['KeyDate'])
+        Si SHARED_DATAMART_PATH apunta a un datamart exportado por el launcher,
+        se mapea en memoria (compartido entre workers); si no, se leen los
+        archivos parquet de la carpeta.
+        """
+        try:
+            # Las declaraciones se validan antes de leer los datos: un error de configuración falla rápido
+            self.views = ViewRegistry.from_settings(settings.get_view_definitions())
+            shared_path = Path(settings.SHARED_DATAMART_PATH) if settings.SHARED_DATAMART_PATH else None
+
+            if shared_path is not None and shared_path.exists():
+                logger.info(f"Usando datamart compartido: {shared_path}")
+                self.progress.start(files_total=1)
+                self.data = attach_shared_datamart(shared_path)
+                self.progress.file_loaded(len(self.data))
+                self.loaded_files = {}
+            else:
+                # Las fechas de modificación se toman antes de leer: un archivo que cambie
+                # durante la lectura se detecta en la siguiente recarga
+                parquet_files = settings.get_parquet_files()
+                loaded_files = _file_mtimes(parquet_files)
+                self.data = read_datamart_frame(self.progress, parquet_files)
+                self.loaded_files = loaded_files
+
+            store_start = time.perf_counter()
+            # Las estructuras que el launcher guardó (save_shared_structures) se mapean
+            # en lugar de reconstruirse en cada worker
+            tickets, cubes, segments, sketches, quantiles, pivots, sample = None, {}, None, {}, {}, {}, None
+            anonymous_customers, bitmaps, statistics, cooccurrence = None, {}, {}, None
+            shared_store_dir = store_dir_for(shared_path) if shared_path is not None else None
+            if shared_store_dir is not None and shared_store_dir.exists():
+                self.store = ColumnarStore.load(shared_store_dir, self.data)
+                tickets = TicketIndex.load(shared_store_dir)
+                cubes = load_daily_cubes(shared_store_dir)
+                segments = SegmentSet.load(shared_store_dir, cubes) if cubes else None
+                anonymous_customers = CustomerGroup.load(shared_store_dir)
+                bitmaps = load_bitmap_indexes(shared_store_dir, self.store)
+                statistics = load_key_statistics(shared_store_dir, len(self.store))
+                sketches = load_distinct_sketches(shared_store_dir)
+                quantiles = load_quantile_sketches(shared_store_dir)
+                pivots = load_pivot_matrices(shared_store_dir)
+                sample = StratifiedSample.load(shared_store_dir)
+                if 'KeyProduct' in self.store.keys:
+                    cooccurrence = CooccurrenceMatrix.load(shared_store_dir, self.store.key('KeyProduct').values)
+            else:
+                shared_store_dir = None
+                self.store = ColumnarStore.from_dataframe(self.data)
+            logger.info(f"Almacén columnar listo en {time.perf_counter() - store_start:.2f}s")
+
+            self.tickets = tickets if tickets is not None else build_ticket_index(self.store)
+            self.cubes = cubes if cubes else build_daily_cubes(self.store, tickets=self.tickets)
+            self.segments = segments if segments is not None else build_segments(self.store, self.cubes, self.tickets)
+            self.anonymous_customers = anonymous_customers if anonymous_customers is not None else \
+                build_anonymous_group(self.store, settings.ANONYMOUS_CUSTOMER_PATTERN, self.tickets)
+            self.bitmaps = bitmaps if bitmaps else build_bitmap_indexes(self.store)
+            self.statistics = statistics if statistics else build_key_statistics(self.store)
+            self.sketches = sketches if sketches else build_distinct_sketches(self.store)
+
+            if pd.api.types.is_integer_dtype(self.data['Amount']):
+                self.amount_decimals = settings.AMOUNT_DECIMALS
+                logger.info(f"Amount en punto fijo ({self.amount_decimals} decimales)")
+
+            self.quantiles = quantiles if quantiles else build_quantile_sketches(self.store, self.amount_decimals)
+            self.pivots = pivots if pivots else build_pivot_matrices(self.store)
+            self.sample = sample if sample is not None else build_sample(
+                self.store, settings.APPROX_SAMPLE_FRACTION, settings.APPROX_MIN_STRATUM_ROWS
+            )
+            self.views.refresh(self.store, self.tickets, shared_store_dir)
+            # En una recarga completa el motor SQL se crea de nuevo sobre el DataFrame nuevo
+            self._sql_engine = None
 
-            # Convertir Amount a float
-            self.data['Amount'] = pd.to_numeric(self.data['Amount'], errors='coerce')
+            self.progress.finish(len(self.data))
 
-            # Convertir Qty a int
-            self.data['Qty'] = pd.to_numeric(self.data['Qty'], errors='coerce').fillna(0).astype(int)
+            valid_days = self.data['KeyDate'][self.data['KeyDate'] != MISSING_DAY]
+            if len(valid_days) > 0:
+                self.first_day = int(valid_days.min())
+                self.last_day = int(valid_days.max())
 
             logger.info(f"Datamart cargado exitosamente")
             logger.info(f"Total registros: {len(self.data):,}")
-            logger.info(f"Rango de fechas: {self.data['KeyDate'].min()} a {self.data['KeyDate'].max()}")
+            if self.first_day is not None:
+                logger.info(f"Rango de fechas: {from_day_number(self.first_day)} a {from_day_number(self.last_day)}")
 
             # Mostrar algunas estadísticas
-            logger.info(f"Empleados únicos: {self.data['KeyEmployee'].nunique()}")
-            logger.info(f"Productos únicos: {self.data['KeyProduct'].nunique()}")
-            logger.info(f"Tiendas únicas: {self.data['KeyStore'].nunique()}")
+            logger.info(f"Empleados únicos: {self.store.key('KeyEmployee').n_keys}")
+            logger.info(f"Productos únicos: {self.store.key('KeyProduct').n_keys}")
+            logger.info(f"Tiendas únicas: {self.store.key('KeyStore').n_keys}")
+
+            if cooccurrence is not None and settings.COOCCURRENCE_ENABLED:
+                # Matriz construida por el launcher: no hace falta el trabajo en segundo plano
+                self.cooccurrence = cooccurrence
+                self.cooccurrence_status = "ready"
+            else:
+                self.start_cooccurrence_job()
 
         except FileNotFoundError as e:
             logger.error(f"Error: {e}")
+            self.progress.fail(e)
             raise
         except Exception as e:
             logger.error(f"Error inesperado al cargar datamart: {e}")
+            self.progress.fail(e)
             raise Exception(f"Error al cargar datamart: {e}")
 
+    def refresh(self) -> Tuple["DatamartService", RefreshResponse]:
+        """
+        Construye el datamart actualizado si cambiaron los archivos de DATAMART_PATH.
+
+        Si solo aparecieron archivos nuevos (el datamart es de solo anexado) se
+        leen solo esos, se construyen las estructuras de sus filas y se mezclan
+        con las existentes (ver ``app.services.incremental``). Si un archivo
+        cargado cambió o se borró, o las filas nuevas no se pueden anexar
+        (columnas distintas, tickets repartidos entre archivos), se hace una
+        carga completa en un servicio nuevo.
+
+        El servicio actual no se modifica: las consultas en curso siguen viendo
+        la carga anterior completa y, si la recarga falla, queda intacto. El
+        servicio nuevo reporta en su propio LoadProgress, así que /ready sigue
+        respondiendo 200 durante la recarga y después de una recarga fallida.
+        El reemplazo lo hace ``refresh_datamart_service`` en una sola asignación.
+
+        Returns:
+            Tupla (servicio con la carga nueva, RefreshResponse con el modo y las filas anexadas);
+            sin cambios el servicio es el mismo
+
+        Raises:
+            ValueError: si el datamart está mapeado desde SHARED_DATAMART_PATH
+        """
+        if settings.SHARED_DATAMART_PATH and Path(settings.SHARED_DATAMART_PATH).exists():
+            raise ValueError("La recarga no está disponible con un datamart compartido (SHARED_DATAMART_PATH)")
+
+        start = time.perf_counter()
+        rows_before = len(self.data)
+        current = _file_mtimes(settings.get_parquet_files())
+        added = new_files(self.loaded_files, current)
+
+        if added is None:
+            logger.info("Archivos del datamart modificados o borrados: carga completa")
+            mode, files_added = "full", len(current)
+            service = DatamartService(progress=LoadProgress())
+        elif not added:
+            mode, files_added, service = "unchanged", 0, self
+        else:
+            files_added = len(added)
+            try:
+                service = self._append_files([Path(path) for path in added], current)
+                mode = "incremental"
+            except ValueError as e:
+                logger.warning(f"No se pueden anexar los archivos nuevos ({e}): carga completa")
+                mode = "full"
+                service = DatamartService(progress=LoadProgress())
+
+        seconds = time.perf_counter() - start
+        logger.info(f"Recarga del datamart ({mode}): {files_added} archivos, {seconds:.2f}s")
+        return service, RefreshResponse(
+            mode=mode,
+            files_added=files_added,
+            rows_added=len(service.data) - rows_before if mode == "incremental" else 0,
+            total_rows=len(service.data),
+            seconds=round(seconds, 3)
+        )
+
+    def _append_files(self, files: List[Path], current: Dict[str, float]) -> "DatamartService":
+        """
+        Anexa archivos nuevos: construye las estructuras de sus filas y las mezcla con las existentes.
+
+        El resultado es una copia del servicio con todas las estructuras nuevas;
+        el servicio actual no se modifica, así que las consultas en curso ven la
+        carga anterior o la nueva, no una mezcla.
+
+        Returns:
+            Servicio con las filas anexadas
+
+        Raises:
+            ValueError: si las filas nuevas no se pueden anexar (se hace una carga completa)
+        """
+        delta_data = read_datamart_frame(files=files)
+        if pd.api.types.is_integer_dtype(delta_data['Amount']) != (self.amount_decimals is not None):
+            raise ValueError("Amount de los archivos nuevos no tiene el mismo tipo que el datamart")
+
+        n_rows = len(self.store)
+        data = pd.concat([self.data, delta_data], ignore_index=True)
+        delta = ColumnarStore.from_dataframe(delta_data)
+        store, code_maps = self.store.append(delta, data)
+
+        delta_tickets = build_ticket_index(delta)
+        if (self.tickets is None) != (delta_tickets is None):
+            raise ValueError("Los archivos nuevos no tienen las mismas columnas que el datamart cargado")
+        tickets = self.tickets.append(delta_tickets, n_rows) if self.tickets is not None else None
+
+        delta_cubes = build_daily_cubes(delta, tickets=delta_tickets)
+        cubes = merge_daily_cubes(self.cubes, delta_cubes, code_maps)
+        try:
+            segments = merge_segments(self.segments, build_segments(delta, delta_cubes, delta_tickets),
+                                      cubes, code_maps)
+        except ValueError as e:
+            logger.info(f"Segmentos reconstruidos: {e}")
+            segments = build_segments(store, cubes, tickets)
+
+        anonymous_customers = None
+        if self.anonymous_customers is not None:
+            anonymous_customers = self.anonymous_customers.merge(
+                build_anonymous_group(delta, settings.ANONYMOUS_CUSTOMER_PATTERN, delta_tickets),
+                code_maps['KeyCustomer']
+            )
+
+        service = copy.copy(self)
+        service.store, service.tickets, service.cubes, service.segments = store, tickets, cubes, segments
+        service.anonymous_customers = anonymous_customers
+        service.bitmaps = merge_bitmap_indexes(self.bitmaps, store, delta, code_maps)
+        service.statistics = merge_key_statistics(self.statistics, build_key_statistics(delta), code_maps)
+        service.sketches = merge_distinct_sketches(self.sketches, build_distinct_sketches(delta), code_maps)
+        service.quantiles = merge_quantile_sketches(
+            self.quantiles, build_quantile_sketches(delta, self.amount_decimals), code_maps
+        )
+        service.pivots = merge_pivot_matrices(self.pivots, build_pivot_matrices(delta), code_maps)
+        service.sample = self.sample.merge(
+            StratifiedSample.build(delta, self.sample.fraction, self.sample.min_rows, row_offset=n_rows),
+            code_maps[STRATUM_DIMENSION]
+        ) if self.sample is not None else None
+        # El registro se copia: las vistas del servicio actual no cambian
+        service.views = copy.copy(self.views)
+        service.views.append(store, delta, code_maps, tickets, delta_tickets)
+        service.data = data
+        service.loaded_files = {path: current[path] for path in list(self.loaded_files) + [str(f) for f in files]}
+        # El motor SQL se crea de nuevo sobre el DataFrame con las filas anexadas
+        service._sql_engine = None
+        service._sql_lock = threading.Lock()
+
+        valid_days = delta_data['KeyDate'][delta_data['KeyDate'] != MISSING_DAY]
+        if len(valid_days) > 0:
+            first_day, last_day = int(valid_days.min()), int(valid_days.max())
+            service.first_day = first_day if self.first_day is None else min(self.first_day, first_day)
+            service.last_day = last_day if self.last_day is None else max(self.last_day, last_day)
+
+        service.progress = self.progress.copy()
+        service.progress.files_appended(len(files), len(delta_data))
+        logger.info(f"Archivos anexados: {len(files)}, {len(delta_data):,} registros (total {len(data):,})")
+
+        service.start_cooccurrence_job(delta=(delta, delta_tickets), base=self)
+        return service
+
+    def start_cooccurrence_job(
+            self,
+            delta: Optional[Tuple[ColumnarStore, TicketIndex]] = None,
+            base: Optional["DatamartService"] = None
+    ) -> Optional[threading.Thread]:
+        """
+        Construye la matriz de co-ocurrencia de productos en un hilo en segundo plano.
+
+        Mientras se construye, las consultas de productos comprados juntos
+        responden 503; el resto del API ya está disponible. En una carga
+        incremental (delta) solo se construye la matriz de las filas nuevas y
+        se suma a la existente (``CooccurrenceMatrix.merge``); la matriz
+        anterior sigue respondiendo mientras tanto.
+
+        Args:
+            delta: (Opcional) Almacén e índice de tickets de las filas anexadas
+            base: (Opcional) Servicio de la carga anterior, dueño de la matriz a la que se suma el delta
+
+        Returns:
+            Hilo de construcción, o None si está deshabilitada (COOCCURRENCE_ENABLED)
+        """
+        if not settings.COOCCURRENCE_ENABLED:
+            self.cooccurrence_status = "disabled"
+            return None
+
+        base = base if base is not None else self
+        previous = base._cooccurrence_thread
+        if delta is None or base.cooccurrence is None:
+            self.cooccurrence_status = "building"
+        self._cooccurrence_thread = threading.Thread(
+            target=self._build_cooccurrence, args=(delta, previous, base), name="cooccurrence-builder", daemon=True
+        )
+        self._cooccurrence_thread.start()
+        return self._cooccurrence_thread
+
+    def _build_cooccurrence(
+            self,
+            delta: Optional[Tuple[ColumnarStore, TicketIndex]] = None,
+            previous: Optional[threading.Thread] = None,
+            base: Optional["DatamartService"] = None
+    ):
+        try:
+            base = base if base is not None else self
+            if previous is not None and delta is not None:
+                # La matriz de las filas nuevas se suma a la de la construcción anterior
+                previous.join()
+
+            if delta is not None and base.cooccurrence is not None:
+                added = build_cooccurrence(delta[0], delta[1], settings.COOCCURRENCE_MAX_BASKET)
+                matrix = base.cooccurrence.merge(added) if added is not None else base.cooccurrence
+            else:
+                matrix = build_cooccurrence(self.store, self.tickets, settings.COOCCURRENCE_MAX_BASKET)
+            if matrix is None:
+                raise ValueError("El datamart no tiene TicketId o KeyProduct")
+            # Si ya existía una matriz (recarga), se reemplaza de una sola vez
+            self.cooccurrence = matrix
+            self.cooccurrence_status = "ready"
+        except Exception as e:
+            logger.error(f"Error al construir la matriz de co-ocurrencia: {e}")
+            self.cooccurrence_status = "error"
+
+    def _select_rows(
+            self,
+            filters: Dict[str, str],
+            day_start: Optional[int] = None,
+            day_end: Optional[int] = None
+    ) -> np.ndarray:
+        """Filas ordenadas por día que cumplen los filtros {columna: clave}, eligiendo la ruta de acceso"""
+        return select_rows(self.store, self.bitmaps, filters, day_start, day_end, statistics=self.statistics)
+
+    def _division_filter(self, division: Optional[str]) -> Dict[str, str]:
+        """Filtro {KeyDivision: división} para _select_rows (vacío si no se pide división)"""
+        if division is None:
+            return {}
+        if DIVISION_COLUMN not in self.store.keys:
+            raise ValueError("El datamart no tiene la columna KeyDivision")
+        return {DIVISION_COLUMN: division}
+
+    def _key_code(self, column: str, key: str) -> int:
+        """
+        Código de una clave consultada, resuelto antes de tocar índices, cubos o filas.
+
+        La pertenencia sale de una búsqueda binaria sobre los valores únicos
+        ordenados de la columna (los mismos que definen los códigos), así que una
+        clave que no existe (error de tipeo, ID obsoleto) se detecta sin recorrer
+        el datamart.
+
+        Args:
+            column: Columna de clave (ej. "KeyEmployee")
+            key: Clave consultada
+
+        Returns:
+            Código de la clave, o -1 si no existe (con UNKNOWN_KEY_MODE=empty)
+
+        Raises:
+            KeyNotFoundError: si la clave no existe y UNKNOWN_KEY_MODE=404
+        """
+        code = self.store.key(column).code_of(key)
+        if code < 0:
+            logger.warning(f"La clave {column}={key} no existe en el datamart")
+            if settings.UNKNOWN_KEY_MODE == "404":
+                raise KeyNotFoundError(column, key)
+        return code
+
+    def _division_known(self, division: Optional[str]) -> bool:
+        """Si la división pedida existe (True si no se pide división)"""
+        if not self._division_filter(division):
+            return True
+        return self._key_code(DIVISION_COLUMN, division) >= 0
+
+    def _division_rows(self, rows: np.ndarray, division: Optional[str]) -> np.ndarray:
+        """Filas que pertenecen a la división (sin cambios si no se pide división, ninguna si no existe)"""
+        if not self._division_filter(division):
+            return rows
+        if not self._division_known(division):
+            # El código -1 es el de los nulos: una división inexistente no debe coincidir con ellos
+            return rows[:0]
+        column = self.store.key(DIVISION_COLUMN)
+        return rows[column.codes[rows] == column.code_of(division)]
+
+    def _rows_currency(self, rows: np.ndarray) -> Optional[str]:
+        """
+        Moneda de un conjunto de filas.
+
+        Raises:
+            MixedCurrencyError: si las filas tienen montos en más de una moneda
+        """
+        if len(rows) == 0 or not self.segments.currencies:
+            return None
+        if len(self.segments.currencies) == 1:
+            return self.segments.currencies[0]
+
+        column = self.store.key(CURRENCY_COLUMN)
+        codes = np.unique(column.codes[rows])
+        currencies = [str(value) for value in column.decode(codes[codes >= 0])]
+        if len(currencies) > 1:
+            raise MixedCurrencyError(currencies)
+        return currencies[0] if currencies else None
+
+    def _group_currency(self, group: CustomerGroup, day_start: Optional[int], day_end: Optional[int]) -> Optional[str]:
+        """Moneda de un grupo de clientes en un rango (solo recorre sus filas si hay varias monedas)"""
+        if len(self.segments.currencies) > 1:
+            return self._rows_currency(group.rows(self.store, day_start, day_end))
+        return self.segments.currencies[0] if self.segments.currencies else None
+
+    def _distinct_counts(
+            self,
+            dimension: str,
+            code: Optional[int],
+            day_start: Optional[int],
+            day_end: Optional[int],
+            records_count: int,
+            division: Optional[str] = None
+    ) -> Tuple[Dict[str, Optional[int]], bool]:
+        """
+        Valores distintos (tickets, clientes, productos) de una entidad en un rango.
+
+        Con pocos registros (DISTINCT_EXACT_MAX_ROWS) se cuentan exactos desde las
+        filas; si no, se estiman con los sketches HyperLogLog. Los sketches no
+        están segmentados: con división y muchos registros no se informan (None).
+
+        Returns:
+            ({valor contado: cantidad}, True si son estimaciones)
+        """
+        sketches = self.sketches.get(dimension, {})
+        if records_count <= settings.DISTINCT_EXACT_MAX_ROWS:
+            rows = None
+            if records_count > 0 and division is not None:
+                filters = self._division_filter(division)
+                if code is not None:
+                    filters[dimension] = str(self.store.key(dimension).values[code])
+                rows = self._select_rows(filters, day_start, day_end)
+            elif records_count > 0:
+                rows = range_rows(self.store, dimension, code, day_start, day_end)
+            return {
+                target: count_exact(self.store, target, rows) if rows is not None else 0
+                for target in sketches
+            }, False
+
+        if division is not None:
+            return {target: None for target in sketches}, False
+
+        return {
+            target: count_distinct(self.store, sketch, code, day_start, day_end)
+            for target, sketch in sketches.items()
+        }, True
+
+    def _sample_filters(
+            self,
+            dimension: Optional[str],
+            code: Optional[int],
+            division: Optional[str]
+    ) -> Optional[Dict[str, int]]:
+        """Filtros {columna: código} de un recorte sobre la muestra, o None si no se puede estimar"""
+        if self.sample is None or (code is not None and code < 0):
+            return None
+        filters = {dimension: code} if dimension is not None and code is not None else {}
+        if self._division_filter(division):
+            division_code = self._key_code(DIVISION_COLUMN, division)
+            if division_code < 0:
+                return None
+            filters[DIVISION_COLUMN] = division_code
+        return filters
+
+    def _approximate_totals(
+            self,
+            dimension: Optional[str],
+            code: Optional[int],
+            day_start: Optional[int],
+            day_end: Optional[int],
+            division: Optional[str] = None
+    ) -> Optional[SampleEstimate]:
+        """
+        Estima monto, cantidad y registros de un recorte desde la muestra estratificada.
+
+        Con recortes chicos (hasta APPROX_EXACT_MAX_ROWS registros estimados) el
+        error relativo de la muestra es grande y el cálculo exacto es barato, así
+        que se retorna None y el llamador calcula exacto.
+
+        Returns:
+            SampleEstimate, o None si se debe calcular exacto
+        """
+        filters = self._sample_filters(dimension, code, division)
+        if filters is None:
+            return None
+
+        estimate = self.sample.estimate(self.store, filters, day_start, day_end)
+        if estimate.totals["count"] <= settings.APPROX_EXACT_MAX_ROWS:
+            logger.info(f"Recorte de ~{estimate.totals['count']:,.0f} registros: se calcula exacto")
+            return None
+
+        logger.info(f"Totales estimados con {estimate.sample_rows:,} filas de la muestra")
+        return estimate
+
+    def _estimated_totals(self, estimate: SampleEstimate) -> Tuple[float, int, int, Dict[str, ConfidenceInterval]]:
+        """(monto, cantidad, registros) estimados y sus intervalos, con el monto en unidades de la moneda"""
+        scale = 10 ** self.amount_decimals if self.amount_decimals is not None else 1
+        intervals = {}
+        for field, measure, divisor in (("total_amount", "amount", scale), ("total_quantity", "qty", 1),
+                                        ("records_count", "count", 1)):
+            lower, upper = estimate.interval(measure)
+            intervals[field] = ConfidenceInterval(
+                lower=round(lower / divisor, 2), upper=round(upper / divisor, 2), level=CONFIDENCE_LEVEL
+            )
+        return (estimate.totals["amount"] / scale, int(round(estimate.totals["qty"])),
+                int(round(estimate.totals["count"])), intervals)
+
+    def _estimated_returns(self, estimate: SampleEstimate, total_amount: float, total_quantity: int,
+                           records_count: int) -> ReturnsBreakdown:
+        """Devoluciones estimadas desde la muestra, con el mismo desglose que las de los cubos"""
+        return_amount = estimate.totals["return_amount"]
+        if self.amount_decimals is not None:
+            return_amount = int(round(return_amount))
+        returns = (return_amount, int(round(estimate.totals["return_qty"])),
+                   int(round(estimate.totals["return_count"])))
+        return _returns_values(returns, total_amount, total_quantity, records_count, self.amount_decimals)
+
     def get_sales_by_employee(
                 self,
                 key_employee: str,
                 date_start: date,
-                date_end: date
+                date_end: date,
+                division: Optional[str] = None
         ) -> EmployeeSalesResponse:
             """
             Obtiene las ventas de un empleado en un periodo.
@@ -101,10 +845,14 @@ class DatamartService:
                 key_employee: ID del empleado (ej. "1|343")
                 date_start: Fecha de inicio
                 date_end: Fecha de fin
+                division: (Opcional) División a la que se limita la consulta
 
             Returns:
                 Diccionario con ventas, totales y resumen
 
+            Raises:
+                MixedCurrencyError: si las ventas del periodo están en más de una moneda
+
             Example:
                 -> service.get_sales_by_employee("1|343", date(2023,11,1), date(2023,11,30))
                 {'key_employee': '1|343',
@@ -123,21 +871,27 @@ class DatamartService:
                 raise InvalidDateRangeError(date_start, date_end)
 
             # Filtrar por empleado y rango de fechas
-            mask = (
-                    (self.data['KeyEmployee'] == key_employee) &
-                    (self.data['KeyDate'] >= pd.Timestamp(date_start)) &
-                    (self.data['KeyDate'] <= pd.Timestamp(date_end))
-            )
-            filtered_employee = self.data[mask].copy()
+            code_employee = self._key_code('KeyEmployee', key_employee)
+            day_start, day_end = to_day_number(date_start), to_day_number(date_end)
+            if code_employee < 0 or not self._division_known(division):
+                # Clave inexistente: resultado vacío sin recorrer índices ni cubos
+                rows_employee, cubes, currency = np.zeros(0, dtype=np.int64), [], None
+            else:
+                rows_employee = self._select_rows(
+                    {'KeyEmployee': key_employee, **self._division_filter(division)}, day_start, day_end
+                )
+                # Calcular totales desde los cubos de los segmentos de la consulta
+                cubes, currency = self.segments.scope('KeyEmployee', code_employee, day_start, day_end, division)
 
-            if len(filtered_employee) == 0:
+            if len(rows_employee) == 0:
                 logger.warning(f"No se encontraron ventas para el empleado {key_employee}")
 
-            # Calcular totales
-            total_amount, total_quantity,records_count = _get_total_details(filtered_employee)
+            total_amount, total_quantity, records_count = _get_scoped_details(
+                cubes, code_employee, day_start, day_end, self.amount_decimals
+            )
 
             # Preparando lista de ventas (detalles)
-            sales_list_employee = _create_detail_list(filtered_employee)
+            sales_list_employee = _create_detail_list(self.store, rows_employee, self.amount_decimals)
 
             logger.info(f"Registros encontrados: {records_count}")
             logger.info(f"Total ventas: ${total_amount:,.2f}")
@@ -150,6 +904,8 @@ class DatamartService:
                 total_amount=total_amount,
                 total_quantity=total_quantity,
                 records_count=records_count,
+                division=division,
+                currency=currency,
                 sales=sales_list_employee
                 )
 
@@ -157,7 +913,8 @@ class DatamartService:
             self,
             key_product: str,
             date_start: date,
-            date_end: date
+            date_end: date,
+            division: Optional[str] = None
     ) -> ProductSalesResponse:
         """
         Obtiene las ventas de un producto en un periodo.
@@ -166,10 +923,14 @@ class DatamartService:
             key_product: ID del producto (ej. "1|44733")
             date_start: Fecha de inicio
             date_end: Fecha de fin
+            division: (Opcional) División a la que se limita la consulta
 
         Returns:
             ProductSalesResponse con ventas, totales y resumen
 
+        Raises:
+            MixedCurrencyError: si las ventas del periodo están en más de una moneda
+
         Example:
             -> service.get_sales_by_product("1|44733", date(2023,11,1), date(2023,11,30))
             ProductSalesResponse(success=True,
@@ -185,21 +946,26 @@ class DatamartService:
             raise InvalidDateRangeError(date_start, date_end)
 
         # Filtrar por producto y rango de fechas
-        mask = (
-                (self.data['KeyProduct'] == key_product) &
-                (self.data['KeyDate'] >= pd.Timestamp(date_start)) &
-                (self.data['KeyDate'] <= pd.Timestamp(date_end))
-        )
-        filtered_product = self.data[mask].copy()
+        code_product = self._key_code('KeyProduct', key_product)
+        day_start, day_end = to_day_number(date_start), to_day_number(date_end)
+        if code_product < 0 or not self._division_known(division):
+            # Clave inexistente: resultado vacío sin recorrer índices ni cubos
+            rows_product, cubes, currency = np.zeros(0, dtype=np.int64), [], None
+        else:
+            rows_product = self._select_rows({'KeyProduct': key_product, **self._division_filter(division)},
+                                             day_start, day_end)
+            # Calcular totales desde los cubos de los segmentos de la consulta
+            cubes, currency = self.segments.scope('KeyProduct', code_product, day_start, day_end, division)
 
-        if len(filtered_product) == 0:
+        if len(rows_product) == 0:
             logger.warning(f"No se encontraron ventas para el producto {key_product}")
 
-        # Calcular totales
-        total_amount, total_quantity,records_count = _get_total_details(filtered_product)
+        total_amount, total_quantity, records_count = _get_scoped_details(
+            cubes, code_product, day_start, day_end, self.amount_decimals
+        )
 
         # Preparar lista de ventas (detalles)
-        sales_list_products = _create_detail_list(filtered_product)
+        sales_list_products = _create_detail_list(self.store, rows_product, self.amount_decimals)
 
         logger.info(f"Consulta completada:")
         logger.info(f"Registros encontrados: {records_count}")
@@ -214,6 +980,8 @@ class DatamartService:
             total_amount=total_amount,
             total_quantity=total_quantity,
             records_count=records_count,
+            division=division,
+            currency=currency,
             sales=sales_list_products
         )
 
@@ -221,7 +989,8 @@ class DatamartService:
             self,
             key_store: str,
             date_start: date,
-            date_end: date
+            date_end: date,
+            division: Optional[str] = None
     ) -> StoreSalesResponse:
         """
         Obtiene las ventas de una tienda en un periodo.
@@ -230,10 +999,14 @@ class DatamartService:
             key_store: ID de la tienda (ej. "1|023")
             date_start: Fecha de inicio
             date_end: Fecha de fin
+            division: (Opcional) División a la que se limita la consulta
 
         Returns:
             StoreSalesResponse con ventas, totales y resumen
 
+        Raises:
+            MixedCurrencyError: si las ventas del periodo están en más de una moneda
+
         Example:
             -> service.get_sales_by_store("1|023", date(2023,11,1), date(2023,11,30))
             StoreSalesResponse(key_store='1|023',
@@ -248,21 +1021,26 @@ class DatamartService:
             raise InvalidDateRangeError(date_start, date_end)
 
         # Filtrar por tienda y rango de fechas
-        mask = (
-                (self.data['KeyStore'] == key_store) &
-                (self.data['KeyDate'] >= pd.Timestamp(date_start)) &
-                (self.data['KeyDate'] <= pd.Timestamp(date_end))
-        )
-        filtered_store = self.data[mask].copy()
+        code_store = self._key_code('KeyStore', key_store)
+        day_start, day_end = to_day_number(date_start), to_day_number(date_end)
+        if code_store < 0 or not self._division_known(division):
+            # Clave inexistente: resultado vacío sin recorrer índices ni cubos
+            rows_store, cubes, currency = np.zeros(0, dtype=np.int64), [], None
+        else:
+            rows_store = self._select_rows({'KeyStore': key_store, **self._division_filter(division)},
+                                           day_start, day_end)
+            # Calcular totales desde los cubos de los segmentos de la consulta
+            cubes, currency = self.segments.scope('KeyStore', code_store, day_start, day_end, division)
 
-        if len(filtered_store) == 0:
+        if len(rows_store) == 0:
             logger.warning(f"No se encontraron ventas para la tienda {key_store}")
 
-        # Calcular totales
-        total_amount, total_quantity, records_count = _get_total_details(filtered_store)
+        total_amount, total_quantity, records_count = _get_scoped_details(
+            cubes, code_store, day_start, day_end, self.amount_decimals
+        )
 
         # Preparar lista de ventas (detalles)
-        sales_list_store = _create_detail_list(filtered_store)
+        sales_list_store = _create_detail_list(self.store, rows_store, self.amount_decimals)
 
         logger.info(f"Consulta completada:")
         logger.info(f"Registros encontrados: {records_count}")
@@ -276,21 +1054,501 @@ class DatamartService:
             total_amount=total_amount,
             total_quantity=total_quantity,
             records_count=records_count,
+            division=division,
+            currency=currency,
             sales=sales_list_store
         )
 
+    def _customer_scope(self, key_customer: Optional[str], anonymous: bool) -> Optional[CustomerGroup]:
+        """Valida la combinación de cliente y grupo anónimo; retorna el grupo si se pidió"""
+        if key_customer and anonymous:
+            raise ValueError("Indique key_customer o anonymous=true, no ambos")
+        if 'KeyCustomer' not in self.store.keys:
+            raise ValueError("El datamart no tiene la columna KeyCustomer")
+        if anonymous:
+            if self.anonymous_customers is None:
+                raise ValueError("El datamart no tiene clientes anónimos agrupados")
+            return self.anonymous_customers
+        return None
+
+    def get_sales_by_customer(
+            self,
+            key_customer: Optional[str],
+            date_start: date,
+            date_end: date,
+            anonymous: bool = False,
+            limit: int = 1000,
+            division: Optional[str] = None
+    ) -> CustomerSalesResponse:
+        """
+        Obtiene las ventas de un cliente (o del grupo de clientes anónimos) en un periodo.
+
+        Args:
+            key_customer: ID del cliente (ej. "1|88120"); None con anonymous=True
+            date_start: Fecha de inicio
+            date_end: Fecha de fin
+            anonymous: Si se consultan todos los clientes anónimos de caja como un grupo
+            limit: Máximo de registros en el detalle (los totales usan todos)
+            division: (Opcional) División a la que se limita la consulta
+
+        Returns:
+            CustomerSalesResponse con ventas, totales y resumen
+
+        Raises:
+            ValueError: si se indica cliente y grupo anónimo, o ninguno de los dos
+            MixedCurrencyError: si las ventas del periodo están en más de una moneda
+
+        Example:
+            -> service.get_sales_by_customer("1|88120", date(2023,11,1), date(2023,11,30))
+            CustomerSalesResponse(success=True,
+                key_customer='1|88120',
+                total_amount=3120.5,
+                ...)
+        """
+        group = self._customer_scope(key_customer, anonymous)
+        if group is None and not key_customer:
+            raise ValueError("Indique key_customer o anonymous=true")
+
+        label = "clientes anónimos" if anonymous else f"cliente {key_customer}"
+        logger.info(f"Consultando ventas de {label}")
+        logger.info(f"Periodo: {date_start} a {date_end}")
+
+        if date_end < date_start:
+            raise InvalidDateRangeError(date_start, date_end)
+
+        day_start, day_end = to_day_number(date_start), to_day_number(date_end)
+        if group is not None and division is None:
+            rows = group.rows(self.store, day_start, day_end)
+            currency = self._rows_currency(rows)
+            total_amount, total_quantity, records_count = _get_total_details(
+                group.cube, 0, day_start, day_end, self.amount_decimals
+            )
+        else:
+            if group is not None:
+                rows = group.rows(self.store, day_start, day_end)
+            else:
+                column = self.store.key('KeyCustomer')
+                rows = column.rows(self._key_code('KeyCustomer', key_customer), day_start, day_end)
+            rows = self._division_rows(rows, division)
+            currency = self._rows_currency(rows)
+            # Sin cubo por cliente (ni por división del grupo anónimo): los totales salen de sus filas
+            amount_sum, total_quantity, records_count = self.store.totals(rows)
+            total_amount = from_minor_units(amount_sum, self.amount_decimals)
+
+        if records_count == 0:
+            logger.warning(f"No se encontraron ventas para {label}")
+
+        sales_list_customer = _create_detail_list(self.store, rows[:limit], self.amount_decimals)
+
+        logger.info(f"Registros encontrados: {records_count}")
+        logger.info(f"Total ventas: ${total_amount:,.2f}")
+        logger.info(f"Cantidad total: {total_quantity}")
+
+        return CustomerSalesResponse(
+            key_customer=key_customer,
+            anonymous=anonymous,
+            date_start=date_start,
+            date_end=date_end,
+            total_amount=total_amount,
+            total_quantity=total_quantity,
+            records_count=records_count,
+            division=division,
+            currency=currency,
+            truncated=len(rows) > limit,
+            sales=sales_list_customer
+        )
+
+    def query_sales(
+            self,
+            filters: Dict[str, Optional[str]],
+            date_start: Optional[date] = None,
+            date_end: Optional[date] = None,
+            limit: int = 1000
+    ) -> SalesQueryResponse:
+        """
+        Obtiene las ventas que cumplen cualquier combinación de filtros de clave.
+
+        Args:
+            filters: {filtro: clave} con filtros de FILTER_COLUMNS (los None se ignoran)
+            date_start: (Opcional) Fecha de inicio
+            date_end: (Opcional) Fecha de fin
+            limit: Máximo de registros en el detalle (los totales usan todos)
+
+        Returns:
+            SalesQueryResponse con totales y detalle
+
+        Example:
+            -> service.query_sales({"key_product": "1|44733", "key_store": "1|023"},
+                                   date(2023,10,1), date(2023,12,31))
+            SalesQueryResponse(success=True,
+                filters={'key_product': '1|44733', 'key_store': '1|023'},
+                total_amount=4500.75,
+                ...)
+        """
+        if date_start is not None and date_end is not None and date_end < date_start:
+            raise InvalidDateRangeError(date_start, date_end)
+
+        applied = {name: key for name, key in filters.items() if key}
+        unknown = [name for name in applied if name not in FILTER_COLUMNS]
+        if unknown:
+            raise ValueError(f"Filtros no soportados: {', '.join(unknown)}")
+        missing = [name for name in applied if FILTER_COLUMNS[name] not in self.bitmaps]
+        if missing:
+            raise ValueError(f"El datamart no tiene las columnas para: {', '.join(missing)}")
+
+        logger.info(f"Consultando ventas con filtros {applied}")
+        logger.info(f"Periodo: {date_start} a {date_end}")
+
+        day_start = to_day_number(date_start) if date_start is not None else None
+        day_end = to_day_number(date_end) if date_end is not None else None
+        if all(self._key_code(FILTER_COLUMNS[name], key) >= 0 for name, key in applied.items()):
+            rows = self._select_rows({FILTER_COLUMNS[name]: key for name, key in applied.items()}, day_start, day_end)
+        else:
+            # Alguna clave no existe: ninguna fila cumple los filtros
+            rows = np.zeros(0, dtype=np.int64)
+
+        if len(rows) == 0:
+            logger.warning(f"No se encontraron ventas para los filtros {applied}")
+
+        # Calcular totales sobre todas las filas (de una sola moneda) y detalle hasta el límite
+        currency = self._rows_currency(rows)
+        amount_sum, total_quantity, records_count = self.store.totals(rows)
+        total_amount = from_minor_units(amount_sum, self.amount_decimals)
+        sales_list = _create_detail_list(self.store, rows[:limit], self.amount_decimals)
+
+        logger.info(f"Registros encontrados: {records_count}")
+        logger.info(f"Total ventas: ${total_amount:,.2f}")
+        logger.info(f"Cantidad total: {total_quantity}")
+
+        return SalesQueryResponse(
+            success=True,
+            filters=applied,
+            date_start=date_start,
+            date_end=date_end,
+            total_amount=total_amount,
+            total_quantity=total_quantity,
+            records_count=records_count,
+            currency=currency,
+            truncated=records_count > limit,
+            sales=sales_list
+        )
+
+    def run_query(self, query: AggregationQuery) -> AggregationQueryResponse:
+        """
+        Ejecuta una consulta de agregación del DSL (filtros, group_by, periodo y métricas).
+
+        Args:
+            query: Consulta validada
+
+        Returns:
+            AggregationQueryResponse con los grupos y, si se pidió, el plan de ejecución
+
+        Example:
+            -> service.run_query(AggregationQuery(group_by=["key_store"],
+                                                  metrics=[{"op": "sum", "field": "amount"}]))
+            AggregationQueryResponse(success=True,
+                columns=['key_store', 'sum_amount'],
+                rows=[{'key_store': '1|007', 'sum_amount': -19243.7}, ...],
+                ...)
+        """
+        plan = compile_query(query, self.bitmaps)
+        rows, groups_count, explain = plan.execute(self.store, self.bitmaps, self.amount_decimals, self.statistics)
+
+        logger.info(
+            f"Consulta de agregación: {explain['rows_aggregated']:,} filas, "
+            f"{groups_count:,} grupos, {explain['elapsed_ms']} ms"
+        )
+
+        return AggregationQueryResponse(
+            success=True,
+            columns=plan.columns,
+            rows=rows,
+            groups_count=groups_count,
+            truncated=groups_count > query.limit,
+            explain=explain if query.explain else None
+        )
+
+    def get_views(self) -> ViewRegistryResponse:
+        """
+        Registro de vistas materializadas: declaración, tamaño y última construcción de cada una.
+
+        Returns:
+            ViewRegistryResponse con una entrada por vista declarada
+
+        Example:
+            -> service.get_views()
+            ViewRegistryResponse(success=True,
+                views=[ViewInfo(name='store_month', rows=1440, size_bytes=46080, build_seconds=0.84, ...)])
+        """
+        views = []
+        for definition in self.views.definitions:
+            view = self.views.views.get(definition.name)
+            views.append(ViewInfo(
+                name=definition.name,
+                dimensions=list(definition.dimensions),
+                grain=definition.grain,
+                metrics=list(definition.metrics),
+                available=view is not None,
+                rows=view.n_rows if view is not None else None,
+                size_bytes=view.nbytes if view is not None else None,
+                build_seconds=round(view.build_seconds, 3) if view is not None else None,
+                refreshed_at=view.refreshed_at if view is not None else None,
+                error=self.views.errors.get(definition.name)
+            ))
+        return ViewRegistryResponse(success=True, views=views)
+
+    def query_view(
+            self,
+            name: str,
+            filters: Dict[str, str],
+            date_start: Optional[date] = None,
+            date_end: Optional[date] = None,
+            offset: int = 0,
+            limit: int = 100
+    ) -> ViewQueryResponse:
+        """
+        Consulta una vista materializada (filas precalculadas, sin recorrer transacciones).
+
+        Args:
+            name: Nombre de la vista
+            filters: Clave por dimensión (ej. {"key_store": "1|023"}); solo dimensiones de la vista
+            date_start: (Opcional) Fecha de inicio; se incluyen los periodos que la contienen
+            date_end: (Opcional) Fecha de fin
+            offset: Filas que se saltan
+            limit: Máximo de filas retornadas
+
+        Returns:
+            ViewQueryResponse con la página de filas y el total que cumple los filtros
+
+        Raises:
+            ViewNotFoundError: si la vista no está declarada
+            ValueError: si la vista no se pudo construir o los filtros no aplican a ella
+
+        Example:
+            -> service.query_view("store_month", {"key_store": "1|023"}, date(2023,1,1), date(2023,12,31))
+            ViewQueryResponse(success=True,
+                view='store_month',
+                rows=[{'key_store': '1|023', 'period': '2023-01-01', 'amount': 480000.5, ...}, ...],
+                total_rows=12,
+                ...)
+        """
+        if date_start and date_end and date_end < date_start:
+            raise InvalidDateRangeError(date_start, date_end)
+
+        view = self.views.get(name)
+        rows, total = view.query(
+            self.store,
+            {dimension: key for dimension, key in filters.items() if key},
+            to_day_number(date_start) if date_start else None,
+            to_day_number(date_end) if date_end else None,
+            offset,
+            limit,
+            self.amount_decimals
+        )
+        logger.info(f"Vista {name}: {total:,} filas cumplen los filtros, {len(rows)} retornadas")
+
+        columns = list(view.definition.dimensions) + (["period"] if view.definition.grain else [])
+        return ViewQueryResponse(
+            success=True,
+            view=name,
+            columns=columns + list(view.definition.metrics),
+            rows=rows,
+            total_rows=total,
+            offset=offset,
+            limit=limit,
+            refreshed_at=view.refreshed_at
+        )
+
+    def get_pivot(
+            self,
+            name: str,
+            rows: Optional[List[str]] = None,
+            columns: Optional[List[str]] = None,
+            date_start: Optional[date] = None,
+            date_end: Optional[date] = None,
+            order_by: str = "amount",
+            row_limit: int = 50,
+            column_limit: int = 50
+    ) -> PivotResponse:
+        """
+        Sub-pivote denso entre dos dimensiones desde la matriz dispersa precalculada.
+
+        Args:
+            name: Nombre del pivote (store-product o employee-store)
+            rows: (Opcional) Claves de las filas, en el orden pedido; sin ellas se
+                eligen las row_limit filas con mayor order_by en el periodo
+            columns: (Opcional) Claves de las columnas; sin ellas se eligen las
+                column_limit columnas con mayor order_by dentro de las filas
+            date_start: (Opcional) Fecha de inicio
+            date_end: (Opcional) Fecha de fin
+            order_by: Medida para elegir filas y columnas (amount, quantity o records)
+            row_limit: Máximo de filas elegidas
+            column_limit: Máximo de columnas elegidas
+
+        Returns:
+            PivotResponse con monto, cantidad y registros por fila y columna
+
+        Raises:
+            PivotNotFoundError: si el pivote no existe en el datamart
+            ValueError: si order_by no es una medida válida
+
+        Example:
+            -> service.get_pivot("store-product", rows=["1|023"], date_start=date(2023,11,1))
+            PivotResponse(success=True,
+                rows=['1|023'],
+                columns=['1|44733', ...],
+                amount=[[150000.5, ...]],
+                ...)
+        """
+        if date_start and date_end and date_end < date_start:
+            raise InvalidDateRangeError(date_start, date_end)
+
+        matrix = self.pivots.get(name)
+        if matrix is None:
+            raise PivotNotFoundError(name)
+
+        row_column = self.store.key(matrix.row_dimension)
+        column_column = self.store.key(matrix.column_dimension)
+        columns = list(dict.fromkeys(columns)) if columns else None
+        table = pivot_table(
+            self.store,
+            matrix,
+            np.array([row_column.code_of(key) for key in rows]) if rows else None,
+            np.array([column_column.code_of(key) for key in columns]) if columns else None,
+            to_day_number(date_start) if date_start else None,
+            to_day_number(date_end) if date_end else None,
+            order_by,
+            row_limit,
+            column_limit
+        )
+
+        amount = table["amount"]
+        if self.amount_decimals is not None:
+            amount = amount / (10 ** self.amount_decimals)
+        dimension_names = {column: dimension for dimension, column in FILTER_COLUMNS.items()}
+        logger.info(f"Pivote {name}: {len(table['rows'])} filas × {len(table['columns'])} columnas")
+
+        return PivotResponse(
+            success=True,
+            pivot=name,
+            row_dimension=dimension_names[matrix.row_dimension],
+            column_dimension=dimension_names[matrix.column_dimension],
+            date_start=date_start,
+            date_end=date_end,
+            rows=rows if rows else [str(key) for key in row_column.values[table["rows"]]],
+            columns=columns if columns else [str(key) for key in column_column.values[table["columns"]]],
+            amount=np.round(amount.astype(np.float64), 2).tolist(),
+            quantity=table["qty"].tolist(),
+            records=table["count"].tolist(),
+            total_rows=table["total_rows"],
+            total_columns=table["total_columns"]
+        )
+
+    def list_keys(
+            self,
+            dimension: str,
+            prefix: Optional[str] = None,
+            offset: int = 0,
+            limit: int = 100
+    ) -> KeyListResponse:
+        """
+        Lista las claves de una dimensión, opcionalmente las que empiezan con un prefijo.
+
+        Las claves salen de los valores únicos ordenados de la columna codificada:
+        el rango del prefijo se ubica con dos búsquedas binarias y los registros por
+        clave se leen de los offsets del índice, sin recorrer transacciones.
+
+        Args:
+            dimension: Dimensión de FILTER_COLUMNS (key_employee, key_product, ...)
+            prefix: (Opcional) Prefijo de las claves
+            offset: Posición de la primera clave retornada
+            limit: Máximo de claves retornadas
+
+        Returns:
+            KeyListResponse con las claves de la página y el total que coincide
+
+        Raises:
+            ValueError: si la dimensión no existe en el datamart
+
+        Example:
+            -> service.list_keys("key_employee", prefix="1|34", limit=2)
+            KeyListResponse(success=True,
+                total=12,
+                keys=[KeyEntry(key='1|34', records=1520), KeyEntry(key='1|340', records=873)],
+                ...)
+        """
+        column_name = FILTER_COLUMNS.get(dimension)
+        if column_name is None:
+            raise ValueError(f"Dimensión no soportada: {dimension}")
+        if column_name not in self.store.keys:
+            raise ValueError(f"El datamart no tiene la columna {column_name}")
+
+        column = self.store.key(column_name)
+        start, end = column.prefix_range(prefix or "")
+        page_start = min(start + offset, end)
+        page_end = min(page_start + limit, end)
+        records = column.record_counts(page_start, page_end)
+
+        return KeyListResponse(
+            success=True,
+            dimension=dimension,
+            prefix=prefix,
+            total=end - start,
+            offset=offset,
+            limit=limit,
+            keys=[
+                KeyEntry(key=str(key), records=int(count))
+                for key, count in zip(column.values[page_start:page_end], records)
+            ]
+        )
+
+    def get_sql_engine(self) -> SqlEngine:
+        """
+        Retorna el motor SQL de solo lectura sobre el DataFrame ya cargado.
+
+        Se crea una sola vez (en la primera consulta) y reutiliza los mismos datos
+        en memoria, sin volver a leer los archivos parquet.
+        """
+        if self._sql_engine is None:
+            with self._sql_lock:
+                if self._sql_engine is None:
+                    self._sql_engine = SqlEngine(
+                        self.data,
+                        amount_decimals=self.amount_decimals,
+                        memory_limit=settings.SQL_MEMORY_LIMIT,
+                        threads=settings.SQL_THREADS
+                    )
+                    logger.info("Motor SQL inicializado sobre el datamart en memoria")
+        return self._sql_engine
+
     def get_employee_summary(
             self,
-            key_employee: Optional[str] = None
+            key_employee: Optional[str] = None,
+            date_start: Optional[date] = None,
+            date_end: Optional[date] = None,
+            division: Optional[str] = None,
+            split_returns: bool = False,
+            approx: bool = False
     ) -> EmployeeSummaryResponse:
         """
         Obtiene el resumen de ventas (total y promedio) por empleado.
 
         Args:
             key_employee: ID del empleado (ej: "1|343") o None para todos los empleados
+            date_start: (Opcional) Fecha de inicio del periodo
+            date_end: (Opcional) Fecha de fin del periodo
+            division: (Opcional) División a la que se limita el resumen
+            split_returns: Si se separan ventas brutas, devoluciones y neto
+            approx: Si los totales y las devoluciones se estiman desde la muestra
+                estratificada (exactos en recortes chicos; ver approximate y
+                confidence_intervals); los tickets no se estiman (None)
 
         Returns:
-            EmployeeSummaryResponse con totales, promedios y estadísticas
+            EmployeeSummaryResponse con totales, promedios, estadísticas y tickets,
+            clientes y productos distintos
+
+        Raises:
+            MixedCurrencyError: si el resumen sumaría montos de más de una moneda
 
         Example:
             # Resumen de un empleado específico
@@ -316,17 +1574,41 @@ class DatamartService:
         else:
             logger.info(f"Calculando resumen de TODOS los empleados")
 
-        # Filtrar datos
-        if key_employee:
-            filtered_summary_employee = self.data[self.data['KeyEmployee'] == key_employee].copy()
-
-            if len(filtered_summary_employee) == 0:
-                logger.warning(f"No se encontraron datos para el empleado {key_employee}")
+        if date_start and date_end and date_end < date_start:
+            raise InvalidDateRangeError(date_start, date_end)
+        day_start = to_day_number(date_start) if date_start else None
+        day_end = to_day_number(date_end) if date_end else None
+
+        # Calcular métricas desde el cubo diario (sin recorrer transacciones)
+        code_summary_employee = self._key_code('KeyEmployee', key_employee) if key_employee else None
+        cubes, currency = self.segments.scope('KeyEmployee', code_summary_employee, day_start, day_end, division)
+        estimate = self._approximate_totals(
+            'KeyEmployee', code_summary_employee, day_start, day_end, division
+        ) if approx else None
+        if estimate is not None:
+            # Todo desde la muestra: no se recorren los cubos
+            total_amount, total_quantity, records_count, intervals = self._estimated_totals(estimate)
+            returns = self._estimated_returns(
+                estimate, total_amount, total_quantity, records_count
+            ) if split_returns else None
         else:
-            filtered_summary_employee = self.data.copy()
+            intervals = None
+            total_amount, total_quantity, records_count = _get_scoped_details(
+                cubes, code_summary_employee, day_start, day_end, self.amount_decimals
+            )
+            returns = _returns_metrics(
+                cubes, code_summary_employee, day_start, day_end, total_amount, total_quantity, records_count, self.amount_decimals
+            ) if split_returns else None
+        distinct, approximate = self._distinct_counts(
+            'KeyEmployee', code_summary_employee, day_start, day_end, records_count, division
+        )
+        # Los tickets agrupan filas y la muestra es de filas: sin estimación de tickets en modo aproximado
+        basket = _basket_metrics(
+            cubes, code_summary_employee, day_start, day_end, total_amount, total_quantity
+        ) if estimate is None else _basket_values(None, total_amount, total_quantity)
 
-        # Calcular métricas
-        total_amount, total_quantity, records_count = _get_total_details(filtered_summary_employee)
+        if key_employee and records_count == 0:
+            logger.warning(f"No se encontraron datos para el empleado {key_employee}")
 
         # Calcular promedio (evitar división por cero)
         average_amount = total_amount / records_count if records_count > 0 else 0.0
@@ -336,6 +1618,9 @@ class DatamartService:
         logger.info(f"Total ventas: ${total_amount:,.2f}")
         logger.info(f"Promedio por venta: ${average_amount:,.2f}")
         logger.info(f"Cantidad total: {total_quantity:,}")
+        logger.info(f"Tickets distintos: {distinct.get('tickets')}"
+                    f"{' (estimado HyperLogLog)' if approximate else ''}")
+        logger.info(f"Valor promedio por ticket: {basket['average_ticket_value']}")
 
         return EmployeeSummaryResponse(
             success=True,
@@ -343,21 +1628,49 @@ class DatamartService:
             total_amount=round(total_amount, 2),
             average_amount=round(average_amount, 2),
             total_quantity=total_quantity,
-            records_count=records_count
+            records_count=records_count,
+            division=division,
+            currency=currency,
+            date_start=date_start,
+            date_end=date_end,
+            unique_tickets=distinct.get('tickets'),
+            unique_customers=distinct.get('customers'),
+            unique_products=distinct.get('products'),
+            distinct_approximate=approximate,
+            **basket,
+            returns=returns,
+            approximate=intervals is not None,
+            confidence_intervals=intervals
         )
 
     def get_product_summary(
             self,
-            key_product: Optional[str] = None
+            key_product: Optional[str] = None,
+            date_start: Optional[date] = None,
+            date_end: Optional[date] = None,
+            division: Optional[str] = None,
+            split_returns: bool = False,
+            approx: bool = False
     ) -> ProductSummaryResponse:
         """
         Obtiene el resumen de ventas (total y promedio) por producto.
 
         Args:
             key_product: ID del producto (ej: "1|44733") o None para todos los productos
+            date_start: (Opcional) Fecha de inicio del periodo
+            date_end: (Opcional) Fecha de fin del periodo
+            division: (Opcional) División a la que se limita el resumen
+            split_returns: Si se separan ventas brutas, devoluciones y neto
+            approx: Si los totales y las devoluciones se estiman desde la muestra
+                estratificada (exactos en recortes chicos; ver approximate y
+                confidence_intervals)
 
         Returns:
-            ProductSummaryResponse con totales, promedios y estadísticas
+            ProductSummaryResponse con totales, promedios, estadísticas y tickets
+            y clientes distintos
+
+        Raises:
+            MixedCurrencyError: si el resumen sumaría montos de más de una moneda
 
         Example:
             # Resumen de un producto específico
@@ -381,17 +1694,37 @@ class DatamartService:
         else:
             logger.info(f"Calculando resumen de TODOS los productos")
 
-        # Filtrar datos
-        if key_product:
-            filtered_summary_product = self.data[self.data['KeyProduct'] == key_product].copy()
-
-            if len(filtered_summary_product) == 0:
-                logger.warning(f"No se encontraron datos para el producto {key_product}")
+        if date_start and date_end and date_end < date_start:
+            raise InvalidDateRangeError(date_start, date_end)
+        day_start = to_day_number(date_start) if date_start else None
+        day_end = to_day_number(date_end) if date_end else None
+
+        # Calcular métricas desde el cubo diario (sin recorrer transacciones)
+        code_summary_product = self._key_code('KeyProduct', key_product) if key_product else None
+        cubes, currency = self.segments.scope('KeyProduct', code_summary_product, day_start, day_end, division)
+        estimate = self._approximate_totals(
+            'KeyProduct', code_summary_product, day_start, day_end, division
+        ) if approx else None
+        if estimate is not None:
+            # Todo desde la muestra: no se recorren los cubos
+            total_amount, total_quantity, records_count, intervals = self._estimated_totals(estimate)
+            returns = self._estimated_returns(
+                estimate, total_amount, total_quantity, records_count
+            ) if split_returns else None
         else:
-            filtered_summary_product = self.data.copy()
+            intervals = None
+            total_amount, total_quantity, records_count = _get_scoped_details(
+                cubes, code_summary_product, day_start, day_end, self.amount_decimals
+            )
+            returns = _returns_metrics(
+                cubes, code_summary_product, day_start, day_end, total_amount, total_quantity, records_count, self.amount_decimals
+            ) if split_returns else None
+        distinct, approximate = self._distinct_counts(
+            'KeyProduct', code_summary_product, day_start, day_end, records_count, division
+        )
 
-        # Calcular métricas
-        total_amount, total_quantity, records_count = _get_total_details(filtered_summary_product)
+        if key_product and records_count == 0:
+            logger.warning(f"No se encontraron datos para el producto {key_product}")
 
         # Calcular promedio (evitar división por cero)
         average_amount = total_amount / records_count if records_count > 0 else 0.0
@@ -401,6 +1734,8 @@ class DatamartService:
         logger.info(f"Total ventas: ${total_amount:,.2f}")
         logger.info(f"Promedio por venta: ${average_amount:,.2f}")
         logger.info(f"Cantidad total: {total_quantity:,}")
+        logger.info(f"Tickets distintos: {distinct.get('tickets')}"
+                    f"{' (estimado HyperLogLog)' if approximate else ''}")
 
         return ProductSummaryResponse(
             success=True,
@@ -408,21 +1743,47 @@ class DatamartService:
             total_amount=round(total_amount, 2),
             average_amount=round(average_amount, 2),
             total_quantity=total_quantity,
-            records_count=records_count
+            records_count=records_count,
+            division=division,
+            currency=currency,
+            date_start=date_start,
+            date_end=date_end,
+            unique_tickets=distinct.get('tickets'),
+            unique_customers=distinct.get('customers'),
+            distinct_approximate=approximate,
+            returns=returns,
+            approximate=intervals is not None,
+            confidence_intervals=intervals
         )
 
     def get_store_summary(
             self,
-            key_store: Optional[str] = None
+            key_store: Optional[str] = None,
+            date_start: Optional[date] = None,
+            date_end: Optional[date] = None,
+            division: Optional[str] = None,
+            split_returns: bool = False,
+            approx: bool = False
     ) -> StoreSummaryResponse:
         """
         Obtiene el resumen de ventas (total y promedio) por tienda.
 
         Args:
             key_store: ID de la tienda (ej: "1|023") o None para todas las tiendas
+            date_start: (Opcional) Fecha de inicio del periodo
+            date_end: (Opcional) Fecha de fin del periodo
+            division: (Opcional) División a la que se limita el resumen
+            split_returns: Si se separan ventas brutas, devoluciones y neto
+            approx: Si los totales y las devoluciones se estiman desde la muestra
+                estratificada (exactos en recortes chicos; ver approximate y
+                confidence_intervals); los tickets no se estiman (None)
 
         Returns:
-            StoreSummaryResponse con totales, promedios y estadísticas
+            StoreSummaryResponse con totales, promedios, estadísticas y tickets,
+            clientes y productos distintos
+
+        Raises:
+            MixedCurrencyError: si el resumen sumaría montos de más de una moneda
 
         Example:
             -> # Resumen de una tienda específica
@@ -446,17 +1807,41 @@ class DatamartService:
         else:
             logger.info(f"Calculando resumen de TODAS las tiendas")
 
-        # Filtrar datos
-        if key_store:
-            filtered_summary_store = self.data[self.data['KeyStore'] == key_store].copy()
-
-            if len(filtered_summary_store) == 0:
-                logger.warning(f"No se encontraron datos para la tienda {key_store}")
+        if date_start and date_end and date_end < date_start:
+            raise InvalidDateRangeError(date_start, date_end)
+        day_start = to_day_number(date_start) if date_start else None
+        day_end = to_day_number(date_end) if date_end else None
+
+        # Calcular métricas desde el cubo diario (sin recorrer transacciones)
+        code_summary_store = self._key_code('KeyStore', key_store) if key_store else None
+        cubes, currency = self.segments.scope('KeyStore', code_summary_store, day_start, day_end, division)
+        estimate = self._approximate_totals(
+            'KeyStore', code_summary_store, day_start, day_end, division
+        ) if approx else None
+        if estimate is not None:
+            # Todo desde la muestra: no se recorren los cubos
+            total_amount, total_quantity, records_count, intervals = self._estimated_totals(estimate)
+            returns = self._estimated_returns(
+                estimate, total_amount, total_quantity, records_count
+            ) if split_returns else None
         else:
-            filtered_summary_store = self.data.copy()
+            intervals = None
+            total_amount, total_quantity, records_count = _get_scoped_details(
+                cubes, code_summary_store, day_start, day_end, self.amount_decimals
+            )
+            returns = _returns_metrics(
+                cubes, code_summary_store, day_start, day_end, total_amount, total_quantity, records_count, self.amount_decimals
+            ) if split_returns else None
+        distinct, approximate = self._distinct_counts(
+            'KeyStore', code_summary_store, day_start, day_end, records_count, division
+        )
+        # Los tickets agrupan filas y la muestra es de filas: sin estimación de tickets en modo aproximado
+        basket = _basket_metrics(
+            cubes, code_summary_store, day_start, day_end, total_amount, total_quantity
+        ) if estimate is None else _basket_values(None, total_amount, total_quantity)
 
-        # Calcular métricas
-        total_amount, total_quantity, records_count = _get_total_details(filtered_summary_store)
+        if key_store and records_count == 0:
+            logger.warning(f"No se encontraron datos para la tienda {key_store}")
 
         # Calcular promedio (evitar división por cero)
         average_amount = total_amount / records_count if records_count > 0 else 0.0
@@ -466,6 +1851,9 @@ class DatamartService:
         logger.info(f"Total ventas: ${total_amount:,.2f}")
         logger.info(f"Promedio por venta: ${average_amount:,.2f}")
         logger.info(f"Cantidad total: {total_quantity:,}")
+        logger.info(f"Tickets distintos: {distinct.get('tickets')}"
+                    f"{' (estimado HyperLogLog)' if approximate else ''}")
+        logger.info(f"Valor promedio por ticket: {basket['average_ticket_value']}")
 
         return StoreSummaryResponse(
             success=True,
@@ -473,18 +1861,681 @@ class DatamartService:
             total_amount=round(total_amount, 2),
             average_amount=round(average_amount, 2),
             total_quantity=total_quantity,
-            records_count=records_count
+            records_count=records_count,
+            division=division,
+            currency=currency,
+            date_start=date_start,
+            date_end=date_end,
+            unique_tickets=distinct.get('tickets'),
+            unique_customers=distinct.get('customers'),
+            unique_products=distinct.get('products'),
+            distinct_approximate=approximate,
+            **basket,
+            returns=returns,
+            approximate=intervals is not None,
+            confidence_intervals=intervals
+        )
+
+    def get_customer_summary(
+            self,
+            key_customer: Optional[str] = None,
+            date_start: Optional[date] = None,
+            date_end: Optional[date] = None,
+            anonymous: bool = False,
+            division: Optional[str] = None,
+            split_returns: bool = False
+    ) -> CustomerSummaryResponse:
+        """
+        Obtiene el resumen de ventas (total, promedio y canasta) por cliente.
+
+        Args:
+            key_customer: ID del cliente (ej: "1|88120") o None para todos los clientes
+            date_start: (Opcional) Fecha de inicio del periodo
+            date_end: (Opcional) Fecha de fin del periodo
+            anonymous: Si se resume el grupo de clientes anónimos de caja
+            division: (Opcional) División a la que se limita el resumen
+            split_returns: Si se separan ventas brutas, devoluciones y neto
+
+        Returns:
+            CustomerSummaryResponse con totales, promedios y métricas de canasta
+
+        Raises:
+            ValueError: si se indica cliente y grupo anónimo a la vez
+            MixedCurrencyError: si el resumen sumaría montos de más de una moneda
+
+        Example:
+            # Resumen de los clientes anónimos de caja
+            -> service.get_customer_summary(anonymous=True)
+            CustomerSummaryResponse(success=True,
+                key_customer=None,
+                anonymous=True,
+                customers_count=3,
+                total_amount=9500000.00,
+                ...)
+        """
+        group = self._customer_scope(key_customer, anonymous)
+        if anonymous:
+            logger.info("Calculando resumen de los clientes anónimos")
+        elif key_customer:
+            logger.info(f"Calculando resumen del cliente {key_customer}")
+        else:
+            logger.info("Calculando resumen de TODOS los clientes")
+
+        if date_start and date_end and date_end < date_start:
+            raise InvalidDateRangeError(date_start, date_end)
+        day_start = to_day_number(date_start) if date_start else None
+        day_end = to_day_number(date_end) if date_end else None
+
+        column = self.store.key('KeyCustomer')
+        unique_products = None
+        if key_customer or (group is not None and division is not None):
+            # Cliente individual (o grupo anónimo en una división): totales y distintos exactos desde sus filas
+            if key_customer:
+                code_customer = self._key_code('KeyCustomer', key_customer)
+                rows = column.rows(code_customer, day_start, day_end)
+            else:
+                rows = group.rows(self.store, day_start, day_end)
+            rows = self._division_rows(rows, division)
+            currency = self._rows_currency(rows)
+            amount_sum, total_quantity, records_count = self.store.totals(rows)
+            total_amount = from_minor_units(amount_sum, self.amount_decimals)
+            returns = _returns_values(
+                self.store.return_totals(rows), total_amount, total_quantity, records_count, self.amount_decimals
+            ) if split_returns else None
+            tickets_count = None
+            if records_count <= settings.DISTINCT_EXACT_MAX_ROWS:
+                tickets_count = count_exact(self.store, 'tickets', rows) if records_count > 0 else 0
+                unique_products = count_exact(self.store, 'products', rows) if records_count > 0 else 0
+            basket = _basket_values(tickets_count, total_amount, total_quantity)
+            customers_count = (1 if code_customer >= 0 else 0) if key_customer else group.n_customers
+        else:
+            # Grupo anónimo desde su cubo; todos los clientes desde los cubos de tiendas de los segmentos
+            if group is not None:
+                cubes, code = [group.cube], 0
+                currency = self._group_currency(group, day_start, day_end)
+            else:
+                cubes, currency = self.segments.scope('KeyStore', None, day_start, day_end, division)
+                code = None
+            total_amount, total_quantity, records_count = _get_scoped_details(
+                cubes, code, day_start, day_end, self.amount_decimals
+            )
+            returns = _returns_metrics(
+                cubes, code, day_start, day_end, total_amount, total_quantity, records_count, self.amount_decimals
+            ) if split_returns else None
+            if group is not None and records_count <= settings.DISTINCT_EXACT_MAX_ROWS:
+                rows = group.rows(self.store, day_start, day_end)
+                unique_products = count_exact(self.store, 'products', rows) if records_count > 0 else 0
+            basket = _basket_metrics(cubes, code, day_start, day_end, total_amount, total_quantity)
+            customers_count = group.n_customers if group is not None else column.n_keys
+
+        if key_customer and records_count == 0:
+            logger.warning(f"No se encontraron datos para el cliente {key_customer}")
+
+        # Calcular promedio (evitar división por cero)
+        average_amount = total_amount / records_count if records_count > 0 else 0.0
+
+        logger.info("Resumen calculado:")
+        logger.info(f"Total registros: {records_count:,}")
+        logger.info(f"Total ventas: ${total_amount:,.2f}")
+        logger.info(f"Promedio por venta: ${average_amount:,.2f}")
+        logger.info(f"Cantidad total: {total_quantity:,}")
+        logger.info(f"Valor promedio por ticket: {basket['average_ticket_value']}")
+
+        return CustomerSummaryResponse(
+            success=True,
+            key_customer=key_customer,
+            anonymous=anonymous,
+            customers_count=customers_count,
+            total_amount=round(total_amount, 2),
+            average_amount=round(average_amount, 2),
+            total_quantity=total_quantity,
+            records_count=records_count,
+            division=division,
+            currency=currency,
+            date_start=date_start,
+            date_end=date_end,
+            unique_products=unique_products,
+            **basket,
+            returns=returns
+        )
+
+    def get_period_comparison(
+            self,
+            date_start: date,
+            date_end: date,
+            key_employee: Optional[str] = None,
+            key_product: Optional[str] = None,
+            key_store: Optional[str] = None,
+            division: Optional[str] = None,
+            split_returns: bool = False
+    ) -> PeriodComparisonResponse:
+        """
+        Compara un periodo con el periodo anterior y con el mismo periodo del año anterior.
+
+        Los tres periodos salen de una sola pasada por el slice de la entidad en
+        el cubo diario: sumas acumuladas y dos búsquedas binarias por periodo.
+
+        Args:
+            date_start: Fecha de inicio del periodo actual
+            date_end: Fecha de fin del periodo actual
+            key_employee: (Opcional) ID del empleado
+            key_product: (Opcional) ID del producto
+            key_store: (Opcional) ID de la tienda
+            division: (Opcional) División a la que se limita la comparación
+            split_returns: Si se separan ventas brutas, devoluciones y neto en cada periodo
+
+        Returns:
+            PeriodComparisonResponse con los totales de los tres periodos y sus variaciones
+
+        Raises:
+            ValueError: si se indica más de una entidad
+            MixedCurrencyError: si los periodos sumarían montos de más de una moneda
+
+        Example:
+            -> service.get_period_comparison(date(2023,11,1), date(2023,11,30), key_store="1|023")
+            PeriodComparisonResponse(success=True,
+                dimension='KeyStore',
+                key='1|023',
+                current=PeriodTotals(total_amount=500000.25, ...),
+                change_vs_year_ago=PeriodChange(amount_pct=11.11, ...),
+                ...)
+        """
+        keys = {name: key for name, key in (('KeyEmployee', key_employee), ('KeyProduct', key_product),
+                                            ('KeyStore', key_store)) if key}
+        if len(keys) > 1:
+            raise ValueError("Indique una sola entidad (key_employee, key_product o key_store)")
+        if date_end < date_start:
+            raise InvalidDateRangeError(date_start, date_end)
+
+        # Sin entidad se compara todo el datamart con el cubo de tiendas
+        dimension, key = next(iter(keys.items())) if keys else (None, None)
+        logger.info(f"Comparando periodos para {dimension or 'todo el datamart'} {key or ''}")
+        logger.info(f"Periodo: {date_start} a {date_end}")
+
+        periods = [(date_start, date_end), previous_period(date_start, date_end),
+                   (shift_years(date_start, -1), shift_years(date_end, -1))]
+        ranges = [(to_day_number(start), to_day_number(end)) for start, end in periods]
+
+        cube_dimension = dimension or 'KeyStore'
+        code = self._key_code(dimension, key) if dimension else None
+        first_day = min(start for start, _ in ranges)
+        cubes, currency = self.segments.scope(cube_dimension, code, first_day, ranges[0][1], division)
+
+        totals = sum_range_totals(cubes, code, ranges)
+        # Las devoluciones salen de las mismas sumas acumuladas, desde sus partes del cubo
+        returns = sum_range_returns(cubes, code, ranges) if split_returns else None
+        current, previous, year_ago = (
+            PeriodTotals(
+                date_start=start,
+                date_end=end,
+                total_amount=round(from_minor_units(amount_sum, self.amount_decimals), 2),
+                total_quantity=total_quantity,
+                records_count=records_count,
+                returns=_returns_values(
+                    returns[i], from_minor_units(amount_sum, self.amount_decimals), total_quantity, records_count,
+                    self.amount_decimals
+                ) if returns is not None else None
+            )
+            for i, ((start, end), (amount_sum, total_quantity, records_count)) in enumerate(zip(periods, totals))
+        )
+
+        logger.info(f"Total actual: ${current.total_amount:,.2f} | anterior: ${previous.total_amount:,.2f} | "
+                    f"año anterior: ${year_ago.total_amount:,.2f}")
+
+        return PeriodComparisonResponse(
+            success=True,
+            dimension=dimension,
+            key=key,
+            division=division,
+            currency=currency,
+            current=current,
+            previous=previous,
+            year_ago=year_ago,
+            change_vs_previous=_period_change(current, previous),
+            change_vs_year_ago=_period_change(current, year_ago)
+        )
+
+    def get_sales_series(
+            self,
+            date_start: date,
+            date_end: date,
+            key_employee: Optional[str] = None,
+            key_product: Optional[str] = None,
+            key_store: Optional[str] = None,
+            division: Optional[str] = None,
+            approx: bool = False
+    ) -> SalesSeriesResponse:
+        """
+        Serie diaria con sumas y promedios móviles de 7/30/90 días y acumulado del año.
+
+        Las celdas de la entidad en el cubo diario se vuelcan en arreglos densos
+        por día y las ventanas salen de sumas acumuladas, sin bucles por día.
+        La lectura empieza antes de date_start para que las ventanas y el YTD
+        del primer día estén completos.
+
+        Args:
+            date_start: Fecha de inicio de la serie
+            date_end: Fecha de fin de la serie
+            key_employee: (Opcional) ID del empleado
+            key_product: (Opcional) ID del producto
+            key_store: (Opcional) ID de la tienda
+            division: (Opcional) División a la que se limita la serie
+            approx: Si la serie se estima desde la muestra estratificada (exacta en
+                recortes chicos), con el intervalo del monto de cada día
+
+        Returns:
+            SalesSeriesResponse con un punto por día del rango
+
+        Raises:
+            ValueError: si se indica más de una entidad
+            MixedCurrencyError: si la serie sumaría montos de más de una moneda
+
+        Example:
+            -> service.get_sales_series(date(2023,11,1), date(2023,11,30), key_store="1|023")
+            SalesSeriesResponse(success=True,
+                dimension='KeyStore',
+                key='1|023',
+                points=[SeriesPoint(date=date(2023,11,1), amount_7d=98000.0, ytd_amount=4800000.5, ...), ...])
+        """
+        keys = {name: key for name, key in (('KeyEmployee', key_employee), ('KeyProduct', key_product),
+                                            ('KeyStore', key_store)) if key}
+        if len(keys) > 1:
+            raise ValueError("Indique una sola entidad (key_employee, key_product o key_store)")
+        if date_end < date_start:
+            raise InvalidDateRangeError(date_start, date_end)
+
+        dimension, key = next(iter(keys.items())) if keys else (None, None)
+        logger.info(f"Armando serie diaria para {dimension or 'todo el datamart'} {key or ''}")
+        logger.info(f"Periodo: {date_start} a {date_end}")
+
+        day_start, day_end = to_day_number(date_start), to_day_number(date_end)
+        first_day = series_start(day_start)
+
+        cube_dimension = dimension or 'KeyStore'
+        code = self._key_code(dimension, key) if dimension else None
+        cubes, currency = self.segments.scope(cube_dimension, code, first_day, day_end, division)
+
+        estimate = self._approximate_totals(dimension, code, first_day, day_end, division) if approx else None
+        if estimate is not None:
+            amount, qty, count, margin = self.sample.estimate_daily(
+                self.store, self._sample_filters(dimension, code, division), first_day, day_end
+            )
+            qty, count = np.rint(qty).astype(np.int64), np.rint(count).astype(np.int64)
+        else:
+            amount, qty, count = dense_daily(cubes, code, first_day, day_end)
+        rolling = {window: rolling_sum(amount, window) for window in SERIES_WINDOWS}
+        ytd_amount = year_to_date(amount, first_day)
+        ytd_quantity = year_to_date(qty, first_day)
+
+        # Solo se devuelven los días del rango pedido; los anteriores completan las ventanas
+        shown = slice(day_start - first_day, None)
+        scale = 10 ** self.amount_decimals if self.amount_decimals is not None else 1
+
+        def _amounts(values: np.ndarray) -> List[float]:
+            return np.round(values[shown] / scale, 2).tolist()
+
+        columns = {
+            'date': dates_from_day_numbers(np.arange(day_start, day_end + 1)).tolist(),
+            'total_amount': _amounts(amount),
+            'total_quantity': qty[shown].tolist(),
+            'records_count': count[shown].tolist(),
+            'ytd_amount': _amounts(ytd_amount),
+            'ytd_quantity': ytd_quantity[shown].tolist(),
+        }
+        for window, sums in rolling.items():
+            columns[f'amount_{window}d'] = _amounts(sums)
+            columns[f'avg_amount_{window}d'] = _amounts(sums / window)
+        if estimate is not None:
+            columns['total_amount_ci'] = [
+                ConfidenceInterval(lower=lower, upper=upper, level=CONFIDENCE_LEVEL)
+                for lower, upper in zip(_amounts(amount - margin), _amounts(amount + margin))
+            ]
+
+        points = [SeriesPoint(**dict(zip(columns, values))) for values in zip(*columns.values())]
+        logger.info(f"Serie de {len(points)} días")
+
+        return SalesSeriesResponse(
+            success=True,
+            dimension=dimension,
+            key=key,
+            division=division,
+            currency=currency,
+            date_start=date_start,
+            date_end=date_end,
+            points=points,
+            approximate=estimate is not None
+        )
+
+    def get_amount_distribution(
+            self,
+            measure: str = "amount",
+            key_employee: Optional[str] = None,
+            key_product: Optional[str] = None,
+            key_store: Optional[str] = None,
+            date_start: Optional[date] = None,
+            date_end: Optional[date] = None,
+            division: Optional[str] = None,
+            bins: int = 20
+    ) -> AmountDistributionResponse:
+        """
+        Obtiene percentiles (p50, p90, p99) e histograma de montos desde los sketches de cuantiles.
+
+        Args:
+            measure: "amount" (Amount de cada registro) o "ticket" (valor de cada ticket)
+            key_employee: (Opcional) ID del empleado
+            key_product: (Opcional) ID del producto
+            key_store: (Opcional) ID de la tienda
+            date_start: (Opcional) Fecha de inicio del periodo
+            date_end: (Opcional) Fecha de fin del periodo
+            division: (Opcional) División a la que se limita la distribución
+            bins: Número de intervalos del histograma
+
+        Returns:
+            AmountDistributionResponse con percentiles e histograma
+
+        Raises:
+            ValueError: si se indica más de una entidad o la medida no existe para la dimensión
+            MixedCurrencyError: si la distribución mezclaría montos de más de una moneda
+
+        Example:
+            -> service.get_amount_distribution("ticket", key_store="1|023")
+            AmountDistributionResponse(success=True,
+                dimension='KeyStore',
+                key='1|023',
+                measure='ticket',
+                p50=18250.4,
+                ...)
+        """
+        keys = {name: key for name, key in (('KeyEmployee', key_employee), ('KeyProduct', key_product),
+                                            ('KeyStore', key_store)) if key}
+        if len(keys) > 1:
+            raise ValueError("Indique una sola entidad (key_employee, key_product o key_store)")
+        if date_start and date_end and date_end < date_start:
+            raise InvalidDateRangeError(date_start, date_end)
+
+        # Sin entidad se usa la unión mensual de cualquier dimensión con la medida
+        dimension, key = next(iter(keys.items())) if keys else (None, None)
+        candidates = [dimension] if dimension else list(self.quantiles)
+        sketch = next((self.quantiles[name][measure] for name in candidates
+                       if measure in self.quantiles.get(name, {})), None)
+        if sketch is None:
+            raise ValueError(f"La medida '{measure}' no está disponible para {dimension or 'el datamart'}")
+
+        logger.info(f"Calculando distribución de {measure} para {dimension or 'todo el datamart'} {key or ''}")
+
+        code = self._key_code(dimension, key) if dimension else None
+        day_start = to_day_number(date_start) if date_start else None
+        day_end = to_day_number(date_end) if date_end else None
+        # Los montos de monedas distintas no se mezclan en una misma distribución
+        _, currency = self.segments.scope(dimension or 'KeyStore', code, day_start, day_end, division)
+        filters = self._division_filter(division)
+        if filters:
+            # Los sketches no están segmentados: con división se cuenta desde las filas del recorte
+            if key:
+                filters[dimension] = key
+            rows = self._select_rows(filters, day_start, day_end) if self._division_known(division) and \
+                (code is None or code >= 0) else np.zeros(0, dtype=np.int64)
+            counts = rows_counts(self.store, measure, rows, self.amount_decimals)
+        else:
+            counts = distribution_counts(self.store, sketch, code, day_start, day_end, self.amount_decimals)
+
+        p50, p90, p99 = quantiles_from_counts(counts, [0.5, 0.9, 0.99])
+        histogram, below, above = histogram_from_counts(counts, bins)
+
+        logger.info(f"Valores: {int(counts.sum()):,} | p50={p50} p90={p90} p99={p99}")
+
+        def rounded(value):
+            return round(value, 2) if value is not None else None
+
+        return AmountDistributionResponse(
+            success=True,
+            dimension=dimension,
+            key=key,
+            measure=measure,
+            division=division,
+            currency=currency,
+            date_start=date_start,
+            date_end=date_end,
+            count=int(counts.sum()),
+            p50=rounded(p50),
+            p90=rounded(p90),
+            p99=rounded(p99),
+            histogram=[HistogramBin(lower=round(lower, 2), upper=round(upper, 2), count=count)
+                       for lower, upper, count in histogram],
+            below_range=below,
+            above_range=above,
+            relative_accuracy=QUANTILE_RELATIVE_ACCURACY
+        )
+
+    def get_ticket(self, ticket_id: str) -> TicketResponse:
+        """
+        Obtiene el detalle y los totales de un ticket desde el índice de tickets.
+
+        La búsqueda es O(1) (tabla hash sobre TicketId) y los totales son los
+        agregados precalculados del ticket.
+
+        Args:
+            ticket_id: ID del ticket (ej: "N01-00000385")
+
+        Returns:
+            TicketResponse con líneas, totales, tienda, empleado y cliente
+
+        Raises:
+            TicketNotFoundError: si el ticket no existe
+            ValueError: si el datamart no tiene TicketId
+
+        Example:
+            -> service.get_ticket("N01-00000385")
+            TicketResponse(success=True,
+                ticket_id='N01-00000385',
+                ticket_date=datetime.date(2023, 11, 2),
+                total_amount=4500.75,
+                lines_count=3,
+                ...)
+        """
+        if self.tickets is None:
+            raise ValueError("El datamart no tiene la columna TicketId")
+
+        code = self.tickets.code_of(self.store, ticket_id)
+        if code < 0:
+            raise TicketNotFoundError(ticket_id)
+
+        rows = self.tickets.rows(code)
+        amount_sum, total_quantity, lines_count = self.tickets.totals(code)
+        head = rows[:1]
+
+        def head_value(name):
+            if name not in self.store.keys:
+                return None
+            column = self.store.key(name)
+            value = column.decode(column.codes[head])[0]
+            return str(value) if value is not None else None
+
+        first_day = int(self.tickets.days[code])
+        logger.info(f"Ticket {ticket_id}: {lines_count} líneas")
+
+        return TicketResponse(
+            success=True,
+            ticket_id=ticket_id,
+            ticket_date=from_day_number(first_day) if first_day != MISSING_DAY else None,
+            key_store=head_value('KeyStore'),
+            key_employee=head_value('KeyEmployee'),
+            key_customer=head_value('KeyCustomer'),
+            total_amount=round(from_minor_units(amount_sum, self.amount_decimals), 2),
+            total_quantity=total_quantity,
+            lines_count=lines_count,
+            sales=_create_detail_list(self.store, rows, self.amount_decimals)
+        )
+
+    def get_copurchased_products(
+            self,
+            key_product: str,
+            limit: int = 10,
+            order_by: str = "count",
+            min_count: int = 1
+    ) -> CoPurchaseResponse:
+        """
+        Obtiene los productos que más se compran junto con un producto (mismo ticket).
+
+        Args:
+            key_product: ID del producto (ej: "1|44733")
+            limit: Máximo de productos retornados
+            order_by: "count" (tickets juntos) o "lift"
+            min_count: Mínimo de tickets juntos para considerar un par
+
+        Returns:
+            CoPurchaseResponse con tickets, support, confidence y lift de cada producto
+
+        Raises:
+            CooccurrenceNotReadyError: si la matriz aún no está construida
+
+        Example:
+            -> service.get_copurchased_products("1|44733", limit=5)
+            CoPurchaseResponse(success=True,
+                key_product='1|44733',
+                product_tickets=1520,
+                products=[CoPurchasedProduct(key_product='1|1021', tickets=310, ...), ...])
+        """
+        matrix = self.cooccurrence
+        if matrix is None:
+            raise CooccurrenceNotReadyError(self.cooccurrence_status)
+
+        logger.info(f"Productos comprados junto con {key_product} (orden: {order_by})")
+
+        code = matrix.code_of(key_product) if self._key_code('KeyProduct', key_product) >= 0 else -1
+        if code < 0:
+            logger.warning(f"No se encontraron datos para el producto {key_product}")
+        products = matrix.top(code, limit, order_by, min_count)
+
+        return CoPurchaseResponse(
+            success=True,
+            key_product=key_product,
+            product_tickets=int(matrix.product_tickets[code]) if code >= 0 else 0,
+            total_tickets=matrix.n_tickets,
+            order_by=order_by,
+            products=[
+                CoPurchasedProduct(
+                    key_product=item["product"],
+                    tickets=item["tickets"],
+                    support=round(item["support"], 6),
+                    confidence=round(item["confidence"], 4),
+                    lift=round(item["lift"], 4)
+                )
+                for item in products
+            ]
         )
 
 # Instancia singleton del servicio
 _datamart_service: Optional[DatamartService] = None
+_datamart_lock = threading.Lock()
+_load_progress = LoadProgress()
+_load_thread: Optional[threading.Thread] = None
+# Serializa las recargas: cada una parte del servicio que dejó la anterior
+_refresh_lock = threading.Lock()
 
 def get_datamart_service() -> DatamartService:
     """
     Dependency para obtener la instancia del servicio.
-    Se crea solo una vez y se reutiliza.
+    Se crea solo una vez y se reutiliza; el lock garantiza que dos peticiones
+    concurrentes no disparen dos cargas.
     """
     global _datamart_service
     if _datamart_service is None:
-        _datamart_service = DatamartService()
-    return _datamart_service
\ No newline at end of file
+        with _datamart_lock:
+            if _datamart_service is None:
+                _datamart_service = DatamartService(progress=_load_progress)
+    return _datamart_service
+
+def refresh_datamart_service() -> RefreshResponse:
+    """
+    Recarga el datamart y reemplaza el servicio en una sola asignación.
+
+    Las peticiones en curso terminan con el servicio que obtuvieron; las
+    siguientes usan el nuevo. El progreso expuesto en /ready se reemplaza por
+    el del servicio nuevo junto con el servicio; si la recarga falla siguen
+    el servicio y el progreso actuales.
+
+    Returns:
+        RefreshResponse con el modo de la recarga y las filas anexadas
+
+    Raises:
+        DatamartNotReadyError: si el datamart aún no terminó de cargar
+        ValueError: si el datamart está mapeado desde SHARED_DATAMART_PATH
+    """
+    global _datamart_service, _load_progress
+    with _refresh_lock:
+        service = get_ready_datamart_service()
+        refreshed, response = service.refresh()
+        _datamart_service = refreshed
+        _load_progress = refreshed.progress
+    return response
+
+def get_load_progress() -> LoadProgress:
+    """Retorna el progreso de carga del datamart"""
+    return _load_progress
+
+def get_ready_datamart_service() -> DatamartService:
+    """
+    Retorna el servicio solo si el datamart ya terminó de cargar.
+
+    Raises:
+        DatamartNotReadyError: si la carga sigue en curso o falló
+    """
+    service = _datamart_service
+    if service is None or service.data is None:
+        raise DatamartNotReadyError(_load_progress.status)
+    return service
+
+def _background_load():
+    try:
+        get_datamart_service()
+    except Exception as e:
+        logger.error(f"Error al cargar datamart en segundo plano: {e}")
+
+def start_background_load() -> threading.Thread:
+    """
+    Inicia la carga del datamart en un hilo en segundo plano (una sola vez).
+
+    Returns:
+        Hilo de carga (el existente si ya se había iniciado)
+    """
+    global _load_thread
+    with _datamart_lock:
+        if _load_thread is None or (not _load_thread.is_alive() and _datamart_service is None):
+            _load_thread = threading.Thread(target=_background_load, name="datamart-loader", daemon=True)
+            _load_thread.start()
+    return _load_thread
+
+_refresh_thread: Optional[threading.Thread] = None
+
+def _refresh_loop(interval: int):
+    while True:
+        time.sleep(interval)
+        service = _datamart_service
+        if service is None or service.data is None:
+            continue
+        try:
+            refresh_datamart_service()
+        except Exception as e:
+            logger.error(f"Error al recargar el datamart: {e}")
+
+def start_refresh_job(interval: Optional[int] = None) -> Optional[threading.Thread]:
+    """
+    Revisa periódicamente si hay archivos nuevos en DATAMART_PATH y los anexa (una sola vez).
+
+    Args:
+        interval: Segundos entre revisiones; por defecto DATAMART_REFRESH_INTERVAL_SECONDS
+
+    Returns:
+        Hilo de revisión, o None si el intervalo es 0
+    """
+    global _refresh_thread
+    interval = settings.DATAMART_REFRESH_INTERVAL_SECONDS if interval is None else interval
+    if interval <= 0:
+        return None
+    with _datamart_lock:
+        if _refresh_thread is None or not _refresh_thread.is_alive():
+            _refresh_thread = threading.Thread(target=_refresh_loop, args=(interval,),
+                                               name="datamart-refresh", daemon=True)
+            _refresh_thread.start()
+    return _refresh_thread
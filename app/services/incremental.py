@@ -0,0 +1,241 @@
+"""
+Carga incremental del datamart (solo archivos nuevos).
+
+El datamart es de solo anexado: cada día llega un archivo parquet nuevo y los
+existentes no cambian. En lugar de reconstruir todo en cada recarga, las filas
+nuevas se procesan como un almacén aparte (el "delta": codificar claves,
+ordenar índices, ``reduceat`` de cubos, hashes de sketches) y sus estructuras
+se mezclan con las existentes:
+
+* Claves: los valores únicos se unen y cada lado recibe un ``CodeMap`` (código
+  anterior -> código nuevo). Como los valores están ordenados, el mapa es
+  creciente y conserva el orden de las estructuras CSR; si no aparecen claves
+  nuevas es la identidad y los códigos existentes no se tocan.
+* Índices de filas: las filas nuevas van al final de cada clave (o en su día,
+  si el archivo trae días anteriores) con ``np.insert``; las posiciones de las
+  filas existentes no cambian porque las filas nuevas se anexan.
+* Cubos, estadísticas y sketches: son celdas (entidad, día/mes) ordenadas, así
+  que la mezcla es la de dos tramos ordenados (``merge_sorted``): búsqueda
+  binaria de las celdas del delta en las existentes, suma (o máximo, en
+  HyperLogLog) en las celdas comunes e inserción de las nuevas.
+
+El trabajo por fila es proporcional a las filas nuevas; lo que queda
+proporcional al total es copiar arreglos (los arreglos son inmutables) y
+recorrer celdas de los agregados, que son mucho menos que las filas.
+"""
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.utils.dates import MISSING_MONTH
+
+# Bits de la parte baja de las claves compuestas (entidad, celda)
+_CELL_BITS = 32
+# Bits de la parte baja de las claves compuestas (celda, registro/bucket)
+_ENTRY_BITS = 16
+
+
+class CodeMap:
+    """Códigos de las claves existentes y del delta sobre la unión de valores"""
+
+    def __init__(self, old: np.ndarray, delta: np.ndarray, n_keys: int):
+        # old[código anterior] / delta[código del delta] -> código en la unión
+        self.old = np.asarray(old, dtype=np.int64)
+        self.delta = np.asarray(delta, dtype=np.int64)
+        self.n_keys = n_keys
+
+    @classmethod
+    def from_values(cls, old_values: np.ndarray, delta_values: np.ndarray) -> Tuple["CodeMap", np.ndarray]:
+        """
+        Une dos arreglos ordenados de valores únicos.
+
+        Returns:
+            (CodeMap, valores únicos ordenados de la unión)
+        """
+        values = np.union1d(old_values, delta_values)
+        old = np.searchsorted(values, old_values)
+        delta = np.searchsorted(values, delta_values)
+        return cls(old, delta, len(values)), values
+
+    @classmethod
+    def single(cls) -> "CodeMap":
+        """Mapa de estructuras de una sola entidad (grupos, totales por mes)"""
+        return cls(np.zeros(1, dtype=np.int64), np.zeros(1, dtype=np.int64), 1)
+
+    @property
+    def identity(self) -> bool:
+        """Si los códigos existentes no cambian (no hay claves nuevas)"""
+        return len(self.old) == self.n_keys
+
+    def remap(self, codes: np.ndarray, delta: bool = False) -> np.ndarray:
+        """Códigos (-1 para nulos) de un lado expresados en la unión, como int32"""
+        mapping = self.delta if delta else self.old
+        lookup = np.append(mapping, -1).astype(np.int32)
+        return lookup[codes]
+
+
+def day_slots(days: np.ndarray) -> np.ndarray:
+    """Días int32 (con MISSING_DAY) como enteros no negativos que conservan el orden"""
+    return np.asarray(days).astype(np.int64) - np.iinfo(np.int32).min
+
+
+def slot_days(slots: np.ndarray) -> np.ndarray:
+    return (slots + np.iinfo(np.int32).min).astype(np.int32)
+
+
+def month_slots(months: np.ndarray) -> np.ndarray:
+    """Meses (con MISSING_MONTH) como enteros no negativos que conservan el orden"""
+    months = np.asarray(months, dtype=np.int64)
+    return np.where(months == MISSING_MONTH, 0, months + 1)
+
+
+def slot_months(slots: np.ndarray) -> np.ndarray:
+    return np.where(slots == 0, MISSING_MONTH, slots - 1).astype(np.int64)
+
+
+def merge_sorted(old: np.ndarray, delta: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Mezcla dos arreglos ordenados de claves únicas.
+
+    Las claves del delta se buscan en las existentes con búsqueda binaria y las
+    que faltan se insertan en su lugar.
+
+    Returns:
+        (claves mezcladas, posición de cada clave existente, posición de cada clave del delta)
+    """
+    positions = np.searchsorted(old, delta)
+    found = positions < len(old)
+    found[found] = old[positions[found]] == delta[found]
+    inserted = np.flatnonzero(~found)
+    insert_at = positions[inserted]
+
+    merged = np.insert(old, insert_at, delta[inserted])
+    # Cada clave existente se corre tantas posiciones como claves se insertaron antes de ella
+    old_positions = np.arange(len(old), dtype=np.int64) + np.searchsorted(insert_at, np.arange(len(old)),
+                                                                          side='right')
+    delta_positions = np.empty(len(delta), dtype=np.int64)
+    delta_positions[inserted] = insert_at + np.arange(len(inserted))
+    delta_positions[found] = old_positions[positions[found]]
+    return merged, old_positions, delta_positions
+
+
+def combine(
+        n: int,
+        old_positions: np.ndarray,
+        old_values: np.ndarray,
+        delta_positions: np.ndarray,
+        delta_values: np.ndarray,
+        how: str = "add"
+) -> np.ndarray:
+    """
+    Valores de las claves mezcladas: los de cada lado en su posición, sumados
+    (``add``) o con máximo (``max``) donde coinciden.
+    """
+    merged = np.zeros(n, dtype=np.result_type(old_values.dtype, delta_values.dtype))
+    merged[old_positions] = old_values
+    if how == "max":
+        merged[delta_positions] = np.maximum(merged[delta_positions], delta_values)
+    else:
+        # Las posiciones del delta son únicas: la suma con índices no pierde valores repetidos
+        merged[delta_positions] += delta_values
+    return merged
+
+
+def _entity_of(offsets: np.ndarray) -> np.ndarray:
+    return np.repeat(np.arange(len(offsets) - 1, dtype=np.int64), np.diff(offsets))
+
+
+class CellMerge:
+    """Celdas (entidad, clave) mezcladas en formato CSR y posición de las celdas de cada lado"""
+
+    def __init__(self, offsets: np.ndarray, slots: np.ndarray, old_positions: np.ndarray,
+                 delta_positions: np.ndarray):
+        self.offsets = offsets
+        self.slots = slots
+        self.old_positions = old_positions
+        self.delta_positions = delta_positions
+
+    @property
+    def n_cells(self) -> int:
+        return len(self.slots)
+
+    def combine(self, old_values: np.ndarray, delta_values: np.ndarray, how: str = "add") -> np.ndarray:
+        return combine(self.n_cells, self.old_positions, old_values, self.delta_positions, delta_values, how)
+
+
+def merge_cells(
+        old_offsets: np.ndarray,
+        old_slots: np.ndarray,
+        delta_offsets: np.ndarray,
+        delta_slots: np.ndarray,
+        code_map: CodeMap
+) -> CellMerge:
+    """
+    Mezcla dos estructuras CSR de celdas (entidad, clave) ordenadas por clave en cada entidad.
+
+    Args:
+        old_offsets: Inicio de las celdas de cada entidad existente
+        old_slots: Clave de cada celda (ver day_slots / month_slots), < 2^32
+        delta_offsets: Inicio de las celdas de cada entidad del delta
+        delta_slots: Clave de cada celda del delta
+        code_map: Códigos de las entidades de cada lado en la unión
+
+    Returns:
+        CellMerge
+    """
+    old_keys = (code_map.old[_entity_of(old_offsets)] << _CELL_BITS) | old_slots
+    delta_keys = (code_map.delta[_entity_of(delta_offsets)] << _CELL_BITS) | delta_slots
+    keys, old_positions, delta_positions = merge_sorted(old_keys, delta_keys)
+
+    entities = keys >> _CELL_BITS
+    offsets = np.searchsorted(entities, np.arange(code_map.n_keys + 1)).astype(np.int64)
+    return CellMerge(offsets, keys & ((1 << _CELL_BITS) - 1), old_positions, delta_positions)
+
+
+def merge_cell_entries(
+        cells: CellMerge,
+        old_cell_offsets: np.ndarray,
+        old_entries: np.ndarray,
+        delta_cell_offsets: np.ndarray,
+        delta_entries: np.ndarray,
+        entry_bits: int = _ENTRY_BITS
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Mezcla las entradas de cada celda (registros HyperLogLog, buckets de cuantiles, columnas de pivotes).
+
+    Args:
+        cells: Celdas ya mezcladas con merge_cells
+        old_cell_offsets: Inicio de las entradas de cada celda existente
+        old_entries: Entrada de cada posición (entero no negativo < 2^entry_bits), ordenadas en cada celda
+        delta_cell_offsets: Inicio de las entradas de cada celda del delta
+        delta_entries: Entradas del delta
+        entry_bits: Bits de la parte baja de la clave (celda, entrada)
+
+    Returns:
+        (inicio de las entradas de cada celda mezclada, entradas, posición de cada
+        entrada existente, posición de cada entrada del delta)
+    """
+    old_keys = (cells.old_positions[_entity_of(old_cell_offsets)] << entry_bits) | old_entries
+    delta_keys = (cells.delta_positions[_entity_of(delta_cell_offsets)] << entry_bits) | delta_entries
+    keys, old_positions, delta_positions = merge_sorted(old_keys, delta_keys)
+
+    cell_offsets = np.searchsorted(keys >> entry_bits, np.arange(cells.n_cells + 1)).astype(np.int64)
+    return cell_offsets, keys & ((1 << entry_bits) - 1), old_positions, delta_positions
+
+
+def new_files(loaded: Dict[str, float], current: Dict[str, float]) -> Optional[List[str]]:
+    """
+    Archivos nuevos desde la última carga.
+
+    Args:
+        loaded: {ruta: mtime} de los archivos ya cargados
+        current: {ruta: mtime} de los archivos en la carpeta
+
+    Returns:
+        Rutas nuevas (ordenadas), o None si un archivo cargado cambió o se borró
+        (ya no es un anexado y hace falta una carga completa)
+    """
+    for path, mtime in loaded.items():
+        if current.get(path) != mtime:
+            return None
+    return sorted(path for path in current if path not in loaded)
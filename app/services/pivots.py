@@ -0,0 +1,422 @@
+"""
+Matrices dispersas de pivote entre dos dimensiones (tienda × producto, empleado × tienda).
+
+"Ventas de cada producto en cada tienda" es un groupby por dos claves sobre
+todas las transacciones; aquí se precalcula una vez al cargar, por mes, y cada
+petición recorta filas y columnas de la matriz en lugar de agrupar filas.
+
+La matriz solo guarda las celdas con ventas, en formato CSR de dos niveles
+(como los sketches por entidad y mes):
+
+* ``offsets``: inicio de las celdas (fila, mes) de cada código de la dimensión fila
+* ``months`` / ``cell_offsets``: mes de cada celda e inicio de sus entradas
+* ``columns`` + ``amount`` / ``qty`` / ``count``: una entrada por columna con
+  ventas en el mes, ordenadas por código de columna
+
+La memoria es proporcional a las combinaciones (fila, columna, mes) con ventas,
+no a filas × columnas × meses. Un sub-pivote toma las celdas de las filas
+pedidas en los meses completos del rango, suma las filas de los días sueltos
+de los bordes desde el índice de la dimensión fila (igual que los sketches) y
+solo al final arma la tabla densa de las filas y columnas seleccionadas.
+"""
+import logging
+import time
+from pathlib import Path
+from typing import Dict, Optional, Tuple, Union
+
+import numpy as np
+
+from app.services.columnar import ColumnarStore, read_only
+from app.services.incremental import (CodeMap, combine, merge_cell_entries, merge_cells, month_slots,
+                                      slot_months)
+from app.utils.dates import month_numbers, split_whole_months
+
+logger = logging.getLogger(__name__)
+
+# Pivotes precalculados: {nombre: (dimensión fila, dimensión columna)}
+PIVOT_MATRICES = {
+    "store-product": ("KeyStore", "KeyProduct"),
+    "employee-store": ("KeyEmployee", "KeyStore"),
+}
+
+# Medidas por las que se eligen las filas y columnas con más ventas
+PIVOT_MEASURES = ("amount", "quantity", "records")
+
+PIVOT_PARTS = ("offsets", "months", "cell_offsets", "columns", "amount", "qty", "count")
+
+# Bits de la parte baja de la clave (celda, columna) al mezclar matrices
+_COLUMN_BITS = 32
+
+
+def _expand(starts: np.ndarray, ends: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Posiciones de varios tramos [inicio, fin) concatenados y el tramo de cada una"""
+    lengths = ends - starts
+    owner = np.repeat(np.arange(len(starts), dtype=np.int64), lengths)
+    before = np.concatenate(([0], np.cumsum(lengths)[:-1])) if len(lengths) else lengths
+    positions = np.arange(int(lengths.sum()), dtype=np.int64) - np.repeat(before - starts, lengths)
+    return positions, owner
+
+
+class PivotMatrix:
+    """Monto, cantidad y registros por (fila, mes, columna), solo las celdas con ventas"""
+
+    def __init__(
+            self,
+            name: str,
+            row_dimension: str,
+            column_dimension: str,
+            offsets: np.ndarray,
+            months: np.ndarray,
+            cell_offsets: np.ndarray,
+            columns: np.ndarray,
+            amount: np.ndarray,
+            qty: np.ndarray,
+            count: np.ndarray
+    ):
+        self.name = name
+        self.row_dimension = row_dimension
+        self.column_dimension = column_dimension
+        # Celdas (fila, mes) de cada código de fila, ordenadas por mes
+        self.offsets = read_only(offsets)
+        self.months = read_only(months)
+        # Entradas (columna) de cada celda, ordenadas por código de columna
+        self.cell_offsets = read_only(cell_offsets)
+        self.columns = read_only(columns)
+        self.amount = read_only(amount)
+        self.qty = read_only(qty)
+        self.count = read_only(count)
+
+    @classmethod
+    def build(cls, name: str, store: ColumnarStore, row_dimension: str, column_dimension: str) -> "PivotMatrix":
+        """
+        Construye la matriz desde los códigos de las dos dimensiones.
+
+        Args:
+            name: Nombre del pivote
+            store: Almacén columnar
+            row_dimension: Columna de clave de las filas (indexada)
+            column_dimension: Columna de clave de las columnas
+
+        Returns:
+            PivotMatrix
+        """
+        rows, columns = store.key(row_dimension), store.key(column_dimension)
+        valid = np.flatnonzero((rows.codes >= 0) & (columns.codes >= 0))
+        slots = month_slots(month_numbers(store.days[valid]))
+        n_slots = int(slots.max()) + 1 if len(slots) else 1
+        n_columns = max(columns.n_keys, 1)
+
+        # Una sola clave int64 (fila, mes, columna): ordenar y reducir tramos iguales
+        keys = (rows.codes[valid].astype(np.int64) * n_slots + slots) * n_columns + columns.codes[valid]
+        order = np.argsort(keys, kind='stable')
+        keys = keys[order]
+        starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]]) if len(keys) else np.zeros(0, dtype=np.int64)
+
+        amount = store.amount[valid[order]]
+        if np.issubdtype(amount.dtype, np.floating):
+            amount = np.nan_to_num(amount)
+        if len(starts) > 0:
+            entry_amount = np.add.reduceat(amount, starts)
+            entry_qty = np.add.reduceat(store.qty[valid[order]], starts).astype(np.int64)
+        else:
+            entry_amount = np.zeros(0, dtype=amount.dtype)
+            entry_qty = np.zeros(0, dtype=np.int64)
+        entry_count = np.diff(np.append(starts, len(keys))).astype(np.int64)
+
+        entry_keys = keys[starts]
+        cell_keys = entry_keys // n_columns
+        cell_starts = (np.flatnonzero(np.r_[True, cell_keys[1:] != cell_keys[:-1]]) if len(cell_keys)
+                       else np.zeros(0, dtype=np.int64))
+        cells = cell_keys[cell_starts]
+        offsets = np.searchsorted(cells // n_slots, np.arange(rows.n_keys + 1)).astype(np.int64)
+
+        return cls(name, row_dimension, column_dimension, offsets, slot_months(cells % n_slots),
+                   np.append(cell_starts, len(entry_keys)).astype(np.int64),
+                   (entry_keys % n_columns).astype(np.int32), entry_amount, entry_qty, entry_count)
+
+    @property
+    def n_rows(self) -> int:
+        return len(self.offsets) - 1
+
+    @property
+    def n_entries(self) -> int:
+        return len(self.columns)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(getattr(self, part).nbytes for part in PIVOT_PARTS)
+
+    def merge(self, delta: "PivotMatrix", row_map: CodeMap, column_map: CodeMap) -> "PivotMatrix":
+        """Suma la matriz de las filas nuevas (construida aparte) celda por celda"""
+        cells = merge_cells(self.offsets, month_slots(self.months), delta.offsets, month_slots(delta.months),
+                            row_map)
+        cell_offsets, columns, old_positions, delta_positions = merge_cell_entries(
+            cells, self.cell_offsets, column_map.old[self.columns], delta.cell_offsets,
+            column_map.delta[delta.columns], entry_bits=_COLUMN_BITS
+        )
+
+        def merged(part: str) -> np.ndarray:
+            return combine(len(columns), old_positions, getattr(self, part), delta_positions, getattr(delta, part))
+
+        return PivotMatrix(self.name, self.row_dimension, self.column_dimension, cells.offsets,
+                           slot_months(cells.slots), cell_offsets, columns.astype(np.int32),
+                           merged("amount"), merged("qty"), merged("count"))
+
+    def entries(
+            self,
+            row_codes: np.ndarray,
+            month_start: Optional[int] = None,
+            month_end: Optional[int] = None
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Entradas de varias filas en un rango de meses completos.
+
+        Args:
+            row_codes: Códigos de fila (≥ 0)
+            month_start: Primer mes incluido (None sin límite)
+            month_end: Último mes incluido (None sin límite)
+
+        Returns:
+            (posición en row_codes, código de columna, Amount sin convertir, Qty, registros) por entrada
+        """
+        cells, owner = _expand(self.offsets[row_codes], self.offsets[row_codes + 1])
+        keep = np.ones(len(cells), dtype=bool)
+        if month_start is not None:
+            keep &= self.months[cells] >= month_start
+        if month_end is not None:
+            keep &= self.months[cells] <= month_end
+        cells, owner = cells[keep], owner[keep]
+
+        positions, cell_owner = _expand(self.cell_offsets[cells], self.cell_offsets[cells + 1])
+        return (owner[cell_owner], self.columns[positions].astype(np.int64), self.amount[positions],
+                self.qty[positions], self.count[positions])
+
+    def save(self, directory: Union[str, Path]):
+        """Guarda la matriz como archivos .npy mapeables en la carpeta del almacén"""
+        directory = Path(directory)
+        for part in PIVOT_PARTS:
+            np.save(directory / f"{self.name}.pivot.{part}.npy", getattr(self, part), allow_pickle=False)
+
+    @classmethod
+    def load(cls, directory: Union[str, Path], name: str, row_dimension: str,
+             column_dimension: str) -> Optional["PivotMatrix"]:
+        """Mapea en memoria una matriz guardada con save, o None si no existe"""
+        directory = Path(directory)
+        paths = {part: directory / f"{name}.pivot.{part}.npy" for part in PIVOT_PARTS}
+        if not all(path.exists() for path in paths.values()):
+            return None
+        return cls(name, row_dimension, column_dimension,
+                   **{part: np.load(path, mmap_mode='r') for part, path in paths.items()})
+
+
+def pivot_entries(
+        store: ColumnarStore,
+        matrix: PivotMatrix,
+        row_codes: np.ndarray,
+        day_start: Optional[int] = None,
+        day_end: Optional[int] = None
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Ventas de varias filas del pivote en un rango de días, sin densificar.
+
+    Los meses completos salen de la matriz; los días de meses parciales en los
+    bordes se leen de las filas del índice de la dimensión fila.
+
+    Args:
+        store: Almacén columnar del que se construyó la matriz
+        matrix: Matriz del pivote
+        row_codes: Códigos de fila (≥ 0)
+        day_start: Primer día incluido (número de día)
+        day_end: Último día incluido (número de día)
+
+    Returns:
+        (posición en row_codes, código de columna, Amount sin convertir, Qty, registros);
+        una misma (fila, columna) puede aparecer varias veces
+    """
+    row_codes = np.asarray(row_codes, dtype=np.int64)
+    month_start, month_end, pieces = split_whole_months(day_start, day_end)
+    if month_start is not None and month_end is not None and month_start > month_end:
+        parts = [tuple(np.zeros(0, dtype=values.dtype) for values in
+                       (row_codes, row_codes, matrix.amount, matrix.qty, matrix.count))]
+    else:
+        parts = [matrix.entries(row_codes, month_start, month_end)]
+
+    row_column, column_column = store.key(matrix.row_dimension), store.key(matrix.column_dimension)
+    for piece_start, piece_end in pieces:
+        piece_rows = [row_column.rows(int(code), piece_start, piece_end) for code in row_codes]
+        rows = np.concatenate(piece_rows) if piece_rows else np.zeros(0, dtype=np.int64)
+        owner = np.repeat(np.arange(len(row_codes), dtype=np.int64), [len(r) for r in piece_rows])
+        columns = column_column.codes[rows].astype(np.int64)
+        valid = columns >= 0
+        amount = store.amount[rows[valid]]
+        if np.issubdtype(amount.dtype, np.floating):
+            amount = np.nan_to_num(amount)
+        parts.append((owner[valid], columns[valid], amount, store.qty[rows[valid]].astype(np.int64),
+                      np.ones(int(valid.sum()), dtype=np.int64)))
+
+    return tuple(np.concatenate(values) for values in zip(*parts))
+
+
+def _top(totals: np.ndarray, present: np.ndarray, limit: int) -> np.ndarray:
+    """Posiciones con ventas ordenadas por total descendente (empates por posición), hasta limit"""
+    candidates = np.flatnonzero(present)
+    order = np.lexsort((candidates, -totals[candidates]))
+    return candidates[order[:limit]]
+
+
+def pivot_table(
+        store: ColumnarStore,
+        matrix: PivotMatrix,
+        row_codes: Optional[np.ndarray] = None,
+        column_codes: Optional[np.ndarray] = None,
+        day_start: Optional[int] = None,
+        day_end: Optional[int] = None,
+        order_by: str = "amount",
+        row_limit: int = 50,
+        column_limit: int = 50
+) -> Dict:
+    """
+    Sub-pivote denso de filas × columnas en un rango de días.
+
+    Sin filas (o columnas) pedidas se eligen las de mayor ``order_by`` en el
+    rango; las columnas se eligen dentro de las filas seleccionadas.
+
+    Args:
+        store: Almacén columnar del que se construyó la matriz
+        matrix: Matriz del pivote
+        row_codes: (Opcional) Códigos de fila, -1 para claves que no existen
+        column_codes: (Opcional) Códigos de columna distintos, -1 para claves que no existen
+        day_start: Primer día incluido (número de día)
+        day_end: Último día incluido (número de día)
+        order_by: Medida para elegir filas y columnas (amount, quantity o records)
+        row_limit: Máximo de filas elegidas
+        column_limit: Máximo de columnas elegidas
+
+    Returns:
+        {rows, columns: códigos seleccionados; amount, qty, count: tablas
+        filas × columnas; total_rows, total_columns: filas y columnas con ventas}
+    """
+    if order_by not in PIVOT_MEASURES:
+        raise ValueError(f"order_by debe ser uno de {', '.join(PIVOT_MEASURES)}")
+
+    candidates = (np.arange(matrix.n_rows, dtype=np.int64) if row_codes is None
+                  else np.asarray(row_codes, dtype=np.int64))
+    known = np.flatnonzero(candidates >= 0)
+    owner, columns, amount, qty, count = pivot_entries(store, matrix, candidates[known], day_start, day_end)
+    owner = known[owner]
+
+    n_columns = store.key(matrix.column_dimension).n_keys
+    if column_codes is not None:
+        column_codes = np.asarray(column_codes, dtype=np.int64)
+        position = np.full(n_columns + 1, -1, dtype=np.int64)
+        position[column_codes[column_codes >= 0]] = np.flatnonzero(column_codes >= 0)
+        columns = position[columns]
+        keep = columns >= 0
+        owner, columns, amount, qty, count = owner[keep], columns[keep], amount[keep], qty[keep], count[keep]
+        n_columns = len(column_codes)
+
+    measure = {"amount": amount, "quantity": qty, "records": count}[order_by].astype(np.float64)
+    row_present = np.bincount(owner, weights=count, minlength=len(candidates)) > 0
+    if row_codes is None:
+        selected_rows = _top(np.bincount(owner, weights=measure, minlength=len(candidates)), row_present,
+                             row_limit)
+    else:
+        selected_rows = np.arange(len(candidates), dtype=np.int64)
+
+    row_position = np.full(len(candidates), -1, dtype=np.int64)
+    row_position[selected_rows] = np.arange(len(selected_rows))
+    owner = row_position[owner]
+    keep = owner >= 0
+    owner, columns, amount, qty, count = owner[keep], columns[keep], amount[keep], qty[keep], count[keep]
+    measure = measure[keep]
+
+    column_present = np.bincount(columns, weights=count, minlength=n_columns) > 0
+    if column_codes is None:
+        selected_columns = _top(np.bincount(columns, weights=measure, minlength=n_columns), column_present,
+                                column_limit)
+    else:
+        selected_columns = np.arange(n_columns, dtype=np.int64)
+
+    column_position = np.full(n_columns, -1, dtype=np.int64)
+    column_position[selected_columns] = np.arange(len(selected_columns))
+    columns = column_position[columns]
+    keep = columns >= 0
+
+    shape = (len(selected_rows), len(selected_columns))
+    flat = owner[keep] * shape[1] + columns[keep]
+    tables = {}
+    for part, values in (("amount", amount), ("qty", qty), ("count", count)):
+        table = np.zeros(shape[0] * shape[1], dtype=values.dtype)
+        np.add.at(table, flat, values[keep])
+        tables[part] = table.reshape(shape)
+
+    return {
+        "rows": candidates[selected_rows],
+        "columns": selected_columns if column_codes is None else column_codes,
+        "total_rows": int(row_present.sum()) if row_codes is None else len(candidates),
+        "total_columns": int(column_present.sum()) if column_codes is None else n_columns,
+        **tables,
+    }
+
+
+def build_pivot_matrices(store: ColumnarStore, pivots: Dict[str, Tuple[str, str]] = None) -> Dict[str, PivotMatrix]:
+    """
+    Construye las matrices de pivote y registra tiempo y memoria.
+
+    Args:
+        store: Almacén columnar
+        pivots: {nombre: (dimensión fila, dimensión columna)}; por defecto PIVOT_MATRICES
+
+    Returns:
+        Diccionario {nombre: PivotMatrix} (solo pivotes con ambas dimensiones en el datamart)
+    """
+    pivots = PIVOT_MATRICES if pivots is None else pivots
+    matrices = {}
+    for name, (row_dimension, column_dimension) in pivots.items():
+        if row_dimension not in store.keys or column_dimension not in store.keys:
+            continue
+        if not store.key(row_dimension).indexed:
+            continue
+
+        start = time.perf_counter()
+        matrix = PivotMatrix.build(name, store, row_dimension, column_dimension)
+        matrices[name] = matrix
+        logger.info(
+            f"Pivote {name}: {matrix.n_entries:,} celdas con ventas, "
+            f"{matrix.nbytes / 1024 ** 2:,.1f} MB, {time.perf_counter() - start:.2f}s"
+        )
+    return matrices
+
+
+def load_pivot_matrices(directory: Union[str, Path], pivots: Dict[str, Tuple[str, str]] = None) -> Dict[str, PivotMatrix]:
+    """Mapea las matrices de pivote guardadas en la carpeta del almacén compartido"""
+    pivots = PIVOT_MATRICES if pivots is None else pivots
+    matrices = {}
+    for name, (row_dimension, column_dimension) in pivots.items():
+        matrix = PivotMatrix.load(directory, name, row_dimension, column_dimension)
+        if matrix is not None:
+            matrices[name] = matrix
+    return matrices
+
+
+def merge_pivot_matrices(
+        matrices: Dict[str, PivotMatrix],
+        delta: Dict[str, PivotMatrix],
+        code_maps: Dict[str, CodeMap]
+) -> Dict[str, PivotMatrix]:
+    """
+    Suma a cada matriz la de las filas nuevas.
+
+    Raises:
+        ValueError: si las matrices de las filas nuevas no son las mismas
+    """
+    if set(matrices) != set(delta):
+        raise ValueError("Las filas nuevas no tienen las mismas matrices de pivote")
+
+    start = time.perf_counter()
+    merged = {
+        name: matrix.merge(delta[name], code_maps[matrix.row_dimension], code_maps[matrix.column_dimension])
+        for name, matrix in matrices.items()
+    }
+    logger.info(f"Pivotes mezclados en {time.perf_counter() - start:.2f}s")
+    return merged
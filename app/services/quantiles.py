@@ -0,0 +1,509 @@
+"""
+Sketches de cuantiles de Amount y del valor del ticket por (entidad, mes).
+
+Se usa un sketch de buckets logarítmicos (estilo DDSketch): cada valor cae en
+el bucket ``ceil(log_gamma(|x| / QUANTILE_MIN_VALUE))`` con signo, así que el
+representante del bucket está a lo más a ``QUANTILE_RELATIVE_ACCURACY`` (1%)
+del valor real. Unir sketches es sumar conteos por bucket, lo que permite
+guardar un sketch disperso por celda (entidad, mes) en formato CSR, igual que
+los cubos diarios y los HyperLogLog, y combinar cualquier rango de meses.
+
+Garantía: para el cuantil q, el valor retornado está a menos del 1% (relativo)
+del valor exacto de rango ``floor(q * (n - 1))`` (``np.quantile`` con
+``method='lower'``). Valores con magnitud menor a ``QUANTILE_MIN_VALUE`` se
+tratan como cero (error absoluto menor a un centavo).
+
+El histograma se arma repartiendo los buckets en intervalos de igual ancho
+(por defecto entre p1 y p99, con las colas contadas aparte).
+
+Medidas:
+- ``amount``: Amount de cada registro.
+- ``ticket``: suma de Amount de cada ticket de la entidad, en el mes del
+  primer día del ticket.
+"""
+import logging
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from app.services.columnar import ColumnarStore, read_only
+from app.services.incremental import CodeMap, combine, merge_cell_entries, merge_cells, month_slots, slot_months
+from app.services.sketches import range_rows
+from app.utils.dates import MISSING_MONTH, month_numbers, split_whole_months
+
+logger = logging.getLogger(__name__)
+
+# Error relativo máximo de cada cuantil
+QUANTILE_RELATIVE_ACCURACY = 0.01
+# Magnitud mínima distinguible (valores menores cuentan como cero)
+QUANTILE_MIN_VALUE = 0.01
+
+_GAMMA = (1 + QUANTILE_RELATIVE_ACCURACY) / (1 - QUANTILE_RELATIVE_ACCURACY)
+_LOG_GAMMA = np.log(_GAMMA)
+# Buckets por signo: cubre magnitudes hasta ~QUANTILE_MIN_VALUE * gamma^2047 (> 1e15)
+_MAX_BUCKET = 2047
+# Los buckets con signo van de -(_MAX_BUCKET + 1) a _MAX_BUCKET + 1; 0 es el cero
+BUCKET_OFFSET = _MAX_BUCKET + 1
+N_BUCKETS = 2 * BUCKET_OFFSET + 1
+
+# Medidas por dimensión
+QUANTILE_DIMENSIONS = {
+    "KeyEmployee": ("amount", "ticket"),
+    "KeyStore": ("amount", "ticket"),
+    "KeyProduct": ("amount",),
+}
+
+QUANTILE_PARTS = ("offsets", "months", "cell_offsets", "buckets", "counts")
+
+
+def bucket_keys(values: np.ndarray) -> np.ndarray:
+    """
+    Bucket con signo de cada valor.
+
+    Returns:
+        Arreglo int16: 0 para magnitudes menores a QUANTILE_MIN_VALUE, ±(j + 1)
+        con j = ceil(log_gamma(|x| / QUANTILE_MIN_VALUE)) en otro caso
+    """
+    values = np.asarray(values, dtype=np.float64)
+    magnitude = np.abs(values)
+    large = magnitude >= QUANTILE_MIN_VALUE
+    scaled = np.where(large, magnitude, QUANTILE_MIN_VALUE) / QUANTILE_MIN_VALUE
+    index = np.minimum(np.ceil(np.log(scaled) / _LOG_GAMMA), _MAX_BUCKET) + 1
+    return np.where(large, np.sign(values) * index, 0).astype(np.int16)
+
+
+def bucket_values(keys: np.ndarray) -> np.ndarray:
+    """Valor representante de cada bucket con signo (error relativo <= QUANTILE_RELATIVE_ACCURACY)"""
+    keys = np.asarray(keys, dtype=np.int64)
+    index = np.abs(keys) - 1
+    representative = QUANTILE_MIN_VALUE * 2 * np.power(_GAMMA, index) / (_GAMMA + 1)
+    return np.where(keys == 0, 0.0, np.sign(keys) * representative)
+
+
+def dense_counts(keys: np.ndarray, counts: Optional[np.ndarray] = None) -> np.ndarray:
+    """Conteos por bucket en un arreglo denso de N_BUCKETS posiciones"""
+    dense = np.bincount(np.asarray(keys, dtype=np.int64) + BUCKET_OFFSET, weights=counts, minlength=N_BUCKETS)
+    return dense.astype(np.int64)
+
+
+def quantiles_from_counts(dense: np.ndarray, qs) -> List[Optional[float]]:
+    """
+    Cuantiles aproximados de un arreglo denso de conteos por bucket.
+
+    Args:
+        dense: Conteos por bucket (dense_counts)
+        qs: Cuantiles entre 0 y 1
+
+    Returns:
+        Valor de cada cuantil (None si no hay datos)
+    """
+    total = int(dense.sum())
+    if total == 0:
+        return [None for _ in qs]
+    cumulative = np.cumsum(dense)
+    ranks = np.floor(np.asarray(qs, dtype=np.float64) * (total - 1))
+    positions = np.searchsorted(cumulative, ranks, side='right')
+    return bucket_values(positions - BUCKET_OFFSET).tolist()
+
+
+def histogram_from_counts(
+        dense: np.ndarray,
+        bins: int,
+        low: Optional[float] = None,
+        high: Optional[float] = None
+) -> Tuple[List[Tuple[float, float, int]], int, int]:
+    """
+    Histograma de igual ancho de un arreglo denso de conteos por bucket.
+
+    Cada bucket del sketch se asigna completo al intervalo que contiene su
+    representante. Sin límites se usa el rango p1-p99 para que las colas no
+    aplasten el histograma; lo que queda fuera se reporta aparte.
+
+    Args:
+        dense: Conteos por bucket (dense_counts)
+        bins: Número de intervalos
+        low: Límite inferior (por defecto p1)
+        high: Límite superior (por defecto p99)
+
+    Returns:
+        ([(límite inferior, límite superior, conteo)], conteo bajo low, conteo sobre high)
+    """
+    used = np.flatnonzero(dense)
+    if len(used) == 0:
+        return [], 0, 0
+
+    default_low, default_high = quantiles_from_counts(dense, [0.01, 0.99])
+    low = default_low if low is None else low
+    high = default_high if high is None else high
+    if high <= low:
+        high = low + QUANTILE_MIN_VALUE
+    edges = np.linspace(low, high, bins + 1)
+
+    values = bucket_values(used - BUCKET_OFFSET)
+    weights = dense[used]
+    below = int(weights[values < low].sum())
+    above = int(weights[values > high].sum())
+    inside = (values >= low) & (values <= high)
+    positions = np.clip(np.searchsorted(edges, values[inside], side='right') - 1, 0, bins - 1)
+    counts = np.bincount(positions, weights=weights[inside], minlength=bins).astype(np.int64)
+    return [(float(edges[i]), float(edges[i + 1]), int(counts[i])) for i in range(bins)], below, above
+
+
+class QuantileSketch:
+    """Sketch de cuantiles disperso por (entidad, mes) de una medida en una dimensión"""
+
+    def __init__(
+            self,
+            name: str,
+            measure: str,
+            offsets: np.ndarray,
+            months: np.ndarray,
+            cell_offsets: np.ndarray,
+            buckets: np.ndarray,
+            counts: np.ndarray,
+            grand: Optional["QuantileSketch"] = None
+    ):
+        self.name = name
+        self.measure = measure
+        # Celdas (meses) de cada entidad: offsets[code]:offsets[code + 1]
+        self.offsets = read_only(offsets)
+        self.months = read_only(months)
+        # Buckets con datos de cada celda y su conteo
+        self.cell_offsets = read_only(cell_offsets)
+        self.buckets = read_only(buckets)
+        self.counts = read_only(counts)
+        # Sketch de todo el datamart por mes (una sola entidad)
+        self.grand = grand
+
+    @classmethod
+    def build(
+            cls,
+            name: str,
+            measure: str,
+            n_entities: int,
+            entity_codes: np.ndarray,
+            months: np.ndarray,
+            values: np.ndarray
+    ) -> "QuantileSketch":
+        """
+        Construye el sketch desde valores sueltos.
+
+        Args:
+            name: Columna de la dimensión
+            measure: Medida ("amount" o "ticket")
+            n_entities: Número de entidades de la dimensión
+            entity_codes: Código de entidad de cada valor (>= 0)
+            months: Mes de cada valor (MISSING_MONTH sin fecha)
+            values: Valores de la medida
+        """
+        # Meses como posiciones pequeñas: 0 para MISSING_MONTH
+        known = months != MISSING_MONTH
+        first_month = int(months[known].min()) if known.any() else 0
+        month_slot = np.where(known, months - first_month + 1, 0)
+        n_slots = int(month_slot.max()) + 1 if len(month_slot) else 1
+
+        cells = entity_codes.astype(np.int64) * n_slots + month_slot
+        composite = np.sort(cells * N_BUCKETS + (bucket_keys(values).astype(np.int64) + BUCKET_OFFSET))
+        is_start = np.ones(len(composite), dtype=bool)
+        is_start[1:] = composite[1:] != composite[:-1]
+        starts = np.flatnonzero(is_start)
+        unique = composite[starts]
+        counts = np.diff(np.append(starts, len(composite))).astype(np.int64)
+        buckets = (unique % N_BUCKETS - BUCKET_OFFSET).astype(np.int16)
+        entry_cells = unique // N_BUCKETS
+
+        cell_starts = np.flatnonzero(np.r_[True, entry_cells[1:] != entry_cells[:-1]]) if len(unique) else starts
+        cell_ids = entry_cells[cell_starts]
+        cell_offsets = np.append(cell_starts, len(unique)).astype(np.int64)
+        slots = cell_ids % n_slots
+        cell_months = np.where(slots == 0, MISSING_MONTH, slots - 1 + first_month).astype(np.int64)
+        offsets = np.searchsorted(cell_ids // n_slots, np.arange(n_entities + 1)).astype(np.int64)
+
+        # Unión por mes de todas las entidades
+        grand_dense = np.bincount(
+            (entry_cells % n_slots) * N_BUCKETS + buckets.astype(np.int64) + BUCKET_OFFSET,
+            weights=counts, minlength=n_slots * N_BUCKETS
+        ).astype(np.int64).reshape(n_slots, N_BUCKETS)
+        grand_slots = np.flatnonzero(grand_dense.any(axis=1))
+        grand_rows, grand_buckets = np.nonzero(grand_dense[grand_slots])
+        grand = cls(
+            name, measure,
+            np.array([0, len(grand_slots)], dtype=np.int64),
+            np.where(grand_slots == 0, MISSING_MONTH, grand_slots - 1 + first_month).astype(np.int64),
+            np.searchsorted(grand_rows, np.arange(len(grand_slots) + 1)).astype(np.int64),
+            (grand_buckets - BUCKET_OFFSET).astype(np.int16),
+            grand_dense[grand_slots][grand_rows, grand_buckets]
+        )
+
+        return cls(name, measure, offsets, cell_months, cell_offsets, buckets, counts, grand)
+
+    @property
+    def nbytes(self) -> int:
+        total = sum(getattr(self, part).nbytes for part in QUANTILE_PARTS)
+        return total + (self.grand.nbytes if self.grand is not None else 0)
+
+    def merge(self, delta: "QuantileSketch", code_map: CodeMap) -> "QuantileSketch":
+        """
+        Une el sketch de las filas nuevas (construido aparte): suma de conteos por bucket en cada celda.
+
+        Args:
+            delta: Sketch de las filas nuevas, con los códigos del delta
+            code_map: Códigos de las entidades de cada sketch en la unión
+        """
+        cells = merge_cells(self.offsets, month_slots(self.months), delta.offsets, month_slots(delta.months),
+                            code_map)
+        cell_offsets, buckets, old_positions, delta_positions = merge_cell_entries(
+            cells, self.cell_offsets, self.buckets.astype(np.int64) + BUCKET_OFFSET,
+            delta.cell_offsets, delta.buckets.astype(np.int64) + BUCKET_OFFSET
+        )
+        counts = combine(len(buckets), old_positions, self.counts, delta_positions, delta.counts)
+        grand = (self.grand.merge(delta.grand, CodeMap.single())
+                 if self.grand is not None and delta.grand is not None else None)
+        return QuantileSketch(self.name, self.measure, cells.offsets, slot_months(cells.slots), cell_offsets,
+                              (buckets - BUCKET_OFFSET).astype(np.int16), counts, grand)
+
+    def merged_counts(
+            self,
+            code: Optional[int],
+            month_start: Optional[int] = None,
+            month_end: Optional[int] = None,
+            include_missing: bool = True
+    ) -> np.ndarray:
+        """
+        Conteos densos por bucket de la unión de los meses de una entidad.
+
+        Args:
+            code: Código de la entidad o None para todo el datamart
+            month_start: Primer mes incluido (None sin límite)
+            month_end: Último mes incluido (None sin límite)
+            include_missing: Si se incluyen los valores sin fecha
+        """
+        if code is None:
+            return self.grand.merged_counts(0, month_start, month_end, include_missing)
+
+        lo, hi = int(self.offsets[code]), int(self.offsets[code + 1])
+        months = self.months[lo:hi]
+        first = MISSING_MONTH if include_missing else MISSING_MONTH + 1
+        if month_start is not None:
+            first = max(first, month_start)
+        start = lo + int(np.searchsorted(months, first, side='left'))
+        end = lo + int(np.searchsorted(months, month_end, side='right')) if month_end is not None else hi
+
+        if end <= start:
+            return np.zeros(N_BUCKETS, dtype=np.int64)
+        a, b = int(self.cell_offsets[start]), int(self.cell_offsets[end])
+        return dense_counts(self.buckets[a:b], self.counts[a:b])
+
+    def save(self, directory: Union[str, Path]):
+        """Guarda el sketch y su unión por mes como archivos .npy mapeables en la carpeta del almacén"""
+        directory = Path(directory)
+        for scope, sketch in (("cells", self), ("grand", self.grand)):
+            if sketch is None:
+                continue
+            for part in QUANTILE_PARTS:
+                np.save(directory / f"{self.name}.quantiles.{self.measure}.{scope}.{part}.npy",
+                        getattr(sketch, part), allow_pickle=False)
+
+    @classmethod
+    def load(cls, directory: Union[str, Path], name: str, measure: str) -> Optional["QuantileSketch"]:
+        """Mapea en memoria un sketch guardado con save, o None si no existe"""
+        directory = Path(directory)
+
+        def parts(scope: str) -> Optional[Dict[str, np.ndarray]]:
+            paths = {part: directory / f"{name}.quantiles.{measure}.{scope}.{part}.npy" for part in QUANTILE_PARTS}
+            if not all(path.exists() for path in paths.values()):
+                return None
+            return {part: np.load(path, mmap_mode='r') for part, path in paths.items()}
+
+        cells, grand = parts("cells"), parts("grand")
+        if cells is None:
+            return None
+        return cls(name, measure, **cells, grand=cls(name, measure, **grand) if grand is not None else None)
+
+
+def _amounts(store: ColumnarStore, rows: Optional[np.ndarray], amount_decimals: Optional[int]) -> np.ndarray:
+    amount = store.amount if rows is None else store.amount[rows]
+    if amount_decimals is not None:
+        return amount / (10 ** amount_decimals)
+    return amount.astype(np.float64)
+
+
+def _ticket_values(store: ColumnarStore, rows: np.ndarray, amount_decimals: Optional[int]) -> np.ndarray:
+    """Suma de Amount de cada ticket presente en las filas"""
+    codes, _ = pd.factorize(pd.Series(store.text('TicketId', rows)))
+    valid = codes >= 0
+    amounts = np.nan_to_num(_amounts(store, rows, amount_decimals))
+    return np.bincount(codes[valid], weights=amounts[valid])
+
+
+def distribution_counts(
+        store: ColumnarStore,
+        sketch: QuantileSketch,
+        code: Optional[int],
+        day_start: Optional[int] = None,
+        day_end: Optional[int] = None,
+        amount_decimals: Optional[int] = None
+) -> np.ndarray:
+    """
+    Conteos densos por bucket de una entidad en un rango de días.
+
+    Los meses completos salen del sketch; los días de meses parciales en los
+    bordes se agregan desde las filas (para tickets, sumando las filas del
+    tramo de cada ticket).
+
+    Args:
+        store: Almacén columnar
+        sketch: Sketch de la dimensión y la medida
+        code: Código de la entidad o None para todo el datamart
+        day_start: Primer día incluido (número de día)
+        day_end: Último día incluido (número de día)
+        amount_decimals: Decimales de Amount si está en punto fijo
+
+    Returns:
+        Arreglo int64 de N_BUCKETS conteos
+    """
+    if (code is not None and code < 0) or (day_start is not None and day_end is not None and day_end < day_start):
+        return np.zeros(N_BUCKETS, dtype=np.int64)
+
+    month_start, month_end, pieces = split_whole_months(day_start, day_end)
+    if month_start is not None and month_end is not None and month_start > month_end:
+        counts = np.zeros(N_BUCKETS, dtype=np.int64)
+    else:
+        counts = sketch.merged_counts(code, month_start, month_end, include_missing=day_start is None)
+
+    for piece_start, piece_end in pieces:
+        rows = range_rows(store, sketch.name, code, piece_start, piece_end)
+        counts += rows_counts(store, sketch.measure, rows, amount_decimals)
+
+    return counts
+
+
+def rows_counts(store: ColumnarStore, measure: str, rows: np.ndarray,
+                amount_decimals: Optional[int] = None) -> np.ndarray:
+    """
+    Conteos densos por bucket calculados desde filas (sin sketch).
+
+    Args:
+        store: Almacén columnar
+        measure: "amount" (por registro) o "ticket" (suma de las filas de cada ticket)
+        rows: Filas incluidas
+        amount_decimals: Decimales de Amount si está en punto fijo
+
+    Returns:
+        Arreglo int64 de N_BUCKETS conteos
+    """
+    if measure == "ticket":
+        values = _ticket_values(store, rows, amount_decimals)
+    else:
+        values = _amounts(store, rows, amount_decimals)
+        values = values[~np.isnan(values)]
+    return dense_counts(bucket_keys(values))
+
+
+def _ticket_table(store: ColumnarStore, amount_decimals: Optional[int]) -> pd.DataFrame:
+    """Código de ticket, día del primer registro y Amount por fila válida"""
+    ticket_codes, _ = store.text_codes('TicketId')
+    return pd.DataFrame({
+        'ticket': ticket_codes,
+        'day': store.days,
+        'amount': np.nan_to_num(_amounts(store, None, amount_decimals)),
+    })
+
+
+def build_quantile_sketches(
+        store: ColumnarStore,
+        amount_decimals: Optional[int] = None,
+        dimensions: Dict[str, Tuple[str, ...]] = None
+) -> Dict[str, Dict[str, QuantileSketch]]:
+    """
+    Construye los sketches de cuantiles por (entidad, mes) y registra tiempo y memoria.
+
+    Args:
+        store: Almacén columnar
+        amount_decimals: Decimales de Amount si está en punto fijo
+        dimensions: {dimensión: medidas}; por defecto QUANTILE_DIMENSIONS
+
+    Returns:
+        Diccionario {dimensión: {medida: QuantileSketch}}
+    """
+    dimensions = QUANTILE_DIMENSIONS if dimensions is None else dimensions
+    row_months = month_numbers(store.days)
+    amounts = _amounts(store, None, amount_decimals)
+    tickets = _ticket_table(store, amount_decimals) if 'TicketId' in store.text_names else None
+
+    sketches: Dict[str, Dict[str, QuantileSketch]] = {}
+    for name, measures in dimensions.items():
+        if name not in store.keys:
+            continue
+
+        start = time.perf_counter()
+        column = store.key(name)
+        sketches[name] = {}
+        for measure in measures:
+            if measure == "amount":
+                valid = (column.codes >= 0) & ~np.isnan(amounts)
+                sketches[name][measure] = QuantileSketch.build(
+                    name, measure, column.n_keys, column.codes[valid], row_months[valid], amounts[valid]
+                )
+            elif measure == "ticket" and tickets is not None:
+                frame = tickets.assign(entity=column.codes)
+                frame = frame[(frame['ticket'] >= 0) & (frame['entity'] >= 0)]
+                per_ticket = frame.groupby(['entity', 'ticket'], sort=False).agg(
+                    day=('day', 'min'), amount=('amount', 'sum')
+                )
+                sketches[name][measure] = QuantileSketch.build(
+                    name, measure, column.n_keys,
+                    per_ticket.index.get_level_values('entity').to_numpy(),
+                    month_numbers(per_ticket['day'].to_numpy()),
+                    per_ticket['amount'].to_numpy()
+                )
+
+        logger.info(
+            f"Sketches de cuantiles {name} ({', '.join(sketches[name])}): "
+            f"{sum(s.nbytes for s in sketches[name].values()) / 1024 ** 2:,.1f} MB, "
+            f"{time.perf_counter() - start:.2f}s"
+        )
+
+    return sketches
+
+
+def load_quantile_sketches(
+        directory: Union[str, Path],
+        dimensions: Dict[str, Tuple[str, ...]] = None
+) -> Dict[str, Dict[str, QuantileSketch]]:
+    """Mapea los sketches de cuantiles guardados en la carpeta del almacén compartido"""
+    dimensions = QUANTILE_DIMENSIONS if dimensions is None else dimensions
+    sketches: Dict[str, Dict[str, QuantileSketch]] = {}
+    for name, measures in dimensions.items():
+        loaded = {measure: QuantileSketch.load(directory, name, measure) for measure in measures}
+        loaded = {measure: sketch for measure, sketch in loaded.items() if sketch is not None}
+        if loaded:
+            sketches[name] = loaded
+    return sketches
+
+
+def merge_quantile_sketches(
+        sketches: Dict[str, Dict[str, QuantileSketch]],
+        delta: Dict[str, Dict[str, QuantileSketch]],
+        code_maps: Dict[str, CodeMap]
+) -> Dict[str, Dict[str, QuantileSketch]]:
+    """
+    Une los sketches de cuantiles de las filas nuevas con los existentes y registra el tiempo.
+
+    Raises:
+        ValueError: si los dos lados no tienen los mismos sketches
+    """
+    if {name: set(measures) for name, measures in sketches.items()} != \
+            {name: set(measures) for name, measures in delta.items()}:
+        raise ValueError("Las filas nuevas no tienen los mismos sketches de cuantiles")
+
+    start = time.perf_counter()
+    merged = {
+        name: {measure: sketch.merge(delta[name][measure], code_maps[name]) for measure, sketch in measures.items()}
+        for name, measures in sketches.items()
+    }
+    logger.info(f"Sketches de cuantiles actualizados en {time.perf_counter() - start:.2f}s")
+    return merged
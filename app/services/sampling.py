@@ -0,0 +1,381 @@
+"""
+Muestra estratificada (tienda × mes) para respuestas aproximadas.
+
+Los tableros exploratorios sobre toda la historia no necesitan totales exactos
+sino respuestas rápidas. Al cargar se guarda una muestra de las transacciones
+estratificada por (tienda, mes) y los totales de un recorte (entidad, periodo,
+división) se estiman desde ella con su intervalo de confianza, sin importar
+cuántas filas tenga el datamart.
+
+Selección (determinista y mezclable):
+
+* Cada fila recibe una prioridad uniforme en [0, 1) que es un hash de su
+  posición en el almacén (las filas anexadas conservan las posiciones).
+* Dentro de cada estrato se guardan las filas con prioridad menor a la fracción
+  ``APPROX_SAMPLE_FRACTION`` y, además, las ``APPROX_MIN_STRATUM_ROWS`` de menor
+  prioridad, para que los estratos chicos también estén representados.
+
+Equivale a tomar las ``n_h`` filas de menor prioridad del estrato, es decir, un
+muestreo aleatorio simple de tamaño ``n_h``. Al anexar archivos, las filas que
+pueden entrar a la muestra son las de la muestra anterior o las de la muestra de
+las filas nuevas, así que la mezcla aplica la misma regla a su unión y el
+resultado es idéntico a muestrear el datamart completo.
+
+Estimación (dominio dentro de un muestreo estratificado): con ``N_h`` filas y
+``n_h`` muestreadas en el estrato ``h``, el total de ``y`` (monto, cantidad o 1
+si la fila cumple el recorte, 0 si no) es ``Σ N_h / n_h · Σ y`` y su varianza
+``Σ N_h² (1 - n_h / N_h) s_h² / n_h``. El intervalo usa la aproximación normal.
+"""
+import logging
+import time
+from pathlib import Path
+from typing import Dict, Optional, Tuple, Union
+
+import numpy as np
+
+from app.services.columnar import ColumnarStore, read_only
+from app.services.incremental import CodeMap, combine, merge_sorted, month_slots, slot_months
+from app.utils.dates import MISSING_MONTH, month_numbers
+
+logger = logging.getLogger(__name__)
+
+# Nivel de confianza de los intervalos y su cuantil normal
+CONFIDENCE_LEVEL = 0.95
+_Z = 1.959963984540054
+
+# Dimensión por la que se estratifica (además del mes)
+STRATUM_DIMENSION = 'KeyStore'
+
+# Bits de la parte baja de la clave (tienda, mes) de cada estrato
+_MONTH_BITS = 32
+
+SAMPLE_PARTS = ("keys", "sizes", "offsets", "rows", "priorities", "days", "amount", "qty")
+
+
+def row_priorities(rows: np.ndarray) -> np.ndarray:
+    """Prioridad uniforme en [0, 1) de cada posición de fila (hash splitmix64)"""
+    x = np.asarray(rows, dtype=np.uint64) + np.uint64(0x9E3779B97F4A7C15)
+    x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    x = x ^ (x >> np.uint64(31))
+    return (x >> np.uint64(11)).astype(np.float64) / float(1 << 53)
+
+
+def _stratum_keys(store_codes: np.ndarray, months: np.ndarray) -> np.ndarray:
+    return ((np.asarray(store_codes, dtype=np.int64) + 1) << _MONTH_BITS) | month_slots(months)
+
+
+def _select(keys: np.ndarray, priorities: np.ndarray, fraction: float, min_rows: int) -> np.ndarray:
+    """Posiciones que quedan en la muestra, ordenadas por (estrato, prioridad)"""
+    order = np.lexsort((priorities, keys))
+    sorted_keys = keys[order]
+    is_start = np.ones(len(keys), dtype=bool)
+    is_start[1:] = sorted_keys[1:] != sorted_keys[:-1]
+    starts = np.flatnonzero(is_start)
+    # Posición de cada fila dentro de su estrato, por prioridad
+    rank = np.arange(len(keys)) - np.repeat(starts, np.diff(np.append(starts, len(keys))))
+    keep = (priorities[order] < fraction) | (rank < min_rows)
+    return order[keep]
+
+
+class SampleEstimate:
+    """Estimaciones de monto, cantidad y registros de un recorte (y de sus devoluciones), con la mitad de su intervalo"""
+
+    def __init__(self, totals: Dict[str, float], margins: Dict[str, float], sample_rows: int):
+        self.totals = totals
+        self.margins = margins
+        self.sample_rows = sample_rows
+
+    def interval(self, measure: str) -> Tuple[float, float]:
+        return self.totals[measure] - self.margins[measure], self.totals[measure] + self.margins[measure]
+
+
+class StratifiedSample:
+    """Filas muestreadas por estrato (tienda, mes), con el tamaño de cada estrato"""
+
+    def __init__(
+            self,
+            keys: np.ndarray,
+            sizes: np.ndarray,
+            offsets: np.ndarray,
+            rows: np.ndarray,
+            priorities: np.ndarray,
+            days: np.ndarray,
+            amount: np.ndarray,
+            qty: np.ndarray,
+            fraction: float,
+            min_rows: int
+    ):
+        # Estratos ordenados por (tienda, mes): clave, filas del estrato e inicio de su muestra
+        self.keys = read_only(keys)
+        self.sizes = read_only(sizes)
+        self.offsets = read_only(offsets)
+        # Filas muestreadas (posición en el almacén) con las columnas que se estiman
+        self.rows = read_only(rows)
+        self.priorities = read_only(priorities)
+        self.days = read_only(days)
+        self.amount = read_only(amount)
+        self.qty = read_only(qty)
+        self.fraction = fraction
+        self.min_rows = min_rows
+
+    @classmethod
+    def _from_candidates(
+            cls,
+            keys: np.ndarray,
+            rows: np.ndarray,
+            priorities: np.ndarray,
+            days: np.ndarray,
+            amount: np.ndarray,
+            qty: np.ndarray,
+            strata: np.ndarray,
+            sizes: np.ndarray,
+            fraction: float,
+            min_rows: int
+    ) -> "StratifiedSample":
+        kept = _select(keys, priorities, fraction, min_rows)
+        offsets = np.searchsorted(keys[kept], strata, side='left')
+        offsets = np.append(offsets, len(kept)).astype(np.int64)
+        return cls(strata, sizes, offsets, rows[kept], priorities[kept], days[kept], amount[kept], qty[kept],
+                   fraction, min_rows)
+
+    @classmethod
+    def build(
+            cls,
+            store: ColumnarStore,
+            fraction: float,
+            min_rows: int,
+            row_offset: int = 0
+    ) -> "StratifiedSample":
+        """
+        Muestrea el almacén.
+
+        Args:
+            store: Almacén columnar
+            fraction: Fracción de filas por estrato
+            min_rows: Filas mínimas por estrato (todas si tiene menos)
+            row_offset: Posición de la primera fila en el datamart (filas anexadas)
+        """
+        rows = np.arange(len(store), dtype=np.int64) + row_offset
+        keys = _stratum_keys(store.key(STRATUM_DIMENSION).codes, month_numbers(store.days))
+        priorities = row_priorities(rows)
+        strata, sizes = np.unique(keys, return_counts=True)
+
+        # Solo se ordenan las candidatas: las filas bajo la fracción y, en los estratos
+        # donde no alcanzan el mínimo, todas sus filas
+        stratum_of = np.searchsorted(strata, keys)
+        low = priorities < fraction
+        short = np.bincount(stratum_of[low], minlength=len(strata)) < np.minimum(sizes, min_rows)
+        candidates = np.flatnonzero(low | short[stratum_of])
+
+        return cls._from_candidates(
+            keys[candidates], rows[candidates], priorities[candidates], store.days[candidates],
+            store.amount[candidates], store.qty[candidates], strata, sizes.astype(np.int64), fraction, min_rows
+        )
+
+    def merge(self, delta: "StratifiedSample", code_map: CodeMap) -> "StratifiedSample":
+        """
+        Mezcla con la muestra de las filas anexadas (construida con su row_offset).
+
+        Args:
+            delta: Muestra de las filas nuevas
+            code_map: Códigos de tienda de cada lado en la unión
+        """
+        old_strata, delta_strata = self._remap(self.keys, code_map.old), self._remap(delta.keys, code_map.delta)
+        strata, old_positions, delta_positions = merge_sorted(old_strata, delta_strata)
+        sizes = combine(len(strata), old_positions, self.sizes, delta_positions, delta.sizes)
+
+        def concat(part: str) -> np.ndarray:
+            return np.concatenate((getattr(self, part), getattr(delta, part)))
+
+        keys = np.concatenate((np.repeat(old_strata, np.diff(self.offsets)),
+                               np.repeat(delta_strata, np.diff(delta.offsets))))
+        return self._from_candidates(
+            keys, concat('rows'), concat('priorities'), concat('days'), concat('amount'), concat('qty'),
+            strata, sizes, self.fraction, self.min_rows
+        )
+
+    @staticmethod
+    def _remap(keys: np.ndarray, mapping: np.ndarray) -> np.ndarray:
+        codes = (keys >> _MONTH_BITS) - 1
+        lookup = np.append(mapping, -1)
+        return ((lookup[codes] + 1) << _MONTH_BITS) | (keys & ((1 << _MONTH_BITS) - 1))
+
+    @property
+    def n_rows(self) -> int:
+        return len(self.rows)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(getattr(self, part).nbytes for part in SAMPLE_PARTS)
+
+    def _strata(self, store_code: Optional[int], day_start: Optional[int], day_end: Optional[int]) -> np.ndarray:
+        """Estratos que pueden tener filas del recorte (de la tienda y de los meses del rango)"""
+        if store_code is not None:
+            lo, hi = np.searchsorted(self.keys, [(store_code + 1) << _MONTH_BITS, (store_code + 2) << _MONTH_BITS])
+            strata = np.arange(lo, hi)
+        else:
+            strata = np.arange(len(self.keys))
+
+        if day_start is None and day_end is None:
+            return strata
+        months = slot_months(self.keys[strata] & ((1 << _MONTH_BITS) - 1))
+        keep = months != MISSING_MONTH
+        if day_start is not None:
+            keep &= months >= month_numbers([day_start])[0]
+        if day_end is not None:
+            keep &= months <= month_numbers([day_end])[0]
+        return strata[keep]
+
+    def _slice(
+            self,
+            store: ColumnarStore,
+            filters: Dict[str, int],
+            day_start: Optional[int],
+            day_end: Optional[int]
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """(estratos, posición en la muestra de sus filas, si cada fila cumple el recorte)"""
+        strata = self._strata(filters.get(STRATUM_DIMENSION), day_start, day_end)
+        starts, ends = self.offsets[strata], self.offsets[strata + 1]
+        lengths = ends - starts
+        positions = np.arange(int(lengths.sum()), dtype=np.int64) + np.repeat(
+            starts - np.concatenate(([0], np.cumsum(lengths)[:-1])), lengths
+        ) if len(strata) else np.zeros(0, dtype=np.int64)
+
+        days = self.days[positions]
+        included = np.ones(len(positions), dtype=bool)
+        if day_start is not None:
+            included &= days >= day_start
+        if day_end is not None:
+            included &= days <= day_end
+        for column, code in filters.items():
+            if column != STRATUM_DIMENSION:
+                included &= store.key(column).codes[self.rows[positions]] == code
+        return strata, positions, included
+
+    def estimate(
+            self,
+            store: ColumnarStore,
+            filters: Dict[str, int],
+            day_start: Optional[int] = None,
+            day_end: Optional[int] = None
+    ) -> SampleEstimate:
+        """
+        Estima monto, cantidad y registros de un recorte, y los de sus devoluciones
+        (filas con monto negativo, como en los cubos diarios).
+
+        Args:
+            store: Almacén columnar (para los códigos de las columnas filtradas)
+            filters: {columna: código} de la entidad y la división
+            day_start: Primer día incluido (número de día)
+            day_end: Último día incluido (número de día)
+
+        Returns:
+            SampleEstimate con totales (monto sin convertir) y márgenes al CONFIDENCE_LEVEL:
+            amount, qty, count, return_amount, return_qty y return_count
+        """
+        strata, positions, included = self._slice(store, filters, day_start, day_end)
+        owner = np.repeat(np.arange(len(strata)), np.diff(self.offsets)[strata])
+        sizes = self.sizes[strata].astype(np.float64)
+        sampled = np.diff(self.offsets)[strata].astype(np.float64)
+        weights = np.divide(sizes, sampled, out=np.zeros_like(sizes), where=sampled > 0)
+        variance_factor = np.divide(sizes ** 2 * (1 - sampled / np.maximum(sizes, 1)), sampled,
+                                    out=np.zeros_like(sizes), where=sampled > 0)
+
+        amount, qty = self.amount[positions], self.qty[positions]
+        is_return = amount < 0
+        totals, margins = {}, {}
+        for measure, values, rows in (("amount", amount, included), ("qty", qty, included),
+                                      ("count", np.ones(len(positions)), included),
+                                      ("return_amount", amount, included & is_return),
+                                      ("return_qty", qty, included & is_return),
+                                      ("return_count", np.ones(len(positions)), included & is_return)):
+            y = np.where(rows, values.astype(np.float64), 0.0)
+            sums = np.bincount(owner, weights=y, minlength=len(strata))
+            squares = np.bincount(owner, weights=y * y, minlength=len(strata))
+            spread = np.divide(squares - sums ** 2 / np.maximum(sampled, 1), sampled - 1,
+                               out=np.zeros_like(sizes), where=sampled > 1)
+            totals[measure] = float((weights * sums).sum())
+            margins[measure] = float(_Z * np.sqrt(max((variance_factor * np.maximum(spread, 0)).sum(), 0.0)))
+
+        return SampleEstimate(totals, margins, int(included.sum()))
+
+    def estimate_daily(
+            self,
+            store: ColumnarStore,
+            filters: Dict[str, int],
+            day_start: int,
+            day_end: int
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Estima monto, cantidad y registros por día (densos) y el margen del monto de cada día.
+
+        Cada día es un dominio de los estratos de su mes: su varianza suma, por
+        estrato, la dispersión de ``y`` restringida a ese día.
+
+        Returns:
+            (amount, qty, count, margen de amount), arreglos de longitud day_end - day_start + 1
+        """
+        n_days = day_end - day_start + 1
+        strata, positions, included = self._slice(store, filters, day_start, day_end)
+        owner = np.repeat(np.arange(len(strata)), np.diff(self.offsets)[strata])[included]
+        positions = positions[included]
+        day_of = self.days[positions].astype(np.int64) - day_start
+
+        sizes = self.sizes[strata].astype(np.float64)
+        sampled = np.diff(self.offsets)[strata].astype(np.float64)
+        weights = np.divide(sizes, sampled, out=np.zeros_like(sizes), where=sampled > 0)
+        amount_values = self.amount[positions].astype(np.float64)
+
+        daily = [np.bincount(day_of, weights=weights[owner] * values, minlength=n_days)
+                 for values in (amount_values, self.qty[positions].astype(np.float64), np.ones(len(positions)))]
+
+        # Varianza por (estrato, día): solo las celdas con filas muestreadas aportan
+        cells, cell_of = np.unique(owner * n_days + day_of, return_inverse=True)
+        sums = np.bincount(cell_of, weights=amount_values, minlength=len(cells))
+        squares = np.bincount(cell_of, weights=amount_values ** 2, minlength=len(cells))
+        cell_strata, cell_days = cells // n_days, cells % n_days
+        n = sampled[cell_strata]
+        spread = np.divide(squares - sums ** 2 / n, n - 1, out=np.zeros(len(cells)), where=n > 1)
+        factor = sizes[cell_strata] ** 2 * (1 - n / np.maximum(sizes[cell_strata], 1)) / n
+        variance = np.bincount(cell_days, weights=factor * np.maximum(spread, 0), minlength=n_days)
+
+        return daily[0], daily[1], daily[2], _Z * np.sqrt(variance)
+
+    def save(self, directory: Union[str, Path]):
+        """Guarda la muestra (y su fracción y mínimo por estrato) como archivos .npy mapeables"""
+        directory = Path(directory)
+        for part in SAMPLE_PARTS:
+            np.save(directory / f"{STRATUM_DIMENSION}.sample.{part}.npy", getattr(self, part), allow_pickle=False)
+        np.save(directory / f"{STRATUM_DIMENSION}.sample.params.npy",
+                np.array([self.fraction, self.min_rows], dtype=np.float64), allow_pickle=False)
+
+    @classmethod
+    def load(cls, directory: Union[str, Path]) -> Optional["StratifiedSample"]:
+        """Mapea en memoria una muestra guardada con save, o None si no existe"""
+        directory = Path(directory)
+        paths = {part: directory / f"{STRATUM_DIMENSION}.sample.{part}.npy" for part in SAMPLE_PARTS + ("params",)}
+        if not all(path.exists() for path in paths.values()):
+            return None
+        fraction, min_rows = np.load(paths.pop("params"))
+        return cls(**{part: np.load(path, mmap_mode='r') for part, path in paths.items()},
+                   fraction=float(fraction), min_rows=int(min_rows))
+
+
+def build_sample(store: ColumnarStore, fraction: float, min_rows: int) -> Optional[StratifiedSample]:
+    """
+    Construye la muestra estratificada y registra tiempo y memoria.
+
+    Returns:
+        StratifiedSample, o None si la fracción es 0 o el datamart no tiene tiendas
+    """
+    if fraction <= 0 or STRATUM_DIMENSION not in store.keys:
+        return None
+
+    start = time.perf_counter()
+    sample = StratifiedSample.build(store, fraction, min_rows)
+    logger.info(
+        f"Muestra estratificada: {sample.n_rows:,} filas en {len(sample.keys):,} estratos (tienda, mes), "
+        f"{sample.nbytes / 1024 ** 2:,.1f} MB, {time.perf_counter() - start:.2f}s"
+    )
+    return sample
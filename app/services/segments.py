@@ -0,0 +1,384 @@
+"""
+Segmentos del datamart por división y moneda.
+
+Un mismo datamart sirve varias divisiones (``KeyDivision``) y monedas
+(``KeyCurrency``). Al cargar se asigna cada fila a un segmento (división,
+moneda) y se construyen cubos diarios por segmento, así que:
+
+* Una consulta con ``division`` solo lee los cubos de los segmentos de esa
+  división, no los totales de todo el datamart.
+* Los totales nunca suman montos de monedas distintas: si el alcance de una
+  consulta tiene registros en más de una moneda se rechaza
+  (``MixedCurrencyError``) en lugar de devolver una suma sin sentido.
+
+Los cubos de segmento se construyen reordenando una sola vez el índice por
+(clave, día) de cada dimensión según el segmento de cada fila (ordenamiento
+estable de un entero pequeño, radix en numpy), así que cada segmento es un
+tramo contiguo que conserva el orden por (clave, día) y el cubo es el mismo
+``reduceat`` que el global.
+
+Con una sola división y una sola moneda no se construyen segmentos: los cubos
+globales ya son el único segmento.
+"""
+import json
+import logging
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from app.services.aggregates import CUBE_DIMENSIONS, DailyCube, load_daily_cubes
+from app.services.columnar import ColumnarStore
+from app.services.incremental import CodeMap
+from app.services.tickets import TICKET_DIMENSIONS, TicketIndex
+from app.utils.exceptions import MixedCurrencyError
+
+logger = logging.getLogger(__name__)
+
+DIVISION_COLUMN = 'KeyDivision'
+CURRENCY_COLUMN = 'KeyCurrency'
+
+# Etiquetas (división, moneda) y filas de cada segmento en el almacén compartido
+SEGMENTS_MANIFEST = "segments.json"
+
+
+class Segment:
+    """Filas de una (división, moneda) con sus cubos diarios por dimensión"""
+
+    def __init__(self, division: Optional[str], currency: Optional[str], n_rows: int, cubes: Dict[str, DailyCube]):
+        self.division = division
+        self.currency = currency
+        self.n_rows = n_rows
+        self.cubes = cubes
+
+
+class SegmentSet:
+    """Segmentos del datamart y resolución del alcance de una consulta"""
+
+    def __init__(self, segments: List[Segment], global_cubes: Dict[str, DailyCube]):
+        self.segments = segments
+        self.global_cubes = global_cubes
+        self.currencies = sorted({segment.currency for segment in segments if segment.currency is not None})
+        self.divisions = sorted({segment.division for segment in segments if segment.division is not None})
+
+    @property
+    def partitioned(self) -> bool:
+        """Si hay más de un segmento (si no, los cubos globales bastan)"""
+        return len(self.segments) > 1
+
+    def scope(
+            self,
+            dimension: str,
+            code: Optional[int],
+            day_start: Optional[int] = None,
+            day_end: Optional[int] = None,
+            division: Optional[str] = None
+    ) -> Tuple[List[DailyCube], Optional[str]]:
+        """
+        Cubos que cubren una consulta y la moneda de sus montos.
+
+        Args:
+            dimension: Columna de clave del cubo
+            code: Código de la entidad, None para todas o -1 si no existe
+            day_start: Primer día incluido
+            day_end: Último día incluido
+            division: (Opcional) División a la que se limita la consulta
+
+        Returns:
+            (cubos a sumar, moneda o None si no hay moneda o registros)
+
+        Raises:
+            MixedCurrencyError: si el alcance tiene registros en más de una moneda
+        """
+        if not self.partitioned:
+            if division is not None and division not in self.divisions:
+                return [], None
+            return [self.global_cubes[dimension]], self.currencies[0] if self.currencies else None
+
+        candidates = [segment for segment in self.segments if division is None or segment.division == division]
+        # Si la consulta cabe en una sola moneda no hace falta mirar los registros
+        if len({segment.currency for segment in candidates}) > 1:
+            candidates = [segment for segment in candidates
+                          if segment.cubes[dimension].totals(code, day_start, day_end)[2] > 0]
+
+        currencies = sorted({segment.currency for segment in candidates if segment.currency is not None})
+        if len(currencies) > 1:
+            raise MixedCurrencyError(currencies)
+        if division is None and len(candidates) == len(self.segments):
+            return [self.global_cubes[dimension]], currencies[0] if currencies else None
+        return [segment.cubes[dimension] for segment in candidates], currencies[0] if currencies else None
+
+    def save(self, directory: Union[str, Path]):
+        """
+        Guarda los segmentos en la carpeta del almacén: sus etiquetas en un
+        manifiesto y los cubos de cada segmento en segments/<n>/ (los cubos
+        globales se guardan aparte).
+        """
+        directory = Path(directory)
+        if self.partitioned:
+            for index, segment in enumerate(self.segments):
+                segment_dir = directory / "segments" / str(index)
+                segment_dir.mkdir(parents=True, exist_ok=True)
+                for cube in segment.cubes.values():
+                    cube.save(segment_dir)
+        manifest = [{"division": segment.division, "currency": segment.currency, "n_rows": segment.n_rows}
+                    for segment in self.segments]
+        (directory / SEGMENTS_MANIFEST).write_text(json.dumps(manifest))
+
+    @classmethod
+    def load(
+            cls,
+            directory: Union[str, Path],
+            global_cubes: Dict[str, DailyCube],
+            dimensions=CUBE_DIMENSIONS
+    ) -> Optional["SegmentSet"]:
+        """Mapea en memoria los segmentos guardados con save, o None si no existen"""
+        directory = Path(directory)
+        path = directory / SEGMENTS_MANIFEST
+        if not path.exists():
+            return None
+        manifest = json.loads(path.read_text())
+        if len(manifest) <= 1:
+            segments = [Segment(item["division"], item["currency"], item["n_rows"], global_cubes)
+                        for item in manifest]
+        else:
+            segments = [Segment(item["division"], item["currency"], item["n_rows"],
+                                load_daily_cubes(directory / "segments" / str(index), dimensions))
+                        for index, item in enumerate(manifest)]
+        return cls(segments, global_cubes)
+
+
+def sum_totals(
+        cubes: List[DailyCube],
+        code: Optional[int],
+        day_start: Optional[int] = None,
+        day_end: Optional[int] = None
+) -> Tuple[Union[int, float], int, int]:
+    """Suma de Amount, suma de Qty y conteo sobre varios cubos (sin convertir)"""
+    amount_sum, qty_sum, count = 0, 0, 0
+    for cube in cubes:
+        amount, qty, records = cube.totals(code, day_start, day_end)
+        amount_sum += amount
+        qty_sum += qty
+        count += records
+    return amount_sum, qty_sum, count
+
+
+def sum_range_totals(
+        cubes: List[DailyCube],
+        code: Optional[int],
+        ranges: Sequence[Tuple[int, int]]
+) -> List[Tuple[Union[int, float], int, int]]:
+    """Totales de varios rangos de días sumados sobre varios cubos (sin convertir)"""
+    totals = [(0, 0, 0)] * len(ranges)
+    for cube in cubes:
+        totals = [tuple(a + b for a, b in zip(current, added))
+                  for current, added in zip(totals, cube.range_totals(code, ranges))]
+    return totals
+
+
+def sum_ticket_counts(
+        cubes: List[DailyCube],
+        code: Optional[int],
+        day_start: Optional[int] = None,
+        day_end: Optional[int] = None
+) -> Optional[int]:
+    """Tickets sobre varios cubos, o None si alguno no cuenta tickets"""
+    counts = [cube.ticket_count(code, day_start, day_end) for cube in cubes]
+    if any(count is None for count in counts):
+        return None
+    return sum(counts)
+
+
+def sum_returns(
+        cubes: List[DailyCube],
+        code: Optional[int],
+        day_start: Optional[int] = None,
+        day_end: Optional[int] = None
+) -> Optional[Tuple[Union[int, float], int, int]]:
+    """Devoluciones sobre varios cubos (sin convertir), o None si alguno no tiene las partes"""
+    totals = sum_range_returns(cubes, code, [(day_start, day_end)])
+    return totals[0] if totals is not None else None
+
+
+def sum_range_returns(
+        cubes: List[DailyCube],
+        code: Optional[int],
+        ranges: Sequence[Tuple[int, int]]
+) -> Optional[List[Tuple[Union[int, float], int, int]]]:
+    """Devoluciones de varios rangos de días sumadas sobre varios cubos, o None si alguno no tiene las partes"""
+    if not all(cube.has_returns for cube in cubes):
+        return None
+    totals = [(0, 0, 0)] * len(ranges)
+    for cube in cubes:
+        totals = [tuple(a + b for a, b in zip(current, added))
+                  for current, added in zip(totals, cube.range_returns(code, ranges))]
+    return totals
+
+
+def segment_ids(store: ColumnarStore) -> Tuple[np.ndarray, List[Tuple[Optional[str], Optional[str]]]]:
+    """
+    Segmento de cada fila y (división, moneda) de cada segmento.
+
+    Returns:
+        (id de segmento por fila, int16; lista de (división, moneda) por id)
+    """
+    columns = [store.key(name) if name in store.keys else None for name in (DIVISION_COLUMN, CURRENCY_COLUMN)]
+    n_values = [column.n_keys + 1 if column is not None else 1 for column in columns]
+
+    # Los nulos (-1) quedan en el valor 0
+    ids = np.zeros(len(store), dtype=np.int64)
+    for column, span in zip(columns, n_values):
+        ids *= span
+        if column is not None:
+            ids += column.codes.astype(np.int64) + 1
+
+    used = np.flatnonzero(np.bincount(ids, minlength=n_values[0] * n_values[1]))
+    remap = np.full(n_values[0] * n_values[1], -1, dtype=np.int64)
+    remap[used] = np.arange(len(used))
+
+    labels = []
+    for segment in used:
+        division_code, currency_code = divmod(int(segment), n_values[1])
+        labels.append(tuple(
+            str(column.values[value - 1]) if column is not None and value > 0 else None
+            for column, value in zip(columns, (division_code, currency_code))
+        ))
+    return remap[ids].astype(np.int16), labels
+
+
+def segment_totals(store: ColumnarStore, ids: np.ndarray, n_segments: int) -> List[Tuple[Union[int, float], int, int]]:
+    """Suma de Amount, suma de Qty y conteo de cada segmento (incluye filas con claves nulas)"""
+    permutation = np.argsort(ids, kind='stable')
+    counts = np.bincount(ids, minlength=n_segments)
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+
+    amount = store.amount[permutation]
+    if np.issubdtype(amount.dtype, np.floating):
+        amount = np.nan_to_num(amount)
+    # Todos los segmentos tienen filas (se numeran solo los usados), así que reduceat es exacto
+    amount_sums = np.add.reduceat(amount, starts)
+    qty_sums = np.add.reduceat(store.qty[permutation], starts)
+    return [(amount_sums[i].item(), int(qty_sums[i]), int(counts[i])) for i in range(n_segments)]
+
+
+def build_segments(
+        store: ColumnarStore,
+        global_cubes: Dict[str, DailyCube],
+        tickets: Optional[TicketIndex] = None,
+        dimensions=CUBE_DIMENSIONS
+) -> SegmentSet:
+    """
+    Construye los segmentos (división, moneda) y sus cubos diarios.
+
+    Args:
+        store: Almacén columnar
+        global_cubes: Cubos de todo el datamart (se usan si hay un solo segmento)
+        tickets: (Opcional) Índice de tickets para contar tickets por segmento
+        dimensions: Columnas de clave para las que se construye cubo
+
+    Returns:
+        SegmentSet
+    """
+    if DIVISION_COLUMN not in store.keys and CURRENCY_COLUMN not in store.keys:
+        return SegmentSet([Segment(None, None, len(store), global_cubes)], global_cubes)
+
+    start = time.perf_counter()
+    ids, labels = segment_ids(store)
+    if len(labels) <= 1:
+        division, currency = labels[0] if labels else (None, None)
+        return SegmentSet([Segment(division, currency, len(store), global_cubes)], global_cubes)
+
+    n_segments = len(labels)
+    grands = segment_totals(store, ids, n_segments)
+    ticket_heads = tickets.head_mask(len(store)) if tickets is not None else None
+
+    cubes: List[Dict[str, DailyCube]] = [{} for _ in range(n_segments)]
+    for name in dimensions:
+        if name not in store.keys or not store.key(name).indexed:
+            continue
+        column = store.key(name)
+
+        # Orden estable por segmento: cada segmento queda contiguo y ordenado por (clave, día)
+        order_segments = ids[column.order]
+        permutation = np.argsort(order_segments, kind='stable')
+        order = column.order[permutation]
+        order_days = column.order_days[permutation]
+        bounds = np.concatenate(([0], np.cumsum(np.bincount(order_segments, minlength=n_segments))))
+
+        for segment in range(n_segments):
+            lo, hi = int(bounds[segment]), int(bounds[segment + 1])
+            counts = np.bincount(column.codes[order[lo:hi]], minlength=column.n_keys)
+            entity_offsets = np.concatenate(([0], np.cumsum(counts))).astype(np.int64)
+            heads = ticket_heads if name in TICKET_DIMENSIONS else None
+            cubes[segment][name] = DailyCube.from_sorted_rows(
+                name, order[lo:hi], order_days[lo:hi], entity_offsets, store, heads, grands[segment]
+            )
+
+    segments = [Segment(division, currency, grands[i][2], cubes[i])
+                for i, (division, currency) in enumerate(labels)]
+    logger.info(
+        f"Segmentos división/moneda: {n_segments} "
+        f"({', '.join(f'{s.division}/{s.currency}: {s.n_rows:,}' for s in segments)}), "
+        f"{sum(c.nbytes for s in segments for c in s.cubes.values()) / 1024 ** 2:,.1f} MB, "
+        f"{time.perf_counter() - start:.2f}s"
+    )
+    return SegmentSet(segments, global_cubes)
+
+
+def _empty_cube(cube: DailyCube, n_entities: int) -> DailyCube:
+    """Cubo sin celdas con las mismas partes que cube (para segmentos sin filas nuevas)"""
+    def empty(values: Optional[np.ndarray]) -> Optional[np.ndarray]:
+        return values[:0] if values is not None else None
+
+    return DailyCube(cube.name, np.zeros(n_entities + 1, dtype=np.int64), cube.days[:0], cube.amount[:0],
+                     cube.qty[:0], cube.count[:0], np.zeros_like(cube.grand), empty(cube.tickets),
+                     empty(cube.return_amount), empty(cube.return_qty), empty(cube.return_count))
+
+
+def merge_segments(
+        segments: SegmentSet,
+        delta: SegmentSet,
+        global_cubes: Dict[str, DailyCube],
+        code_maps: Dict[str, CodeMap]
+) -> SegmentSet:
+    """
+    Suma los segmentos de las filas nuevas a los segmentos existentes.
+
+    Args:
+        segments: Segmentos existentes
+        delta: Segmentos de las filas nuevas (build_segments sobre el almacén del delta)
+        global_cubes: Cubos globales ya mezclados
+        code_maps: CodeMap de cada columna (ColumnarStore.append)
+
+    Returns:
+        SegmentSet con las filas de los dos
+
+    Raises:
+        ValueError: si las filas nuevas traen una (división, moneda) que no existía
+    """
+    delta_segments = {(segment.division, segment.currency): segment for segment in delta.segments}
+    labels = [(segment.division, segment.currency) for segment in segments.segments]
+    if not set(delta_segments) <= set(labels):
+        raise ValueError("Las filas nuevas tienen divisiones o monedas que no existían")
+
+    if not segments.partitioned:
+        (division, currency), = labels
+        n_rows = segments.segments[0].n_rows + delta_segments[(division, currency)].n_rows
+        return SegmentSet([Segment(division, currency, n_rows, global_cubes)], global_cubes)
+
+    merged = []
+    for segment, label in zip(segments.segments, labels):
+        added = delta_segments.get(label)
+        cubes = {}
+        for name, cube in segment.cubes.items():
+            code_map = code_maps[name]
+            if added is None and code_map.identity:
+                cubes[name] = cube
+                continue
+            other = added.cubes[name] if added is not None else _empty_cube(cube, len(code_map.delta))
+            cubes[name] = cube.merge(other, code_map)
+        merged.append(Segment(segment.division, segment.currency,
+                              segment.n_rows + (added.n_rows if added is not None else 0), cubes))
+    return SegmentSet(merged, global_cubes)
@@ -0,0 +1,181 @@
+"""
+Datamart compartido entre procesos (workers de uvicorn/gunicorn).
+
+El launcher carga el datamart una sola vez y lo escribe como archivo Arrow IPC
+sin compresión (por defecto en /dev/shm). Cada worker lo mapea en memoria con
+``pyarrow.memory_map``: las columnas numéricas y de fecha quedan como vistas
+numpy de solo lectura sobre el mapeo y las columnas de texto como
+``pd.ArrowDtype`` respaldadas por los mismos buffers, sin copiar datos.
+
+Junto al archivo Arrow se guarda el almacén columnar (claves codificadas e
+índices, ver ``ColumnarStore.save``) y las estructuras derivadas (índice de
+tickets, cubos globales y por segmento, grupo de clientes anónimos, bitmaps,
+estadísticas de cardinalidad, sketches, pivotes, muestra, vistas materializadas
+y matriz de co-ocurrencia) como archivos .npy que los workers también mapean en
+lugar de reconstruirlos (ver ``save_shared_structures``). Un worker adicional
+no construye nada de tamaño O(filas): en memoria privada solo quedan arreglos
+de tamaño O(claves) (conteos por clave de los bitmaps) y los objetos Python;
+el resto son páginas compartidas del mapeo.
+"""
+import logging
+import os
+import tempfile
+from pathlib import Path
+from typing import Union
+
+import pandas as pd
+import pyarrow as pa
+
+from app.config import settings
+from app.services.aggregates import build_daily_cubes
+from app.services.bitmaps import build_bitmap_indexes
+from app.services.columnar import ColumnarStore
+from app.services.cooccurrence import build_cooccurrence
+from app.services.customers import build_anonymous_group
+from app.services.pivots import build_pivot_matrices
+from app.services.quantiles import build_quantile_sketches
+from app.services.sampling import build_sample
+from app.services.segments import build_segments
+from app.services.sketches import build_distinct_sketches
+from app.services.statistics import build_key_statistics
+from app.services.tickets import build_ticket_index
+from app.services.views import ViewRegistry
+
+logger = logging.getLogger(__name__)
+
+SHARED_DATAMART_FILENAME = "sales_datamart.arrow"
+
+
+def default_shared_path() -> Path:
+    """Ruta por defecto del datamart compartido (memoria compartida si existe)"""
+    shm_dir = Path("/dev/shm")
+    base_dir = shm_dir if shm_dir.is_dir() else Path(tempfile.gettempdir())
+    return base_dir / SHARED_DATAMART_FILENAME
+
+
+def store_dir_for(path: Union[str, Path]) -> Path:
+    """Carpeta con el almacén columnar compartido asociado a un datamart exportado"""
+    path = Path(path)
+    return path.with_name(f"{path.name}.store")
+
+
+def export_shared_datamart(data: pd.DataFrame, path: Union[str, Path]) -> Path:
+    """
+    Escribe el datamart ya procesado como archivo Arrow IPC mapeable.
+
+    Cada columna se escribe en un único bloque (un solo record batch) para que
+    los workers puedan obtener vistas zero-copy. El archivo se escribe primero
+    en una ruta temporal y luego se renombra, así un worker nunca ve un archivo
+    a medio escribir.
+
+    Args:
+        data: DataFrame procesado (tipos ya normalizados)
+        path: Ruta destino del archivo Arrow
+
+    Returns:
+        Ruta del archivo escrito
+    """
+    path = Path(path)
+
+    # Las columnas numéricas se convierten desde numpy para conservar NaN como
+    # valor (no como nulo) y permitir vistas zero-copy al mapear. Los textos van
+    # como large_string para evitar el límite de 2GB de offsets int32.
+    arrays = []
+    for name in data.columns:
+        values = data[name]
+        if pd.api.types.is_numeric_dtype(values) or pd.api.types.is_datetime64_any_dtype(values):
+            arrays.append(pa.array(values.to_numpy()))
+        else:
+            arrays.append(pa.array(values, type=pa.large_string(), from_pandas=True))
+    table = pa.Table.from_arrays(arrays, names=[str(name) for name in data.columns])
+
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    with pa.OSFile(str(tmp_path), "wb") as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table, max_chunksize=max(len(table), 1))
+    os.replace(tmp_path, path)
+
+    logger.info(f"Datamart compartido escrito en {path} ({path.stat().st_size / 1024 ** 2:,.1f} MB)")
+    return path
+
+
+def attach_shared_datamart(path: Union[str, Path]) -> pd.DataFrame:
+    """
+    Mapea en memoria un datamart exportado y lo expone como DataFrame zero-copy.
+
+    Args:
+        path: Ruta del archivo Arrow creado por export_shared_datamart
+
+    Returns:
+        DataFrame de solo lectura cuyas columnas apuntan al archivo mapeado
+    """
+    source = pa.memory_map(str(path), "r")
+    table = pa.ipc.open_file(source).read_all()
+
+    columns = {}
+    for name, column in zip(table.column_names, table.columns):
+        array = column.chunk(0) if column.num_chunks == 1 else column.combine_chunks()
+
+        if pa.types.is_string(array.type) or pa.types.is_large_string(array.type):
+            columns[name] = pd.arrays.ArrowExtensionArray(array)
+        elif array.null_count == 0:
+            columns[name] = array.to_numpy(zero_copy_only=True)
+        else:
+            # Con nulos no es posible una vista directa; se materializa la columna
+            columns[name] = array.to_numpy(zero_copy_only=False)
+
+    # copy=False evita que pandas consolide (y copie) los bloques numéricos
+    return pd.DataFrame(columns, copy=False)
+
+
+def save_shared_structures(data: pd.DataFrame, store_dir: Union[str, Path]) -> Path:
+    """
+    Construye las estructuras derivadas del datamart y las guarda en la carpeta
+    del almacén compartido, donde ``DatamartService`` las mapea en cada worker.
+
+    Args:
+        data: Datamart ya procesado (el mismo que se exporta)
+        store_dir: Carpeta del almacén (``store_dir_for``)
+
+    Returns:
+        Carpeta del almacén
+    """
+    store = ColumnarStore.from_dataframe(data)
+    store_dir = store.save(store_dir)
+    tickets = build_ticket_index(store)
+    if tickets is not None:
+        tickets.save(store_dir)
+    cubes = build_daily_cubes(store, tickets=tickets)
+    for cube in cubes.values():
+        cube.save(store_dir)
+    build_segments(store, cubes, tickets).save(store_dir)
+    anonymous_customers = build_anonymous_group(store, settings.ANONYMOUS_CUSTOMER_PATTERN, tickets)
+    if anonymous_customers is not None:
+        anonymous_customers.save(store_dir)
+    for index in build_bitmap_indexes(store).values():
+        index.save(store_dir)
+    for statistics in build_key_statistics(store).values():
+        statistics.save(store_dir)
+
+    for sketches in build_distinct_sketches(store).values():
+        for sketch in sketches.values():
+            sketch.save(store_dir)
+    amount_decimals = settings.AMOUNT_DECIMALS if pd.api.types.is_integer_dtype(data['Amount']) else None
+    for sketches in build_quantile_sketches(store, amount_decimals).values():
+        for sketch in sketches.values():
+            sketch.save(store_dir)
+    for matrix in build_pivot_matrices(store).values():
+        matrix.save(store_dir)
+    sample = build_sample(store, settings.APPROX_SAMPLE_FRACTION, settings.APPROX_MIN_STRATUM_ROWS)
+    if sample is not None:
+        sample.save(store_dir)
+    views = ViewRegistry.from_settings(settings.get_view_definitions())
+    views.refresh(store, tickets)
+    views.save(store_dir)
+    if settings.COOCCURRENCE_ENABLED:
+        cooccurrence = build_cooccurrence(store, tickets, settings.COOCCURRENCE_MAX_BASKET)
+        if cooccurrence is not None:
+            cooccurrence.save(store_dir)
+
+    logger.info(f"Estructuras compartidas guardadas en {store_dir}")
+    return store_dir
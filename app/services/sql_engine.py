@@ -0,0 +1,206 @@
+"""
+Motor SQL de solo lectura sobre el datamart en memoria (DuckDB).
+
+El DataFrame que ya tiene ``DatamartService`` se registra en DuckDB sin
+copiarlo (DuckDB lee los arreglos de pandas/Arrow directamente) y se expone
+como la vista ``sales``, con KeyDate como DATE y Amount en unidades de la
+moneda aunque internamente estén como número de día e int64 en punto fijo.
+
+Restricciones de cada consulta:
+- Una sola sentencia SELECT (o EXPLAIN); el resto se rechaza antes de ejecutar.
+- Sin acceso a archivos, red ni extensiones (``enable_external_access``) y
+  configuración bloqueada para que la consulta no pueda reactivarlo.
+- Límite de memoria e hilos de DuckDB, límite de filas y tiempo máximo
+  (la consulta se interrumpe con ``interrupt``).
+- Los resultados se leen por lotes Arrow, así que la respuesta se puede
+  enviar en streaming sin materializarla completa.
+"""
+import logging
+import threading
+import time
+from typing import Dict, Iterator, List, Optional
+
+import duckdb
+import pandas as pd
+
+from app.utils.dates import MISSING_DAY
+from app.utils.exceptions import InvalidSqlQueryError, SqlQueryTimeoutError
+
+logger = logging.getLogger(__name__)
+
+# Sentencias permitidas (solo lectura)
+ALLOWED_STATEMENTS = (duckdb.StatementType.SELECT, duckdb.StatementType.EXPLAIN)
+
+# Filas por lote al leer el resultado
+BATCH_SIZE = 2048
+
+
+class SqlResult:
+    """Resultado de una consulta SQL, leído por lotes"""
+
+    def __init__(
+            self,
+            cursor: duckdb.DuckDBPyConnection,
+            relation: duckdb.DuckDBPyRelation,
+            max_rows: int,
+            timeout_seconds: float,
+            timer: threading.Timer
+    ):
+        self.columns: List[str] = list(relation.columns)
+        self.max_rows = max_rows
+        self.rows_returned = 0
+        self.truncated = False
+        self._cursor = cursor
+        self._timeout_seconds = timeout_seconds
+        self._timer = timer
+        self._started = time.perf_counter()
+        # Una fila extra para saber si el resultado se recortó
+        self._reader = relation.limit(max_rows + 1).to_arrow_reader(BATCH_SIZE)
+
+    def batches(self) -> Iterator[List[Dict]]:
+        """
+        Lotes de filas (diccionarios columna -> valor) hasta el límite de filas.
+
+        Raises:
+            SqlQueryTimeoutError: si la consulta se interrumpió por tiempo
+        """
+        try:
+            for batch in self._reader:
+                rows = batch.to_pylist()
+                remaining = self.max_rows - self.rows_returned
+                if len(rows) > remaining:
+                    rows = rows[:remaining]
+                    self.truncated = True
+                self.rows_returned += len(rows)
+                if rows:
+                    yield rows
+                if self.truncated:
+                    break
+        except duckdb.InterruptException:
+            raise SqlQueryTimeoutError(self._timeout_seconds)
+        except duckdb.OutOfMemoryException:
+            raise InvalidSqlQueryError("La consulta excedió el límite de memoria del motor SQL")
+        finally:
+            self.close()
+
+    def close(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+            self._cursor.close()
+            logger.info(
+                f"Consulta SQL: {self.rows_returned:,} filas"
+                f"{' (recortada)' if self.truncated else ''} en {time.perf_counter() - self._started:.3f}s"
+            )
+
+
+class SqlEngine:
+    """Conexión DuckDB de solo lectura sobre el DataFrame del datamart"""
+
+    def __init__(
+            self,
+            data: pd.DataFrame,
+            amount_decimals: Optional[int] = None,
+            memory_limit: str = "1GB",
+            threads: int = 2
+    ):
+        self.data = data
+        self.amount_decimals = amount_decimals
+
+        self._db = duckdb.connect(":memory:")
+        self._db.execute(f"SET memory_limit = '{memory_limit}'")
+        self._db.execute(f"SET threads = {int(threads)}")
+        self._db.execute("SET enable_external_access = false")
+        self._db.execute("SET lock_configuration = true")
+
+    def _view_sql(self) -> str:
+        amount = (
+            f"CAST(Amount AS DOUBLE) / {10 ** self.amount_decimals}"
+            if self.amount_decimals is not None else "Amount"
+        )
+        return (
+            "CREATE TEMP VIEW sales AS SELECT * REPLACE ("
+            f"CASE WHEN KeyDate = {MISSING_DAY} THEN NULL ELSE DATE '1970-01-01' + KeyDate END AS KeyDate, "
+            f"{amount} AS Amount"
+            ") FROM sales_raw"
+        )
+
+    @staticmethod
+    def validate(query: str) -> str:
+        """
+        Verifica que la consulta sea una sola sentencia de lectura.
+
+        Args:
+            query: Texto SQL
+
+        Returns:
+            Sentencia sin el punto y coma final
+
+        Raises:
+            InvalidSqlQueryError: si no se puede interpretar, tiene varias sentencias
+                o no es de solo lectura
+        """
+        try:
+            statements = duckdb.extract_statements(query)
+        except duckdb.Error as e:
+            raise InvalidSqlQueryError(f"Consulta SQL inválida: {e}")
+
+        if len(statements) != 1:
+            raise InvalidSqlQueryError("Se permite exactamente una sentencia SQL por consulta")
+        if statements[0].type not in ALLOWED_STATEMENTS:
+            raise InvalidSqlQueryError("Solo se permiten consultas de lectura (SELECT)", forbidden=True)
+
+        return query.strip().rstrip(";")
+
+    def execute(self, query: str, max_rows: int, timeout_seconds: float) -> SqlResult:
+        """
+        Prepara una consulta sobre la vista ``sales`` y retorna su resultado por lotes.
+
+        Los errores de sintaxis o de columnas se detectan aquí, antes de empezar a
+        enviar la respuesta; la ejecución ocurre mientras se leen los lotes.
+
+        Args:
+            query: Sentencia SELECT
+            max_rows: Máximo de filas a retornar
+            timeout_seconds: Tiempo máximo desde que se prepara la consulta
+
+        Returns:
+            SqlResult para iterar los lotes
+
+        Raises:
+            InvalidSqlQueryError: si la consulta no es válida
+        """
+        statement = self.validate(query)
+
+        # Los objetos registrados son locales a cada conexión: cada consulta usa
+        # su propio cursor, que registra el mismo DataFrame (sin copiarlo)
+        cursor = self._db.cursor()
+        timer = threading.Timer(timeout_seconds, cursor.interrupt)
+        try:
+            cursor.register("sales_raw", self.data)
+            cursor.execute(self._view_sql())
+            relation = cursor.sql(statement)
+            if relation is None:
+                raise InvalidSqlQueryError("La consulta no retorna filas")
+            timer.start()
+            return SqlResult(cursor, relation, max_rows, timeout_seconds, timer)
+        except duckdb.InterruptException:
+            timer.cancel()
+            cursor.close()
+            raise SqlQueryTimeoutError(timeout_seconds)
+        except duckdb.PermissionException as e:
+            timer.cancel()
+            cursor.close()
+            raise InvalidSqlQueryError(f"Operación no permitida: {e}", forbidden=True)
+        except duckdb.OutOfMemoryException:
+            timer.cancel()
+            cursor.close()
+            raise InvalidSqlQueryError("La consulta excedió el límite de memoria del motor SQL")
+        except duckdb.Error as e:
+            timer.cancel()
+            cursor.close()
+            raise InvalidSqlQueryError(f"Error en la consulta SQL: {e}")
+        except Exception:
+            timer.cancel()
+            cursor.close()
+            raise
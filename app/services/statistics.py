@@ -0,0 +1,234 @@
+"""
+Estadísticas de cardinalidad para elegir la ruta de acceso de cada consulta.
+
+Por cada dimensión indexada se guarda el número de filas por (clave, mes) en
+formato CSR (meses ordenados por clave). Con eso se estima, sin tocar las
+transacciones, cuántas filas tiene una clave en un rango de días: los meses
+completos se suman y los meses parciales se prorratean por días.
+
+``choose_access_path`` compara el costo estimado de las dos rutas:
+
+- ``index``: leer las posiciones de la clave más selectiva (acceso disperso a
+  las columnas) e intersectar con los bitmaps de los demás filtros.
+- ``scan``: recorrer secuencialmente las columnas de los filtros con
+  comparaciones vectorizadas; las filas salen en orden de posición.
+
+Con selectividades bajas gana el índice; para claves que cubren buena parte del
+datamart (la tienda más grande en varios años) o intersecciones de filtros
+densos, el recorrido secuencial es más barato que reunir millones de posiciones
+dispersas. Si el resultado debe quedar ordenado por día, el índice de una sola
+clave casi siempre gana porque su slice ya viene ordenado.
+"""
+import logging
+import time
+from pathlib import Path
+from typing import Dict, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from app.services.columnar import ColumnarStore, KeyColumn, INDEXED_KEYS, read_only
+from app.services.incremental import CodeMap, merge_cells, month_slots, slot_months
+from app.utils.dates import MISSING_MONTH, month_bounds, month_numbers
+
+logger = logging.getLogger(__name__)
+
+# Arreglos de KeyStatistics que se guardan para los workers (ver save)
+STATISTICS_PARTS = ("offsets", "months", "counts")
+
+# Costos relativos por fila (aprox. ns, calibrados con scripts/bench_columnar.py --access-path)
+# Comparar una columna de códigos en el recorrido secuencial
+SCAN_ROW_COST = 1.5
+# Leer las columnas de una fila resultado en orden de posición (acceso secuencial)
+SEQUENTIAL_ROW_COST = 12.0
+# Leer las columnas de una fila por posición dispersa (slice del índice ordenado por día)
+RANDOM_ROW_COST = 30.0
+# Convertir las filas candidatas a bitmap e intersectar con otro filtro
+BITMAP_ROW_COST = 45.0
+# Ordenar las filas resultado por día
+SORT_ROW_COST = 85.0
+
+
+class KeyStatistics:
+    """Conteo de filas por (clave, mes) de una dimensión"""
+
+    def __init__(self, name: str, offsets: np.ndarray, months: np.ndarray, counts: np.ndarray, n_rows: int):
+        self.name = name
+        self.offsets = read_only(offsets)
+        self.months = read_only(months)
+        self.counts = read_only(counts)
+        self.n_rows = n_rows
+
+    @classmethod
+    def from_key_column(cls, column: KeyColumn, n_rows: int) -> "KeyStatistics":
+        """
+        Construye las estadísticas desde el índice de filas ordenado por (clave, día).
+
+        Args:
+            column: Columna de clave indexada
+            n_rows: Filas totales del datamart
+        """
+        if not column.indexed:
+            raise ValueError(f"La columna {column.name} no tiene índice por clave")
+
+        months = month_numbers(column.order_days)
+
+        # Una celda empieza donde cambia el mes o la clave
+        is_start = np.zeros(len(months), dtype=bool)
+        if len(months) > 0:
+            is_start[0] = True
+            is_start[1:] = months[1:] != months[:-1]
+            is_start[column.offsets[:-1][np.diff(column.offsets) > 0]] = True
+        starts = np.flatnonzero(is_start)
+
+        counts = np.diff(np.append(starts, len(months))).astype(np.int64)
+        cells_before = np.concatenate(([0], np.cumsum(is_start)))
+        offsets = cells_before[column.offsets].astype(np.int64)
+
+        return cls(column.name, offsets, months[starts], counts, n_rows)
+
+    @property
+    def nbytes(self) -> int:
+        return self.offsets.nbytes + self.months.nbytes + self.counts.nbytes
+
+    def merge(self, delta: "KeyStatistics", code_map: CodeMap) -> "KeyStatistics":
+        """Suma los conteos por (clave, mes) de las filas nuevas (construidos aparte)"""
+        cells = merge_cells(self.offsets, month_slots(self.months), delta.offsets, month_slots(delta.months),
+                            code_map)
+        return KeyStatistics(self.name, cells.offsets, slot_months(cells.slots),
+                             cells.combine(self.counts, delta.counts), self.n_rows + delta.n_rows)
+
+    def save(self, directory: Union[str, Path]):
+        """Guarda las estadísticas como archivos .npy mapeables en la carpeta del almacén"""
+        directory = Path(directory)
+        for part in STATISTICS_PARTS:
+            np.save(directory / f"{self.name}.statistics.{part}.npy", getattr(self, part), allow_pickle=False)
+
+    @classmethod
+    def load(cls, directory: Union[str, Path], name: str, n_rows: int) -> Optional["KeyStatistics"]:
+        """Mapea en memoria las estadísticas guardadas con save, o None si no existen"""
+        directory = Path(directory)
+        paths = {part: directory / f"{name}.statistics.{part}.npy" for part in STATISTICS_PARTS}
+        if not all(path.exists() for path in paths.values()):
+            return None
+        return cls(name, **{part: np.load(path, mmap_mode='r') for part, path in paths.items()}, n_rows=n_rows)
+
+    def estimate(self, code: int, day_start: Optional[int] = None, day_end: Optional[int] = None) -> float:
+        """
+        Filas estimadas de una clave en un rango de días.
+
+        Exacto sin rango de días o con meses completos; los meses parciales se
+        prorratean por la fracción de días cubiertos.
+        """
+        if code < 0:
+            return 0.0
+
+        lo, hi = int(self.offsets[code]), int(self.offsets[code + 1])
+        months, counts = self.months[lo:hi], self.counts[lo:hi]
+        if day_start is None and day_end is None:
+            return float(counts.sum())
+
+        known = months != MISSING_MONTH
+        months, counts = months[known], counts[known]
+        first, length = month_bounds(months)
+        start = np.maximum(first, day_start) if day_start is not None else first
+        end = np.minimum(first + length - 1, day_end) if day_end is not None else first + length - 1
+        covered = np.clip(end - start + 1, 0, None)
+        return float((counts * covered / length).sum())
+
+
+def build_key_statistics(store: ColumnarStore, dimensions=INDEXED_KEYS) -> Dict[str, KeyStatistics]:
+    """
+    Construye las estadísticas de cardinalidad de las dimensiones indexadas.
+
+    Args:
+        store: Almacén columnar
+        dimensions: Columnas de clave
+
+    Returns:
+        Diccionario {columna: KeyStatistics}
+    """
+    start = time.perf_counter()
+    statistics = {
+        name: KeyStatistics.from_key_column(store.key(name), len(store))
+        for name in dimensions if name in store.keys and store.key(name).indexed
+    }
+    logger.info(
+        f"Estadísticas de cardinalidad ({', '.join(statistics)}): "
+        f"{sum(s.nbytes for s in statistics.values()) / 1024 ** 2:,.1f} MB, "
+        f"{time.perf_counter() - start:.2f}s"
+    )
+    return statistics
+
+
+def load_key_statistics(directory: Union[str, Path], n_rows: int,
+                        dimensions=INDEXED_KEYS) -> Dict[str, KeyStatistics]:
+    """Mapea las estadísticas guardadas (ver KeyStatistics.save); las dimensiones sin archivos se omiten"""
+    loaded = {name: KeyStatistics.load(directory, name, n_rows) for name in dimensions}
+    return {name: statistics for name, statistics in loaded.items() if statistics is not None}
+
+
+def merge_key_statistics(
+        statistics: Dict[str, KeyStatistics],
+        delta: Dict[str, KeyStatistics],
+        code_maps: Dict[str, CodeMap]
+) -> Dict[str, KeyStatistics]:
+    """
+    Suma las estadísticas de las filas nuevas a las existentes.
+
+    Raises:
+        ValueError: si los dos lados no tienen estadísticas de las mismas dimensiones
+    """
+    if set(statistics) != set(delta):
+        raise ValueError("Las filas nuevas no tienen estadísticas de las mismas dimensiones")
+    return {name: stats.merge(delta[name], code_maps[name]) for name, stats in statistics.items()}
+
+
+def estimate_rows(
+        statistics: KeyStatistics,
+        column: KeyColumn,
+        key: Union[str, Sequence[str]],
+        day_start: Optional[int] = None,
+        day_end: Optional[int] = None
+) -> float:
+    """Filas estimadas de una clave (o varias) en un rango de días"""
+    keys = [key] if isinstance(key, str) else key
+    return sum(statistics.estimate(column.code_of(single), day_start, day_end) for single in keys)
+
+
+def choose_access_path(
+        n_rows: int,
+        estimates: Sequence[float],
+        has_day_range: bool,
+        ordered: bool = True
+) -> Tuple[str, float, float]:
+    """
+    Elige entre índice y recorrido secuencial según el costo estimado.
+
+    Las filas del resultado se estiman suponiendo filtros independientes.
+
+    Args:
+        n_rows: Filas totales del datamart
+        estimates: Filas estimadas de cada filtro en el rango, de menor a mayor
+        has_day_range: Si la consulta filtra por días
+        ordered: Si el resultado debe quedar ordenado por día
+
+    Returns:
+        (ruta "index" o "scan", costo estimado del índice, costo estimado del recorrido)
+    """
+    driver_rows = estimates[0]
+    result_rows = driver_rows
+    for other in estimates[1:]:
+        result_rows *= other / max(n_rows, 1)
+    sort_cost = SORT_ROW_COST if ordered else 0.0
+
+    if len(estimates) == 1:
+        # El slice del índice ya está ordenado por día, pero se lee disperso
+        index_cost = driver_rows * RANDOM_ROW_COST
+    else:
+        index_cost = driver_rows * BITMAP_ROW_COST * (len(estimates) - 1) + \
+                     result_rows * (SEQUENTIAL_ROW_COST + sort_cost)
+
+    scan_cost = n_rows * SCAN_ROW_COST * (len(estimates) + (1 if has_day_range else 0)) + \
+                result_rows * (SEQUENTIAL_ROW_COST + sort_cost)
+
+    return ("scan" if scan_cost < index_cost else "index"), index_cost, scan_cost
@@ -0,0 +1,294 @@
+"""
+Índice de tickets (canastas) con agregados precalculados por ticket.
+
+``TicketId`` es una columna de texto que antes solo se devolvía en el detalle.
+Aquí cada ticket recibe un código (orden de aparición) y se guarda:
+
+* Las filas de cada ticket en formato CSR (``order`` + ``offsets``) ordenadas
+  por (ticket, día), igual que los índices de clave del almacén columnar.
+* Agregados por ticket: suma de Amount, suma de Qty y primer día. Las líneas
+  son la diferencia de offsets.
+* Una tabla hash de direccionamiento abierto (sondeo lineal, factor de carga
+  ≤ 0.5) de hash de 64 bits -> código, así que buscar un ticket por su texto es
+  O(1): un hash, unos pocos saltos en la tabla y una comparación del texto en
+  la fila cabeza del ticket, sin recorrer el datamart.
+
+La fila cabeza de cada ticket (la primera de su primer día) sirve además para
+atribuir cada ticket a una sola celda (entidad, día) de los cubos diarios de
+empleado y tienda, de modo que los tickets de un periodo se suman igual que los
+montos.
+"""
+import logging
+import time
+from pathlib import Path
+from typing import Optional, Tuple, Union
+
+import numpy as np
+
+from app.services.columnar import ColumnarStore, read_only
+from app.services.sketches import hash_values
+
+logger = logging.getLogger(__name__)
+
+TICKET_COLUMN = 'TicketId'
+
+TICKET_PARTS = ("order", "offsets", "amount", "qty", "days", "hashes", "slots")
+
+# Dimensiones cuyos cubos cuentan tickets (un ticket pertenece a una sola tienda y empleado)
+TICKET_DIMENSIONS = ('KeyEmployee', 'KeyStore')
+
+
+def build_hash_slots(hashes: np.ndarray, slots: Optional[np.ndarray] = None, n_placed: int = 0) -> np.ndarray:
+    """
+    Tabla hash de direccionamiento abierto con sondeo lineal, construida por rondas vectorizadas.
+
+    En cada ronda los códigos pendientes intentan ocupar su posición actual; en
+    las posiciones libres gana uno (la última escritura) y el resto avanza un
+    lugar. El número de rondas es el sondeo más largo, que con factor de carga
+    ≤ 0.5 es pequeño.
+
+    Args:
+        hashes: Hash de 64 bits de cada código
+        slots: (Opcional) Tabla existente con los primeros n_placed códigos; si
+            mantiene el factor de carga ≤ 0.5 solo se insertan los códigos nuevos
+        n_placed: Códigos que ya están en slots
+
+    Returns:
+        Posiciones (potencia de dos) con el código que la ocupa, -1 si está libre
+    """
+    n_codes = len(hashes)
+    slot_dtype = np.int32 if n_codes < np.iinfo(np.int32).max else np.int64
+    if slots is not None and len(slots) >= 2 * n_codes and np.can_cast(slots.dtype, slot_dtype):
+        size = len(slots)
+        slots = np.array(slots, dtype=slot_dtype)
+    else:
+        size = 1 << max(4, int(2 * n_codes - 1).bit_length())
+        slots = np.full(size, -1, dtype=slot_dtype)
+        n_placed = 0
+    mask = np.uint64(size - 1)
+
+    pending = np.arange(n_placed, n_codes, dtype=np.int64)
+    positions = (hashes[n_placed:] & mask).astype(np.int64)
+    while len(pending) > 0:
+        free = slots[positions] == -1
+        candidates, candidate_positions = pending[free], positions[free]
+        slots[candidate_positions] = candidates
+        placed = np.zeros(len(pending), dtype=bool)
+        placed[np.flatnonzero(free)[slots[candidate_positions] == candidates]] = True
+
+        pending = pending[~placed]
+        positions = (positions[~placed] + 1) & (size - 1)
+
+    return slots
+
+
+class TicketIndex:
+    """Filas y agregados por ticket con búsqueda O(1) por texto"""
+
+    def __init__(
+            self,
+            order: np.ndarray,
+            offsets: np.ndarray,
+            amount: np.ndarray,
+            qty: np.ndarray,
+            days: np.ndarray,
+            hashes: np.ndarray,
+            slots: np.ndarray
+    ):
+        self.order = read_only(order)
+        self.offsets = read_only(offsets)
+        # Agregados por código de ticket
+        self.amount = read_only(amount)
+        self.qty = read_only(qty)
+        self.days = read_only(days)
+        self.hashes = read_only(hashes)
+        self.slots = read_only(slots)
+
+    @classmethod
+    def build(cls, store: ColumnarStore) -> "TicketIndex":
+        """
+        Construye el índice de tickets del almacén.
+
+        Args:
+            store: Almacén columnar con la columna de texto TicketId
+
+        Returns:
+            TicketIndex con filas, agregados y tabla hash
+        """
+        codes, uniques = store.text_codes(TICKET_COLUMN)
+        n_tickets = len(uniques)
+
+        valid = np.flatnonzero(codes >= 0)
+        row_dtype = np.int32 if len(codes) < np.iinfo(np.int32).max else np.int64
+        # Orden por (ticket, día) con una sola clave int64: más rápido que lexsort
+        day_offset = store.days[valid].astype(np.int64) - np.iinfo(np.int32).min
+        order = valid[np.argsort((codes[valid] << 32) | day_offset, kind='stable')].astype(row_dtype)
+        counts = np.bincount(codes[valid], minlength=n_tickets)
+        offsets = np.concatenate(([0], np.cumsum(counts))).astype(np.int64)
+
+        amount = store.amount[order]
+        if np.issubdtype(amount.dtype, np.floating):
+            amount = np.nan_to_num(amount)
+        starts = offsets[:-1]
+        if n_tickets > 0:
+            ticket_amount = np.add.reduceat(amount, starts)
+            ticket_qty = np.add.reduceat(store.qty[order], starts).astype(np.int64)
+        else:
+            ticket_amount = np.zeros(0, dtype=amount.dtype)
+            ticket_qty = np.zeros(0, dtype=np.int64)
+
+        hashes = hash_values(uniques)
+        return cls(order, offsets, ticket_amount, ticket_qty, store.days[order[starts]],
+                   hashes, build_hash_slots(hashes))
+
+    @property
+    def n_tickets(self) -> int:
+        return len(self.hashes)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(getattr(self, part).nbytes for part in TICKET_PARTS)
+
+    @property
+    def heads(self) -> np.ndarray:
+        """Fila cabeza de cada ticket (la primera de su primer día)"""
+        return self.order[self.offsets[:-1]]
+
+    def head_mask(self, n_rows: int) -> np.ndarray:
+        """Máscara por fila que marca la fila cabeza de cada ticket"""
+        mask = np.zeros(n_rows, dtype=bool)
+        mask[self.heads] = True
+        return mask
+
+    def append(self, delta: "TicketIndex", n_rows: int) -> "TicketIndex":
+        """
+        Anexa el índice de los tickets de filas nuevas (construido aparte).
+
+        Los tickets nuevos reciben los códigos siguientes y solo ellos se
+        insertan en la tabla hash (se reconstruye si supera el factor de carga).
+
+        Args:
+            delta: Índice de tickets de las filas nuevas
+            n_rows: Filas ya cargadas (las nuevas empiezan en esta posición)
+
+        Returns:
+            TicketIndex con todos los tickets
+
+        Raises:
+            ValueError: si un ticket de las filas nuevas ya existía (repartido entre archivos)
+        """
+        if (self.find_hashes(delta.hashes) >= 0).any():
+            raise ValueError("Hay tickets repartidos entre archivos ya cargados y nuevos")
+
+        row_dtype = np.int32 if n_rows + len(delta.order) < np.iinfo(np.int32).max else np.int64
+        hashes = np.concatenate((self.hashes, delta.hashes))
+        return TicketIndex(
+            np.concatenate((self.order.astype(row_dtype, copy=False), delta.order.astype(row_dtype) + n_rows)),
+            np.concatenate((self.offsets, delta.offsets[1:] + self.offsets[-1])),
+            np.concatenate((self.amount, delta.amount)),
+            np.concatenate((self.qty, delta.qty)),
+            np.concatenate((self.days, delta.days)),
+            hashes,
+            build_hash_slots(hashes, self.slots, self.n_tickets)
+        )
+
+    def find_hashes(self, hashes: np.ndarray) -> np.ndarray:
+        """
+        Código de los tickets con cada hash (sondeo vectorizado), -1 si no hay.
+
+        Solo compara hashes: sirve para detectar tickets repetidos, no para confirmar el texto.
+        """
+        codes = np.full(len(hashes), -1, dtype=np.int64)
+        size = len(self.slots)
+        pending = np.arange(len(hashes), dtype=np.int64)
+        positions = (np.asarray(hashes, dtype=np.uint64) & np.uint64(size - 1)).astype(np.int64)
+        for _ in range(size):
+            if len(pending) == 0:
+                break
+            occupant = self.slots[positions].astype(np.int64)
+            occupied = occupant >= 0
+            match = occupied.copy()
+            match[occupied] = self.hashes[occupant[occupied]] == hashes[pending[occupied]]
+            codes[pending[match]] = occupant[match]
+
+            keep = occupied & ~match
+            pending = pending[keep]
+            positions = (positions[keep] + 1) & (size - 1)
+        return codes
+
+    def code_of(self, store: ColumnarStore, ticket_id: str) -> int:
+        """
+        Código de un ticket, o -1 si no existe en el datamart.
+
+        Args:
+            store: Almacén del que se construyó el índice (para confirmar el texto)
+            ticket_id: Texto del ticket
+
+        Returns:
+            Código del ticket
+        """
+        target = hash_values([ticket_id])[0]
+        size = len(self.slots)
+        position = int(target & np.uint64(size - 1))
+
+        for _ in range(size):
+            code = int(self.slots[position])
+            if code < 0:
+                return -1
+            # Un hash igual se confirma con el texto de la fila cabeza
+            if self.hashes[code] == target:
+                head = self.order[self.offsets[code]:self.offsets[code] + 1]
+                if store.text(TICKET_COLUMN, head)[0] == ticket_id:
+                    return code
+            position = (position + 1) & (size - 1)
+        return -1
+
+    def rows(self, code: int) -> np.ndarray:
+        """Filas de un ticket ordenadas por día (vista de solo lectura)"""
+        if code < 0:
+            return self.order[:0]
+        return self.order[int(self.offsets[code]):int(self.offsets[code + 1])]
+
+    def totals(self, code: int) -> Tuple[Union[int, float], int, int]:
+        """
+        Agregados precalculados de un ticket.
+
+        Returns:
+            (suma Amount sin convertir, suma Qty, número de líneas)
+        """
+        return (self.amount[code].item(), int(self.qty[code]),
+                int(self.offsets[code + 1] - self.offsets[code]))
+
+    def save(self, directory: Union[str, Path]):
+        """Guarda el índice como archivos .npy mapeables en la carpeta del almacén"""
+        directory = Path(directory)
+        for part in TICKET_PARTS:
+            np.save(directory / f"{TICKET_COLUMN}.tickets.{part}.npy", getattr(self, part), allow_pickle=False)
+
+    @classmethod
+    def load(cls, directory: Union[str, Path]) -> Optional["TicketIndex"]:
+        """Mapea en memoria un índice guardado con save, o None si no existe"""
+        directory = Path(directory)
+        paths = {part: directory / f"{TICKET_COLUMN}.tickets.{part}.npy" for part in TICKET_PARTS}
+        if not all(path.exists() for path in paths.values()):
+            return None
+        return cls(**{part: np.load(path, mmap_mode='r') for part, path in paths.items()})
+
+
+def build_ticket_index(store: ColumnarStore) -> Optional[TicketIndex]:
+    """
+    Construye el índice de tickets y registra tiempo y memoria.
+
+    Returns:
+        TicketIndex, o None si el datamart no tiene TicketId
+    """
+    if TICKET_COLUMN not in store.text_names:
+        return None
+
+    start = time.perf_counter()
+    index = TicketIndex.build(store)
+    logger.info(
+        f"Índice de tickets: {index.n_tickets:,} tickets, "
+        f"{index.nbytes / 1024 ** 2:,.1f} MB, {time.perf_counter() - start:.2f}s"
+    )
+    return index
@@ -0,0 +1,413 @@
+"""
+Vistas materializadas declarativas.
+
+Una vista se declara en la configuración (``MATERIALIZED_VIEWS``) con sus
+dimensiones, su grano temporal y sus métricas, y se construye una vez al
+terminar la carga del datamart en lugar de recalcularse en cada petición (en
+una carga incremental se construye sobre las filas nuevas y se suma a la
+vista existente, ver ``MaterializedView.merge``):
+
+1. Claves de grupo: códigos int32 de cada dimensión y, si hay grano, el inicio
+   del periodo; se combinan con el mismo radix mixto de las consultas de
+   agregación (``app.services.query_plan``).
+2. Agregación: las filas se ordenan por grupo una vez y cada métrica es un
+   ``reduceat``.
+
+El resultado se guarda en forma columnar compacta (un arreglo por dimensión,
+periodo y métrica, una posición por grupo) ordenado por (dimensiones,
+periodo), así que filtrar por la primera dimensión es una búsqueda binaria y
+el resto es una máscara sobre los grupos, no sobre las transacciones.
+"""
+import logging
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+import numpy as np
+
+from app.models.schemas import ViewDefinition
+from app.services.bitmaps import FILTER_COLUMNS
+from app.services.columnar import ColumnarStore, read_only
+from app.services.incremental import CodeMap
+from app.services.query_plan import _group_ids
+from app.services.tickets import TicketIndex
+from app.utils.dates import MISSING_DAY, bucket_start_days, from_day_number
+from app.utils.exceptions import ViewNotFoundError
+
+logger = logging.getLogger(__name__)
+
+# Métricas cuyo valor es un monto (se convierten desde punto fijo al responder)
+AMOUNT_METRICS = ("amount", "returns_amount")
+
+
+class MaterializedView:
+    """Agregado precalculado de una declaración de vista, en forma columnar"""
+
+    def __init__(
+            self,
+            definition: ViewDefinition,
+            dimensions: Dict[str, np.ndarray],
+            periods: Optional[np.ndarray],
+            metrics: Dict[str, np.ndarray],
+            build_seconds: float
+    ):
+        self.definition = definition
+        # Código de cada dimensión por grupo (int32)
+        self.dimensions = {name: read_only(values) for name, values in dimensions.items()}
+        # Inicio del periodo de cada grupo (None si la vista no tiene grano)
+        self.periods = read_only(periods) if periods is not None else None
+        self.metrics = {name: read_only(values) for name, values in metrics.items()}
+        self.build_seconds = build_seconds
+        self.refreshed_at = datetime.now(timezone.utc)
+
+    @property
+    def name(self) -> str:
+        return self.definition.name
+
+    @property
+    def n_rows(self) -> int:
+        return len(next(iter(self.metrics.values())))
+
+    @property
+    def nbytes(self) -> int:
+        arrays = list(self.dimensions.values()) + list(self.metrics.values())
+        if self.periods is not None:
+            arrays.append(self.periods)
+        return sum(values.nbytes for values in arrays)
+
+    @classmethod
+    def build(
+            cls,
+            definition: ViewDefinition,
+            store: ColumnarStore,
+            tickets: Optional[TicketIndex] = None
+    ) -> "MaterializedView":
+        """
+        Construye la vista sobre todas las filas del almacén.
+
+        Args:
+            definition: Declaración de la vista
+            store: Almacén columnar
+            tickets: (Opcional) Índice de tickets, necesario para la métrica tickets
+
+        Returns:
+            MaterializedView
+
+        Raises:
+            ValueError: si el datamart no tiene las columnas o el índice que la vista necesita
+        """
+        start = time.perf_counter()
+        missing = [name for name in definition.dimensions if FILTER_COLUMNS[name] not in store.keys]
+        if missing:
+            raise ValueError(f"El datamart no tiene las columnas para: {', '.join(missing)}")
+        if "tickets" in definition.metrics and tickets is None:
+            raise ValueError("La métrica tickets requiere TicketId")
+
+        n_rows = len(store)
+        components = [store.key(FILTER_COLUMNS[name]).codes for name in definition.dimensions]
+        if definition.grain:
+            components.append(bucket_start_days(store.days, definition.grain))
+
+        if components and n_rows > 0:
+            inverse, group_values = _group_ids(components)
+        else:
+            # Sin dimensiones ni grano la vista es un solo total
+            inverse = np.zeros(n_rows, dtype=np.int64)
+            group_values = [np.zeros(0, dtype=np.int64) for _ in components]
+
+        # Una sola ordenación por grupo; las métricas son reduceat sobre los tramos
+        order = np.argsort(inverse, kind='stable')
+        starts = (np.flatnonzero(np.r_[True, np.diff(inverse[order]) != 0]) if n_rows > 0
+                  else np.zeros(0, dtype=np.int64))
+        counts = np.diff(np.r_[starts, n_rows]).astype(np.int64)
+
+        amount = store.amount[order]
+        if np.issubdtype(amount.dtype, np.floating):
+            amount = np.nan_to_num(amount)
+        qty = store.qty[order]
+        is_return = amount < 0
+
+        def _sum(values: np.ndarray) -> np.ndarray:
+            if len(starts) == 0:
+                return np.zeros(1 if not components else 0, dtype=values.dtype)
+            return np.add.reduceat(values, starts)
+
+        columns = {
+            "amount": lambda: _sum(amount),
+            "quantity": lambda: _sum(qty),
+            "records": lambda: counts if len(starts) > 0 else np.zeros(1 if not components else 0, dtype=np.int64),
+            "tickets": lambda: _sum(tickets.head_mask(n_rows)[order].astype(np.int64)),
+            "returns_amount": lambda: _sum(np.where(is_return, amount, 0).astype(amount.dtype, copy=False)),
+            "returns_quantity": lambda: _sum(np.where(is_return, qty, 0).astype(qty.dtype, copy=False)),
+            "returns_records": lambda: _sum(is_return.astype(np.int64)),
+        }
+        metrics = {name: columns[name]() for name in definition.metrics}
+
+        dimensions = {name: values.astype(np.int32) for name, values in zip(definition.dimensions, group_values)}
+        periods = group_values[-1].astype(np.int32) if definition.grain else None
+
+        view = cls(definition, dimensions, periods, metrics, time.perf_counter() - start)
+        logger.info(
+            f"Vista {definition.name}: {view.n_rows:,} filas, "
+            f"{view.nbytes / 1024 ** 2:,.2f} MB, {view.build_seconds:.2f}s"
+        )
+        return view
+
+    def _paths(self, directory: Path) -> Dict[str, Path]:
+        return _view_paths(directory, self.definition)
+
+    def save(self, directory: Union[str, Path]):
+        """Guarda la vista como archivos .npy mapeables en la carpeta del almacén"""
+        paths = self._paths(Path(directory))
+        arrays = {f"dimension.{name}": values for name, values in self.dimensions.items()}
+        arrays.update({f"metric.{name}": values for name, values in self.metrics.items()})
+        if self.periods is not None:
+            arrays["periods"] = self.periods
+        for part, values in arrays.items():
+            np.save(paths[part], values, allow_pickle=False)
+
+    @classmethod
+    def load(cls, directory: Union[str, Path], definition: ViewDefinition) -> Optional["MaterializedView"]:
+        """Mapea en memoria una vista guardada con save, o None si no existe"""
+        start = time.perf_counter()
+        paths = _view_paths(Path(directory), definition)
+        if not all(path.exists() for path in paths.values()):
+            return None
+        arrays = {part: np.load(path, mmap_mode='r') for part, path in paths.items()}
+        return cls(
+            definition,
+            {name: arrays[f"dimension.{name}"] for name in definition.dimensions},
+            arrays.get("periods"),
+            {name: arrays[f"metric.{name}"] for name in definition.metrics},
+            time.perf_counter() - start
+        )
+
+    def merge(self, delta: "MaterializedView", code_maps: Dict[str, CodeMap]) -> "MaterializedView":
+        """
+        Suma la vista de las filas nuevas (construida aparte) a esta vista.
+
+        Se reagrupan las filas de las dos vistas, no las transacciones: el costo
+        depende del tamaño de la vista.
+
+        Args:
+            delta: Vista de la misma declaración sobre las filas nuevas
+            code_maps: CodeMap de cada columna (ColumnarStore.append)
+
+        Returns:
+            MaterializedView con los grupos de las dos
+        """
+        start = time.perf_counter()
+        components = []
+        for name in self.definition.dimensions:
+            code_map = code_maps[FILTER_COLUMNS[name]]
+            components.append(np.concatenate((code_map.remap(self.dimensions[name]),
+                                              code_map.remap(delta.dimensions[name], delta=True))))
+        if self.periods is not None:
+            components.append(np.concatenate((self.periods, delta.periods)))
+        metrics = {name: np.concatenate((values, delta.metrics[name])) for name, values in self.metrics.items()}
+
+        n_rows = self.n_rows + delta.n_rows
+        if not components:
+            # Sin dimensiones ni grano la vista es un solo total
+            view_metrics = {name: values.sum(keepdims=True) for name, values in metrics.items()}
+            return MaterializedView(self.definition, {}, None, view_metrics, time.perf_counter() - start)
+
+        if n_rows > 0:
+            inverse, group_values = _group_ids(components)
+        else:
+            inverse, group_values = np.zeros(0, dtype=np.int64), [values[:0] for values in components]
+        order = np.argsort(inverse, kind='stable')
+        starts = (np.flatnonzero(np.r_[True, np.diff(inverse[order]) != 0]) if n_rows > 0
+                  else np.zeros(0, dtype=np.int64))
+        view_metrics = {
+            name: (np.add.reduceat(values[order], starts) if len(starts) > 0 else values[:0])
+            for name, values in metrics.items()
+        }
+
+        dimensions = {name: values.astype(np.int32)
+                      for name, values in zip(self.definition.dimensions, group_values)}
+        periods = group_values[-1].astype(np.int32) if self.periods is not None else None
+        return MaterializedView(self.definition, dimensions, periods, view_metrics, time.perf_counter() - start)
+
+    def query(
+            self,
+            store: ColumnarStore,
+            filters: Dict[str, str],
+            day_start: Optional[int] = None,
+            day_end: Optional[int] = None,
+            offset: int = 0,
+            limit: int = 100,
+            amount_decimals: Optional[int] = None
+    ) -> Tuple[List[Dict[str, Any]], int]:
+        """
+        Filas de la vista que cumplen los filtros, en el orden de la vista.
+
+        Args:
+            store: Almacén del que se construyó la vista (para códigos y textos de clave)
+            filters: Clave por dimensión de la vista (ej. {"key_store": "1|023"})
+            day_start: (Opcional) Primer día; se incluyen los periodos que lo contienen
+            day_end: (Opcional) Último día incluido
+            offset: Filas que se saltan
+            limit: Máximo de filas retornadas
+            amount_decimals: Decimales de Amount si está en punto fijo
+
+        Returns:
+            (filas, total de filas que cumplen los filtros)
+
+        Raises:
+            ValueError: si se filtra por una dimensión o fecha que la vista no tiene
+        """
+        unknown = [name for name in filters if name not in self.definition.dimensions]
+        if unknown:
+            raise ValueError(f"La vista {self.name} no tiene las dimensiones: {', '.join(unknown)}")
+        if (day_start is not None or day_end is not None) and self.periods is None:
+            raise ValueError(f"La vista {self.name} no tiene grano temporal; no admite date_start/date_end")
+
+        codes = {name: store.key(FILTER_COLUMNS[name]).code_of(key) for name, key in filters.items()}
+        if any(code < 0 for code in codes.values()):
+            # Clave inexistente (el código -1 es el de los nulos, no debe coincidir con ellos)
+            return [], 0
+
+        # Las filas están ordenadas por la primera dimensión: su filtro es un tramo
+        lo, hi = 0, self.n_rows
+        first = self.definition.dimensions[0] if self.definition.dimensions else None
+        if first in codes:
+            column = self.dimensions[first]
+            # Mismo tipo que la columna: buscar un int64 en int32 copiaría la columna
+            code = column.dtype.type(codes[first])
+            lo = int(np.searchsorted(column, code, side='left'))
+            hi = int(np.searchsorted(column, code, side='right'))
+
+        mask = np.ones(hi - lo, dtype=bool)
+        for name, code in codes.items():
+            if name != first:
+                mask &= self.dimensions[name][lo:hi] == code
+        if day_start is not None:
+            first_period = int(bucket_start_days([day_start], self.definition.grain)[0])
+            mask &= self.periods[lo:hi] >= first_period
+        if day_end is not None:
+            mask &= self.periods[lo:hi] <= day_end
+
+        positions = lo + np.flatnonzero(mask)
+        total = len(positions)
+        selected = positions[offset:offset + limit]
+
+        columns: Dict[str, list] = {}
+        for name in self.definition.dimensions:
+            columns[name] = list(store.key(FILTER_COLUMNS[name]).decode(self.dimensions[name][selected]))
+        if self.periods is not None:
+            columns["period"] = [from_day_number(int(day)).isoformat() if day != MISSING_DAY else None
+                                 for day in self.periods[selected]]
+        for name, values in self.metrics.items():
+            values = values[selected]
+            if name in AMOUNT_METRICS:
+                if amount_decimals is not None:
+                    values = values / (10 ** amount_decimals)
+                values = np.round(values.astype(np.float64), amount_decimals if amount_decimals is not None else 2)
+            columns[name] = values.tolist()
+
+        rows = [dict(zip(columns, values)) for values in zip(*columns.values())]
+        return rows, total
+
+
+def _view_paths(directory: Path, definition: ViewDefinition) -> Dict[str, Path]:
+    """Archivos .npy de una vista guardada: un arreglo por dimensión, periodo y métrica"""
+    parts = [f"dimension.{name}" for name in definition.dimensions]
+    parts += [f"metric.{name}" for name in definition.metrics]
+    if definition.grain:
+        parts.append("periods")
+    return {part: directory / f"{definition.name}.view.{part}.npy" for part in parts}
+
+
+class ViewRegistry:
+    """Vistas materializadas declaradas, con su estado de construcción"""
+
+    def __init__(self, definitions: List[ViewDefinition]):
+        self.definitions = definitions
+        self.views: Dict[str, MaterializedView] = {}
+        # Error de la última construcción de cada vista (las demás siguen disponibles)
+        self.errors: Dict[str, str] = {}
+
+    @classmethod
+    def from_settings(cls, raw_definitions: List[Dict[str, Any]]) -> "ViewRegistry":
+        """Valida las declaraciones de la configuración (nombres únicos)"""
+        definitions = [ViewDefinition(**definition) for definition in raw_definitions]
+        names = [definition.name for definition in definitions]
+        repeated = sorted({name for name in names if names.count(name) > 1})
+        if repeated:
+            raise ValueError(f"Vistas materializadas repetidas: {', '.join(repeated)}")
+        return cls(definitions)
+
+    def refresh(self, store: ColumnarStore, tickets: Optional[TicketIndex] = None,
+                directory: Optional[Union[str, Path]] = None):
+        """
+        Construye (o reconstruye tras una recarga) todas las vistas.
+
+        Con directory (carpeta del almacén compartido) las vistas que el launcher
+        guardó se mapean en lugar de construirse. Una vista que falla queda
+        registrada con su error y no bloquea a las demás.
+        """
+        start = time.perf_counter()
+        views, errors = {}, {}
+        for definition in self.definitions:
+            try:
+                view = MaterializedView.load(directory, definition) if directory is not None else None
+                if view is None:
+                    view = MaterializedView.build(definition, store, tickets)
+                views[definition.name] = view
+            except Exception as e:
+                logger.error(f"No se pudo construir la vista {definition.name}: {e}")
+                errors[definition.name] = str(e)
+
+        # Se reemplazan juntas para que una consulta no vea vistas de cargas distintas
+        self.views, self.errors = views, errors
+        logger.info(f"Vistas materializadas: {len(views)} listas en {time.perf_counter() - start:.2f}s")
+
+    def append(
+            self,
+            store: ColumnarStore,
+            delta: ColumnarStore,
+            code_maps: Dict[str, CodeMap],
+            tickets: Optional[TicketIndex] = None,
+            delta_tickets: Optional[TicketIndex] = None
+    ):
+        """
+        Actualiza las vistas con las filas nuevas: cada vista se construye sobre
+        el delta y se suma a la existente. Una vista sin versión anterior (su
+        construcción había fallado) se construye completa sobre el almacén.
+        """
+        start = time.perf_counter()
+        views, errors = {}, {}
+        for definition in self.definitions:
+            try:
+                if definition.name in self.views:
+                    added = MaterializedView.build(definition, delta, delta_tickets)
+                    views[definition.name] = self.views[definition.name].merge(added, code_maps)
+                else:
+                    views[definition.name] = MaterializedView.build(definition, store, tickets)
+            except Exception as e:
+                logger.error(f"No se pudo actualizar la vista {definition.name}: {e}")
+                errors[definition.name] = str(e)
+
+        self.views, self.errors = views, errors
+        logger.info(f"Vistas materializadas: {len(views)} actualizadas en {time.perf_counter() - start:.2f}s")
+
+    def save(self, directory: Union[str, Path]):
+        """Guarda las vistas construidas en la carpeta del almacén (ver MaterializedView.save)"""
+        for view in self.views.values():
+            view.save(directory)
+
+    def get(self, name: str) -> MaterializedView:
+        """
+        Vista por nombre.
+
+        Raises:
+            ViewNotFoundError: si no está declarada
+            ValueError: si está declarada pero su construcción falló
+        """
+        if name in self.views:
+            return self.views[name]
+        if name in self.errors:
+            raise ValueError(f"La vista {name} no está disponible: {self.errors[name]}")
+        raise ViewNotFoundError(name)
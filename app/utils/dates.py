@@ -0,0 +1,165 @@
+"""
+Codificación compacta de fechas como número de día.
+
+El datamart solo tiene granularidad diaria, así que KeyDate se guarda como
+int32 con los días transcurridos desde 1970-01-01 (la misma época que
+``datetime64[D]``). Esto reduce a la mitad la memoria frente a
+``datetime64[ns]`` y permite indexar tablas por día directamente
+(``dia - primer_dia``) o agrupar con ``np.bincount``.
+"""
+from datetime import date, datetime, timedelta
+from typing import List, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+EPOCH = date(1970, 1, 1)
+
+# Valor usado para fechas nulas: nunca cae dentro de un rango consultado
+MISSING_DAY = np.iinfo(np.int32).min
+
+# Mes de las fechas nulas (ordena antes que cualquier mes real)
+MISSING_MONTH = np.iinfo(np.int64).min
+
+
+def to_day_number(value: Union[date, datetime]) -> int:
+    """Convierte una fecha al número de día desde 1970-01-01"""
+    if isinstance(value, datetime):
+        value = value.date()
+    return (value - EPOCH).days
+
+
+def from_day_number(day: int) -> date:
+    """Convierte un número de día a fecha"""
+    return EPOCH + timedelta(days=int(day))
+
+
+def day_numbers_from_dates(values) -> np.ndarray:
+    """
+    Convierte una serie de fechas (texto, datetime o datetime64) a números de día.
+
+    Args:
+        values: Serie o arreglo de fechas
+
+    Returns:
+        Arreglo int32 de días desde 1970-01-01 (MISSING_DAY para fechas nulas)
+    """
+    datetimes = pd.to_datetime(pd.Series(values)).to_numpy(dtype="datetime64[D]")
+    missing = np.isnat(datetimes)
+    days = datetimes.astype(np.int64)
+    days[missing] = MISSING_DAY
+    return days.astype(np.int32)
+
+
+def dates_from_day_numbers(days: np.ndarray) -> np.ndarray:
+    """Convierte números de día a un arreglo datetime64[D]"""
+    return np.asarray(days, dtype=np.int64).astype("datetime64[D]")
+
+
+def bucket_start_days(days: np.ndarray, bucket: str) -> np.ndarray:
+    """
+    Número de día del inicio del periodo (día, semana ISO, mes o año) de cada día.
+
+    Args:
+        days: Números de día
+        bucket: "day", "week", "month" o "year"
+
+    Returns:
+        Arreglo int64 con el primer día del periodo (MISSING_DAY se conserva)
+    """
+    days = np.asarray(days, dtype=np.int64)
+    if bucket == "day":
+        starts = days.copy()
+    elif bucket == "week":
+        # 1970-01-01 fue jueves: (día + 3) % 7 es el día de la semana con lunes = 0
+        starts = days - (days + 3) % 7
+    elif bucket in ("month", "year"):
+        unit = "datetime64[M]" if bucket == "month" else "datetime64[Y]"
+        starts = days.astype("datetime64[D]").astype(unit).astype("datetime64[D]").astype(np.int64)
+    else:
+        raise ValueError(f"Periodo no soportado: {bucket}")
+
+    starts[days == MISSING_DAY] = MISSING_DAY
+    return starts
+
+
+def month_numbers(days: np.ndarray) -> np.ndarray:
+    """
+    Número de mes desde 1970-01 de cada día.
+
+    Returns:
+        Arreglo int64 (MISSING_MONTH para MISSING_DAY)
+    """
+    days = np.asarray(days, dtype=np.int64)
+    valid = days != MISSING_DAY
+    months = np.where(valid, days, 0).astype("datetime64[D]").astype("datetime64[M]").astype(np.int64)
+    return np.where(valid, months, MISSING_MONTH)
+
+
+def month_bounds(months: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Primer día y número de días de cada mes.
+
+    Args:
+        months: Números de mes desde 1970-01
+
+    Returns:
+        (número de día del primer día, días del mes)
+    """
+    months = np.asarray(months, dtype=np.int64)
+    first = months.astype("datetime64[M]").astype("datetime64[D]").astype(np.int64)
+    following = (months + 1).astype("datetime64[M]").astype("datetime64[D]").astype(np.int64)
+    return first, following - first
+
+
+def split_whole_months(
+        day_start: Optional[int],
+        day_end: Optional[int]
+) -> Tuple[Optional[int], Optional[int], List[Tuple[int, int]]]:
+    """
+    Divide un rango de días en meses completos y tramos de días sueltos.
+
+    Sirve para responder un rango con agregados mensuales: los meses completos
+    salen del agregado y los tramos de los bordes se calculan desde las filas.
+
+    Args:
+        day_start: Primer día incluido (None sin límite)
+        day_end: Último día incluido (None sin límite)
+
+    Returns:
+        (primer mes completo, último mes completo, tramos (día inicial, día final));
+        los meses son None cuando el rango no tiene límite por ese lado
+    """
+    month_start = month_end = None
+    pieces = []
+    if day_start is not None:
+        month_start = int(month_numbers([day_start])[0])
+        first, length = month_bounds([month_start])
+        if day_start != first[0]:
+            month_last_day = int(first[0] + length[0] - 1)
+            pieces.append((day_start, month_last_day if day_end is None else min(day_end, month_last_day)))
+            month_start += 1
+    if day_end is not None:
+        month_end = int(month_numbers([day_end])[0])
+        first, length = month_bounds([month_end])
+        if day_end != first[0] + length[0] - 1:
+            piece_start = int(first[0]) if day_start is None else max(int(first[0]), day_start)
+            if not pieces or piece_start > pieces[0][1]:
+                pieces.append((piece_start, day_end))
+            month_end -= 1
+    return month_start, month_end, pieces
+
+
+def shift_years(value: date, years: int) -> date:
+    """Misma fecha desplazada en años (el 29 de febrero pasa al 28 en años no bisiestos)"""
+    try:
+        return value.replace(year=value.year + years)
+    except ValueError:
+        return value.replace(year=value.year + years, day=28)
+
+
+def previous_period(date_start: date, date_end: date) -> Tuple[date, date]:
+    """Periodo de la misma cantidad de días que termina el día antes de date_start"""
+    length = date_end - date_start
+    previous_end = date_start - timedelta(days=1)
+    return previous_end - length, previous_end
@@ -1,4 +1,5 @@
 from datetime import date
+from typing import List
 
 from fastapi import HTTPException, status
 
@@ -18,6 +19,66 @@ class DatamartNotFoundError(DatamartException):
         super().__init__(message)
 
 
+class DatamartNotReadyError(DatamartException):
+    """Error cuando el datamart aún no termina de cargar"""
+
+    def __init__(self, load_status: str = "loading"):
+        if load_status == "error":
+            message = "Datamart no disponible: la carga falló"
+        else:
+            message = "Datamart en carga, intente nuevamente en unos segundos"
+        super().__init__(message)
+
+        self.status = load_status
+
+
+class CooccurrenceNotReadyError(DatamartException):
+    """Error cuando la matriz de co-ocurrencia aún no termina de construirse"""
+
+    def __init__(self, build_status: str = "building"):
+        if build_status == "error":
+            message = "Matriz de co-ocurrencia no disponible: la construcción falló"
+        elif build_status == "disabled":
+            message = "Matriz de co-ocurrencia deshabilitada (COOCCURRENCE_ENABLED)"
+        else:
+            message = "Matriz de co-ocurrencia en construcción, intente nuevamente en unos segundos"
+        super().__init__(message)
+
+        self.status = build_status
+
+
+class InvalidSqlQueryError(DatamartException):
+    """Error cuando una consulta SQL no es válida o no es de solo lectura"""
+
+    def __init__(self, message: str, forbidden: bool = False):
+        super().__init__(message)
+
+        self.forbidden = forbidden
+
+
+class SqlQueryTimeoutError(DatamartException):
+    """Error cuando una consulta SQL excede el tiempo máximo de ejecución"""
+
+    def __init__(self, timeout_seconds: float):
+        message = f"La consulta SQL excedió el tiempo máximo de {timeout_seconds:g} segundos"
+        super().__init__(message)
+
+        self.timeout_seconds = timeout_seconds
+
+
+class MixedCurrencyError(DatamartException):
+    """Error cuando una consulta sumaría montos de monedas distintas"""
+
+    def __init__(self, currencies: List[str]):
+        message = (
+            f"La consulta incluye montos en varias monedas ({', '.join(currencies)}); "
+            f"limite la consulta con el parámetro division"
+        )
+        super().__init__(message)
+
+        self.currencies = currencies
+
+
 class InvalidDateRangeError(DatamartException):
     """Error cuando el rango de fechas es inválido"""
 
@@ -52,6 +113,40 @@ class EmployeeNotFoundError(EntityNotFoundError):
         super().__init__("empleado", employee_id)
 
 
+class KeyNotFoundError(EntityNotFoundError):
+    """Error cuando una clave consultada no existe en el datamart (UNKNOWN_KEY_MODE=404)"""
+
+    def __init__(self, column: str, key: str):
+        super().__init__(column, key)
+
+        self.column = column
+
+
+class TicketNotFoundError(EntityNotFoundError):
+    """Error específico cuando no se encuentra un ticket"""
+
+    def __init__(self, ticket_id: str):
+        super().__init__("Ticket", ticket_id)
+
+
+class ViewNotFoundError(DatamartException):
+    """Error cuando no existe la vista materializada solicitada"""
+
+    def __init__(self, view_name: str):
+        super().__init__(f"Vista materializada {view_name} no encontrada")
+
+        self.view_name = view_name
+
+
+class PivotNotFoundError(DatamartException):
+    """Error cuando no existe el pivote solicitado"""
+
+    def __init__(self, pivot_name: str):
+        super().__init__(f"Pivote {pivot_name} no encontrado")
+
+        self.pivot_name = pivot_name
+
+
 class NoSalesFoundError(EntityNotFoundError):
     """Error específico cuando no se encuentran ventas"""
 
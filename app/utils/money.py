@@ -0,0 +1,47 @@
+"""
+Representación en punto fijo de montos.
+
+Con AMOUNT_FIXED_POINT los montos se guardan como int64 en unidades menores
+(p. ej. centavos con 2 decimales). Las sumas en enteros son exactas y se pueden
+combinar entre hilos o particiones sumando los parciales; la conversión a float
+solo se hace al armar la respuesta.
+"""
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+
+def to_minor_units(amounts: pd.Series, decimals: int) -> np.ndarray:
+    """
+    Convierte montos decimales a enteros en unidades menores.
+
+    Los valores no numéricos (NaN) se guardan como 0, igual que los ignora
+    la suma en float.
+
+    Args:
+        amounts: Serie de montos (float)
+        decimals: Número de decimales de la moneda (2 = centavos)
+
+    Returns:
+        Arreglo int64 con los montos escalados por 10**decimals
+    """
+    values = pd.to_numeric(amounts, errors='coerce').to_numpy(dtype=np.float64)
+    scaled = np.rint(values * (10 ** decimals))
+    return np.nan_to_num(scaled, nan=0.0).astype(np.int64)
+
+
+def from_minor_units(value, decimals: Optional[int]) -> float:
+    """
+    Convierte un monto (o una suma) en unidades menores a float.
+
+    Args:
+        value: Monto entero en unidades menores, o float si decimals es None
+        decimals: Decimales usados al escalar, o None si el monto ya es float
+
+    Returns:
+        Monto en unidades de la moneda
+    """
+    if decimals is None:
+        return float(value)
+    return int(value) / (10 ** decimals)
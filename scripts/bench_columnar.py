@@ -0,0 +1,138 @@
+"""
+Micro-benchmark: costo por consulta de pandas vs almacén columnar.
+
+Genera un datamart sintético y mide una consulta "ventas de una clave en un
+rango de fechas" con resultado pequeño, donde el costo fijo de pandas
+(máscaras sobre todo el DataFrame, .copy(), Series) es más visible.
+
+Con ``--access-path`` compara en cambio las dos rutas de ``select_rows``
+(índice vs recorrido secuencial) para filtros de distinta selectividad, con el
+consumo típico de una agregación (leer Amount, Qty y la fecha de las filas), y
+muestra la ruta que elige el modelo de costos. Sirve para recalibrar las
+constantes de ``app.services.statistics``.
+
+Uso:
+    python scripts/bench_columnar.py --rows 2000000 --repeat 50
+    python scripts/bench_columnar.py --rows 2000000 --repeat 5 --access-path
+"""
+import argparse
+import sys
+import timeit
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.services.bitmaps import build_bitmap_indexes, select_rows  # noqa: E402
+from app.services.columnar import ColumnarStore  # noqa: E402
+from app.services.statistics import build_key_statistics, choose_access_path, estimate_rows  # noqa: E402
+
+
+def build_frame(rows: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    first_day = 19000
+    return pd.DataFrame({
+        'KeyDate': rng.integers(first_day, first_day + 730, rows).astype(np.int32),
+        'KeyStore': np.char.add('1|', rng.integers(0, 200, rows).astype(str)),
+        'KeyEmployee': np.char.add('1|', rng.integers(0, 5000, rows).astype(str)),
+        'KeyProduct': np.char.add('1|', rng.integers(0, 50000, rows).astype(str)),
+        'TicketId': np.char.add('T', rng.integers(0, rows // 3 + 1, rows).astype(str)),
+        'Qty': rng.integers(-2, 10, rows),
+        'Amount': rng.uniform(-1000, 50000, rows).round(2),
+    })
+
+
+def access_path_benchmark(rows: int, repeat: int):
+    data = build_frame(rows)
+    rng = np.random.default_rng(1)
+    # Una tienda dominante (40% de las filas) y una división con 3 valores
+    data['KeyStore'] = np.where(rng.random(rows) < 0.4, '1|0', data['KeyStore'].to_numpy())
+    data['KeyDivision'] = np.char.add('1|', rng.integers(0, 3, rows).astype(str))
+
+    store = ColumnarStore.from_dataframe(data)
+    indexes = build_bitmap_indexes(store)
+    statistics = build_key_statistics(store)
+
+    def consume(selected):
+        return store.amount[selected].sum(), store.qty[selected].sum(), store.days[selected].min()
+
+    cases = [
+        ({'KeyStore': '1|0'}, None, None),
+        ({'KeyStore': '1|0'}, 19000, 19200),
+        ({'KeyStore': '1|7'}, None, None),
+        ({'KeyStore': '1|0', 'KeyDivision': '1|1'}, None, None),
+        ({'KeyStore': '1|3', 'KeyDivision': '1|1'}, None, None),
+        ({'KeyStore': '1|0', 'KeyEmployee': '1|12'}, 19000, 19730),
+    ]
+    print(f"Filas: {rows:,} (agregación, sin orden por día)")
+    for filters, day_start, day_end in cases:
+        timings = {}
+        for path in ("index", "scan"):
+            if path == "scan":
+                # Mismo recorrido que select_rows en la ruta "scan"
+                def query():
+                    mask = np.ones(len(store), dtype=bool)
+                    if day_start is not None:
+                        mask &= store.days >= day_start
+                    if day_end is not None:
+                        mask &= store.days <= day_end
+                    for name, key in filters.items():
+                        mask &= store.key(name).codes == store.key(name).code_of(key)
+                    return consume(np.flatnonzero(mask))
+            else:
+                def query():
+                    return consume(select_rows(store, indexes, filters, day_start, day_end, ordered=False))
+            timings[path] = min(timeit.repeat(query, number=1, repeat=repeat)) * 1e3
+
+        estimates = sorted(
+            estimate_rows(statistics[name], store.key(name), key, day_start, day_end)
+            for name, key in filters.items()
+        )
+        chosen, _, _ = choose_access_path(len(store), estimates, day_start is not None, ordered=False)
+        print(f"{str(filters):>45} días {day_start}-{day_end}: "
+              f"índice {timings['index']:7.1f} ms | recorrido {timings['scan']:7.1f} ms | elegido: {chosen}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=2_000_000)
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--access-path", action="store_true", help="Comparar índice vs recorrido secuencial")
+    args = parser.parse_args(argv)
+
+    if args.access_path:
+        access_path_benchmark(args.rows, args.repeat)
+        return
+
+    data = build_frame(args.rows)
+    store = ColumnarStore.from_dataframe(data)
+
+    # Empleado con un rango de un mes: resultado de unas pocas filas
+    key = '1|123'
+    day_start, day_end = 19100, 19130
+
+    def pandas_query():
+        mask = (
+                (data['KeyEmployee'] == key) &
+                (data['KeyDate'] >= day_start) &
+                (data['KeyDate'] <= day_end)
+        )
+        filtered = data[mask].copy()
+        return float(filtered['Amount'].sum()), int(filtered['Qty'].sum()), len(filtered)
+
+    def columnar_query():
+        rows = store.select('KeyEmployee', key, day_start, day_end)
+        return store.totals(rows)
+
+    assert pandas_query()[2] == columnar_query()[2]
+
+    print(f"Filas: {args.rows:,} | filas en el resultado: {columnar_query()[2]}")
+    for name, query in [("pandas", pandas_query), ("columnar", columnar_query)]:
+        seconds = min(timeit.repeat(query, number=1, repeat=args.repeat))
+        print(f"{name:>9}: {seconds * 1e6:12,.1f} µs/consulta")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,10 @@
 import pytest
+import numpy as np
 import pandas as pd
-from datetime import date, datetime
+from datetime import date
 from pathlib import Path
 import os
-from unittest.mock import Mock
+from typing import Dict, Optional, Tuple, Union
 
 
 @pytest.fixture(scope="session")
@@ -243,4 +244,99 @@ def setup_test_environment():
     yield
 
     # Limpieza
-    os.environ.pop("TESTING", None)
\ No newline at end of file
+    os.environ.pop("TESTING", None)
+
+
+def random_sales_frame(
+        rows: int,
+        seed: int = 0,
+        first_day: int = 19300,
+        n_days: int = 100,
+        keys: Optional[Dict[str, Union[int, np.ndarray]]] = None,
+        tickets: Optional[Union[int, np.ndarray]] = None,
+        ticket_prefix: str = 'T',
+        qty: Tuple[int, int] = (-2, 10),
+        amount: Tuple[float, float] = (-1000, 5000),
+        integer_amount: bool = False,
+        **columns
+) -> pd.DataFrame:
+    """
+    Datamart sintético (KeyDate ya como número de día) con claves '1|<n>'.
+
+    Args:
+        rows: Registros
+        seed: Semilla del generador
+        first_day: Primer día de KeyDate
+        n_days: Días del rango de KeyDate
+        keys: {columna: claves distintas (uniformes) o código de cada fila}
+        tickets: Tickets distintos (al azar) o ticket de cada fila; None sin TicketId
+        ticket_prefix: Prefijo de TicketId
+        qty: Rango [inicio, fin) de Qty
+        amount: Rango de Amount (uniforme con 2 decimales)
+        integer_amount: Si Amount es int64 (punto fijo) en lugar de float
+        **columns: Columnas que reemplazan o se agregan a las generadas (un valor por fila)
+    """
+    rng = np.random.default_rng(seed)
+
+    def codes(spec: Union[int, np.ndarray]) -> np.ndarray:
+        return rng.integers(0, spec, rows) if np.isscalar(spec) else np.asarray(spec)
+
+    frame = {'KeyDate': rng.integers(first_day, first_day + n_days, rows).astype(np.int32)}
+    for column, spec in (keys or {}).items():
+        frame[column] = np.char.add('1|', codes(spec).astype(str))
+    if tickets is not None:
+        frame['TicketId'] = np.char.add(ticket_prefix, codes(tickets).astype(str))
+    frame['Qty'] = rng.integers(qty[0], qty[1], rows)
+    if integer_amount:
+        frame['Amount'] = rng.integers(int(amount[0]), int(amount[1]), rows).astype(np.int64)
+    else:
+        frame['Amount'] = rng.uniform(amount[0], amount[1], rows).round(2)
+    frame.update(columns)
+    return pd.DataFrame(frame)
+
+
+def memory_service(store, amount_decimals: Optional[int] = None, **structures):
+    """
+    DatamartService sobre un almacén en memoria, sin leer archivos.
+
+    Construye tickets, cubos, segmentos, bitmaps, estadísticas, sketches y
+    cuantiles como _load_data (sin pivotes, muestra ni clientes anónimos);
+    structures reemplaza o agrega atributos (sample, pivots, ...).
+    """
+    from app.services.aggregates import build_daily_cubes
+    from app.services.bitmaps import build_bitmap_indexes
+    from app.services.datamart import DatamartService
+    from app.services.quantiles import build_quantile_sketches
+    from app.services.segments import build_segments
+    from app.services.sketches import build_distinct_sketches
+    from app.services.statistics import build_key_statistics
+    from app.services.tickets import build_ticket_index
+
+    service = DatamartService.__new__(DatamartService)
+    service.store = store
+    service.tickets = build_ticket_index(store)
+    service.cubes = build_daily_cubes(store, tickets=service.tickets)
+    service.segments = build_segments(store, service.cubes, service.tickets)
+    service.bitmaps = build_bitmap_indexes(store)
+    service.statistics = build_key_statistics(store)
+    service.sketches = build_distinct_sketches(store)
+    service.quantiles = build_quantile_sketches(store, amount_decimals)
+    service.anonymous_customers = None
+    service.pivots = {}
+    service.sample = None
+    service.amount_decimals = amount_decimals
+    for name, value in structures.items():
+        setattr(service, name, value)
+    return service
+
+
+@pytest.fixture(scope="session")
+def make_sales_frame():
+    """Fábrica de datamarts sintéticos (ver random_sales_frame)"""
+    return random_sales_frame
+
+
+@pytest.fixture(scope="session")
+def make_service():
+    """Fábrica de servicios sobre un almacén en memoria (ver memory_service)"""
+    return memory_service
@@ -0,0 +1,93 @@
+import pytest
+import numpy as np
+
+from app.services.columnar import ColumnarStore
+from app.services.bitmaps import RowSet, build_bitmap_indexes, select_rows
+
+
+@pytest.fixture
+def random_frame(make_sales_frame):
+    """Datamart sintético con una tienda y una división dominantes (bitsets densos)"""
+    rows = 5000
+    stores = np.random.default_rng([7, 1]).choice(12, rows, p=[0.5] + [0.5 / 11] * 11)
+    return make_sales_frame(rows, seed=7, keys={
+        'KeyStore': stores, 'KeyEmployee': 60, 'KeyProduct': 300, 'KeyCustomer': 400, 'KeyDivision': 3
+    }, tickets=1500)
+
+
+@pytest.mark.unit
+class TestRowSet:
+    """Tests para los conjuntos de filas estilo roaring"""
+
+    def test_container_depends_on_density(self):
+        """Un conjunto disperso debe ser arreglo y uno denso bitset"""
+        sparse = RowSet.from_positions(np.array([900, 5, 40]), 1000)
+        dense = RowSet.from_positions(np.arange(0, 1000, 2), 1000)
+
+        assert not sparse.is_dense
+        assert sparse.to_positions().tolist() == [5, 40, 900]
+        assert dense.is_dense
+        assert len(dense) == 500
+        assert dense.to_positions().tolist() == list(range(0, 1000, 2))
+
+    @pytest.mark.parametrize("left_step,right_step", [(2, 3), (2, 97), (89, 97), (97, 3)])
+    def test_intersection_matches_sets(self, left_step, right_step):
+        """La intersección debe coincidir con la de conjuntos de Python en todas las combinaciones"""
+        n_rows = 10_000
+        left = RowSet.from_positions(np.arange(0, n_rows, left_step), n_rows)
+        right = RowSet.from_positions(np.arange(1, n_rows, right_step), n_rows)
+
+        result = left & right
+
+        expected = sorted(set(range(0, n_rows, left_step)) & set(range(1, n_rows, right_step)))
+        assert result.to_positions().tolist() == expected
+        assert len(result) == len(expected)
+
+    def test_empty_intersection(self):
+        """Intersectar con un conjunto vacío debe dar vacío"""
+        empty = RowSet(100, positions=np.empty(0, dtype=np.int64))
+
+        assert len(RowSet.full(100) & empty) == 0
+        assert len(empty & RowSet.from_positions(np.array([1, 2]), 100)) == 0
+
+
+@pytest.mark.unit
+class TestSelectRows:
+    """Tests para la combinación de filtros con índices de bitmaps"""
+
+    @pytest.mark.parametrize("filters", [
+        {'KeyStore': '1|0'},
+        {'KeyStore': '1|0', 'KeyDivision': '1|1'},
+        {'KeyStore': '1|0', 'KeyEmployee': '1|7'},
+        {'KeyProduct': '1|12', 'KeyCustomer': '1|3', 'KeyStore': '1|0'},
+        {'KeyEmployee': '1|7', 'KeyProduct': '1|999'},
+    ])
+    def test_matches_pandas_masks(self, random_frame, filters):
+        """Las filas deben coincidir con filtrar el DataFrame con máscaras"""
+        store = ColumnarStore.from_dataframe(random_frame)
+        indexes = build_bitmap_indexes(store)
+
+        rows = select_rows(store, indexes, filters, 19320, 19380)
+
+        mask = (random_frame['KeyDate'] >= 19320) & (random_frame['KeyDate'] <= 19380)
+        for name, key in filters.items():
+            mask &= random_frame[name] == key
+        assert sorted(rows.tolist()) == np.flatnonzero(mask).tolist()
+        assert np.all(np.diff(store.days[rows]) >= 0)
+
+    def test_dominant_keys_are_precomputed_as_bitsets(self, random_frame):
+        """Las claves con muchas filas deben tener su bitset precalculado"""
+        store = ColumnarStore.from_dataframe(random_frame)
+        indexes = build_bitmap_indexes(store)
+
+        assert indexes['KeyStore'].rows('1|0').is_dense
+        assert indexes['KeyDivision'].rows('1|2').is_dense
+        assert not indexes['KeyProduct'].rows('1|12').is_dense
+
+    def test_without_key_filters_uses_date_range(self, random_frame):
+        """Sin filtros de clave se retornan las filas del rango de días"""
+        store = ColumnarStore.from_dataframe(random_frame)
+
+        rows = select_rows(store, build_bitmap_indexes(store), {}, 19390, None)
+
+        assert len(rows) == int((random_frame['KeyDate'] >= 19390).sum())
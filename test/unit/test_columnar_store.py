@@ -0,0 +1,102 @@
+import pytest
+import numpy as np
+from datetime import date
+
+from app.services.columnar import ColumnarStore, KeyColumn
+from app.utils.dates import day_numbers_from_dates, to_day_number
+
+
+@pytest.fixture
+def columnar_store(sample_dataframe):
+    """Almacén columnar construido con el DataFrame de prueba"""
+    data = sample_dataframe.copy()
+    data['KeyDate'] = day_numbers_from_dates(data['KeyDate'])
+    return ColumnarStore.from_dataframe(data)
+
+
+@pytest.mark.unit
+class TestColumnarStore:
+    """Tests para el almacén columnar"""
+
+    def test_keys_are_int_coded(self, columnar_store):
+        """Las claves deben codificarse como int32 contra valores ordenados"""
+        stores = columnar_store.key('KeyStore')
+
+        assert stores.codes.dtype == np.int32
+        assert stores.values.tolist() == ['1|007', '1|023', '1|098']
+        assert stores.code_of('1|023') == 1
+        assert stores.code_of('999|999') == -1
+
+    def test_arrays_are_immutable(self, columnar_store):
+        """Los arreglos del almacén deben ser de solo lectura"""
+        with pytest.raises(ValueError):
+            columnar_store.amount[0] = 0
+        with pytest.raises(ValueError):
+            columnar_store.key('KeyEmployee').codes[0] = 0
+
+    def test_select_by_key_sorted_by_day(self, columnar_store):
+        """select debe retornar las filas de la clave ordenadas por día"""
+        rows = columnar_store.select('KeyStore', '1|023')
+
+        assert sorted(rows.tolist()) == [0, 3, 4]
+        assert np.all(np.diff(columnar_store.days[rows]) >= 0)
+
+    def test_select_by_key_and_day_range(self, columnar_store):
+        """select debe filtrar por rango de días inclusivo"""
+        rows = columnar_store.select(
+            'KeyStore', '1|023', to_day_number(date(2023, 11, 1)), to_day_number(date(2023, 11, 30))
+        )
+
+        assert rows.tolist() == [0]
+
+    def test_select_unknown_key_is_empty(self, columnar_store):
+        """Una clave inexistente debe retornar cero filas"""
+        assert len(columnar_store.select('KeyEmployee', '999|999')) == 0
+
+    def test_prefix_range_finds_contiguous_keys(self, columnar_store):
+        """El rango del prefijo contiene exactamente las claves que empiezan con él"""
+        products = columnar_store.key('KeyProduct')
+
+        for prefix in ['', '1|', '1|10', '1|4', '1|61889', '1|9', '2|']:
+            start, end = products.prefix_range(prefix)
+            expected = [key for key in products.values.tolist() if key.startswith(prefix)]
+            assert products.values[start:end].tolist() == expected
+
+    def test_record_counts_per_key(self, columnar_store):
+        """Los registros por clave coinciden con las filas de cada clave"""
+        stores = columnar_store.key('KeyStore')
+
+        assert stores.record_counts(0, stores.n_keys).tolist() == [1, 3, 1]
+        assert stores.record_counts(1, 2).tolist() == [3]
+
+        unindexed = KeyColumn.build('KeyStore', stores.values[stores.codes], columnar_store.days)
+        assert unindexed.record_counts(0, unindexed.n_keys).tolist() == [1, 3, 1]
+
+    def test_totals_match_pandas(self, columnar_store, sample_dataframe):
+        """Los totales deben coincidir con los de pandas"""
+        rows = columnar_store.select('KeyEmployee', '1|343')
+        expected = sample_dataframe[sample_dataframe['KeyEmployee'] == '1|343']
+
+        amount, quantity, count = columnar_store.totals(rows)
+
+        assert amount == pytest.approx(expected['Amount'].sum())
+        assert quantity == expected['Qty'].sum()
+        assert count == len(expected)
+
+    def test_totals_of_all_rows(self, columnar_store, sample_dataframe):
+        """totals sin filas debe sumar todo el datamart"""
+        amount, quantity, count = columnar_store.totals()
+
+        assert amount == pytest.approx(sample_dataframe['Amount'].sum())
+        assert count == len(sample_dataframe)
+
+    def test_save_and_load_maps_keys(self, columnar_store, sample_dataframe, tmp_path):
+        """save/load debe conservar las claves codificadas e índices"""
+        data = sample_dataframe.copy()
+        data['KeyDate'] = day_numbers_from_dates(data['KeyDate'])
+
+        columnar_store.save(tmp_path / "store")
+        loaded = ColumnarStore.load(tmp_path / "store", data)
+
+        assert loaded.select('KeyStore', '1|023').tolist() == columnar_store.select('KeyStore', '1|023').tolist()
+        assert loaded.text('TicketId', np.array([0])).tolist() == ['N01-00000385']
@@ -96,3 +96,20 @@ class TestSettings:
 
         # Assert
         assert settings.DEBUG is True
+
+    def test_view_definitions_inline_and_from_file(self, tmp_path):
+        """MATERIALIZED_VIEWS acepta JSON en línea o la ruta a un archivo .json"""
+        # Arrange
+        settings = Settings()
+        views_file = tmp_path / "views.json"
+        views_file.write_text('[{"name": "product_week", "dimensions": ["key_product"], "grain": "week"}]')
+
+        # Act & Assert
+        settings.MATERIALIZED_VIEWS = '[{"name": "total"}]'
+        assert settings.get_view_definitions() == [{"name": "total"}]
+
+        settings.MATERIALIZED_VIEWS = str(views_file)
+        assert settings.get_view_definitions()[0]["name"] == "product_week"
+
+        settings.MATERIALIZED_VIEWS = ""
+        assert settings.get_view_definitions() == []
@@ -0,0 +1,122 @@
+import pytest
+import itertools
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+from app.services.columnar import ColumnarStore
+from app.services.cooccurrence import CooccurrenceMatrix, basket_items, count_pairs
+from app.services.tickets import build_ticket_index
+
+
+@pytest.fixture
+def basket_frame(make_sales_frame):
+    """Datamart sintético con tickets de varias líneas y productos repetidos en un ticket"""
+    rows = 6000
+    return make_sales_frame(
+        rows, seed=5, n_days=1, keys={'KeyProduct': 40}, tickets=1500, qty=(1, 2), Amount=np.ones(rows)
+    )
+
+
+def build_matrix(frame: pd.DataFrame, max_basket: int = 50) -> CooccurrenceMatrix:
+    store = ColumnarStore.from_dataframe(frame.reset_index(drop=True))
+    return CooccurrenceMatrix.build(store, build_ticket_index(store), max_basket)
+
+
+def expected_pairs(frame: pd.DataFrame) -> Counter:
+    """Self-join por ticket: tickets en que aparece cada par de productos"""
+    pairs = Counter()
+    for products in frame.groupby('TicketId')['KeyProduct'].agg(lambda values: sorted(set(values))):
+        pairs.update(itertools.combinations(products, 2))
+    return pairs
+
+
+def matrix_pairs(matrix: CooccurrenceMatrix) -> dict:
+    n_products = len(matrix.products)
+    return {
+        (matrix.products[key // n_products], matrix.products[key % n_products]): count
+        for key, count in zip(matrix.pair_keys.tolist(), matrix.pair_counts.tolist())
+    }
+
+
+@pytest.mark.unit
+class TestCooccurrenceMatrix:
+    """Tests para la matriz de co-ocurrencia de productos"""
+
+    def test_pairs_match_self_join(self, basket_frame):
+        """Los conteos por par deben coincidir con un self-join por TicketId"""
+        matrix = build_matrix(basket_frame)
+
+        assert matrix_pairs(matrix) == dict(expected_pairs(basket_frame))
+        assert matrix.n_tickets == basket_frame['TicketId'].nunique()
+
+    def test_chunked_counting_matches(self, basket_frame):
+        """Contar por tramos pequeños debe dar el mismo resultado"""
+        store = ColumnarStore.from_dataframe(basket_frame)
+        ticket_of, product_of = basket_items(store, build_ticket_index(store), 50)
+        n_products = store.key('KeyProduct').n_keys
+
+        keys, counts = count_pairs(ticket_of, product_of, n_products)
+        chunked_keys, chunked_counts = count_pairs(ticket_of, product_of, n_products, chunk_pairs=500)
+
+        assert np.array_equal(keys, chunked_keys)
+        assert np.array_equal(counts, chunked_counts)
+
+    def test_top_metrics(self, basket_frame):
+        """El top por conteo viene ordenado y las métricas son support, confidence y lift"""
+        matrix = build_matrix(basket_frame)
+        product_tickets = basket_frame.groupby('KeyProduct')['TicketId'].nunique()
+        pairs = expected_pairs(basket_frame)
+        n_tickets = basket_frame['TicketId'].nunique()
+
+        top = matrix.top(matrix.code_of('1|7'), limit=5)
+
+        assert [item['tickets'] for item in top] == sorted((item['tickets'] for item in top), reverse=True)
+        first = top[0]
+        together = pairs[tuple(sorted(('1|7', first['product'])))]
+        assert first['tickets'] == together
+        assert first['support'] == pytest.approx(together / n_tickets)
+        assert first['confidence'] == pytest.approx(together / product_tickets['1|7'])
+        assert first['lift'] == pytest.approx(
+            together * n_tickets / (product_tickets['1|7'] * product_tickets[first['product']])
+        )
+
+    def test_top_by_lift_respects_min_count(self, basket_frame):
+        """Por lift se ordena descendente y se omiten los pares con menos de min_count tickets"""
+        matrix = build_matrix(basket_frame)
+
+        top = matrix.top(matrix.code_of('1|7'), limit=10, order_by="lift", min_count=12)
+
+        assert all(item['tickets'] >= 12 for item in top)
+        assert [item['lift'] for item in top] == sorted((item['lift'] for item in top), reverse=True)
+        assert matrix.top(-1) == []
+
+    def test_large_baskets_are_skipped(self):
+        """Un ticket con más productos distintos que max_basket no aporta pares"""
+        frame = pd.DataFrame({
+            'KeyDate': np.full(7, 19300, dtype=np.int32),
+            'KeyProduct': ['1|1', '1|2', '1|1', '1|2', '1|3', '1|4', '1|5'],
+            'TicketId': ['A', 'A', 'B', 'B', 'B', 'B', 'B'],
+            'Qty': np.ones(7, dtype=np.int64),
+            'Amount': np.ones(7),
+        })
+
+        matrix = build_matrix(frame, max_basket=3)
+
+        assert matrix_pairs(matrix) == {('1|1', '1|2'): 1}
+        assert matrix.n_tickets == 1
+
+    def test_merge_equals_full_build(self, basket_frame):
+        """Sumar la matriz de un lote nuevo equivale a construirla con todo"""
+        old = basket_frame[basket_frame['TicketId'] < 'T5']
+        new = basket_frame[basket_frame['TicketId'] >= 'T5']
+        # El lote nuevo trae un producto que el anterior no tenía
+        new = new.assign(KeyProduct=new['KeyProduct'].replace('1|3', '1|999'))
+
+        merged = build_matrix(old).merge(build_matrix(new))
+        full = build_matrix(pd.concat([old, new]))
+
+        assert matrix_pairs(merged) == matrix_pairs(full)
+        assert merged.n_tickets == full.n_tickets
+        assert merged.top(merged.code_of('1|999')) == full.top(full.code_of('1|999'))
@@ -0,0 +1,82 @@
+import pytest
+import numpy as np
+import pandas as pd
+
+from app.services.columnar import ColumnarStore
+from app.services.customers import anonymous_codes, build_anonymous_group
+from app.services.tickets import build_ticket_index
+
+
+@pytest.fixture
+def customer_frame(make_sales_frame):
+    """Datamart sintético con clientes identificados y dos claves anónimas de caja"""
+    rows = 3000
+    frame = make_sales_frame(
+        rows, seed=13, n_days=60, keys={'KeyStore': 4, 'KeyCustomer': 300},
+        tickets=np.arange(rows) // 3, qty=(1, 5), amount=(1, 500)
+    )
+    rng = np.random.default_rng([13, 1])
+    anonymous = rng.random(rows) < 0.4
+    frame.loc[anonymous, 'KeyCustomer'] = np.where(rng.random(anonymous.sum()) < 0.7, '1|POS|', '2|POS|')
+    return frame
+
+
+@pytest.mark.unit
+class TestAnonymousCustomers:
+    """Tests para el grupo de clientes anónimos de caja"""
+
+    def test_pattern_selects_pos_keys(self, customer_frame):
+        """El patrón por defecto agrupa todas las claves con |POS|"""
+        store = ColumnarStore.from_dataframe(customer_frame)
+        column = store.key('KeyCustomer')
+
+        codes = anonymous_codes(column, r"\|POS\|")
+
+        assert sorted(column.values[codes]) == ['1|POS|', '2|POS|']
+
+    def test_group_cube_matches_rows(self, customer_frame):
+        """Los totales del grupo en un rango deben coincidir con filtrar las filas anónimas"""
+        store = ColumnarStore.from_dataframe(customer_frame)
+        group = build_anonymous_group(store, r"\|POS\|", build_ticket_index(store))
+
+        amount, qty, count = group.cube.totals(0, 19310, 19340)
+
+        expected = customer_frame[customer_frame['KeyCustomer'].str.contains('|POS|', regex=False) &
+                                  customer_frame['KeyDate'].between(19310, 19340)]
+        assert group.n_customers == 2
+        assert amount == pytest.approx(expected['Amount'].sum())
+        assert qty == expected['Qty'].sum()
+        assert count == len(expected)
+
+    def test_group_rows_are_sorted_by_day(self, customer_frame):
+        """Las filas del grupo vienen ordenadas por día y solo dentro del rango"""
+        store = ColumnarStore.from_dataframe(customer_frame)
+        group = build_anonymous_group(store, r"\|POS\|")
+
+        rows = group.rows(store, 19320, 19330)
+
+        days = store.days[rows]
+        assert np.all(np.diff(days) >= 0)
+        assert days.min() >= 19320 and days.max() <= 19330
+        assert len(rows) == group.cube.totals(0, 19320, 19330)[2]
+
+    def test_group_counts_tickets(self):
+        """Los tickets del grupo se cuentan una vez por ticket"""
+        frame = pd.DataFrame({
+            'KeyDate': np.array([19300, 19300, 19301, 19301], dtype=np.int32),
+            'KeyCustomer': ['1|POS|', '1|POS|', '2|POS|', '1|7'],
+            'TicketId': ['A', 'A', 'B', 'C'],
+            'Qty': [1, 2, 3, 4],
+            'Amount': [1.0, 2.0, 3.0, 4.0],
+        })
+        store = ColumnarStore.from_dataframe(frame)
+
+        group = build_anonymous_group(store, r"\|POS\|", build_ticket_index(store))
+
+        assert group.cube.ticket_count(0) == 2
+
+    def test_without_customer_column(self, customer_frame):
+        """Sin KeyCustomer no hay grupo"""
+        store = ColumnarStore.from_dataframe(customer_frame.drop(columns=['KeyCustomer']))
+
+        assert build_anonymous_group(store, r"\|POS\|") is None
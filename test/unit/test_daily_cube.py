@@ -0,0 +1,122 @@
+import pytest
+import numpy as np
+
+from app.services.columnar import ColumnarStore
+from app.services.aggregates import DailyCube, build_daily_cubes, load_daily_cubes
+from app.utils.money import to_minor_units
+
+
+@pytest.fixture
+def random_frame(make_sales_frame):
+    """Datamart sintético con varias entidades y días repetidos"""
+    return make_sales_frame(2000, seed=42, keys={'KeyStore': 7, 'KeyEmployee': 40, 'KeyProduct': 150}, tickets=700)
+
+
+@pytest.mark.unit
+class TestDailyCube:
+    """Tests para el cubo diario entidad × día"""
+
+    def test_cells_match_groupby(self, random_frame):
+        """Cada celda debe coincidir con un groupby por (entidad, día)"""
+        store = ColumnarStore.from_dataframe(random_frame)
+        cube = DailyCube.from_key_column(store.key('KeyStore'), store)
+        expected = random_frame.groupby(['KeyStore', 'KeyDate']).agg(
+            amount=('Amount', 'sum'), qty=('Qty', 'sum'), count=('Amount', 'size')
+        )
+
+        assert cube.n_cells == len(expected)
+        for code, key in enumerate(store.key('KeyStore').values):
+            days, amount, qty, count = cube.daily(code)
+            group = expected.loc[key]
+            assert days.tolist() == group.index.tolist()
+            assert amount == pytest.approx(group['amount'].to_numpy())
+            assert qty.tolist() == group['qty'].tolist()
+            assert count.tolist() == group['count'].tolist()
+
+    def test_range_totals_match_totals(self, random_frame):
+        """Los totales de varios rangos en una pasada deben coincidir con totals por rango"""
+        store = ColumnarStore.from_dataframe(random_frame)
+        cube = DailyCube.from_key_column(store.key('KeyStore'), store)
+        ranges = [(19350, 19380), (19319, 19349), (19300, 19399), (19500, 19600)]
+
+        for code in (store.key('KeyStore').code_of('1|3'), None, -1):
+            results = cube.range_totals(code, ranges)
+            for (day_start, day_end), (amount, qty, count) in zip(ranges, results):
+                expected_amount, expected_qty, expected_count = cube.totals(code, day_start, day_end)
+                assert amount == pytest.approx(expected_amount)
+                assert (qty, count) == (expected_qty, expected_count)
+
+    def test_entity_totals_in_range(self, random_frame):
+        """Los totales por entidad y rango deben coincidir con filtrar filas"""
+        store = ColumnarStore.from_dataframe(random_frame)
+        cube = DailyCube.from_key_column(store.key('KeyEmployee'), store)
+        code = store.key('KeyEmployee').code_of('1|5')
+
+        amount, qty, count = cube.totals(code, 19320, 19350)
+
+        expected = random_frame[(random_frame['KeyEmployee'] == '1|5') &
+                                (random_frame['KeyDate'] >= 19320) & (random_frame['KeyDate'] <= 19350)]
+        assert amount == pytest.approx(expected['Amount'].sum())
+        assert qty == expected['Qty'].sum()
+        assert count == len(expected)
+
+    def test_returns_match_negative_rows(self, random_frame):
+        """Las devoluciones de la celda son las filas con Amount negativo, también desde las filas del almacén"""
+        store = ColumnarStore.from_dataframe(random_frame)
+        cube = DailyCube.from_key_column(store.key('KeyEmployee'), store)
+        column = store.key('KeyEmployee')
+        code = column.code_of('1|7')
+
+        amount, qty, count = cube.returns(code, 19320, 19380)
+
+        frame = random_frame
+        expected = frame[(frame['KeyEmployee'] == '1|7') & frame['KeyDate'].between(19320, 19380) &
+                         (frame['Amount'] < 0)]
+        assert amount == pytest.approx(expected['Amount'].sum())
+        assert qty == expected['Qty'].sum()
+        assert count == len(expected)
+        assert store.return_totals(column.rows(code, 19320, 19380)) == pytest.approx((amount, qty, count))
+
+    def test_range_returns_match_returns(self, random_frame):
+        """Las devoluciones por rango en una pasada coinciden con returns por rango"""
+        store = ColumnarStore.from_dataframe(random_frame)
+        cube = DailyCube.from_key_column(store.key('KeyStore'), store)
+        ranges = [(19350, 19380), (19300, 19399), (19500, 19600)]
+
+        for code in (store.key('KeyStore').code_of('1|2'), None, -1):
+            for (day_start, day_end), totals in zip(ranges, cube.range_returns(code, ranges)):
+                assert totals == pytest.approx(cube.returns(code, day_start, day_end))
+
+        negatives = random_frame[random_frame['Amount'] < 0]
+        assert cube.returns(None) == pytest.approx((negatives['Amount'].sum(), negatives['Qty'].sum(), len(negatives)))
+
+    def test_grand_and_unknown_totals(self, random_frame):
+        """Sin entidad debe dar el total general y con -1 ceros"""
+        store = ColumnarStore.from_dataframe(random_frame)
+        cube = DailyCube.from_key_column(store.key('KeyProduct'), store)
+
+        amount, qty, count = cube.totals()
+        assert amount == pytest.approx(random_frame['Amount'].sum())
+        assert count == len(random_frame)
+        assert cube.totals(-1) == (0.0, 0, 0)
+
+    def test_fixed_point_cube_is_exact(self, random_frame):
+        """Con Amount en punto fijo las sumas del cubo deben ser enteras y exactas"""
+        random_frame['Amount'] = to_minor_units(random_frame['Amount'], 2)
+        store = ColumnarStore.from_dataframe(random_frame)
+        cube = DailyCube.from_key_column(store.key('KeyStore'), store)
+
+        assert cube.amount.dtype == np.int64
+        assert sum(cube.totals(code)[0] for code in range(store.key('KeyStore').n_keys)) == int(random_frame['Amount'].sum())
+
+    def test_save_and_load(self, random_frame, tmp_path):
+        """Los cubos guardados deben mapearse con los mismos valores"""
+        store = ColumnarStore.from_dataframe(random_frame)
+        cubes = build_daily_cubes(store)
+        for cube in cubes.values():
+            cube.save(tmp_path)
+
+        loaded = load_daily_cubes(tmp_path)
+
+        assert set(loaded) == {'KeyEmployee', 'KeyProduct', 'KeyStore'}
+        assert loaded['KeyStore'].totals(2, 19310, 19390) == cubes['KeyStore'].totals(2, 19310, 19390)
@@ -0,0 +1,161 @@
+import pytest
+import threading
+import time
+from unittest.mock import Mock
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+
+from app.services import datamart
+from app.services.datamart import LoadProgress, get_datamart_service
+from app.dependencies import get_current_datamart
+
+
+@pytest.fixture
+def fresh_datamart_state(monkeypatch):
+    """Reinicia el singleton y el progreso de carga"""
+    progress = LoadProgress()
+    monkeypatch.setattr(datamart, "_datamart_service", None)
+    monkeypatch.setattr(datamart, "_load_progress", progress)
+    monkeypatch.setattr(datamart, "_load_thread", None)
+    return progress
+
+
+@pytest.mark.unit
+class TestLoadProgress:
+    """Tests para el progreso de carga"""
+
+    def test_starts_pending(self):
+        """El progreso inicial debe ser pending"""
+        progress = LoadProgress()
+
+        assert progress.status == LoadProgress.PENDING
+        assert progress.is_ready is False
+
+    def test_tracks_files_and_rows(self):
+        """Debe acumular archivos y registros cargados"""
+        progress = LoadProgress()
+
+        progress.start(files_total=3)
+        progress.file_loaded(100)
+        progress.file_loaded(50)
+
+        info = progress.as_dict()
+        assert info["status"] == LoadProgress.LOADING
+        assert info["files_total"] == 3
+        assert info["files_loaded"] == 2
+        assert info["rows_loaded"] == 150
+
+    def test_finish_marks_ready(self):
+        """finish debe marcar el datamart como listo"""
+        progress = LoadProgress()
+
+        progress.start(files_total=1)
+        progress.finish(rows_total=10)
+
+        assert progress.is_ready is True
+        assert progress.as_dict()["finished_at"] is not None
+
+    def test_fail_records_error(self):
+        """fail debe registrar el error"""
+        progress = LoadProgress()
+
+        progress.fail(FileNotFoundError("sin archivos"))
+
+        assert progress.status == LoadProgress.ERROR
+        assert progress.error == "sin archivos"
+
+
+@pytest.mark.unit
+class TestReadinessGating:
+    """Tests para el gating de rutas mientras carga el datamart"""
+
+    def test_dependency_returns_503_while_loading(self, fresh_datamart_state):
+        """Debe responder 503 con Retry-After si el datamart no está cargado"""
+        fresh_datamart_state.start(files_total=2)
+
+        with pytest.raises(HTTPException) as exc_info:
+            get_current_datamart()
+
+        assert exc_info.value.status_code == 503
+        assert "Retry-After" in exc_info.value.headers
+
+    def test_dependency_returns_service_when_ready(self, fresh_datamart_state, monkeypatch):
+        """Debe retornar el servicio cuando el datamart está cargado"""
+        service = Mock()
+        service.data = object()
+        monkeypatch.setattr(datamart, "_datamart_service", service)
+
+        assert get_current_datamart() is service
+
+    def test_concurrent_first_calls_load_once(self, fresh_datamart_state, monkeypatch):
+        """Dos peticiones concurrentes no deben disparar dos cargas"""
+        calls = []
+
+        def slow_service(progress=None):
+            calls.append(1)
+            time.sleep(0.05)
+            return Mock()
+
+        monkeypatch.setattr(datamart, "DatamartService", slow_service)
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(get_datamart_service())) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert len(calls) == 1
+        assert all(result is results[0] for result in results)
+
+    def test_background_load_does_not_block(self, fresh_datamart_state, monkeypatch):
+        """start_background_load debe retornar antes de terminar la carga"""
+        release = threading.Event()
+
+        def blocking_service(progress=None):
+            release.wait(timeout=5)
+            return Mock()
+
+        monkeypatch.setattr(datamart, "DatamartService", blocking_service)
+
+        thread = datamart.start_background_load()
+        assert thread.is_alive()
+        assert datamart.start_background_load() is thread
+
+        release.set()
+        thread.join(timeout=5)
+        assert datamart._datamart_service is not None
+
+
+@pytest.mark.unit
+class TestReadyEndpoint:
+    """Tests para endpoint /ready"""
+
+    @pytest.mark.asyncio
+    async def test_ready_returns_503_while_loading(self, fresh_datamart_state):
+        """/ready debe responder 503 mientras carga"""
+        from app.main import readiness_check
+
+        fresh_datamart_state.start(files_total=4)
+        fresh_datamart_state.file_loaded(1000)
+
+        response = await readiness_check()
+
+        assert isinstance(response, JSONResponse)
+        assert response.status_code == 503
+        assert response.headers["Retry-After"]
+
+    @pytest.mark.asyncio
+    async def test_ready_reports_progress_when_ready(self, fresh_datamart_state):
+        """/ready debe reportar el progreso final cuando está listo"""
+        from app.main import readiness_check
+
+        fresh_datamart_state.start(files_total=1)
+        fresh_datamart_state.file_loaded(5)
+        fresh_datamart_state.finish(rows_total=5)
+
+        result = await readiness_check()
+
+        assert result["ready"] is True
+        assert result["datamart"]["files_loaded"] == 1
+        assert result["datamart"]["rows_loaded"] == 5
@@ -1,5 +1,6 @@
 import pytest
 import pandas as pd
+import numpy as np
 from datetime import date
 from unittest.mock import Mock, patch, MagicMock
 from pathlib import Path
@@ -29,10 +30,10 @@ class TestDatamartServiceInitialization:
         assert 'Amount' in service._data.columns
 
     def test_service_converts_date_column(self, mock_settings):
-        """Debe convertir KeyDate a datetime"""
+        """Debe convertir KeyDate a número de día (int32)"""
         service = DatamartService()
 
-        assert pd.api.types.is_datetime64_any_dtype(service._data['KeyDate'])
+        assert service._data['KeyDate'].dtype == np.int32
 
     def test_service_converts_amount_to_float(self, mock_settings):
         """Debe convertir Amount a float"""
@@ -0,0 +1,73 @@
+import pytest
+import numpy as np
+import pandas as pd
+from datetime import date, datetime
+
+from app.utils.dates import (to_day_number, from_day_number, day_numbers_from_dates,
+                             dates_from_day_numbers, previous_period, shift_years, MISSING_DAY)
+
+
+@pytest.mark.unit
+class TestDayNumbers:
+    """Tests para la codificación de fechas como número de día"""
+
+    def test_epoch_is_day_zero(self):
+        """1970-01-01 debe ser el día 0"""
+        assert to_day_number(date(1970, 1, 1)) == 0
+
+    def test_roundtrip(self):
+        """Convertir ida y vuelta debe conservar la fecha"""
+        for value in [date(2023, 11, 2), date(2000, 2, 29), date(1969, 12, 31)]:
+            assert from_day_number(to_day_number(value)) == value
+
+    def test_accepts_datetime(self):
+        """Debe aceptar datetime ignorando la hora"""
+        assert to_day_number(datetime(2023, 11, 2, 23, 59)) == to_day_number(date(2023, 11, 2))
+
+    def test_series_conversion_is_int32(self, sample_dataframe):
+        """La conversión de columnas debe producir int32 compatible con datetime64[D]"""
+        days = day_numbers_from_dates(sample_dataframe['KeyDate'])
+
+        assert days.dtype == np.int32
+        assert days[0] == to_day_number(date(2023, 11, 2))
+        assert (dates_from_day_numbers(days) == sample_dataframe['KeyDate'].to_numpy(dtype="datetime64[D]")).all()
+
+    def test_series_conversion_from_strings(self):
+        """Debe aceptar fechas en texto como vienen del parquet"""
+        days = day_numbers_from_dates(pd.Series(['2023-11-02', '2023-06-15']))
+
+        assert days.tolist() == [to_day_number(date(2023, 11, 2)), to_day_number(date(2023, 6, 15))]
+
+    def test_missing_dates_use_sentinel(self):
+        """Las fechas nulas deben quedar fuera de cualquier rango"""
+        days = day_numbers_from_dates(pd.Series(['2023-11-02', None]))
+
+        assert days[1] == MISSING_DAY
+
+    def test_bincount_by_day_offset(self):
+        """Los días deben servir como índice directo de tablas por día"""
+        days = day_numbers_from_dates(pd.Series(['2023-11-01', '2023-11-03', '2023-11-03']))
+        first_day = int(days.min())
+
+        counts = np.bincount(days - first_day)
+
+        assert counts.tolist() == [1, 0, 2]
+
+
+@pytest.mark.unit
+class TestComparisonPeriods:
+    """Tests para los periodos de comparación"""
+
+    def test_previous_period_has_same_length(self):
+        """El periodo anterior termina el día antes y tiene los mismos días"""
+        start, end = previous_period(date(2023, 11, 1), date(2023, 11, 30))
+
+        assert (start, end) == (date(2023, 10, 2), date(2023, 10, 31))
+
+    def test_shift_years_keeps_month_and_day(self):
+        """El mismo periodo del año anterior conserva mes y día"""
+        assert shift_years(date(2023, 11, 30), -1) == date(2022, 11, 30)
+
+    def test_shift_years_from_leap_day(self):
+        """El 29 de febrero pasa al 28 en un año no bisiesto"""
+        assert shift_years(date(2024, 2, 29), -1) == date(2023, 2, 28)
@@ -0,0 +1,91 @@
+import pytest
+from datetime import date
+from unittest.mock import Mock
+from fastapi import HTTPException
+
+from app.api.routes.summary import get_amount_distribution
+from app.models.responses import AmountDistributionResponse
+from app.utils.exceptions import MixedCurrencyError
+
+
+def distribution_response():
+    return AmountDistributionResponse(
+        dimension='KeyStore',
+        key='1|023',
+        measure='ticket',
+        count=10,
+        p50=100.0,
+        p90=900.0,
+        p99=990.0,
+        relative_accuracy=0.01
+    )
+
+
+@pytest.mark.unit
+class TestAmountDistributionEndpoint:
+    """Tests para endpoint get_amount_distribution"""
+
+    @pytest.mark.asyncio
+    async def test_endpoint_calls_service_with_params(self):
+        """El endpoint debe pasar la medida, la entidad, el periodo y los intervalos"""
+        mock_service = Mock()
+        mock_service.get_amount_distribution.return_value = distribution_response()
+
+        result = await get_amount_distribution(
+            measure='ticket', key_employee=None, key_product=None, key_store='1|023',
+            date_start=date(2023, 11, 1), date_end=date(2023, 11, 30), division='1', bins=10,
+            datamart_service=mock_service
+        )
+
+        mock_service.get_amount_distribution.assert_called_once_with(
+            measure='ticket', key_employee=None, key_product=None, key_store='1|023',
+            date_start=date(2023, 11, 1), date_end=date(2023, 11, 30), division='1', bins=10
+        )
+        assert isinstance(result, AmountDistributionResponse)
+        assert result.p90 == 900.0
+
+    @pytest.mark.asyncio
+    async def test_invalid_date_range_returns_422(self):
+        """date_end anterior a date_start debe retornar 422 sin llamar al servicio"""
+        mock_service = Mock()
+
+        with pytest.raises(HTTPException) as exc_info:
+            await get_amount_distribution(
+                measure='amount', key_employee=None, key_product=None, key_store=None,
+                date_start=date(2023, 12, 1), date_end=date(2023, 11, 1), division=None, bins=20,
+                datamart_service=mock_service
+            )
+
+        assert exc_info.value.status_code == 422
+        mock_service.get_amount_distribution.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_value_error_returns_422(self):
+        """Varias entidades o una medida no disponible deben retornar 422"""
+        mock_service = Mock()
+        mock_service.get_amount_distribution.side_effect = ValueError("Indique una sola entidad")
+
+        with pytest.raises(HTTPException) as exc_info:
+            await get_amount_distribution(
+                measure='amount', key_employee='1|343', key_product=None, key_store='1|023',
+                date_start=None, date_end=None, division=None, bins=20,
+                datamart_service=mock_service
+            )
+
+        assert exc_info.value.status_code == 422
+
+    @pytest.mark.asyncio
+    async def test_mixed_currency_returns_422(self):
+        """Una distribución que mezclaría monedas debe retornar 422"""
+        mock_service = Mock()
+        mock_service.get_amount_distribution.side_effect = MixedCurrencyError(['CLP', 'USD'])
+
+        with pytest.raises(HTTPException) as exc_info:
+            await get_amount_distribution(
+                measure='amount', key_employee=None, key_product=None, key_store=None,
+                date_start=None, date_end=None, division=None, bins=20,
+                datamart_service=mock_service
+            )
+
+        assert exc_info.value.status_code == 422
+        assert 'division' in exc_info.value.detail
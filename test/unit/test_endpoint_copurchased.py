@@ -0,0 +1,65 @@
+import pytest
+from unittest.mock import Mock
+from fastapi import HTTPException
+
+from app.api.routes.summary import get_copurchased_products
+from app.models.responses import CoPurchaseResponse, CoPurchasedProduct
+from app.utils.exceptions import CooccurrenceNotReadyError
+
+
+@pytest.mark.unit
+class TestCoPurchasedEndpoint:
+    """Tests para endpoint get_copurchased_products"""
+
+    @pytest.mark.asyncio
+    async def test_endpoint_calls_service_with_params(self):
+        """El endpoint debe pasar el producto, el límite, el orden y el mínimo de tickets"""
+        mock_service = Mock()
+        mock_service.get_copurchased_products.return_value = CoPurchaseResponse(
+            key_product='1|44733',
+            product_tickets=100,
+            total_tickets=1000,
+            order_by='lift',
+            products=[CoPurchasedProduct(key_product='1|1021', tickets=30, support=0.03,
+                                         confidence=0.3, lift=2.5)]
+        )
+
+        result = await get_copurchased_products(
+            key_product='1|44733', limit=5, order_by='lift', min_count=10,
+            datamart_service=mock_service
+        )
+
+        mock_service.get_copurchased_products.assert_called_once_with(
+            key_product='1|44733', limit=5, order_by='lift', min_count=10
+        )
+        assert isinstance(result, CoPurchaseResponse)
+        assert result.products[0].lift == 2.5
+
+    @pytest.mark.asyncio
+    async def test_matrix_not_ready_returns_503(self):
+        """Mientras la matriz se construye debe retornar 503 con Retry-After"""
+        mock_service = Mock()
+        mock_service.get_copurchased_products.side_effect = CooccurrenceNotReadyError("building")
+
+        with pytest.raises(HTTPException) as exc_info:
+            await get_copurchased_products(
+                key_product='1|44733', limit=10, order_by='count', min_count=1,
+                datamart_service=mock_service
+            )
+
+        assert exc_info.value.status_code == 503
+        assert "Retry-After" in exc_info.value.headers
+
+    @pytest.mark.asyncio
+    async def test_service_error_returns_500(self):
+        """Un error inesperado debe retornar 500"""
+        mock_service = Mock()
+        mock_service.get_copurchased_products.side_effect = Exception("Error de conexión")
+
+        with pytest.raises(HTTPException) as exc_info:
+            await get_copurchased_products(
+                key_product='1|44733', limit=10, order_by='count', min_count=1,
+                datamart_service=mock_service
+            )
+
+        assert exc_info.value.status_code == 500
@@ -0,0 +1,113 @@
+import pytest
+from datetime import date
+from unittest.mock import Mock
+from fastapi import HTTPException
+
+from app.api.routes.sales import get_sales_by_customer
+from app.api.routes.summary import get_customer_summary
+from app.models.responses import CustomerSalesResponse, CustomerSummaryResponse
+
+
+@pytest.mark.unit
+class TestSalesByCustomerEndpoint:
+    """Tests para endpoint get_sales_by_customer"""
+
+    @pytest.mark.asyncio
+    async def test_endpoint_calls_service_with_params(self):
+        """El endpoint debe pasar cliente, periodo, grupo anónimo y límite"""
+        mock_service = Mock()
+        mock_service.get_sales_by_customer.return_value = CustomerSalesResponse(
+            key_customer='1|88120',
+            date_start=date(2023, 11, 1),
+            date_end=date(2023, 11, 30),
+            total_amount=3120.5,
+            total_quantity=14,
+            records_count=6,
+            sales=[]
+        )
+
+        result = await get_sales_by_customer(
+            key_customer='1|88120', date_start=date(2023, 11, 1), date_end=date(2023, 11, 30),
+            anonymous=False, limit=100, division=None, datamart_service=mock_service
+        )
+
+        mock_service.get_sales_by_customer.assert_called_once_with(
+            key_customer='1|88120', date_start=date(2023, 11, 1), date_end=date(2023, 11, 30),
+            anonymous=False, limit=100, division=None
+        )
+        assert isinstance(result, CustomerSalesResponse)
+
+    @pytest.mark.asyncio
+    async def test_invalid_date_range_returns_422(self):
+        """date_end anterior a date_start debe retornar 422 sin llamar al servicio"""
+        mock_service = Mock()
+
+        with pytest.raises(HTTPException) as exc_info:
+            await get_sales_by_customer(
+                key_customer='1|88120', date_start=date(2023, 12, 1), date_end=date(2023, 11, 1),
+                anonymous=False, limit=1000, datamart_service=mock_service
+            )
+
+        assert exc_info.value.status_code == 422
+        mock_service.get_sales_by_customer.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_customer_and_anonymous_returns_422(self):
+        """Cliente y grupo anónimo a la vez (ValueError del servicio) debe retornar 422"""
+        mock_service = Mock()
+        mock_service.get_sales_by_customer.side_effect = ValueError("Indique key_customer o anonymous=true")
+
+        with pytest.raises(HTTPException) as exc_info:
+            await get_sales_by_customer(
+                key_customer='1|88120', date_start=date(2023, 11, 1), date_end=date(2023, 11, 30),
+                anonymous=True, limit=1000, datamart_service=mock_service
+            )
+
+        assert exc_info.value.status_code == 422
+
+
+@pytest.mark.unit
+class TestCustomerSummaryEndpoint:
+    """Tests para endpoint get_customer_summary"""
+
+    @pytest.mark.asyncio
+    async def test_anonymous_group_summary(self):
+        """El endpoint debe pasar anonymous y retornar el resumen del grupo"""
+        mock_service = Mock()
+        mock_service.get_customer_summary.return_value = CustomerSummaryResponse(
+            anonymous=True,
+            customers_count=2,
+            total_amount=9500.0,
+            average_amount=95.0,
+            total_quantity=300,
+            records_count=100,
+            tickets_count=40,
+            average_ticket_value=237.5,
+            average_items_per_ticket=7.5
+        )
+
+        result = await get_customer_summary(
+            key_customer=None, anonymous=True, date_start=None, date_end=None, division=None, split_returns=False,
+            datamart_service=mock_service
+        )
+
+        mock_service.get_customer_summary.assert_called_once_with(
+            key_customer=None, date_start=None, date_end=None, anonymous=True, division=None,
+            split_returns=False
+        )
+        assert result.anonymous is True
+        assert result.customers_count == 2
+
+    @pytest.mark.asyncio
+    async def test_service_error_returns_500(self):
+        """Un error inesperado debe retornar 500"""
+        mock_service = Mock()
+        mock_service.get_customer_summary.side_effect = Exception("Error de conexión")
+
+        with pytest.raises(HTTPException) as exc_info:
+            await get_customer_summary(
+                key_customer='1|88120', anonymous=False, date_start=None, date_end=None,
+                datamart_service=mock_service
+            )
+
+        assert exc_info.value.status_code == 500
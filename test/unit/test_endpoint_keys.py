@@ -0,0 +1,77 @@
+import pytest
+from unittest.mock import Mock
+from fastapi import HTTPException
+
+from app.api.routes.keys import list_keys
+from app.models.responses import KeyEntry, KeyListResponse
+from app.services.columnar import ColumnarStore
+
+
+@pytest.mark.unit
+class TestKeysEndpoint:
+    """Tests para el endpoint de listado de claves"""
+
+    @pytest.mark.asyncio
+    async def test_keys_passes_parameters(self):
+        """Los parámetros llegan al servicio y se retorna la página de claves"""
+        mock_service = Mock()
+        mock_service.list_keys.return_value = KeyListResponse(
+            dimension='key_employee', prefix='1|34', total=1, offset=0, limit=20,
+            keys=[KeyEntry(key='1|343', records=3)]
+        )
+
+        result = await list_keys(
+            dimension='key_employee', prefix='1|34', offset=0, limit=20, datamart_service=mock_service
+        )
+
+        mock_service.list_keys.assert_called_once_with(dimension='key_employee', prefix='1|34', offset=0, limit=20)
+        assert result.keys[0].key == '1|343'
+
+    @pytest.mark.asyncio
+    async def test_missing_dimension_returns_422(self):
+        """Una dimensión que el datamart no tiene debe retornar 422"""
+        mock_service = Mock()
+        mock_service.list_keys.side_effect = ValueError("El datamart no tiene la columna KeyDivision")
+
+        with pytest.raises(HTTPException) as exc_info:
+            await list_keys(
+                dimension='key_division', prefix=None, offset=0, limit=100, datamart_service=mock_service
+            )
+
+        assert exc_info.value.status_code == 422
+
+
+@pytest.mark.unit
+class TestListKeys:
+    """Tests para el listado de claves del servicio"""
+
+    @pytest.fixture
+    def service(self, sample_dataframe, make_service):
+        data = sample_dataframe.copy()
+        data['KeyDate'] = data['KeyDate'].astype('int64') // 86_400_000_000_000
+        return make_service(ColumnarStore.from_dataframe(data))
+
+    def test_prefix_search_with_counts(self, service):
+        """El prefijo filtra las claves y cada una trae sus registros"""
+        result = service.list_keys('key_store', prefix='1|0', limit=2)
+
+        assert result.total == 3
+        assert [(entry.key, entry.records) for entry in result.keys] == [('1|007', 1), ('1|023', 3)]
+        assert service.list_keys('key_store', prefix='1|1').total == 0
+
+    def test_pagination(self, service):
+        """offset y limit recorren las claves en orden sin cambiar el total"""
+        first = service.list_keys('key_product', offset=0, limit=2)
+        second = service.list_keys('key_product', offset=2, limit=2)
+        past_end = service.list_keys('key_product', offset=10, limit=2)
+
+        assert [entry.key for entry in first.keys + second.keys] == ['1|101', '1|102', '1|42606', '1|44733']
+        assert first.total == second.total == past_end.total == 5
+        assert past_end.keys == []
+
+    def test_unknown_dimension_is_invalid(self, service):
+        """Dimensiones fuera de FILTER_COLUMNS o ausentes en el datamart son inválidas"""
+        with pytest.raises(ValueError):
+            service.list_keys('key_sale')
+        with pytest.raises(ValueError):
+            service.list_keys('key_customer')
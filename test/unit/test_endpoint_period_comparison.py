@@ -0,0 +1,79 @@
+import pytest
+from datetime import date
+from unittest.mock import Mock
+from fastapi import HTTPException
+
+from app.api.routes.summary import get_period_comparison
+from app.models.responses import PeriodComparisonResponse, PeriodTotals, PeriodChange
+
+
+def period(start, end, amount):
+    return PeriodTotals(date_start=start, date_end=end, total_amount=amount, total_quantity=10, records_count=5)
+
+
+def comparison_response():
+    change = PeriodChange(amount=100.0, amount_pct=10.0, quantity=0, quantity_pct=0.0, records=0, records_pct=0.0)
+    return PeriodComparisonResponse(
+        dimension='KeyStore',
+        key='1|023',
+        current=period(date(2023, 11, 1), date(2023, 11, 30), 1100.0),
+        previous=period(date(2023, 10, 2), date(2023, 10, 31), 1000.0),
+        year_ago=period(date(2022, 11, 1), date(2022, 11, 30), 1000.0),
+        change_vs_previous=change,
+        change_vs_year_ago=change
+    )
+
+
+@pytest.mark.unit
+class TestPeriodComparisonEndpoint:
+    """Tests para endpoint get_period_comparison"""
+
+    @pytest.mark.asyncio
+    async def test_endpoint_calls_service_with_params(self):
+        """El endpoint debe pasar el periodo, la entidad y la división"""
+        mock_service = Mock()
+        mock_service.get_period_comparison.return_value = comparison_response()
+
+        result = await get_period_comparison(
+            date_start=date(2023, 11, 1), date_end=date(2023, 11, 30),
+            key_employee=None, key_product=None, key_store='1|023', division=None, split_returns=False,
+            datamart_service=mock_service
+        )
+
+        mock_service.get_period_comparison.assert_called_once_with(
+            date_start=date(2023, 11, 1), date_end=date(2023, 11, 30),
+            key_employee=None, key_product=None, key_store='1|023', division=None,
+            split_returns=False
+        )
+        assert isinstance(result, PeriodComparisonResponse)
+        assert result.change_vs_previous.amount_pct == 10.0
+
+    @pytest.mark.asyncio
+    async def test_endpoint_invalid_date_range_returns_422(self):
+        """date_end anterior a date_start debe retornar 422 sin llamar al servicio"""
+        mock_service = Mock()
+
+        with pytest.raises(HTTPException) as exc_info:
+            await get_period_comparison(
+                date_start=date(2023, 12, 31), date_end=date(2023, 1, 1),
+                key_employee=None, key_product=None, key_store=None, division=None, split_returns=False,
+                datamart_service=mock_service
+            )
+
+        assert exc_info.value.status_code == 422
+        mock_service.get_period_comparison.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_endpoint_several_entities_returns_422(self):
+        """Indicar más de una entidad debe retornar 422"""
+        mock_service = Mock()
+        mock_service.get_period_comparison.side_effect = ValueError("Indique una sola entidad")
+
+        with pytest.raises(HTTPException) as exc_info:
+            await get_period_comparison(
+                date_start=date(2023, 11, 1), date_end=date(2023, 11, 30),
+                key_employee='1|343', key_product=None, key_store='1|023', division=None, split_returns=False,
+                datamart_service=mock_service
+            )
+
+        assert exc_info.value.status_code == 422
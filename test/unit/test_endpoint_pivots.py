@@ -0,0 +1,77 @@
+import pytest
+from datetime import date
+from unittest.mock import Mock
+from fastapi import HTTPException
+
+from app.api.routes.pivots import get_pivot
+from app.models.responses import PivotResponse
+from app.utils.exceptions import PivotNotFoundError
+
+
+def pivot_response():
+    return PivotResponse(
+        pivot='store-product',
+        row_dimension='key_store',
+        column_dimension='key_product',
+        date_start=date(2023, 11, 1),
+        date_end=date(2023, 11, 30),
+        rows=['1|023'],
+        columns=['1|44733', '1|44734'],
+        amount=[[1500.5, 0.0]],
+        quantity=[[3, 0]],
+        records=[[2, 0]],
+        total_rows=1,
+        total_columns=2
+    )
+
+
+@pytest.mark.unit
+class TestPivotsEndpoint:
+    """Tests para el endpoint de pivotes"""
+
+    @pytest.mark.asyncio
+    async def test_pivot_passes_parameters(self):
+        """Los parámetros llegan al servicio y se retorna el sub-pivote"""
+        mock_service = Mock()
+        mock_service.get_pivot.return_value = pivot_response()
+
+        result = await get_pivot(
+            name='store-product', rows=['1|023'], columns=None, date_start=date(2023, 11, 1),
+            date_end=date(2023, 11, 30), order_by='amount', row_limit=50, column_limit=50,
+            datamart_service=mock_service
+        )
+
+        mock_service.get_pivot.assert_called_once_with(
+            name='store-product', rows=['1|023'], columns=None, date_start=date(2023, 11, 1),
+            date_end=date(2023, 11, 30), order_by='amount', row_limit=50, column_limit=50
+        )
+        assert result.amount == [[1500.5, 0.0]]
+
+    @pytest.mark.asyncio
+    async def test_unknown_pivot_returns_404(self):
+        """Un pivote que no existe debe retornar 404"""
+        mock_service = Mock()
+        mock_service.get_pivot.side_effect = PivotNotFoundError('product-customer')
+
+        with pytest.raises(HTTPException) as exc_info:
+            await get_pivot(
+                name='product-customer', rows=None, columns=None, date_start=None, date_end=None,
+                order_by='amount', row_limit=50, column_limit=50, datamart_service=mock_service
+            )
+
+        assert exc_info.value.status_code == 404
+
+    @pytest.mark.asyncio
+    async def test_invalid_date_range_returns_422(self):
+        """date_end anterior a date_start debe retornar 422 sin llamar al servicio"""
+        mock_service = Mock()
+
+        with pytest.raises(HTTPException) as exc_info:
+            await get_pivot(
+                name='store-product', rows=None, columns=None, date_start=date(2023, 12, 1),
+                date_end=date(2023, 11, 1), order_by='amount', row_limit=50, column_limit=50,
+                datamart_service=mock_service
+            )
+
+        assert exc_info.value.status_code == 422
+        mock_service.get_pivot.assert_not_called()
@@ -4,6 +4,7 @@ from unittest.mock import Mock, patch
 from fastapi import HTTPException
 
 from app.api.routes.sales import get_sales_by_employee
+from app.utils.exceptions import KeyNotFoundError
 
 
 @pytest.mark.unit
@@ -30,6 +31,7 @@ class TestSalesByEmployeeEndpoint:
             key_employee='1|343',
             date_start=date(2023, 11, 1),
             date_end=date(2023, 11, 30),
+            division=None,
             datamart_service=mock_service
         )
 
@@ -37,7 +39,8 @@ class TestSalesByEmployeeEndpoint:
         mock_service.get_sales_by_employee.assert_called_once_with(
             key_employee='1|343',
             date_start=date(2023, 11, 1),
-            date_end=date(2023, 11, 30)
+            date_end=date(2023, 11, 30),
+            division=None
         )
 
     @pytest.mark.asyncio
@@ -99,6 +102,24 @@ class TestSalesByEmployeeEndpoint:
 
         assert exc_info.value.status_code == 422
 
+    @pytest.mark.asyncio
+    async def test_endpoint_returns_404_for_unknown_key(self):
+        """Con UNKNOWN_KEY_MODE=404 una clave inexistente debe retornar 404"""
+        mock_service = Mock()
+        mock_service.get_sales_by_employee.side_effect = KeyNotFoundError('KeyEmployee', '999|999')
+
+        with pytest.raises(HTTPException) as exc_info:
+            await get_sales_by_employee(
+                key_employee='999|999',
+                date_start=date(2023, 11, 1),
+                date_end=date(2023, 11, 30),
+                division=None,
+                datamart_service=mock_service
+            )
+
+        assert exc_info.value.status_code == 404
+        assert '999|999' in exc_info.value.detail
+
     @pytest.mark.asyncio
     async def test_endpoint_handles_service_generic_error(self):
         """El endpoint debe manejar errores genéricos del servicio"""
@@ -32,6 +32,7 @@ class TestSalesByProductEndpoint:
             key_product='1|44733',
             date_start=date(2023, 11, 1),
             date_end=date(2023, 11, 30),
+            division=None,
             datamart_service=mock_service
         )
 
@@ -39,7 +40,8 @@ class TestSalesByProductEndpoint:
         mock_service.get_sales_by_product.assert_called_once_with(
             key_product='1|44733',
             date_start=date(2023, 11, 1),
-            date_end=date(2023, 11, 30)
+            date_end=date(2023, 11, 30),
+            division=None
         )
 
     @pytest.mark.asyncio
@@ -30,6 +30,7 @@ class TestSalesByStoreEndpoint:
             key_store='1|023',
             date_start=date(2023, 11, 1),
             date_end=date(2023, 11, 30),
+            division=None,
             datamart_service=mock_service
         )
 
@@ -37,7 +38,8 @@ class TestSalesByStoreEndpoint:
         mock_service.get_sales_by_store.assert_called_once_with(
             key_store='1|023',
             date_start=date(2023, 11, 1),
-            date_end=date(2023, 11, 30)
+            date_end=date(2023, 11, 30),
+            division=None
         )
 
     @pytest.mark.asyncio
@@ -0,0 +1,79 @@
+import pytest
+from datetime import date
+from unittest.mock import Mock
+from fastapi import HTTPException
+
+from app.api.routes.summary import get_sales_series
+from app.models.responses import SalesSeriesResponse, SeriesPoint
+from app.utils.exceptions import MixedCurrencyError
+
+
+def series_response():
+    point = SeriesPoint(
+        date=date(2023, 11, 1), total_amount=100.0, total_quantity=2, records_count=1,
+        amount_7d=700.0, amount_30d=3000.0, amount_90d=9000.0,
+        avg_amount_7d=100.0, avg_amount_30d=100.0, avg_amount_90d=100.0,
+        ytd_amount=30500.0, ytd_quantity=610
+    )
+    return SalesSeriesResponse(
+        dimension='KeyStore',
+        key='1|023',
+        date_start=date(2023, 11, 1),
+        date_end=date(2023, 11, 1),
+        points=[point]
+    )
+
+
+@pytest.mark.unit
+class TestSalesSeriesEndpoint:
+    """Tests para endpoint get_sales_series"""
+
+    @pytest.mark.asyncio
+    async def test_endpoint_calls_service_with_params(self):
+        """El endpoint debe pasar el rango, la entidad y la división"""
+        mock_service = Mock()
+        mock_service.get_sales_series.return_value = series_response()
+
+        result = await get_sales_series(
+            date_start=date(2023, 11, 1), date_end=date(2023, 11, 1),
+            key_employee=None, key_product=None, key_store='1|023', division=None, approx=False,
+            datamart_service=mock_service
+        )
+
+        mock_service.get_sales_series.assert_called_once_with(
+            date_start=date(2023, 11, 1), date_end=date(2023, 11, 1),
+            key_employee=None, key_product=None, key_store='1|023', division=None, approx=False
+        )
+        assert isinstance(result, SalesSeriesResponse)
+        assert result.points[0].amount_7d == 700.0
+
+    @pytest.mark.asyncio
+    async def test_endpoint_invalid_date_range_returns_422(self):
+        """date_end anterior a date_start debe retornar 422 sin llamar al servicio"""
+        mock_service = Mock()
+
+        with pytest.raises(HTTPException) as exc_info:
+            await get_sales_series(
+                date_start=date(2023, 12, 31), date_end=date(2023, 1, 1),
+                key_employee=None, key_product=None, key_store=None, division=None,
+                datamart_service=mock_service
+            )
+
+        assert exc_info.value.status_code == 422
+        mock_service.get_sales_series.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_endpoint_mixed_currency_returns_422(self):
+        """Una serie que sumaría varias monedas debe retornar 422"""
+        mock_service = Mock()
+        mock_service.get_sales_series.side_effect = MixedCurrencyError(['CLP', 'USD'])
+
+        with pytest.raises(HTTPException) as exc_info:
+            await get_sales_series(
+                date_start=date(2023, 11, 1), date_end=date(2023, 11, 30),
+                key_employee=None, key_product=None, key_store=None, division=None,
+                datamart_service=mock_service
+            )
+
+        assert exc_info.value.status_code == 422
+        assert 'division' in exc_info.value.detail
@@ -0,0 +1,81 @@
+import json
+import pytest
+from unittest.mock import Mock
+from fastapi import HTTPException
+
+from app.api.routes.sql import run_sql_query
+from app.models.schemas import SqlQueryRequest
+from app.services.sql_engine import SqlEngine
+from app.utils.dates import day_numbers_from_dates
+
+
+@pytest.fixture
+def mock_service(sample_dataframe):
+    """Servicio simulado que entrega un motor SQL real sobre el DataFrame de prueba"""
+    data = sample_dataframe.copy()
+    data['KeyDate'] = day_numbers_from_dates(data['KeyDate'])
+    service = Mock()
+    service.get_sql_engine.return_value = SqlEngine(data)
+    return service
+
+
+async def read_lines(response):
+    body = "".join([chunk async for chunk in response.body_iterator])
+    return [json.loads(line) for line in body.splitlines()]
+
+
+@pytest.mark.unit
+class TestSqlQueryEndpoint:
+    """Tests para endpoint run_sql_query"""
+
+    @pytest.mark.asyncio
+    async def test_streams_rows_as_ndjson(self, mock_service):
+        """El endpoint debe enviar una fila JSON por línea"""
+        response = await run_sql_query(
+            request=SqlQueryRequest(query="SELECT KeyEmployee, COUNT(*) AS n FROM sales "
+                                          "GROUP BY KeyEmployee ORDER BY n DESC"),
+            datamart_service=mock_service,
+            current_user={'user_id': 'test'}
+        )
+
+        lines = await read_lines(response)
+        assert response.media_type == "application/x-ndjson"
+        assert response.headers["X-Columns"] == "KeyEmployee,n"
+        assert lines[0] == {'KeyEmployee': '1|343', 'n': 3}
+
+    @pytest.mark.asyncio
+    async def test_reports_truncation(self, mock_service):
+        """Si se recorta el resultado la última línea debe indicarlo"""
+        response = await run_sql_query(
+            request=SqlQueryRequest(query="SELECT * FROM sales", max_rows=2),
+            datamart_service=mock_service,
+            current_user={'user_id': 'test'}
+        )
+
+        lines = await read_lines(response)
+        assert len(lines) == 3
+        assert lines[-1] == {'_truncated': True, 'max_rows': 2}
+
+    @pytest.mark.asyncio
+    async def test_write_statement_returns_403(self, mock_service):
+        """Una sentencia de escritura debe responder 403"""
+        with pytest.raises(HTTPException) as exc_info:
+            await run_sql_query(
+                request=SqlQueryRequest(query="DROP VIEW sales"),
+                datamart_service=mock_service,
+                current_user={'user_id': 'test'}
+            )
+
+        assert exc_info.value.status_code == 403
+
+    @pytest.mark.asyncio
+    async def test_invalid_sql_returns_422(self, mock_service):
+        """Una consulta inválida debe responder 422"""
+        with pytest.raises(HTTPException) as exc_info:
+            await run_sql_query(
+                request=SqlQueryRequest(query="SELECT nope FROM sales"),
+                datamart_service=mock_service,
+                current_user={'user_id': 'test'}
+            )
+
+        assert exc_info.value.status_code == 422
@@ -4,7 +4,8 @@ from unittest.mock import Mock
 from fastapi import HTTPException
 
 from app.api.routes.summary import get_store_summary
-from app.models.responses import StoreSummaryResponse, StoreSalesResponse, SaleRecord
+from app.models.responses import StoreSummaryResponse, ReturnsBreakdown, ConfidenceInterval
+from app.utils.exceptions import MixedCurrencyError
 
 
 @pytest.mark.unit
@@ -28,11 +29,84 @@ class TestStoreSummaryEndpoint:
         # Act
         result = await get_store_summary(
             key_store='1|023',
+            date_start=None,
+            date_end=None,
+            division=None,
+            split_returns=False,
+            approx=False,
             datamart_service=mock_service
         )
 
         # Assert
-        mock_service.get_store_summary.assert_called_once_with(key_store='1|023')
+        mock_service.get_store_summary.assert_called_once_with(
+            key_store='1|023', date_start=None, date_end=None, division=None, split_returns=False, approx=False
+        )
+
+    @pytest.mark.asyncio
+    async def test_endpoint_forwards_split_returns(self):
+        """split_returns=true debe llegar al servicio y retornar el desglose de devoluciones"""
+        mock_service = Mock()
+        mock_service.get_store_summary.return_value = StoreSummaryResponse(
+            success=True,
+            key_store='1|023',
+            total_amount=900.0,
+            average_amount=90.0,
+            total_quantity=9,
+            records_count=10,
+            returns=ReturnsBreakdown(
+                gross_amount=1000.0, returns_amount=100.0, net_amount=900.0,
+                gross_quantity=10, returns_quantity=1, net_quantity=9,
+                sales_count=9, returns_count=1, return_rate=10.0, quantity_return_rate=10.0
+            )
+        )
+
+        result = await get_store_summary(
+            key_store='1|023',
+            date_start=None,
+            date_end=None,
+            division=None,
+            split_returns=True,
+            approx=False,
+            datamart_service=mock_service
+        )
+
+        mock_service.get_store_summary.assert_called_once_with(
+            key_store='1|023', date_start=None, date_end=None, division=None, split_returns=True, approx=False
+        )
+        assert result.returns.return_rate == 10.0
+
+    @pytest.mark.asyncio
+    async def test_endpoint_forwards_approx(self):
+        """approx=true debe llegar al servicio y retornar los intervalos de confianza"""
+        mock_service = Mock()
+        mock_service.get_store_summary.return_value = StoreSummaryResponse(
+            success=True,
+            key_store=None,
+            total_amount=1000000.0,
+            average_amount=100.0,
+            total_quantity=20000,
+            records_count=10000,
+            approximate=True,
+            confidence_intervals={
+                'total_amount': ConfidenceInterval(lower=980000.0, upper=1020000.0, level=0.95)
+            }
+        )
+
+        result = await get_store_summary(
+            key_store=None,
+            date_start=None,
+            date_end=None,
+            division=None,
+            split_returns=False,
+            approx=True,
+            datamart_service=mock_service
+        )
+
+        mock_service.get_store_summary.assert_called_once_with(
+            key_store=None, date_start=None, date_end=None, division=None, split_returns=False, approx=True
+        )
+        assert result.approximate is True
+        assert result.confidence_intervals['total_amount'].lower == 980000.0
 
     @pytest.mark.asyncio
     async def test_endpoint_returns_store_summary_response(self):
@@ -52,6 +126,8 @@ class TestStoreSummaryEndpoint:
         # Act
         result = await get_store_summary(
             key_store='1|023',
+            date_start=None,
+            date_end=None,
             datamart_service=mock_service
         )
 
@@ -60,3 +136,24 @@ class TestStoreSummaryEndpoint:
         assert result.success is True
 
 
+
+    @pytest.mark.asyncio
+    async def test_endpoint_mixed_currencies_returns_422(self):
+        """Un resumen que mezclaría monedas debe retornar 422 pidiendo la división"""
+        # Arrange
+        mock_service = Mock()
+        mock_service.get_store_summary.side_effect = MixedCurrencyError(['CLP', 'USD'])
+
+        # Act & Assert
+        with pytest.raises(HTTPException) as exc_info:
+            await get_store_summary(
+                key_store=None,
+                date_start=None,
+                date_end=None,
+                division=None,
+                split_returns=False,
+                datamart_service=mock_service
+            )
+
+        assert exc_info.value.status_code == 422
+        assert 'CLP, USD' in exc_info.value.detail
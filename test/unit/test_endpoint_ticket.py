@@ -0,0 +1,55 @@
+import pytest
+from datetime import date
+from unittest.mock import Mock
+from fastapi import HTTPException
+
+from app.api.routes.sales import get_ticket
+from app.models.responses import TicketResponse
+from app.utils.exceptions import TicketNotFoundError
+
+
+@pytest.mark.unit
+class TestTicketEndpoint:
+    """Tests para endpoint get_ticket"""
+
+    @pytest.mark.asyncio
+    async def test_endpoint_calls_service(self):
+        """El endpoint debe pasar el ticket al servicio y retornar su detalle"""
+        mock_service = Mock()
+        mock_service.get_ticket.return_value = TicketResponse(
+            ticket_id='N01-00000385',
+            ticket_date=date(2023, 11, 2),
+            key_store='1|023',
+            total_amount=1800.5,
+            total_quantity=12,
+            lines_count=2,
+            sales=[]
+        )
+
+        result = await get_ticket(ticket_id='N01-00000385', datamart_service=mock_service)
+
+        mock_service.get_ticket.assert_called_once_with(ticket_id='N01-00000385')
+        assert isinstance(result, TicketResponse)
+        assert result.lines_count == 2
+
+    @pytest.mark.asyncio
+    async def test_unknown_ticket_returns_404(self):
+        """Un ticket inexistente debe retornar 404"""
+        mock_service = Mock()
+        mock_service.get_ticket.side_effect = TicketNotFoundError('N01-X')
+
+        with pytest.raises(HTTPException) as exc_info:
+            await get_ticket(ticket_id='N01-X', datamart_service=mock_service)
+
+        assert exc_info.value.status_code == 404
+
+    @pytest.mark.asyncio
+    async def test_service_error_returns_500(self):
+        """Un error inesperado debe retornar 500"""
+        mock_service = Mock()
+        mock_service.get_ticket.side_effect = Exception("Error de conexión")
+
+        with pytest.raises(HTTPException) as exc_info:
+            await get_ticket(ticket_id='N01-00000385', datamart_service=mock_service)
+
+        assert exc_info.value.status_code == 500
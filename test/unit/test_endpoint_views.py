@@ -0,0 +1,86 @@
+import pytest
+from datetime import date, datetime, timezone
+from unittest.mock import Mock
+from fastapi import HTTPException
+
+from app.api.routes.views import get_views, query_view
+from app.models.responses import ViewInfo, ViewQueryResponse, ViewRegistryResponse
+from app.utils.exceptions import ViewNotFoundError
+
+
+def view_response():
+    return ViewQueryResponse(
+        view='store_month',
+        columns=['key_store', 'period', 'amount'],
+        rows=[{'key_store': '1|023', 'period': '2023-11-01', 'amount': 1500.5}],
+        total_rows=1,
+        offset=0,
+        limit=100,
+        refreshed_at=datetime(2024, 1, 15, tzinfo=timezone.utc)
+    )
+
+
+@pytest.mark.unit
+class TestViewsEndpoint:
+    """Tests para los endpoints de vistas materializadas"""
+
+    @pytest.mark.asyncio
+    async def test_registry_lists_views(self):
+        """El registro retorna las vistas del servicio"""
+        mock_service = Mock()
+        mock_service.get_views.return_value = ViewRegistryResponse(views=[
+            ViewInfo(name='store_month', dimensions=['key_store'], grain='month', metrics=['amount'],
+                     available=True, rows=10, size_bytes=120, build_seconds=0.01)
+        ])
+
+        result = await get_views(datamart_service=mock_service)
+
+        assert result.views[0].name == 'store_month'
+
+    @pytest.mark.asyncio
+    async def test_query_passes_only_given_filters(self):
+        """Solo los filtros con valor llegan al servicio"""
+        mock_service = Mock()
+        mock_service.query_view.return_value = view_response()
+
+        result = await query_view(
+            name='store_month', key_employee=None, key_product=None, key_store='1|023', key_customer=None,
+            key_division=None, date_start=date(2023, 11, 1), date_end=None, offset=0, limit=100,
+            datamart_service=mock_service
+        )
+
+        mock_service.query_view.assert_called_once_with(
+            name='store_month', filters={'key_store': '1|023'}, date_start=date(2023, 11, 1), date_end=None,
+            offset=0, limit=100
+        )
+        assert result.rows[0]['amount'] == 1500.5
+
+    @pytest.mark.asyncio
+    async def test_unknown_view_returns_404(self):
+        """Una vista no declarada debe retornar 404"""
+        mock_service = Mock()
+        mock_service.query_view.side_effect = ViewNotFoundError('missing')
+
+        with pytest.raises(HTTPException) as exc_info:
+            await query_view(
+                name='missing', key_employee=None, key_product=None, key_store=None, key_customer=None,
+                key_division=None, date_start=None, date_end=None, offset=0, limit=100,
+                datamart_service=mock_service
+            )
+
+        assert exc_info.value.status_code == 404
+
+    @pytest.mark.asyncio
+    async def test_invalid_filter_returns_422(self):
+        """Un filtro que la vista no admite debe retornar 422"""
+        mock_service = Mock()
+        mock_service.query_view.side_effect = ValueError("La vista store_month no tiene las dimensiones: key_product")
+
+        with pytest.raises(HTTPException) as exc_info:
+            await query_view(
+                name='store_month', key_employee=None, key_product='1|1', key_store=None, key_customer=None,
+                key_division=None, date_start=None, date_end=None, offset=0, limit=100,
+                datamart_service=mock_service
+            )
+
+        assert exc_info.value.status_code == 422
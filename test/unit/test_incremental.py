@@ -0,0 +1,250 @@
+import pytest
+import os
+import numpy as np
+import pandas as pd
+from datetime import date
+
+from app.config import settings
+from app.services import datamart as datamart_module
+from app.services.aggregates import build_daily_cubes, merge_daily_cubes
+from app.services.columnar import ColumnarStore
+from app.services.datamart import DatamartService, refresh_datamart_service
+from app.services.incremental import CodeMap, merge_sorted, new_files
+from app.services.quantiles import build_quantile_sketches, merge_quantile_sketches
+from app.services.sketches import build_distinct_sketches, merge_distinct_sketches
+from app.services.statistics import build_key_statistics, merge_key_statistics
+from app.services.tickets import build_ticket_index
+from app.utils.dates import to_day_number
+
+
+@pytest.fixture(scope="module")
+def sales_frame(make_sales_frame):
+    """Fábrica de ventas sintéticas; cada archivo tiene sus propios tickets"""
+    def build(rows: int, seed: int, ticket_prefix: str, first_day: int, n_days: int, n_keys: int) -> pd.DataFrame:
+        return make_sales_frame(rows, seed, first_day, n_days, keys={
+            'KeyStore': n_keys // 10, 'KeyEmployee': n_keys // 2, 'KeyProduct': n_keys, 'KeyCustomer': n_keys * 2
+        }, tickets=rows // 3, ticket_prefix=ticket_prefix)
+    return build
+
+
+@pytest.fixture(scope="module")
+def stores(sales_frame):
+    """Almacén con las filas existentes, almacén de las nuevas (claves y días solapados) y el completo"""
+    first_day = to_day_number(date(2023, 1, 1))
+    old_frame = sales_frame(6000, 1, 'A', first_day, 90, 200)
+    delta_frame = sales_frame(1500, 2, 'B', first_day + 80, 30, 240)
+    data = pd.concat([old_frame, delta_frame], ignore_index=True)
+    old = ColumnarStore.from_dataframe(old_frame)
+    delta = ColumnarStore.from_dataframe(delta_frame)
+    merged, code_maps = old.append(delta, data)
+    return old, delta, merged, code_maps, ColumnarStore.from_dataframe(data)
+
+
+@pytest.mark.unit
+class TestMergeSorted:
+    """Tests para la mezcla de claves ordenadas"""
+
+    def test_positions_point_to_each_key(self):
+        """Cada clave de ambos lados queda en su posición de la mezcla"""
+        old = np.array([2, 5, 9, 14], dtype=np.int64)
+        delta = np.array([1, 5, 10, 20], dtype=np.int64)
+
+        merged, old_positions, delta_positions = merge_sorted(old, delta)
+
+        assert merged.tolist() == [1, 2, 5, 9, 10, 14, 20]
+        assert merged[old_positions].tolist() == old.tolist()
+        assert merged[delta_positions].tolist() == delta.tolist()
+
+    def test_code_map_keeps_order(self):
+        """Los códigos en la unión conservan el orden; sin claves nuevas es la identidad"""
+        code_map, values = CodeMap.from_values(np.array(['a', 'c']), np.array(['b', 'c']))
+
+        assert values.tolist() == ['a', 'b', 'c']
+        assert code_map.old.tolist() == [0, 2]
+        assert code_map.delta.tolist() == [1, 2]
+        assert not code_map.identity
+        assert code_map.remap(np.array([1, -1, 0])).tolist() == [2, -1, 0]
+        assert CodeMap.from_values(np.array(['a', 'c']), np.array(['c']))[0].identity
+
+
+@pytest.mark.unit
+class TestAppendStore:
+    """Tests para anexar filas nuevas al almacén y a sus estructuras"""
+
+    def test_key_columns_match_full_build(self, stores):
+        """Valores, códigos e índices de filas coinciden con construir el almacén completo"""
+        _, _, merged, _, full = stores
+
+        for name in full.keys:
+            column, expected = merged.key(name), full.key(name)
+            assert column.values.tolist() == expected.values.tolist()
+            assert np.array_equal(column.codes, expected.codes)
+            assert np.array_equal(column.order, expected.order)
+            assert np.array_equal(column.offsets, expected.offsets)
+
+    def test_daily_cubes_match_full_build(self, stores):
+        """Los cubos mezclados tienen las mismas celdas y sumas que los del almacén completo"""
+        old, delta, _, code_maps, full = stores
+
+        cubes = merge_daily_cubes(
+            build_daily_cubes(old, tickets=build_ticket_index(old)),
+            build_daily_cubes(delta, tickets=build_ticket_index(delta)),
+            code_maps
+        )
+        expected = build_daily_cubes(full, tickets=build_ticket_index(full))
+
+        assert set(cubes) == set(expected)
+        for name, cube in cubes.items():
+            assert cube.parts == expected[name].parts
+            for part in cube.parts:
+                assert getattr(cube, part) == pytest.approx(getattr(expected[name], part))
+
+    def test_statistics_and_sketches_match_full_build(self, stores):
+        """Estadísticas, HyperLogLog y cuantiles mezclados coinciden con los del almacén completo"""
+        old, delta, _, code_maps, full = stores
+
+        statistics = merge_key_statistics(build_key_statistics(old), build_key_statistics(delta), code_maps)
+        for name, expected in build_key_statistics(full).items():
+            assert np.array_equal(statistics[name].offsets, expected.offsets)
+            assert np.array_equal(statistics[name].counts, expected.counts)
+
+        sketches = merge_distinct_sketches(build_distinct_sketches(old), build_distinct_sketches(delta), code_maps)
+        for name, targets in build_distinct_sketches(full).items():
+            for target, expected in targets.items():
+                assert np.array_equal(sketches[name][target].registers, expected.registers)
+                assert np.array_equal(sketches[name][target].ranks, expected.ranks)
+
+        quantiles = merge_quantile_sketches(build_quantile_sketches(old), build_quantile_sketches(delta),
+                                            code_maps)
+        for name, measures in build_quantile_sketches(full).items():
+            for measure, expected in measures.items():
+                assert np.array_equal(quantiles[name][measure].buckets, expected.buckets)
+                assert np.array_equal(quantiles[name][measure].counts, expected.counts)
+
+    def test_repeated_ticket_cannot_be_appended(self, stores):
+        """Un ticket repartido entre archivos no se puede anexar"""
+        old, _, _, _, _ = stores
+        tickets = build_ticket_index(old)
+
+        with pytest.raises(ValueError):
+            tickets.append(tickets, len(old))
+
+
+@pytest.mark.unit
+class TestNewFiles:
+    """Tests para detectar archivos nuevos del datamart"""
+
+    def test_only_new_files_are_returned(self):
+        """Los archivos cargados sin cambios no se vuelven a leer"""
+        assert new_files({'a.parquet': 1.0}, {'a.parquet': 1.0, 'c.parquet': 3.0, 'b.parquet': 2.0}) == [
+            'b.parquet', 'c.parquet'
+        ]
+        assert new_files({'a.parquet': 1.0}, {'a.parquet': 1.0}) == []
+
+    def test_modified_or_removed_file_needs_full_load(self):
+        """Un archivo cargado que cambió o se borró obliga a una carga completa"""
+        assert new_files({'a.parquet': 1.0}, {'a.parquet': 2.0, 'b.parquet': 2.0}) is None
+        assert new_files({'a.parquet': 1.0}, {'b.parquet': 2.0}) is None
+
+
+def write_parquet(frame: pd.DataFrame, path):
+    """Escribe el frame como archivo del datamart (KeyDate como fecha)"""
+    frame.assign(KeyDate=pd.to_datetime(frame['KeyDate'], unit='D')).to_parquet(path)
+
+
+@pytest.mark.unit
+class TestRefresh:
+    """Tests para la recarga del datamart con reemplazo atómico del servicio"""
+
+    @pytest.fixture
+    def datamart_dir(self, sales_frame, tmp_path, monkeypatch):
+        """Carpeta del datamart con un archivo cargado y el servicio como singleton"""
+        monkeypatch.setattr(settings, 'DATAMART_PATH', str(tmp_path))
+        monkeypatch.setattr(settings, 'SHARED_DATAMART_PATH', None)
+        monkeypatch.setattr(settings, 'COOCCURRENCE_ENABLED', False)
+        first_day = to_day_number(date(2023, 1, 1))
+        write_parquet(sales_frame(3000, 1, 'A', first_day, 60, 100), tmp_path / "part-0.parquet")
+        service = DatamartService()
+        monkeypatch.setattr(datamart_module, '_datamart_service', service)
+        monkeypatch.setattr(datamart_module, '_load_progress', service.progress)
+        return tmp_path
+
+    def test_incremental_refresh_keeps_previous_service(self, datamart_dir, sales_frame):
+        """La recarga incremental arma un servicio nuevo y deja intacto el anterior"""
+        first_day = to_day_number(date(2023, 1, 1))
+        service = datamart_module._datamart_service
+        store, cubes = service.store, service.cubes
+        write_parquet(sales_frame(600, 2, 'B', first_day + 50, 20, 120), datamart_dir / "part-1.parquet")
+
+        refreshed, response = service.refresh()
+
+        assert response.mode == "incremental"
+        assert response.rows_added == 600
+        assert len(refreshed.data) == 3600 and len(refreshed.store) == 3600
+        assert len(service.data) == 3000
+        assert service.store is store and service.cubes is cubes
+        assert refreshed.views is not service.views
+
+    def test_refresh_swaps_service(self, datamart_dir, sales_frame):
+        """El singleton se reemplaza de una sola vez por el servicio recargado"""
+        first_day = to_day_number(date(2023, 1, 1))
+        previous = datamart_module._datamart_service
+        write_parquet(sales_frame(600, 2, 'B', first_day + 50, 20, 120), datamart_dir / "part-1.parquet")
+
+        response = refresh_datamart_service()
+
+        assert response.total_rows == 3600
+        assert datamart_module._datamart_service is not previous
+        assert len(datamart_module._datamart_service.data) == 3600
+
+    def test_failed_refresh_keeps_current_service(self, datamart_dir):
+        """Si la recarga falla, el servicio actual sigue respondiendo"""
+        previous = datamart_module._datamart_service
+        (datamart_dir / "part-1.parquet").write_bytes(b"no es parquet")
+
+        with pytest.raises(Exception):
+            refresh_datamart_service()
+
+        assert datamart_module._datamart_service is previous
+        assert len(previous.data) == 3000
+
+    @pytest.mark.asyncio
+    async def test_ready_during_full_refresh(self, datamart_dir, monkeypatch):
+        """/ready sigue en 200 mientras la carga completa lee los archivos y al terminar"""
+        from app.main import readiness_check
+
+        read_frame = datamart_module.read_datamart_frame
+        ready_while_loading = []
+
+        def reading(*args, **kwargs):
+            ready_while_loading.append(datamart_module.get_load_progress().is_ready)
+            return read_frame(*args, **kwargs)
+
+        monkeypatch.setattr(datamart_module, 'read_datamart_frame', reading)
+        part = datamart_dir / "part-0.parquet"
+        os.utime(part, (part.stat().st_atime, part.stat().st_mtime + 10))
+
+        response = refresh_datamart_service()
+
+        assert response.mode == "full"
+        assert ready_while_loading == [True]
+        result = await readiness_check()
+        assert result["ready"] is True
+        assert datamart_module.get_load_progress() is datamart_module._datamart_service.progress
+
+    @pytest.mark.asyncio
+    async def test_ready_after_failed_full_refresh(self, datamart_dir):
+        """Si la carga completa falla, /ready sigue en 200 con el progreso del servicio actual"""
+        from app.main import readiness_check
+
+        progress = datamart_module.get_load_progress()
+        part = datamart_dir / "part-0.parquet"
+        os.utime(part, (part.stat().st_atime, part.stat().st_mtime + 10))
+        (datamart_dir / "part-1.parquet").write_bytes(b"no es parquet")
+
+        with pytest.raises(Exception):
+            refresh_datamart_service()
+
+        result = await readiness_check()
+        assert result["ready"] is True
+        assert datamart_module.get_load_progress() is progress
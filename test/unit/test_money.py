@@ -0,0 +1,62 @@
+import pytest
+import numpy as np
+import pandas as pd
+
+from app.utils.money import to_minor_units, from_minor_units
+from app.services.datamart import _get_total_details
+from app.services.columnar import ColumnarStore
+from app.services.aggregates import DailyCube
+
+
+@pytest.mark.unit
+class TestFixedPointAmounts:
+    """Tests para montos en punto fijo"""
+
+    def test_to_minor_units_scales_and_rounds(self):
+        """Debe escalar a centavos redondeando al entero más cercano"""
+        result = to_minor_units(pd.Series([-24873.95, 1500.5, 0.005, 19243.7]), 2)
+
+        assert result.dtype == np.int64
+        assert result.tolist() == [-2487395, 150050, 0, 1924370]
+
+    def test_to_minor_units_treats_nan_as_zero(self):
+        """Los montos no numéricos deben guardarse como 0"""
+        result = to_minor_units(pd.Series([1.25, np.nan, "x"]), 2)
+
+        assert result.tolist() == [125, 0, 0]
+
+    def test_from_minor_units(self):
+        """Debe convertir unidades menores a float, o dejar el float intacto"""
+        assert from_minor_units(-2487395, 2) == -24873.95
+        assert from_minor_units(1500.5, None) == 1500.5
+
+    def test_integer_sum_is_exact(self):
+        """La suma en enteros no debe acumular error de redondeo"""
+        amounts = pd.Series([0.1] * 1_000_000)
+
+        exact = from_minor_units(to_minor_units(amounts, 2).sum(), 2)
+
+        assert exact == 100000.0
+        assert float(amounts.sum()) != 100000.0
+
+    def test_partial_sums_merge_exactly(self):
+        """Las sumas parciales deben combinarse sin diferencia con la total"""
+        minor = to_minor_units(pd.Series(np.random.default_rng(0).uniform(-1e6, 1e6, 10_000)), 2)
+
+        partials = [int(chunk.sum()) for chunk in np.array_split(minor, 7)]
+
+        assert sum(partials) == int(minor.sum())
+
+    def test_get_total_details_with_fixed_point(self, sample_dataframe):
+        """_get_total_details debe convertir la suma entera al final"""
+        fixed = sample_dataframe.copy()
+        fixed['Amount'] = to_minor_units(fixed['Amount'], 2)
+
+        store = ColumnarStore.from_dataframe(fixed)
+        cube = DailyCube.from_key_column(store.key('KeyStore'), store)
+
+        total_amount, total_quantity, records_count = _get_total_details(cube, amount_decimals=2)
+
+        assert total_amount == pytest.approx(sample_dataframe['Amount'].sum())
+        assert total_quantity == 21
+        assert records_count == 5
@@ -0,0 +1,106 @@
+import pytest
+import numpy as np
+import pandas as pd
+
+from app.services.columnar import ColumnarStore
+from app.services.pivots import build_pivot_matrices, merge_pivot_matrices, pivot_table
+
+
+@pytest.fixture(scope="module")
+def pivot_frame(make_sales_frame):
+    """Fábrica de datamarts sintéticos de varios meses con devoluciones"""
+    def build(rows: int, seed: int, first_day: int, n_products: int) -> pd.DataFrame:
+        return make_sales_frame(
+            rows, seed, first_day, 200, keys={'KeyStore': 12, 'KeyEmployee': 60, 'KeyProduct': n_products},
+            amount=(-100, 500)
+        )
+    return build
+
+
+@pytest.fixture(scope="module")
+def frame(pivot_frame):
+    return pivot_frame(20000, 47, 19300, 300)
+
+
+@pytest.fixture(scope="module")
+def store(frame):
+    return ColumnarStore.from_dataframe(frame)
+
+
+@pytest.fixture(scope="module")
+def matrices(store):
+    return build_pivot_matrices(store)
+
+
+@pytest.mark.unit
+class TestPivotMatrix:
+    """Tests para las matrices dispersas de pivote"""
+
+    def test_matrix_keeps_only_cells_with_sales(self, frame, store, matrices):
+        """Hay una entrada por (tienda, mes, producto) con ventas y los totales coinciden"""
+        matrix = matrices['store-product']
+        months = pd.to_datetime(frame['KeyDate'], unit='D').dt.to_period('M')
+
+        assert set(matrices) == {'store-product', 'employee-store'}
+        assert matrix.n_entries == frame.groupby(['KeyStore', months, 'KeyProduct']).ngroups
+        assert matrix.amount.sum() == pytest.approx(frame['Amount'].sum())
+        assert matrix.count.sum() == len(frame)
+
+    @pytest.mark.parametrize("day_start,day_end", [(None, None), (19317, 19450), (19340, 19345), (None, 19370)])
+    def test_top_sub_pivot_matches_groupby(self, frame, store, matrices, day_start, day_end):
+        """Las filas y columnas con más monto y sus celdas coinciden con un pivot_table del rango"""
+        table = pivot_table(store, matrices['store-product'], day_start=day_start, day_end=day_end,
+                            row_limit=5, column_limit=7)
+
+        period = frame
+        if day_start is not None:
+            period = period[period['KeyDate'] >= day_start]
+        if day_end is not None:
+            period = period[period['KeyDate'] <= day_end]
+        rows = store.key('KeyStore').values[table['rows']].tolist()
+        columns = store.key('KeyProduct').values[table['columns']].tolist()
+        selected = period[period['KeyStore'].isin(rows)]
+
+        assert rows == period.groupby('KeyStore')['Amount'].sum().nlargest(5).index.tolist()
+        assert columns == selected.groupby('KeyProduct')['Amount'].sum().nlargest(7).index.tolist()
+        expected = selected.pivot_table(index='KeyStore', columns='KeyProduct', values='Amount', aggfunc='sum')
+        assert table['amount'] == pytest.approx(expected.reindex(index=rows, columns=columns).fillna(0).to_numpy())
+        assert table['total_rows'] == period['KeyStore'].nunique()
+        assert table['total_columns'] == selected['KeyProduct'].nunique()
+
+    def test_requested_keys_keep_order_and_unknown_are_zero(self, frame, store, matrices):
+        """Las filas y columnas pedidas se retornan en su orden; las que no existen quedan en cero"""
+        stores, products = store.key('KeyStore'), store.key('KeyProduct')
+        table = pivot_table(
+            store, matrices['store-product'],
+            np.array([stores.code_of('1|3'), -1]),
+            np.array([products.code_of('1|9'), -1, products.code_of('1|5')]),
+            19310, 19400, order_by="records"
+        )
+
+        period = frame[frame['KeyDate'].between(19310, 19400) & (frame['KeyStore'] == '1|3')]
+        assert table['count'].tolist() == [
+            [int((period['KeyProduct'] == '1|9').sum()), 0, int((period['KeyProduct'] == '1|5').sum())],
+            [0, 0, 0],
+        ]
+        assert (table['total_rows'], table['total_columns']) == (2, 3)
+
+    def test_invalid_measure_is_rejected(self, store, matrices):
+        """order_by debe ser una medida del pivote"""
+        with pytest.raises(ValueError):
+            pivot_table(store, matrices['employee-store'], order_by='tickets')
+
+    def test_merge_matches_full_build(self, frame, store, matrices, pivot_frame):
+        """Sumar la matriz de filas nuevas equivale a construirla con todas las filas"""
+        delta_frame = pivot_frame(5000, 48, 19450, 340)
+        data = pd.concat([frame, delta_frame], ignore_index=True)
+        delta = ColumnarStore.from_dataframe(delta_frame)
+        _, code_maps = store.append(delta, data)
+
+        merged = merge_pivot_matrices(matrices, build_pivot_matrices(delta), code_maps)
+        expected = build_pivot_matrices(ColumnarStore.from_dataframe(data))
+
+        for name, matrix in expected.items():
+            for part in ("offsets", "months", "cell_offsets", "columns", "qty", "count"):
+                assert np.array_equal(getattr(merged[name], part), getattr(matrix, part))
+            assert merged[name].amount == pytest.approx(matrix.amount)
@@ -0,0 +1,126 @@
+import pytest
+import numpy as np
+import pandas as pd
+from datetime import date
+
+from app.services.columnar import ColumnarStore
+from app.services.quantiles import (QUANTILE_RELATIVE_ACCURACY, QUANTILE_MIN_VALUE, bucket_keys, bucket_values,
+                                    build_quantile_sketches, dense_counts, distribution_counts,
+                                    histogram_from_counts, quantiles_from_counts)
+from app.services.sketches import range_rows
+from app.utils.dates import to_day_number
+
+QUANTILES = [0.01, 0.25, 0.5, 0.9, 0.99]
+
+
+@pytest.fixture(scope="module")
+def store(make_sales_frame):
+    """Datamart sintético con montos log-normales, devoluciones y tickets de una tienda y un día"""
+    rng = np.random.default_rng(8)
+    tickets, rows = 40_000, 150_000
+    first_day = to_day_number(date(2023, 1, 1))
+    ticket_store = rng.integers(0, 6, tickets)
+    ticket_employee = rng.integers(0, 50, tickets)
+    ticket_day = rng.integers(first_day, first_day + 365, tickets)
+
+    ticket_of_row = rng.integers(0, tickets, rows)
+    amounts = rng.lognormal(8, 1.4, rows) * np.where(rng.random(rows) < 0.05, -1, 1)
+    return ColumnarStore.from_dataframe(make_sales_frame(
+        rows, seed=8, keys={
+            'KeyStore': ticket_store[ticket_of_row], 'KeyEmployee': ticket_employee[ticket_of_row], 'KeyProduct': 800
+        }, tickets=ticket_of_row, qty=(1, 5),
+        KeyDate=ticket_day[ticket_of_row].astype(np.int32), Amount=amounts.round(2)
+    ))
+
+
+@pytest.fixture(scope="module")
+def sketches(store):
+    return build_quantile_sketches(store)
+
+
+def assert_within_accuracy(estimates, exact):
+    for estimate, value in zip(estimates, exact):
+        assert estimate == pytest.approx(value, rel=QUANTILE_RELATIVE_ACCURACY, abs=QUANTILE_MIN_VALUE)
+
+
+@pytest.mark.unit
+class TestQuantileBuckets:
+    """Tests para los buckets logarítmicos"""
+
+    def test_representative_is_within_relative_accuracy(self):
+        """El representante de cada bucket debe estar a menos de 1% del valor"""
+        values = np.concatenate([np.geomspace(0.01, 1e9, 5000), -np.geomspace(0.01, 1e7, 500)])
+
+        representatives = bucket_values(bucket_keys(values))
+
+        assert np.all(np.abs(representatives - values) <= QUANTILE_RELATIVE_ACCURACY * np.abs(values) + 1e-12)
+        assert bucket_values(bucket_keys(np.array([0.0, 0.004, -0.004]))).tolist() == [0.0, 0.0, 0.0]
+
+    def test_keys_preserve_order(self):
+        """El orden de los buckets debe ser el orden de los valores"""
+        values = np.sort(np.random.default_rng(1).normal(0, 5000, 2000))
+
+        assert np.all(np.diff(bucket_keys(values)) >= 0)
+
+
+@pytest.mark.unit
+class TestQuantileSketches:
+    """Tests de exactitud de los sketches de cuantiles contra percentiles de numpy"""
+
+    @pytest.mark.parametrize("dimension,key", [('KeyStore', '1|2'), ('KeyEmployee', '1|7'), ('KeyProduct', '1|30')])
+    def test_amount_quantiles_match_numpy(self, store, sketches, dimension, key):
+        """Los percentiles de Amount deben estar a menos de 1% de np.quantile (method='lower')"""
+        code = store.key(dimension).code_of(key)
+        day_start, day_end = to_day_number(date(2023, 2, 11)), to_day_number(date(2023, 10, 19))
+
+        for start, end in [(None, None), (day_start, day_end)]:
+            counts = distribution_counts(store, sketches[dimension]['amount'], code, start, end)
+            amounts = store.amount[range_rows(store, dimension, code, start, end)]
+
+            assert counts.sum() == len(amounts)
+            assert_within_accuracy(quantiles_from_counts(counts, QUANTILES),
+                                   np.quantile(amounts, QUANTILES, method='lower'))
+
+    def test_ticket_value_quantiles_match_numpy(self, store, sketches):
+        """Los percentiles del valor del ticket deben coincidir con sumar Amount por ticket"""
+        code = store.key('KeyStore').code_of('1|4')
+        day_start, day_end = to_day_number(date(2023, 3, 20)), to_day_number(date(2023, 8, 5))
+
+        for start, end in [(None, None), (day_start, day_end)]:
+            counts = distribution_counts(store, sketches['KeyStore']['ticket'], code, start, end)
+            rows = range_rows(store, 'KeyStore', code, start, end)
+            ticket_values = pd.Series(store.amount[rows]).groupby(store.text('TicketId', rows)).sum().to_numpy()
+
+            assert counts.sum() == len(ticket_values)
+            assert_within_accuracy(quantiles_from_counts(counts, QUANTILES),
+                                   np.quantile(ticket_values, QUANTILES, method='lower'))
+
+    def test_whole_datamart_in_range(self, store, sketches):
+        """Sin entidad se usa la unión mensual de todas las entidades"""
+        day_start, day_end = to_day_number(date(2023, 4, 1)), to_day_number(date(2023, 4, 20))
+
+        counts = distribution_counts(store, sketches['KeyStore']['amount'], None, day_start, day_end)
+        amounts = store.amount[range_rows(store, 'KeyStore', None, day_start, day_end)]
+
+        assert counts.sum() == len(amounts)
+        assert_within_accuracy(quantiles_from_counts(counts, QUANTILES),
+                               np.quantile(amounts, QUANTILES, method='lower'))
+
+    def test_histogram_counts_every_value(self, store, sketches):
+        """El histograma más las colas debe sumar todos los valores"""
+        counts = distribution_counts(store, sketches['KeyEmployee']['amount'], 3)
+
+        histogram, below, above = histogram_from_counts(counts, 10)
+
+        assert len(histogram) == 10
+        assert sum(count for _, _, count in histogram) + below + above == counts.sum()
+        assert all(lower < upper for lower, upper, _ in histogram)
+        assert histogram[0][0] == pytest.approx(quantiles_from_counts(counts, [0.01])[0])
+
+    def test_empty_results(self, store, sketches):
+        """Una entidad inexistente no tiene percentiles ni histograma"""
+        counts = distribution_counts(store, sketches['KeyStore']['amount'], -1)
+
+        assert quantiles_from_counts(counts, [0.5]) == [None]
+        assert histogram_from_counts(counts, 5) == ([], 0, 0)
+        assert quantiles_from_counts(dense_counts(bucket_keys(np.array([5.0]))), [0.5])[0] == pytest.approx(5.0, rel=0.01)
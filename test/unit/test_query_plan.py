@@ -0,0 +1,122 @@
+import pytest
+import numpy as np
+from datetime import date
+from pydantic import ValidationError
+
+from app.models.schemas import AggregationQuery
+from app.services.bitmaps import build_bitmap_indexes
+from app.services.columnar import ColumnarStore
+from app.services.query_plan import compile_query
+from app.utils.dates import bucket_start_days, from_day_number, to_day_number
+
+
+@pytest.fixture
+def random_frame(make_sales_frame):
+    """Datamart sintético con varias dimensiones"""
+    return make_sales_frame(3000, seed=11, n_days=200, keys={
+        'KeyStore': 6, 'KeyEmployee': 30, 'KeyProduct': 100, 'KeyCustomer': 200, 'KeyDivision': 3
+    }, tickets=900)
+
+
+def run(frame, **query):
+    store = ColumnarStore.from_dataframe(frame)
+    plan = compile_query(AggregationQuery(**query), store.keys)
+    return plan.execute(store, build_bitmap_indexes(store))
+
+
+@pytest.mark.unit
+class TestAggregationQuery:
+    """Tests para el DSL de consultas de agregación"""
+
+    def test_group_by_matches_pandas(self, random_frame):
+        """Las métricas por grupo deben coincidir con un groupby de pandas"""
+        rows, groups_count, _ = run(
+            random_frame,
+            filters={'key_division': '1|1'},
+            group_by=['key_store', 'key_employee'],
+            metrics=[{'op': 'sum', 'field': 'amount'}, {'op': 'count'},
+                     {'op': 'max', 'field': 'quantity'}, {'op': 'avg', 'field': 'amount'}],
+            limit=10000
+        )
+
+        subset = random_frame[random_frame['KeyDivision'] == '1|1']
+        expected = subset.groupby(['KeyStore', 'KeyEmployee']).agg(
+            sum_amount=('Amount', 'sum'), count=('Amount', 'size'),
+            max_quantity=('Qty', 'max'), avg_amount=('Amount', 'mean')
+        )
+        assert groups_count == len(expected)
+        for record in rows:
+            group = expected.loc[(record['key_store'], record['key_employee'])]
+            assert record['sum_amount'] == pytest.approx(group['sum_amount'], abs=0.01)
+            assert record['count'] == group['count']
+            assert record['max_quantity'] == group['max_quantity']
+            assert record['avg_amount'] == pytest.approx(group['avg_amount'], abs=0.01)
+
+    def test_time_bucket_and_order(self, random_frame):
+        """El periodo mensual debe agrupar por inicio de mes y respetar order_by y limit"""
+        rows, groups_count, _ = run(
+            random_frame,
+            filters={'key_store': ['1|0', '1|1']},
+            date_start=date(2023, 1, 1),
+            time_bucket='month',
+            metrics=[{'op': 'sum', 'field': 'quantity'}],
+            order_by='sum_quantity',
+            limit=3
+        )
+
+        subset = random_frame[random_frame['KeyStore'].isin(['1|0', '1|1']) &
+                              (random_frame['KeyDate'] >= to_day_number(date(2023, 1, 1)))]
+        months = bucket_start_days(subset['KeyDate'].to_numpy(), 'month')
+        expected = subset.groupby(months)['Qty'].sum().sort_values(ascending=False)
+
+        assert groups_count == len(expected)
+        assert len(rows) == 3
+        assert [r['sum_quantity'] for r in rows] == expected.iloc[:3].tolist()
+        assert rows[0]['period'] == from_day_number(expected.index[0]).isoformat()
+        assert all(r['period'].endswith('-01') for r in rows)
+
+    def test_global_aggregate_without_rows(self, random_frame):
+        """Sin group_by y sin filas coincidentes se retorna un grupo con count 0"""
+        rows, groups_count, _ = run(
+            random_frame,
+            filters={'key_employee': '999|999'},
+            metrics=[{'op': 'count'}, {'op': 'min', 'field': 'amount'}]
+        )
+
+        assert groups_count == 1
+        assert rows == [{'count': 0, 'min_amount': None}]
+
+    def test_explain_reports_indexes_and_rows(self, random_frame):
+        """explain debe mostrar los índices usados y las filas recorridas"""
+        _, _, explain = run(
+            random_frame,
+            filters={'key_store': '1|2', 'key_product': '1|5'},
+            group_by=['key_employee']
+        )
+
+        assert explain['selection'][0]['index'] == 'KeyProduct'
+        assert explain['selection'][1]['index'] == 'KeyStore'
+        assert explain['rows_scanned'] < len(random_frame)
+        assert explain['rows_aggregated'] == int(((random_frame['KeyStore'] == '1|2') &
+                                                  (random_frame['KeyProduct'] == '1|5')).sum())
+
+    def test_invalid_queries_are_rejected(self):
+        """El modelo debe rechazar métricas sin campo y order_by desconocido"""
+        with pytest.raises(ValidationError):
+            AggregationQuery(metrics=[{'op': 'sum'}])
+        with pytest.raises(ValidationError):
+            AggregationQuery(group_by=['key_store'], order_by='sum_amount')
+        with pytest.raises(ValidationError):
+            AggregationQuery(group_by=['KeyStore'])
+
+
+@pytest.mark.unit
+class TestBucketStartDays:
+    """Tests para el inicio de periodo por día"""
+
+    def test_week_starts_on_monday(self):
+        """La semana debe empezar el lunes"""
+        day = to_day_number(date(2023, 11, 16))  # jueves
+
+        assert from_day_number(bucket_start_days(np.array([day]), 'week')[0]) == date(2023, 11, 13)
+        assert from_day_number(bucket_start_days(np.array([day]), 'year')[0]) == date(2023, 1, 1)
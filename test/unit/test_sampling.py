@@ -0,0 +1,180 @@
+import pytest
+import numpy as np
+import pandas as pd
+from datetime import date
+
+from app.config import settings
+from app.services.columnar import ColumnarStore
+from app.services.sampling import StratifiedSample, row_priorities
+from app.utils.dates import to_day_number
+
+FIRST_DAY = to_day_number(date(2022, 1, 1))
+
+
+@pytest.fixture(scope="module")
+def sample_frame(make_sales_frame):
+    """Fábrica de ventas sintéticas de varios meses y tiendas, con 5% de devoluciones"""
+    def build(rows: int, seed: int, first_day: int, n_days: int) -> pd.DataFrame:
+        rng = np.random.default_rng([seed, 1])
+        amounts = rng.gamma(2.0, 300.0, rows) * np.where(rng.random(rows) < 0.05, -1, 1)
+        return make_sales_frame(
+            rows, seed, first_day, n_days,
+            keys={'KeyStore': 20, 'KeyEmployee': 100, 'KeyProduct': 500}, tickets=rows // 3,
+            qty=(-1, 8), Amount=amounts.round(2)
+        )
+    return build
+
+
+@pytest.fixture(scope="module")
+def frame(sample_frame):
+    return sample_frame(200000, 50, FIRST_DAY, 365)
+
+
+@pytest.fixture(scope="module")
+def store(frame):
+    return ColumnarStore.from_dataframe(frame)
+
+
+@pytest.fixture(scope="module")
+def sample(store):
+    return StratifiedSample.build(store, 0.02, 10)
+
+
+@pytest.mark.unit
+class TestStratifiedSample:
+    """Tests para la muestra estratificada por (tienda, mes)"""
+
+    def test_every_stratum_is_represented(self, frame, sample):
+        """Cada estrato guarda al menos el mínimo de filas y su tamaño real"""
+        months = pd.to_datetime(frame['KeyDate'], unit='D').dt.to_period('M')
+
+        assert len(sample.keys) == frame.groupby(['KeyStore', months]).ngroups
+        assert sample.sizes.sum() == len(frame)
+        assert np.diff(sample.offsets).min() >= 10
+        assert sample.n_rows < len(frame) * 0.05
+
+    def test_priorities_are_uniform_and_deterministic(self):
+        """Las prioridades dependen solo de la posición de la fila"""
+        priorities = row_priorities(np.arange(100000))
+
+        assert np.array_equal(priorities, row_priorities(np.arange(100000)))
+        assert 0.0 <= priorities.min() and priorities.max() < 1.0
+        assert abs((priorities < 0.1).mean() - 0.1) < 0.01
+
+    def test_merge_matches_full_build(self, frame, sample_frame):
+        """Mezclar la muestra de las filas anexadas da la misma muestra que construirla completa"""
+        old_frame = frame.iloc[:150000]
+        delta_frame = sample_frame(20000, 51, FIRST_DAY + 350, 40)
+        data = pd.concat([old_frame, delta_frame], ignore_index=True)
+        old = ColumnarStore.from_dataframe(old_frame)
+        merged, code_maps = old.append(ColumnarStore.from_dataframe(delta_frame), data)
+
+        sample = StratifiedSample.build(old, 0.02, 10).merge(
+            StratifiedSample.build(ColumnarStore.from_dataframe(delta_frame), 0.02, 10, row_offset=len(old)),
+            code_maps['KeyStore']
+        )
+        expected = StratifiedSample.build(ColumnarStore.from_dataframe(data), 0.02, 10)
+
+        for part in ("keys", "sizes", "offsets", "rows", "priorities", "days", "amount", "qty"):
+            assert np.array_equal(getattr(sample, part), getattr(expected, part))
+
+    def test_full_sample_is_exact(self, frame, store):
+        """Con fracción 1 la estimación es el total exacto, sin margen"""
+        sample = StratifiedSample.build(store, 1.0, 10)
+        day_start, day_end = FIRST_DAY + 40, FIRST_DAY + 100
+        code = store.key('KeyEmployee').code_of('1|7')
+        mask = (frame['KeyEmployee'] == '1|7') & frame['KeyDate'].between(day_start, day_end)
+
+        estimate = sample.estimate(store, {'KeyEmployee': code}, day_start, day_end)
+
+        assert estimate.totals['amount'] == pytest.approx(frame.loc[mask, 'Amount'].sum())
+        assert estimate.totals['count'] == pytest.approx(mask.sum())
+        assert estimate.margins['amount'] == pytest.approx(0.0)
+
+    def test_intervals_cover_exact_totals(self, frame, store, sample):
+        """Los intervalos al 95% contienen los totales exactos en la gran mayoría de los recortes"""
+        day_start, day_end = FIRST_DAY + 20, FIRST_DAY + 300
+        covered, total = 0, 0
+        for index in range(20):
+            key = f'1|{index}'
+            mask = (frame['KeyStore'] == key) & frame['KeyDate'].between(day_start, day_end)
+            estimate = sample.estimate(store, {'KeyStore': store.key('KeyStore').code_of(key)}, day_start, day_end)
+            for measure, exact in (("amount", frame.loc[mask, 'Amount'].sum()), ("qty", frame.loc[mask, 'Qty'].sum()),
+                                   ("count", mask.sum())):
+                lower, upper = estimate.interval(measure)
+                covered += lower <= exact <= upper
+                total += 1
+
+        assert covered / total >= 0.85
+
+    def test_daily_estimates_add_up(self, store, sample):
+        """La serie diaria estimada suma lo mismo que la estimación del rango"""
+        day_start, day_end = FIRST_DAY + 31, FIRST_DAY + 89
+        amount, qty, count, margin = sample.estimate_daily(store, {}, day_start, day_end)
+        estimate = sample.estimate(store, {}, day_start, day_end)
+
+        assert len(amount) == day_end - day_start + 1
+        assert amount.sum() == pytest.approx(estimate.totals['amount'])
+        assert count.sum() == pytest.approx(estimate.totals['count'])
+        assert (margin > 0).all()
+
+
+@pytest.fixture
+def service(store, sample, make_service, monkeypatch):
+    """Servicio con estructuras construidas en memoria (sin leer archivos)"""
+    monkeypatch.setattr(settings, "APPROX_EXACT_MAX_ROWS", 20000)
+    return make_service(store, sample=sample)
+
+
+@pytest.mark.unit
+class TestApproximateQueries:
+    """Tests para approx=true en resúmenes y series"""
+
+    def test_large_summary_is_estimated(self, service):
+        """Un resumen grande se estima y sus intervalos contienen el valor exacto"""
+        exact = service.get_store_summary(date_start=date(2022, 1, 1), date_end=date(2022, 12, 31))
+        approx = service.get_store_summary(date_start=date(2022, 1, 1), date_end=date(2022, 12, 31), approx=True)
+
+        assert approx.approximate is True and exact.approximate is False
+        for field in ("total_amount", "records_count"):
+            interval = approx.confidence_intervals[field]
+            assert interval.lower <= getattr(exact, field) <= interval.upper
+        assert approx.records_count == pytest.approx(exact.records_count, rel=0.05)
+
+    def test_returns_are_estimated_and_tickets_omitted(self, service):
+        """En modo aproximado las devoluciones salen de la muestra y los tickets no se informan"""
+        exact = service.get_store_summary(date_start=date(2022, 1, 1), date_end=date(2022, 12, 31),
+                                          split_returns=True)
+        approx = service.get_store_summary(date_start=date(2022, 1, 1), date_end=date(2022, 12, 31),
+                                           split_returns=True, approx=True)
+
+        assert approx.returns.returns_count == pytest.approx(exact.returns.returns_count, rel=0.15)
+        assert approx.returns.returns_amount == pytest.approx(exact.returns.returns_amount, rel=0.15)
+        assert approx.returns.net_amount == approx.total_amount
+        assert approx.tickets_count is None and approx.average_ticket_value is None
+        assert exact.tickets_count is not None
+
+    def test_small_slice_falls_back_to_exact(self, service):
+        """Un recorte chico se calcula exacto aunque se pida approx"""
+        exact = service.get_employee_summary(key_employee='1|3')
+        approx = service.get_employee_summary(key_employee='1|3', approx=True)
+
+        assert approx.approximate is False
+        assert approx.confidence_intervals is None
+        assert (approx.total_amount, approx.records_count) == (exact.total_amount, exact.records_count)
+
+    def test_series_is_estimated_with_intervals(self, service):
+        """Los intervalos diarios de la serie aproximada contienen el monto exacto de casi todos los días"""
+        exact = service.get_sales_series(date(2022, 10, 1), date(2022, 10, 31))
+        result = service.get_sales_series(date(2022, 10, 1), date(2022, 10, 31), approx=True)
+
+        assert result.approximate is True and exact.approximate is False
+        assert [point.date for point in result.points] == [point.date for point in exact.points]
+        covered = sum(
+            point.total_amount_ci.lower <= expected.total_amount <= point.total_amount_ci.upper
+            for point, expected in zip(result.points, exact.points)
+        )
+        assert covered / len(exact.points) >= 0.85
+        assert sum(point.total_amount for point in result.points) == pytest.approx(
+            sum(point.total_amount for point in exact.points), rel=0.1
+        )
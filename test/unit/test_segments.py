@@ -0,0 +1,185 @@
+import pytest
+import numpy as np
+import pandas as pd
+from datetime import date
+
+from app.config import settings
+from app.services.aggregates import build_daily_cubes
+from app.services.columnar import ColumnarStore
+from app.services.segments import build_segments, segment_ids, sum_ticket_counts, sum_totals
+from app.services.tickets import build_ticket_index
+from app.utils.exceptions import MixedCurrencyError
+
+
+@pytest.fixture
+def segmented_frame(make_sales_frame):
+    """Datamart sintético con tres divisiones: dos en CLP y una en USD"""
+    rows = 4000
+    divisions = np.random.default_rng([29, 1]).choice(['1', '2', '3'], rows)
+    return make_sales_frame(
+        rows, seed=29, n_days=90, keys={'KeyEmployee': 12, 'KeyProduct': 40, 'KeyStore': 6},
+        tickets=np.arange(rows) // 4, qty=(1, 5), amount=(100, 50000), integer_amount=True,
+        KeyDivision=divisions, KeyCurrency=np.where(divisions == '3', 'USD', 'CLP')
+    )
+
+
+def _segments(frame):
+    store = ColumnarStore.from_dataframe(frame)
+    tickets = build_ticket_index(store)
+    cubes = build_daily_cubes(store, tickets=tickets)
+    return store, build_segments(store, cubes, tickets)
+
+
+@pytest.mark.unit
+class TestSegments:
+    """Tests para los segmentos por división y moneda"""
+
+    def test_one_segment_per_division_and_currency(self, segmented_frame):
+        """Cada (división, moneda) con filas es un segmento"""
+        store, segments = _segments(segmented_frame)
+
+        labels = sorted((segment.division, segment.currency) for segment in segments.segments)
+
+        assert labels == [('1', 'CLP'), ('2', 'CLP'), ('3', 'USD')]
+        assert segments.currencies == ['CLP', 'USD']
+        assert sum(segment.n_rows for segment in segments.segments) == len(segmented_frame)
+
+    def test_segment_ids_label_every_row(self, segmented_frame):
+        """El id de segmento de cada fila corresponde a su división y moneda"""
+        store = ColumnarStore.from_dataframe(segmented_frame)
+
+        ids, labels = segment_ids(store)
+
+        for row in (0, 17, 3999):
+            assert labels[ids[row]] == (segmented_frame['KeyDivision'][row], segmented_frame['KeyCurrency'][row])
+
+    def test_division_totals_match_filtered_rows(self, segmented_frame):
+        """Los totales de una entidad en una división coinciden con filtrar las filas"""
+        store, segments = _segments(segmented_frame)
+        code = store.key('KeyStore').code_of('1|2')
+
+        cubes, currency = segments.scope('KeyStore', code, 19320, 19350, division='2')
+        amount, qty, count = sum_totals(cubes, code, 19320, 19350)
+
+        frame = segmented_frame
+        expected = frame[(frame['KeyStore'] == '1|2') & (frame['KeyDivision'] == '2') &
+                         frame['KeyDate'].between(19320, 19350)]
+        assert currency == 'CLP'
+        assert amount == expected['Amount'].sum()
+        assert qty == expected['Qty'].sum()
+        assert count == len(expected)
+
+    def test_division_grand_totals(self, segmented_frame):
+        """Sin entidad, los totales de la división son los de todas sus filas"""
+        store, segments = _segments(segmented_frame)
+
+        cubes, currency = segments.scope('KeyEmployee', None, division='3')
+
+        expected = segmented_frame[segmented_frame['KeyDivision'] == '3']
+        assert currency == 'USD'
+        assert sum_totals(cubes, None) == (expected['Amount'].sum(), expected['Qty'].sum(), len(expected))
+
+    def test_mixed_currencies_are_rejected(self, segmented_frame):
+        """Una consulta sin división que cruza monedas no se suma"""
+        store, segments = _segments(segmented_frame)
+
+        with pytest.raises(MixedCurrencyError) as error:
+            segments.scope('KeyProduct', None)
+
+        assert error.value.currencies == ['CLP', 'USD']
+
+    def test_single_currency_scope_without_division(self, segmented_frame):
+        """Sin división basta que los registros de la entidad sean de una moneda"""
+        frame = segmented_frame.copy()
+        frame.loc[frame['KeyDivision'] == '3', 'KeyEmployee'] = '9|USD'
+        store, segments = _segments(frame)
+        code = store.key('KeyEmployee').code_of('9|USD')
+
+        cubes, currency = segments.scope('KeyEmployee', code)
+
+        assert currency == 'USD'
+        assert sum_totals(cubes, code)[2] == (frame['KeyEmployee'] == '9|USD').sum()
+
+    def test_segment_ticket_counts_add_up(self, segmented_frame):
+        """Los tickets de los segmentos de una moneda suman los de sus divisiones"""
+        store, segments = _segments(segmented_frame)
+
+        clp_cubes, _ = segments.scope('KeyStore', None, division='1')
+        division_1 = sum_ticket_counts(clp_cubes, None)
+
+        heads = build_ticket_index(store).heads
+        expected = (segmented_frame['KeyDivision'].to_numpy()[heads] == '1').sum()
+        assert division_1 == expected
+
+    def test_unpartitioned_store_uses_global_cubes(self):
+        """Con una sola división y moneda los cubos globales son el único segmento"""
+        frame = pd.DataFrame({
+            'KeyDate': np.array([19300, 19301], dtype=np.int32),
+            'KeyStore': ['1|1', '1|2'],
+            'KeyDivision': ['1', '1'],
+            'KeyCurrency': ['CLP', 'CLP'],
+            'Qty': [1, 2],
+            'Amount': [10.0, 20.0],
+        })
+        store = ColumnarStore.from_dataframe(frame)
+        cubes = build_daily_cubes(store)
+
+        segments = build_segments(store, cubes)
+
+        assert not segments.partitioned
+        assert segments.scope('KeyStore', None) == ([cubes['KeyStore']], 'CLP')
+        assert segments.scope('KeyStore', None, division='9') == ([], None)
+
+
+@pytest.fixture
+def segmented_service(segmented_frame, make_service):
+    """Servicio con segmentos y sketches de cuantiles construidos en memoria"""
+    return make_service(ColumnarStore.from_dataframe(segmented_frame))
+
+
+@pytest.mark.unit
+class TestDivisionDistribution:
+    """Tests para la distribución de montos limitada a una división"""
+
+    def test_distribution_without_division_rejects_mixed_currencies(self, segmented_service):
+        """Sin división la distribución de todo el datamart mezclaría CLP y USD"""
+        with pytest.raises(MixedCurrencyError):
+            segmented_service.get_amount_distribution("amount")
+
+    def test_division_distribution_counts_its_rows(self, segmented_service, segmented_frame):
+        """Con división solo se cuentan las filas (o tickets) de la división, en su moneda"""
+        frame = segmented_frame
+        expected = frame[(frame['KeyDivision'] == '3') & (frame['KeyStore'] == '1|2')]
+
+        amounts = segmented_service.get_amount_distribution("amount", key_store='1|2', division='3')
+        tickets = segmented_service.get_amount_distribution("ticket", key_store='1|2', division='3')
+
+        assert (amounts.division, amounts.currency) == ('3', 'USD')
+        assert amounts.count == len(expected)
+        assert amounts.p50 == pytest.approx(expected['Amount'].median(), rel=0.02)
+        assert tickets.count == expected['TicketId'].nunique()
+
+
+@pytest.mark.unit
+class TestUnknownDivision:
+    """Tests para una división inexistente en un datamart con divisiones nulas"""
+
+    @pytest.fixture
+    def service(self, make_sales_frame, make_service, monkeypatch):
+        rows = 2000
+        divisions = np.random.default_rng([31, 1]).choice(np.array(['1', '2', None], dtype=object), rows)
+        frame = make_sales_frame(
+            rows, seed=31, keys={'KeyStore': 4, 'KeyProduct': 30, 'KeyCustomer': 20}, tickets=np.arange(rows) // 2,
+            qty=(1, 5), amount=(1, 500), KeyDivision=divisions, KeyCurrency=np.full(rows, 'CLP')
+        )
+        monkeypatch.setattr(settings, "UNKNOWN_KEY_MODE", "empty")
+        return make_service(ColumnarStore.from_dataframe(frame))
+
+    def test_customer_queries_do_not_match_null_divisions(self, service):
+        """Una división inexistente no retorna las filas sin división (código -1 de los nulos)"""
+        summary = service.get_customer_summary(key_customer='1|3', division='9')
+        sales = service.get_sales_by_customer('1|3', date(2022, 11, 1), date(2023, 2, 28), division='9')
+
+        assert summary.records_count == 0
+        assert sales.records_count == 0
+        assert service.get_customer_summary(key_customer='1|3').records_count > 0
@@ -0,0 +1,59 @@
+import pytest
+import numpy as np
+import pandas as pd
+from datetime import date
+
+from app.services.columnar import ColumnarStore
+from app.services.aggregates import DailyCube
+from app.services.series import dense_daily, rolling_sum, series_start, year_to_date
+from app.utils.dates import to_day_number
+
+
+@pytest.fixture
+def series_frame(make_sales_frame):
+    """Datamart sintético que cruza un cambio de año y tiene días sin ventas"""
+    return make_sales_frame(
+        3000, seed=43, n_days=120, keys={'KeyStore': 5}, qty=(1, 6), amount=(100, 9000), integer_amount=True
+    )
+
+
+@pytest.mark.unit
+class TestSeries:
+    """Tests para las series densas con ventanas móviles y acumulado del año"""
+
+    def test_dense_daily_matches_groupby(self, series_frame):
+        """La serie densa de una entidad y de todo el datamart coincide con un groupby por día"""
+        store = ColumnarStore.from_dataframe(series_frame)
+        cube = DailyCube.from_key_column(store.key('KeyStore'), store)
+        code = store.key('KeyStore').code_of('1|2')
+        days = pd.RangeIndex(19290, 19430)
+
+        for key, selected in (('1|2', code), (None, None)):
+            frame = series_frame if key is None else series_frame[series_frame['KeyStore'] == key]
+            expected = frame.groupby('KeyDate')['Amount'].agg(['sum', 'size']).reindex(days, fill_value=0)
+
+            amount, qty, count = dense_daily([cube], selected, 19290, 19429)
+
+            assert amount.tolist() == expected['sum'].tolist()
+            assert count.tolist() == expected['size'].tolist()
+
+    def test_rolling_sum_matches_pandas(self):
+        """Las ventanas móviles coinciden con rolling de pandas (ventanas parciales al inicio)"""
+        values = np.random.default_rng(7).integers(0, 100, 200)
+
+        for window in (7, 30, 90):
+            expected = pd.Series(values).rolling(window, min_periods=1).sum()
+            assert rolling_sum(values, window).tolist() == expected.astype(np.int64).tolist()
+
+    def test_year_to_date_restarts_each_year(self):
+        """El acumulado del año vuelve a empezar el 1 de enero"""
+        first_day = to_day_number(date(2022, 12, 30))
+        values = np.ones(5, dtype=np.int64)
+
+        assert year_to_date(values, first_day).tolist() == [1, 2, 1, 2, 3]
+        assert year_to_date(values[1:], first_day + 1).tolist() == [1, 1, 2, 3]
+
+    def test_series_start_covers_windows_and_year(self):
+        """La lectura empieza en la ventana más larga o en el 1 de enero, lo que sea anterior"""
+        assert series_start(to_day_number(date(2023, 11, 1))) == to_day_number(date(2023, 1, 1))
+        assert series_start(to_day_number(date(2023, 2, 1))) == to_day_number(date(2022, 11, 4))
@@ -0,0 +1,168 @@
+import pytest
+import numpy as np
+
+from app.config import settings
+from app.services import datamart as datamart_module
+from app.services.bitmaps import FILTER_COLUMNS, build_bitmap_indexes
+from app.services.columnar import ColumnarStore
+from app.services.cooccurrence import CooccurrenceMatrix
+from app.services.datamart import DatamartService
+from app.services.pivots import build_pivot_matrices
+from app.services.sampling import build_sample
+from app.services.statistics import build_key_statistics
+from app.services.tickets import build_ticket_index
+from app.services.views import MaterializedView
+from app.services.shared_datamart import (export_shared_datamart, attach_shared_datamart, save_shared_structures,
+                                          store_dir_for)
+
+
+@pytest.mark.unit
+class TestSharedDatamart:
+    """Tests para el datamart compartido entre workers"""
+
+    def test_roundtrip_preserves_values(self, sample_dataframe, tmp_path):
+        """Los datos mapeados deben coincidir con los exportados"""
+        path = export_shared_datamart(sample_dataframe, tmp_path / "datamart.arrow")
+
+        shared = attach_shared_datamart(path)
+
+        assert list(shared.columns) == list(sample_dataframe.columns)
+        assert shared['Amount'].tolist() == sample_dataframe['Amount'].tolist()
+        assert shared['Qty'].tolist() == sample_dataframe['Qty'].tolist()
+        assert shared['KeyEmployee'].tolist() == sample_dataframe['KeyEmployee'].tolist()
+        assert (shared['KeyDate'] == sample_dataframe['KeyDate']).all()
+
+    def test_numeric_columns_are_read_only_views(self, sample_dataframe, tmp_path):
+        """Las columnas numéricas deben ser vistas de solo lectura sobre el mapeo"""
+        path = export_shared_datamart(sample_dataframe, tmp_path / "datamart.arrow")
+
+        shared = attach_shared_datamart(path)
+
+        for column in ['Amount', 'Qty', 'KeyDate']:
+            values = shared[column].to_numpy()
+            assert not values.flags.owndata
+            assert not values.flags.writeable
+
+    def test_preserves_nan_amounts(self, sample_dataframe, tmp_path):
+        """Los NaN de Amount deben conservarse sin romper el mapeo zero-copy"""
+        sample_dataframe.loc[0, 'Amount'] = np.nan
+        path = export_shared_datamart(sample_dataframe, tmp_path / "datamart.arrow")
+
+        shared = attach_shared_datamart(path)
+
+        assert np.isnan(shared['Amount'].iloc[0])
+        assert not shared['Amount'].to_numpy().flags.owndata
+
+    def test_string_filters_work_on_shared_frame(self, sample_dataframe, tmp_path):
+        """Los filtros por clave deben funcionar sobre columnas Arrow"""
+        path = export_shared_datamart(sample_dataframe, tmp_path / "datamart.arrow")
+
+        shared = attach_shared_datamart(path)
+        filtered = shared[shared['KeyEmployee'] == '1|343']
+
+        assert len(filtered) == 3
+        assert filtered['Amount'].sum() == pytest.approx(-24873.95 + 1500.50 + 2300.00)
+
+
+def is_mapped(array) -> bool:
+    """Si el arreglo es (una vista de) un archivo mapeado en memoria"""
+    while array is not None:
+        if isinstance(array, np.memmap):
+            return True
+        array = getattr(array, 'base', None)
+    return False
+
+
+@pytest.mark.unit
+class TestSharedStructures:
+    """Tests para las estructuras que el launcher guarda y los workers mapean"""
+
+    @pytest.fixture
+    def launcher_data(self, make_sales_frame, tmp_path, monkeypatch):
+        """Datamart exportado por el launcher con sus estructuras, apuntado por SHARED_DATAMART_PATH"""
+        rows = 3000
+        rng = np.random.default_rng([41, 1])
+        divisions = rng.choice(['1', '2'], rows)
+        data = make_sales_frame(rows, seed=41, n_days=120, keys={
+            'KeyStore': 8, 'KeyEmployee': 30, 'KeyProduct': 90, 'KeyCustomer': 200
+        }, tickets=np.arange(rows) // 3, qty=(-1, 6), amount=(-500, 5000),
+            KeyDivision=divisions, KeyCurrency=np.where(divisions == '2', 'USD', 'CLP'))
+        data.loc[rng.random(rows) < 0.2, 'KeyCustomer'] = '1|POS|'
+        monkeypatch.setattr(settings, 'COOCCURRENCE_ENABLED', True)
+        path = export_shared_datamart(data, tmp_path / "datamart.arrow")
+        save_shared_structures(data, store_dir_for(path))
+        monkeypatch.setattr(settings, 'SHARED_DATAMART_PATH', str(path))
+        return data
+
+    @pytest.fixture
+    def shared_service(self, launcher_data):
+        """Servicio de un worker sobre el datamart y las estructuras guardadas por el launcher"""
+        return DatamartService(), launcher_data
+
+    def test_structures_are_mapped_not_rebuilt(self, shared_service):
+        """Cubos por segmento, sketches, cuantiles, pivotes y muestra se mapean desde la carpeta del almacén"""
+        service, _ = shared_service
+
+        assert service.segments.partitioned
+        assert all(is_mapped(segment.cubes['KeyStore'].amount) for segment in service.segments.segments)
+        assert is_mapped(service.sketches['KeyStore']['tickets'].registers)
+        assert is_mapped(service.sketches['KeyStore']['tickets'].grand.registers)
+        assert is_mapped(service.quantiles['KeyStore']['amount'].counts)
+        assert all(is_mapped(matrix.amount) for matrix in service.pivots.values())
+        assert is_mapped(service.sample.rows)
+        assert is_mapped(service.anonymous_customers.cube.amount)
+        assert all(row_set.is_dense and is_mapped(row_set.words)
+                   for row_set in service.bitmaps['KeyStore']._dense.values())
+        assert is_mapped(service.statistics['KeyStore'].counts)
+        assert is_mapped(service.views.get('store_month').metrics['amount'])
+        assert service.cooccurrence_status == "ready" and is_mapped(service.cooccurrence.partners)
+
+    def test_worker_builds_nothing(self, launcher_data, monkeypatch):
+        """Un worker no construye ninguna estructura de tamaño O(filas): todas vienen del launcher"""
+        def not_built(*args, **kwargs):
+            raise AssertionError("Estructura construida en el worker")
+
+        for name in ("build_ticket_index", "build_daily_cubes", "build_segments", "build_anonymous_group",
+                     "build_bitmap_indexes", "build_key_statistics", "build_distinct_sketches",
+                     "build_quantile_sketches", "build_pivot_matrices", "build_sample", "build_cooccurrence"):
+            monkeypatch.setattr(datamart_module, name, not_built)
+        monkeypatch.setattr(MaterializedView, 'build', not_built)
+        monkeypatch.setattr(ColumnarStore, 'from_dataframe', not_built)
+
+        service = DatamartService()
+
+        assert service.views.errors == {}
+        assert set(service.bitmaps) == set(FILTER_COLUMNS.values())
+
+    def test_mapped_structures_match_a_fresh_build(self, shared_service):
+        """Lo mapeado responde igual que lo construido en el proceso"""
+        service, data = shared_service
+        store = ColumnarStore.from_dataframe(data)
+
+        assert [(s.division, s.currency, s.n_rows) for s in service.segments.segments] == [
+            ('1', 'CLP', (data['KeyDivision'] == '1').sum()), ('2', 'USD', (data['KeyDivision'] == '2').sum())
+        ]
+        summary = service.get_store_summary(key_store='1|3', division='2')
+        expected = data[(data['KeyStore'] == '1|3') & (data['KeyDivision'] == '2')]
+        assert summary.currency == 'USD'
+        assert summary.records_count == len(expected)
+        assert summary.total_amount == pytest.approx(expected['Amount'].sum())
+
+        built = build_sample(store, settings.APPROX_SAMPLE_FRACTION, settings.APPROX_MIN_STRATUM_ROWS)
+        assert np.array_equal(service.sample.rows, built.rows)
+        assert (service.sample.fraction, service.sample.min_rows) == (built.fraction, built.min_rows)
+        for name, matrix in build_pivot_matrices(store).items():
+            assert np.array_equal(service.pivots[name].amount, matrix.amount)
+
+        bitmaps = build_bitmap_indexes(store)
+        for key in ('1|0', '1|5'):
+            assert np.array_equal(service.bitmaps['KeyStore'].rows(key).to_positions(),
+                                  bitmaps['KeyStore'].rows(key).to_positions())
+        assert service.statistics['KeyEmployee'].estimate(3) == build_key_statistics(store)['KeyEmployee'].estimate(3)
+        anonymous = data[data['KeyCustomer'] == '1|POS|']
+        assert service.anonymous_customers.cube.totals(0)[2] == len(anonymous)
+        view_rows, _ = service.views.get('store_month').query(service.store, {'key_store': '1|2'}, limit=1000)
+        assert sum(row['records'] for row in view_rows) == (data['KeyStore'] == '1|2').sum()
+        built = CooccurrenceMatrix.build(store, build_ticket_index(store), settings.COOCCURRENCE_MAX_BASKET)
+        code = built.code_of('1|7')
+        assert service.cooccurrence.top(code, limit=5) == built.top(code, limit=5)
@@ -0,0 +1,92 @@
+import pytest
+import numpy as np
+from datetime import date
+
+from app.services.columnar import ColumnarStore
+from app.services.sketches import (HLL_PRECISION, build_distinct_sketches, count_distinct, count_exact,
+                                   range_rows, register_ranks)
+from app.utils.dates import to_day_number
+
+
+@pytest.fixture(scope="module")
+def store(make_sales_frame):
+    """Datamart sintético de un año con muchos tickets y clientes"""
+    return ColumnarStore.from_dataframe(make_sales_frame(
+        200_000, seed=21, first_day=to_day_number(date(2023, 1, 1)), n_days=365,
+        keys={'KeyStore': 8, 'KeyEmployee': 400, 'KeyProduct': 3000, 'KeyCustomer': 40000},
+        tickets=90000, qty=(1, 5), amount=(1, 500)
+    ))
+
+
+@pytest.fixture(scope="module")
+def sketches(store):
+    return build_distinct_sketches(store)
+
+
+@pytest.mark.unit
+class TestRegisterRanks:
+    """Tests para el registro y rango de cada hash"""
+
+    def test_register_is_top_bits_and_rank_counts_leading_zeros(self):
+        """El registro son los bits altos y el rango la posición del primer 1 del resto"""
+        base = np.uint64(5) << np.uint64(64 - HLL_PRECISION)
+        hashes = np.array([
+            base | (np.uint64(1) << np.uint64(63 - HLL_PRECISION)),  # primer bit del resto en 1
+            base | np.uint64(1),                                     # solo el último bit
+            base,                                                    # resto en cero
+        ], dtype=np.uint64)
+
+        registers, ranks = register_ranks(hashes)
+
+        assert registers.tolist() == [5, 5, 5]
+        assert ranks.tolist() == [1, 64 - HLL_PRECISION, 64 - HLL_PRECISION + 1]
+
+
+@pytest.mark.unit
+class TestDistinctSketches:
+    """Tests para los conteos distintos HyperLogLog por (entidad, mes)"""
+
+    @pytest.mark.parametrize("dimension,target", [
+        ('KeyStore', 'tickets'), ('KeyStore', 'customers'), ('KeyStore', 'products'),
+        ('KeyProduct', 'tickets'), ('KeyEmployee', 'customers'),
+    ])
+    def test_error_within_documented_bound(self, store, sketches, dimension, target):
+        """Con p=12 el error estándar es ~1.6%: se exige menos de 5% (~3 errores estándar)"""
+        code = 2
+        day_start, day_end = to_day_number(date(2023, 2, 14)), to_day_number(date(2023, 11, 3))
+
+        for start, end in [(None, None), (day_start, day_end)]:
+            estimate = count_distinct(store, sketches[dimension][target], code, start, end)
+            exact = count_exact(store, target, range_rows(store, dimension, code, start, end))
+            assert estimate == pytest.approx(exact, rel=0.05, abs=2)
+
+    def test_whole_datamart_uses_grand_sketch(self, store, sketches):
+        """Sin entidad se estima sobre todo el datamart (también en un rango)"""
+        day_start, day_end = to_day_number(date(2023, 3, 1)), to_day_number(date(2023, 6, 30))
+
+        for start, end in [(None, None), (day_start, day_end)]:
+            estimate = count_distinct(store, sketches['KeyStore']['tickets'], None, start, end)
+            exact = count_exact(store, 'tickets', range_rows(store, 'KeyStore', None, start, end))
+            assert estimate == pytest.approx(exact, rel=0.05)
+
+    def test_partial_month_inside_single_month(self, store, sketches):
+        """Un rango dentro de un mes se responde solo desde las filas (casi exacto en cardinalidades bajas)"""
+        day_start, day_end = to_day_number(date(2023, 5, 10)), to_day_number(date(2023, 5, 12))
+        code = store.key('KeyEmployee').code_of('1|17')
+
+        estimate = count_distinct(store, sketches['KeyEmployee']['tickets'], code, day_start, day_end)
+        exact = count_exact(store, 'tickets', range_rows(store, 'KeyEmployee', code, day_start, day_end))
+
+        assert estimate == pytest.approx(exact, abs=1)
+
+    def test_unknown_entity_and_empty_range(self, store, sketches):
+        """Una entidad inexistente o un rango vacío tienen cero distintos"""
+        sketch = sketches['KeyStore']['customers']
+
+        assert count_distinct(store, sketch, -1) == 0
+        assert count_distinct(store, sketch, 0, to_day_number(date(2024, 3, 1)), None) == 0
+
+    def test_dimension_does_not_count_itself(self, sketches):
+        """El producto no tiene sketch de productos distintos"""
+        assert set(sketches['KeyProduct']) == {'tickets', 'customers'}
+        assert set(sketches['KeyStore']) == {'tickets', 'customers', 'products'}
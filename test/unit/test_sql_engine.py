@@ -0,0 +1,85 @@
+import pytest
+from datetime import date
+
+from app.services.sql_engine import SqlEngine
+from app.utils.dates import MISSING_DAY, day_numbers_from_dates
+from app.utils.exceptions import InvalidSqlQueryError, SqlQueryTimeoutError
+from app.utils.money import to_minor_units
+
+
+@pytest.fixture
+def sql_engine(sample_dataframe):
+    """Motor SQL sobre el DataFrame de prueba con fechas como número de día"""
+    data = sample_dataframe.copy()
+    data['KeyDate'] = day_numbers_from_dates(data['KeyDate'])
+    return SqlEngine(data)
+
+
+def fetch(result):
+    return [row for rows in result.batches() for row in rows]
+
+
+@pytest.mark.unit
+class TestSqlEngine:
+    """Tests para el motor SQL de solo lectura"""
+
+    def test_sales_view_exposes_dates(self, sql_engine):
+        """La tabla sales debe exponer KeyDate como fecha"""
+        result = sql_engine.execute(
+            "SELECT KeyStore, COUNT(*) AS n, MIN(KeyDate) AS first FROM sales GROUP BY KeyStore ORDER BY KeyStore",
+            max_rows=10, timeout_seconds=5
+        )
+
+        assert result.columns == ['KeyStore', 'n', 'first']
+        assert fetch(result)[1] == {'KeyStore': '1|023', 'n': 3, 'first': date(2023, 6, 15)}
+
+    def test_fixed_point_amount_in_currency_units(self, sample_dataframe):
+        """En punto fijo Amount debe verse en unidades de la moneda y las fechas nulas como NULL"""
+        data = sample_dataframe.copy()
+        data['KeyDate'] = day_numbers_from_dates(data['KeyDate'])
+        data.loc[4, 'KeyDate'] = MISSING_DAY
+        data['Amount'] = to_minor_units(data['Amount'], 2)
+        engine = SqlEngine(data, amount_decimals=2)
+
+        rows = fetch(engine.execute(
+            "SELECT SUM(Amount) AS total, COUNT(KeyDate) AS dated FROM sales", max_rows=10, timeout_seconds=5
+        ))
+
+        assert rows[0]['total'] == pytest.approx(sample_dataframe['Amount'].sum())
+        assert rows[0]['dated'] == 4
+
+    def test_max_rows_truncates(self, sql_engine):
+        """El resultado debe recortarse al máximo de filas"""
+        result = sql_engine.execute("SELECT * FROM sales", max_rows=2, timeout_seconds=5)
+
+        assert len(fetch(result)) == 2
+        assert result.truncated
+
+    @pytest.mark.parametrize("query", [
+        "DELETE FROM sales",
+        "CREATE TABLE copy AS SELECT * FROM sales",
+        "SET enable_external_access = true",
+        "SELECT * FROM read_csv('/etc/passwd')",
+        "COPY (SELECT * FROM sales) TO '/tmp/sales.csv'",
+    ])
+    def test_rejects_non_read_only(self, sql_engine, query):
+        """Escrituras, cambios de configuración y acceso a archivos deben rechazarse"""
+        with pytest.raises(InvalidSqlQueryError) as exc_info:
+            sql_engine.execute(query, max_rows=10, timeout_seconds=5)
+
+        assert exc_info.value.forbidden
+
+    def test_rejects_multiple_statements_and_bad_columns(self, sql_engine):
+        """Varias sentencias o columnas inexistentes deben dar error de validación"""
+        with pytest.raises(InvalidSqlQueryError):
+            sql_engine.execute("SELECT 1; SELECT 2", max_rows=10, timeout_seconds=5)
+        with pytest.raises(InvalidSqlQueryError):
+            sql_engine.execute("SELECT missing_column FROM sales", max_rows=10, timeout_seconds=5)
+
+    def test_timeout_interrupts_query(self, sql_engine):
+        """Una consulta que excede el tiempo máximo debe interrumpirse"""
+        with pytest.raises(SqlQueryTimeoutError):
+            result = sql_engine.execute(
+                "SELECT COUNT(*) FROM range(100000000000) a, range(1000) b", max_rows=10, timeout_seconds=0.2
+            )
+            fetch(result)
@@ -0,0 +1,105 @@
+import pytest
+import numpy as np
+from datetime import date
+
+from app.services.bitmaps import build_bitmap_indexes, select_rows
+from app.services.columnar import ColumnarStore
+from app.services.statistics import build_key_statistics, choose_access_path, estimate_rows
+from app.utils.dates import to_day_number
+
+
+@pytest.fixture
+def random_frame(make_sales_frame):
+    """Datamart sintético con una tienda dominante y una división densa"""
+    rows = 6000
+    first_day = to_day_number(date(2023, 1, 1))
+    stores = np.random.default_rng([5, 1]).choice(10, rows, p=[0.6] + [0.4 / 9] * 9)
+    return make_sales_frame(rows, seed=5, first_day=first_day, n_days=to_day_number(date(2023, 7, 1)) - first_day, keys={
+        'KeyStore': stores, 'KeyEmployee': 80, 'KeyProduct': 300, 'KeyCustomer': 500, 'KeyDivision': 2
+    }, tickets=2000)
+
+
+@pytest.mark.unit
+class TestKeyStatistics:
+    """Tests para las estadísticas de cardinalidad por (clave, mes)"""
+
+    def test_estimate_is_exact_for_whole_months(self, random_frame):
+        """Sin rango o con meses completos la estimación debe ser exacta"""
+        store = ColumnarStore.from_dataframe(random_frame)
+        statistics = build_key_statistics(store)
+        column = store.key('KeyEmployee')
+
+        days = random_frame['KeyDate']
+        march = (days >= to_day_number(date(2023, 3, 1))) & (days <= to_day_number(date(2023, 4, 30)))
+        employee = random_frame['KeyEmployee'] == '1|4'
+
+        assert estimate_rows(statistics['KeyEmployee'], column, '1|4') == int(employee.sum())
+        assert estimate_rows(
+            statistics['KeyEmployee'], column, '1|4',
+            to_day_number(date(2023, 3, 1)), to_day_number(date(2023, 4, 30))
+        ) == pytest.approx(int((employee & march).sum()))
+        assert estimate_rows(statistics['KeyEmployee'], column, '999|999') == 0
+
+    def test_partial_months_are_prorated(self, random_frame):
+        """Un medio mes debe estimarse cerca de la mitad de las filas del mes"""
+        store = ColumnarStore.from_dataframe(random_frame)
+        statistics = build_key_statistics(store)
+
+        estimate = estimate_rows(
+            statistics['KeyStore'], store.key('KeyStore'), ['1|0', '1|1'],
+            to_day_number(date(2023, 5, 1)), to_day_number(date(2023, 5, 16))
+        )
+
+        days = random_frame['KeyDate']
+        in_may = random_frame['KeyStore'].isin(['1|0', '1|1']) & \
+            (days >= to_day_number(date(2023, 5, 1))) & (days <= to_day_number(date(2023, 5, 31)))
+        assert estimate == pytest.approx(in_may.sum() * 16 / 31)
+
+
+@pytest.mark.unit
+class TestAccessPath:
+    """Tests para la elección entre índice y recorrido secuencial"""
+
+    def test_cost_model_decisions(self):
+        """Claves selectivas usan el índice; claves e intersecciones densas el recorrido"""
+        n_rows = 2_000_000
+
+        assert choose_access_path(n_rows, [2_000], False)[0] == "index"
+        assert choose_access_path(n_rows, [800_000], False, ordered=False)[0] == "scan"
+        assert choose_access_path(n_rows, [800_000], False, ordered=True)[0] == "index"
+        assert choose_access_path(n_rows, [700_000, 800_000], False, ordered=False)[0] == "scan"
+        assert choose_access_path(n_rows, [3_000, 800_000], True, ordered=False)[0] == "index"
+
+    @pytest.mark.parametrize("filters", [
+        {'KeyStore': '1|0'},
+        {'KeyStore': '1|0', 'KeyDivision': '1|1'},
+        {'KeyStore': '1|3', 'KeyDivision': '1|1'},
+        {'KeyStore': ['1|0', '1|2'], 'KeyEmployee': '1|9'},
+    ])
+    @pytest.mark.parametrize("ordered", [True, False])
+    def test_both_paths_return_same_rows(self, random_frame, filters, ordered):
+        """Con o sin estadísticas (recorrido o índice) las filas deben ser las mismas"""
+        store = ColumnarStore.from_dataframe(random_frame)
+        indexes = build_bitmap_indexes(store)
+        statistics = build_key_statistics(store)
+        day_start, day_end = to_day_number(date(2023, 2, 10)), to_day_number(date(2023, 6, 20))
+
+        expected = select_rows(store, indexes, filters, day_start, day_end)
+        rows = select_rows(store, indexes, filters, day_start, day_end, statistics=statistics, ordered=ordered)
+
+        assert sorted(rows.tolist()) == sorted(expected.tolist())
+        if ordered:
+            assert np.all(np.diff(store.days[rows]) >= 0)
+
+    def test_dense_unordered_selection_scans(self, random_frame):
+        """Una intersección densa sin orden debe recorrer las columnas y reportarlo en la traza"""
+        store = ColumnarStore.from_dataframe(random_frame)
+        trace = []
+
+        select_rows(
+            store, build_bitmap_indexes(store), {'KeyStore': '1|0', 'KeyDivision': '1|1'},
+            trace=trace, statistics=build_key_statistics(store), ordered=False
+        )
+
+        assert trace[0]['step'] == 'scan'
+        assert trace[0]['rows_scanned'] == len(random_frame)
@@ -0,0 +1,122 @@
+import pytest
+import numpy as np
+
+from app.services.aggregates import build_daily_cubes, load_daily_cubes
+from app.services.columnar import ColumnarStore
+from app.services.tickets import TicketIndex, build_hash_slots, build_ticket_index
+
+
+@pytest.fixture
+def ticket_frame(make_sales_frame):
+    """Datamart sintético: cada ticket pertenece a una tienda, un empleado y un día"""
+    rng = np.random.default_rng(8)
+    tickets = 600
+    lines = rng.integers(1, 6, tickets)
+    ticket_of_row = np.repeat(np.arange(tickets), lines)
+    rng.shuffle(ticket_of_row)
+    return make_sales_frame(len(ticket_of_row), seed=8, keys={
+        'KeyStore': ticket_of_row % 5, 'KeyEmployee': ticket_of_row % 23, 'KeyProduct': 80,
+        'KeyCustomer': ticket_of_row % 97
+    }, tickets=ticket_of_row, ticket_prefix='N01-', qty=(1, 5), amount=(1, 500),
+        KeyDate=(19300 + ticket_of_row % 90).astype(np.int32))
+
+
+@pytest.mark.unit
+class TestHashSlots:
+    """Tests para la tabla hash de direccionamiento abierto"""
+
+    def test_every_code_is_reachable_with_collisions(self):
+        """Con hashes que colisionan, cada código queda en su posición o más adelante (sondeo lineal)"""
+        hashes = np.array([3, 3, 3, 4, 19], dtype=np.uint64)
+
+        slots = build_hash_slots(hashes)
+        mask = len(slots) - 1
+
+        assert len(slots) >= 2 * len(hashes)
+        for code, value in enumerate(hashes):
+            position = int(value) & mask
+            while slots[position] != code:
+                assert slots[position] != -1
+                position = (position + 1) & mask
+
+
+@pytest.mark.unit
+class TestTicketIndex:
+    """Tests para el índice de tickets y sus agregados"""
+
+    def test_lookup_matches_groupby(self, ticket_frame):
+        """Las filas y los agregados de cada ticket deben coincidir con un groupby"""
+        store = ColumnarStore.from_dataframe(ticket_frame)
+        index = build_ticket_index(store)
+        expected = ticket_frame.groupby('TicketId').agg(
+            amount=('Amount', 'sum'), qty=('Qty', 'sum'), lines=('Amount', 'size'), day=('KeyDate', 'min')
+        )
+
+        assert index.n_tickets == len(expected)
+        for ticket_id, group in expected.sample(50, random_state=1).iterrows():
+            code = index.code_of(store, ticket_id)
+            amount, qty, lines = index.totals(code)
+
+            assert set(store.text('TicketId', index.rows(code))) == {ticket_id}
+            assert amount == pytest.approx(group['amount'])
+            assert qty == group['qty']
+            assert lines == group['lines']
+            assert index.days[code] == group['day']
+
+    def test_unknown_ticket(self, ticket_frame):
+        """Un ticket inexistente tiene código -1 y ninguna fila"""
+        store = ColumnarStore.from_dataframe(ticket_frame)
+        index = build_ticket_index(store)
+
+        code = index.code_of(store, 'N01-999999')
+
+        assert code == -1
+        assert len(index.rows(code)) == 0
+
+    def test_save_and_load(self, ticket_frame, tmp_path):
+        """El índice guardado se mapea y responde igual"""
+        store = ColumnarStore.from_dataframe(ticket_frame)
+        build_ticket_index(store).save(tmp_path)
+
+        loaded = TicketIndex.load(tmp_path)
+
+        code = loaded.code_of(store, 'N01-42')
+        assert set(store.text('TicketId', loaded.rows(code))) == {'N01-42'}
+        assert TicketIndex.load(tmp_path / "missing") is None
+
+
+@pytest.mark.unit
+class TestCubeTicketCounts:
+    """Tests para los tickets por celda de los cubos de empleado y tienda"""
+
+    def test_ticket_counts_in_range(self, ticket_frame):
+        """Los tickets de una tienda en un rango deben coincidir con contar tickets distintos"""
+        store = ColumnarStore.from_dataframe(ticket_frame)
+        cubes = build_daily_cubes(store, tickets=build_ticket_index(store))
+        code = store.key('KeyStore').code_of('1|3')
+
+        count = cubes['KeyStore'].ticket_count(code, 19310, 19350)
+
+        expected = ticket_frame[(ticket_frame['KeyStore'] == '1|3') &
+                                (ticket_frame['KeyDate'] >= 19310) & (ticket_frame['KeyDate'] <= 19350)]
+        assert count == expected['TicketId'].nunique()
+        assert cubes['KeyEmployee'].ticket_count() == ticket_frame['TicketId'].nunique()
+        assert cubes['KeyStore'].ticket_count(-1) == 0
+
+    def test_product_cube_and_cube_without_index_have_no_tickets(self, ticket_frame):
+        """El cubo de producto no cuenta tickets, ni los cubos construidos sin índice"""
+        store = ColumnarStore.from_dataframe(ticket_frame)
+
+        assert build_daily_cubes(store, tickets=build_ticket_index(store))['KeyProduct'].ticket_count() is None
+        assert build_daily_cubes(store)['KeyStore'].ticket_count() is None
+
+    def test_ticket_part_is_saved(self, ticket_frame, tmp_path):
+        """La parte de tickets se guarda y se mapea con el cubo"""
+        store = ColumnarStore.from_dataframe(ticket_frame)
+        for cube in build_daily_cubes(store, tickets=build_ticket_index(store)).values():
+            cube.save(tmp_path)
+
+        cubes = load_daily_cubes(tmp_path)
+
+        assert cubes['KeyStore'].ticket_count() == ticket_frame['TicketId'].nunique()
+        assert cubes['KeyProduct'].ticket_count() is None
@@ -0,0 +1,53 @@
+import pytest
+from datetime import date
+
+from app.config import settings
+from app.services.columnar import ColumnarStore
+from app.utils.dates import to_day_number
+from app.utils.exceptions import KeyNotFoundError
+
+
+@pytest.fixture
+def service(make_sales_frame, make_service, monkeypatch):
+    """Servicio con estructuras construidas en memoria (sin leer archivos)"""
+    rows = 2000
+    store = ColumnarStore.from_dataframe(make_sales_frame(
+        rows, seed=48, first_day=to_day_number(date(2023, 11, 1)), n_days=30,
+        keys={'KeyStore': 5, 'KeyEmployee': 20, 'KeyProduct': 80}, tickets=rows // 3,
+        qty=(1, 5), amount=(1, 500)
+    ))
+    monkeypatch.setattr(settings, "UNKNOWN_KEY_MODE", "empty")
+    return make_service(store)
+
+
+@pytest.mark.unit
+class TestUnknownKeys:
+    """Tests para las claves que no existen en el datamart"""
+
+    def test_unknown_key_returns_empty_without_selecting_rows(self, service, monkeypatch):
+        """Una clave inexistente responde vacío sin recorrer índices"""
+        def fail(*args, **kwargs):
+            raise AssertionError("No se deben seleccionar filas para una clave inexistente")
+        monkeypatch.setattr(service, "_select_rows", fail)
+
+        result = service.get_sales_by_employee('9|999', date(2023, 11, 1), date(2023, 11, 30))
+
+        assert (result.records_count, result.total_amount, result.sales) == (0, 0.0, [])
+
+    def test_known_key_still_returns_sales(self, service):
+        """Las claves que existen siguen respondiendo sus ventas"""
+        result = service.get_sales_by_store('1|3', date(2023, 11, 1), date(2023, 11, 30))
+
+        assert result.records_count > 0
+        assert len(result.sales) == result.records_count
+
+    def test_404_mode_raises_for_unknown_keys(self, service, monkeypatch):
+        """Con UNKNOWN_KEY_MODE=404 una clave inexistente lanza KeyNotFoundError"""
+        monkeypatch.setattr(settings, "UNKNOWN_KEY_MODE", "404")
+
+        with pytest.raises(KeyNotFoundError):
+            service.get_sales_by_product('9|999', date(2023, 11, 1), date(2023, 11, 30))
+        with pytest.raises(KeyNotFoundError):
+            service.query_sales({'key_store': '1|0', 'key_employee': '9|999'})
+        with pytest.raises(KeyNotFoundError):
+            service.get_store_summary(key_store='9|999')
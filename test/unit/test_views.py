@@ -0,0 +1,110 @@
+import pytest
+import numpy as np
+import pandas as pd
+
+from app.models.schemas import ViewDefinition
+from app.services.columnar import ColumnarStore
+from app.services.tickets import build_ticket_index
+from app.services.views import MaterializedView, ViewRegistry
+from app.utils.dates import dates_from_day_numbers
+from app.utils.exceptions import ViewNotFoundError
+
+
+@pytest.fixture
+def view_frame(make_sales_frame):
+    """Datamart sintético con devoluciones y varios meses"""
+    rows = 3000
+    return make_sales_frame(
+        rows, seed=45, n_days=180, keys={'KeyStore': 6, 'KeyProduct': 30}, tickets=np.arange(rows) // 3,
+        qty=(-1, 6), amount=(-2000, 9000), integer_amount=True
+    )
+
+
+def _monthly(frame):
+    months = dates_from_day_numbers(frame['KeyDate'].to_numpy()).astype('datetime64[M]').astype('datetime64[D]')
+    return frame.assign(period=pd.to_datetime(months).strftime('%Y-%m-%d'))
+
+
+@pytest.mark.unit
+class TestMaterializedViews:
+    """Tests para las vistas materializadas declarativas"""
+
+    def test_view_matches_groupby(self, view_frame):
+        """Cada fila de la vista coincide con un groupby por dimensiones y mes"""
+        store = ColumnarStore.from_dataframe(view_frame)
+        definition = ViewDefinition(name='product_store_month', dimensions=['key_product', 'key_store'],
+                                    grain='month', metrics=['amount', 'records', 'returns_amount'])
+
+        view = MaterializedView.build(definition, store)
+        rows, total = view.query(store, {}, limit=100000)
+
+        frame = _monthly(view_frame)
+        expected = frame.groupby(['KeyProduct', 'KeyStore', 'period']).agg(
+            amount=('Amount', 'sum'), records=('Amount', 'size'),
+            returns_amount=('Amount', lambda values: values[values < 0].sum())
+        )
+        assert total == view.n_rows == len(expected)
+        for row in rows[:50]:
+            group = expected.loc[(row['key_product'], row['key_store'], row['period'])]
+            assert (row['amount'], row['records'], row['returns_amount']) == \
+                   (group['amount'], group['records'], group['returns_amount'])
+
+    def test_query_filters_and_dates(self, view_frame):
+        """Los filtros por dimensión y periodo seleccionan las filas de la entidad"""
+        store = ColumnarStore.from_dataframe(view_frame)
+        tickets = build_ticket_index(store)
+        definition = ViewDefinition(name='store_month', dimensions=['key_store'], grain='month',
+                                    metrics=['amount', 'tickets'])
+        view = MaterializedView.build(definition, store, tickets)
+
+        rows, total = view.query(store, {'key_store': '1|3'}, 19358, 19450)
+
+        assert total == len(rows) > 0
+        assert all(row['key_store'] == '1|3' for row in rows)
+        # 19358 es 2023-01-01; 19450 cae en abril
+        assert [row['period'] for row in rows] == ['2023-01-01', '2023-02-01', '2023-03-01', '2023-04-01']
+        frame = _monthly(view_frame)
+        expected = frame[(frame['KeyStore'] == '1|3') & (frame['period'] == '2023-02-01')]['Amount'].sum()
+        assert rows[1]['amount'] == expected
+
+    def test_unknown_key_and_pagination(self, view_frame):
+        """Una clave inexistente no retorna filas y offset/limit paginan"""
+        store = ColumnarStore.from_dataframe(view_frame)
+        view = MaterializedView.build(ViewDefinition(name='store', dimensions=['key_store']), store)
+
+        assert view.query(store, {'key_store': '9|999'}) == ([], 0)
+        rows, total = view.query(store, {}, offset=2, limit=3)
+        assert total == 6
+        assert [row['key_store'] for row in rows] == sorted(view_frame['KeyStore'].unique())[2:5]
+
+    def test_query_rejects_filters_outside_view(self, view_frame):
+        """Filtrar por una dimensión o fecha que la vista no tiene es un error"""
+        store = ColumnarStore.from_dataframe(view_frame)
+        view = MaterializedView.build(ViewDefinition(name='store', dimensions=['key_store']), store)
+
+        with pytest.raises(ValueError):
+            view.query(store, {'key_product': '1|1'})
+        with pytest.raises(ValueError):
+            view.query(store, {}, day_start=19300)
+
+    def test_registry_records_build_errors(self, view_frame):
+        """Una vista que no se puede construir queda con su error y no bloquea a las demás"""
+        store = ColumnarStore.from_dataframe(view_frame)
+        registry = ViewRegistry.from_settings([
+            {'name': 'by_customer', 'dimensions': ['key_customer']},
+            {'name': 'total', 'metrics': ['amount', 'records']},
+        ])
+
+        registry.refresh(store)
+
+        assert 'KeyCustomer' not in store.keys
+        assert registry.get('total').query(store, {})[0] == [{'amount': view_frame['Amount'].sum(), 'records': 3000}]
+        with pytest.raises(ValueError):
+            registry.get('by_customer')
+        with pytest.raises(ViewNotFoundError):
+            registry.get('missing')
+
+    def test_repeated_view_names_are_rejected(self):
+        """Las declaraciones no pueden repetir nombres"""
+        with pytest.raises(ValueError):
+            ViewRegistry.from_settings([{'name': 'a'}, {'name': 'a', 'grain': 'day'}])